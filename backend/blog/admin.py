@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import subprocess
 from pathlib import Path
 
@@ -13,8 +14,10 @@ from django.utils.html import format_html, format_html_join
 from django.utils import timezone
 from adminsortable2.admin import SortableAdminMixin, SortableInlineAdminMixin
 
-from .image_bed import ImageBedUploadError, upload_photo_to_obsidian_images
+from .image_bed import ImageBedUploadError, upload_photo_to_obsidian_images, upload_photos_to_obsidian_images
 from sync.document_pool import sync_obsidian_documents
+from sync.locks import SyncLockBusy, sync_lease
+from sync.payload_store import expand_payload
 from sync.service import sync_post_payload
 
 from .models import (
@@ -34,7 +37,9 @@ from .models import (
     SectionQuote,
     SiteVisit,
     SocialFriend,
+    SyncJobRun,
     SyncLog,
+    SyncLogRollup,
     TimeSeriesConfig,
     TimelineNode,
     TravelPlace,
@@ -91,6 +96,9 @@ class PostAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("title",)}
     readonly_fields = ["created_at", "updated_at", "last_synced_at", "views_count"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related("view_record")
+
     @admin.display(boolean=True, description="已发布", ordering="draft")
     def is_published(self, obj: Post) -> bool:
         return not obj.draft
@@ -113,16 +121,42 @@ class PostAdmin(admin.ModelAdmin):
         self.message_user(request, f"已取消置顶 {updated} 篇文章", level=messages.SUCCESS)
 
 
+class _PostEngagementAdmin(admin.ModelAdmin):
+    """Engagement rows live in the analytics database, so nothing may join ``blog_post``.
+
+    The changelist must not ``select_related`` the post (an empty
+    ``list_select_related`` stops Django adding it for the FK column); the
+    post is prefetched from the default database instead, and search only
+    touches columns of the engagement table.
+    """
+
+    list_select_related = ()
+    # Searched by post id only; see ``get_search_results``.
+    search_fields = ["post_id"]
+    search_help_text = "按文章 ID 搜索"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related("post")
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return (queryset.filter(post_id=int(term)) if term.isdigit() else queryset.none()), False
+
+    @admin.display(description="文章", ordering="post_id")
+    def post_title(self, obj) -> str:
+        return str(obj.post.title) if obj.post else f"#{obj.post_id}"
+
+
 @admin.register(PostView)
-class PostViewAdmin(admin.ModelAdmin):
-    list_display = ["post", "views", "updated_at"]
-    search_fields = ["post__title", "post__slug"]
+class PostViewAdmin(_PostEngagementAdmin):
+    list_display = ["post_title", "views", "updated_at"]
 
 
 @admin.register(PostLike)
-class PostLikeAdmin(admin.ModelAdmin):
-    list_display = ["post", "likes", "updated_at"]
-    search_fields = ["post__title", "post__slug"]
+class PostLikeAdmin(_PostEngagementAdmin):
+    list_display = ["post_title", "likes", "updated_at"]
 
 
 @admin.register(BarrageComment)
@@ -320,36 +354,41 @@ class PhotoWallImageAdmin(SortableAdminMixin, admin.ModelAdmin):
         if request.method != "POST":
             return JsonResponse({"ok": False, "message": "仅支持 POST"}, status=405)
 
-        upload = request.FILES.get("file")
-        if upload is None:
+        uploads = request.FILES.getlist("file")
+        if not uploads:
             return JsonResponse({"ok": False, "message": "缺少 file 字段"}, status=400)
 
-        suffix = Path(str(upload.name or "")).suffix.lower()
-        content_type = str(getattr(upload, "content_type", "")).lower()
-        if upload.size > self.max_upload_size:
-            return JsonResponse({"ok": False, "message": "图片大小不能超过 8MB"}, status=400)
-        if content_type not in self.allowed_content_types and suffix not in self.allowed_extensions:
-            return JsonResponse({"ok": False, "message": "仅支持 jpg/png/webp 格式"}, status=400)
+        for upload in uploads:
+            suffix = Path(str(upload.name or "")).suffix.lower()
+            content_type = str(getattr(upload, "content_type", "")).lower()
+            if upload.size > self.max_upload_size:
+                return JsonResponse({"ok": False, "message": "图片大小不能超过 8MB"}, status=400)
+            if content_type not in self.allowed_content_types and suffix not in self.allowed_extensions:
+                return JsonResponse({"ok": False, "message": "仅支持 jpg/png/webp 格式"}, status=400)
 
+        operator = getattr(request.user, "username", "")
         try:
-            result = upload_photo_to_obsidian_images(upload, operator=getattr(request.user, "username", ""))
+            if len(uploads) == 1:
+                results = [upload_photo_to_obsidian_images(uploads[0], operator=operator)]
+            else:
+                # Several files become one image-bed commit.
+                results = upload_photos_to_obsidian_images(uploads, operator=operator)
         except ImageBedUploadError as exc:
             return JsonResponse({"ok": False, "message": str(exc)}, status=400)
 
-        return JsonResponse(
+        items = [
             {
-                "ok": True,
-                "data": {
-                    "image_url": result.image_url,
-                    "source_url": result.source_url,
-                    "path": result.path,
-                    "sha": result.sha,
-                    "size": upload.size,
-                    "content_type": content_type,
-                },
-            },
-            status=200,
-        )
+                "image_url": result.image_url,
+                "source_url": result.source_url,
+                "path": result.path,
+                "sha": result.sha,
+                "size": upload.size,
+                "content_type": str(getattr(upload, "content_type", "")).lower(),
+            }
+            for upload, result in zip(uploads, results)
+        ]
+        data = items[0] if len(items) == 1 else {"items": items}
+        return JsonResponse({"ok": True, "data": data}, status=200)
 
 
 
@@ -547,17 +586,18 @@ class ObsidianDocumentAdmin(admin.ModelAdmin):
 
         repo_commit = self._resolve_repo_commit(settings.OBSIDIAN_VAULT_PATH)
         try:
-            result = sync_obsidian_documents(
-                source=settings.OBSIDIAN_VAULT_PATH,
-                trigger=ObsidianSyncRun.Trigger.MANUAL,
-                publish_tag=settings.OBSIDIAN_DOC_SYNC_PUBLISH_TAG,
-                missing_behavior="draft",
-                auto_update_published=True,
-                repo_url=settings.OBSIDIAN_VAULT_REPO_URL,
-                repo_branch=settings.OBSIDIAN_VAULT_REPO_BRANCH,
-                repo_commit=repo_commit,
-                operator=request.user,
-            )
+            with sync_lease(holder=f"admin:{request.user.get_username()}"):
+                result = sync_obsidian_documents(
+                    source=settings.OBSIDIAN_VAULT_PATH,
+                    trigger=ObsidianSyncRun.Trigger.MANUAL,
+                    publish_tag=settings.OBSIDIAN_DOC_SYNC_PUBLISH_TAG,
+                    missing_behavior="draft",
+                    auto_update_published=True,
+                    repo_url=settings.OBSIDIAN_VAULT_REPO_URL,
+                    repo_branch=settings.OBSIDIAN_VAULT_REPO_BRANCH,
+                    repo_commit=repo_commit,
+                    operator=request.user,
+                )
             run = result.run
             self.message_user(
                 request,
@@ -568,6 +608,8 @@ class ObsidianDocumentAdmin(admin.ModelAdmin):
                 ),
                 level=messages.SUCCESS,
             )
+        except SyncLockBusy as exc:
+            self.message_user(request, f"已有同步任务在运行，请稍后再试: {exc}", level=messages.WARNING)
         except ValueError as exc:
             self.message_user(request, f"文档池同步失败: {exc}", level=messages.ERROR)
 
@@ -590,6 +632,31 @@ class ObsidianDocumentAdmin(admin.ModelAdmin):
         return str(result.stdout or "").strip()
 
 
+def _render_stage_timings(timings) -> str:
+    if not isinstance(timings, dict) or not timings:
+        return "-"
+    rows = sorted(timings.items(), key=lambda item: -float((item[1] or {}).get("ms") or 0))
+    body = format_html_join(
+        "",
+        "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>",
+        (
+            (
+                name,
+                f"{float(values.get('ms') or 0):.1f}",
+                values.get("count") or 0,
+                "-" if values.get("p95_ms") is None else f"{float(values['p95_ms']):.2f}",
+            )
+            for name, values in rows
+            if isinstance(values, dict)
+        ),
+    )
+    return format_html(
+        "<table><thead><tr><th>阶段</th><th>耗时 (ms)</th><th>数量</th><th>单项 p95 (ms)</th></tr></thead>"
+        "<tbody>{}</tbody></table>",
+        body,
+    )
+
+
 @admin.register(ObsidianSyncRun)
 class ObsidianSyncRunAdmin(admin.ModelAdmin):
     list_display = [
@@ -603,6 +670,7 @@ class ObsidianSyncRunAdmin(admin.ModelAdmin):
         "published_updated_count",
         "drafted_count",
         "duration_ms",
+        "slowest_stage",
         "operator",
     ]
     list_filter = ["trigger", "status"]
@@ -622,12 +690,25 @@ class ObsidianSyncRunAdmin(admin.ModelAdmin):
         "started_at",
         "finished_at",
         "duration_ms",
+        "stage_breakdown",
         "message",
         "operator",
         "created_at",
         "updated_at",
     ]
 
+    @admin.display(description="阶段耗时")
+    def stage_breakdown(self, obj: ObsidianSyncRun):
+        return _render_stage_timings(obj.stage_timings)
+
+    @admin.display(description="最慢阶段")
+    def slowest_stage(self, obj: ObsidianSyncRun):
+        timings = obj.stage_timings if isinstance(obj.stage_timings, dict) else {}
+        if not timings:
+            return "-"
+        name, values = max(timings.items(), key=lambda item: float((item[1] or {}).get("ms") or 0))
+        return f"{name} {float(values.get('ms') or 0):.0f}ms"
+
     def has_add_permission(self, request):
         return False
 
@@ -651,21 +732,81 @@ class SyncLogAdmin(admin.ModelAdmin):
         "status",
         "message",
         "payload",
+        "full_payload",
         "result",
         "started_at",
         "finished_at",
         "duration_ms",
+        "stage_breakdown",
         "operator",
         "created_at",
         "updated_at",
     ]
     fieldsets = (
         ("基本信息", {"fields": ("source", "slug", "mode", "action", "status", "operator")}),
-        ("执行信息", {"fields": ("message", "duration_ms", "started_at", "finished_at")}),
-        ("数据快照", {"fields": ("payload", "result")}),
+        ("执行信息", {"fields": ("message", "duration_ms", "stage_breakdown", "started_at", "finished_at")}),
+        ("数据快照", {"fields": ("payload", "full_payload", "result")}),
         ("时间", {"fields": ("created_at", "updated_at")}),
     )
 
+    def get_queryset(self, request):
+        # Payload columns are only needed on the detail page.
+        return super().get_queryset(request).select_related("operator").defer("payload", "result", "stage_timings")
+
+    @admin.display(description="阶段耗时")
+    def stage_breakdown(self, obj: SyncLog):
+        return _render_stage_timings(obj.stage_timings)
+
+    @admin.display(description="完整载荷")
+    def full_payload(self, obj: SyncLog):
+        expanded = expand_payload(obj.payload)
+        return format_html("<pre style=\"white-space: pre-wrap\">{}</pre>", json.dumps(expanded, ensure_ascii=False, indent=2))
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SyncLogRollup)
+class SyncLogRollupAdmin(admin.ModelAdmin):
+    list_display = ["day", "source", "action", "status", "count", "duration_ms"]
+    list_filter = ["source", "action", "status"]
+    date_hierarchy = "day"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SyncJobRun)
+class SyncJobRunAdmin(admin.ModelAdmin):
+    list_display = ["started_at", "job", "attempt", "status", "exit_code", "duration_ms"]
+    list_filter = ["job", "status"]
+    search_fields = ["job", "command", "output"]
+    readonly_fields = [
+        "job",
+        "command",
+        "attempt",
+        "status",
+        "exit_code",
+        "output",
+        "started_at",
+        "finished_at",
+        "duration_ms",
+        "created_at",
+        "updated_at",
+    ]
+
     def has_add_permission(self, request):
         return False
 
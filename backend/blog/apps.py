@@ -8,7 +8,10 @@ class BlogConfig(AppConfig):
 
     def ready(self):
         from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete
 
         from .db import configure_sqlite
+        from .signals import delete_post_engagement
 
         connection_created.connect(configure_sqlite, dispatch_uid="blog.configure_sqlite")
+        post_delete.connect(delete_post_engagement, sender="blog.Post", dispatch_uid="blog.delete_post_engagement")
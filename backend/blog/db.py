@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": "5000",
+}
+
 
 def configure_sqlite(sender, connection, **_kwargs):
     if connection.vendor != "sqlite":
         return
 
+    # Per-database overrides come from the ``PRAGMAS`` key of its DATABASES entry.
+    pragmas = {**DEFAULT_PRAGMAS, **connection.settings_dict.get("PRAGMAS", {})}
     with connection.cursor() as cursor:
-        cursor.execute("PRAGMA journal_mode=WAL;")
-        cursor.execute("PRAGMA synchronous=NORMAL;")
-        cursor.execute("PRAGMA foreign_keys=ON;")
-        cursor.execute("PRAGMA busy_timeout=5000;")
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value};")
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib import parse
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from sync.http_client import HttpClient, HttpError, shared_client
+
+from .models import GithubProject
+
+GITHUB_API = "https://api.github.com"
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_CHUNK_SIZE = 50
+ETAG_CACHE_FILE = "github_projects_etags.json"
+# Columns a refresh owns; curated fields (Chinese copy, tech stack, cover, order) are left alone.
+REFRESHED_FIELDS = (
+    "name",
+    "description",
+    "html_url",
+    "language",
+    "topics",
+    "homepage_url",
+    "stars_count",
+    "forks_count",
+    "open_issues_count",
+)
+BULK_UPDATE_BATCH_SIZE = 200
+
+_REPOSITORY_FIELDS = """
+fragment ProjectFields on Repository {
+  name
+  description
+  url
+  homepageUrl
+  stargazerCount
+  forkCount
+  primaryLanguage { name }
+  repositoryTopics(first: 20) { nodes { topic { name } } }
+  issues(states: OPEN) { totalCount }
+  pullRequests(states: OPEN) { totalCount }
+}
+"""
+
+
+class GithubRefreshError(ValueError):
+    pass
+
+
+@dataclass
+class RefreshResult:
+    requests: int = 0
+    not_modified: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    missing: list[str] = field(default_factory=list)
+
+
+def split_full_name(full_name: str) -> tuple[str, str]:
+    owner, _, name = str(full_name or "").strip().strip("/").partition("/")
+    return owner, name
+
+
+def rest_project_fields(payload: dict) -> dict:
+    """Map a REST ``GET /repos/{owner}/{repo}`` body onto ``GithubProject`` columns."""
+    return {
+        "name": payload.get("name") or "",
+        "description": payload.get("description") or "",
+        "html_url": payload.get("html_url") or "",
+        "language": payload.get("language") or "",
+        "topics": payload.get("topics") or [],
+        "homepage_url": payload.get("homepage") or "",
+        "stars_count": payload.get("stargazers_count") or 0,
+        "forks_count": payload.get("forks_count") or 0,
+        "open_issues_count": payload.get("open_issues_count") or 0,
+    }
+
+
+def graphql_project_fields(node: dict) -> dict:
+    topics = [item["topic"]["name"] for item in (node.get("repositoryTopics") or {}).get("nodes") or []]
+    return {
+        "name": node.get("name") or "",
+        "description": node.get("description") or "",
+        "html_url": node.get("url") or "",
+        "language": (node.get("primaryLanguage") or {}).get("name") or "",
+        "topics": topics,
+        "homepage_url": node.get("homepageUrl") or "",
+        "stars_count": node.get("stargazerCount") or 0,
+        "forks_count": node.get("forkCount") or 0,
+        # REST's open_issues_count includes open pull requests; keep the numbers comparable.
+        "open_issues_count": (node.get("issues") or {}).get("totalCount", 0)
+        + (node.get("pullRequests") or {}).get("totalCount", 0),
+    }
+
+
+def _graphql_query(count: int) -> str:
+    variables = ", ".join(f"$o{index}: String!, $n{index}: String!" for index in range(count))
+    aliases = "\n".join(
+        f"  r{index}: repository(owner: $o{index}, name: $n{index}) {{ ...ProjectFields }}" for index in range(count)
+    )
+    return f"query Projects({variables}) {{\n{aliases}\n}}\n{_REPOSITORY_FIELDS}"
+
+
+def _github_headers(token: str) -> dict[str, str]:
+    headers = {"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def fetch_via_graphql(
+    full_names: list[str],
+    *,
+    token: str,
+    client: HttpClient,
+    result: RefreshResult,
+    chunk_size: int = GRAPHQL_CHUNK_SIZE,
+) -> dict[str, dict]:
+    """One GraphQL query per ``chunk_size`` repositories; unknown repositories are left out."""
+    fetched: dict[str, dict] = {}
+    for start in range(0, len(full_names), chunk_size):
+        chunk = full_names[start : start + chunk_size]
+        variables: dict[str, str] = {}
+        for index, full_name in enumerate(chunk):
+            variables[f"o{index}"], variables[f"n{index}"] = split_full_name(full_name)
+        try:
+            response = client.request(
+                "POST",
+                GITHUB_GRAPHQL_URL,
+                headers=_github_headers(token),
+                payload={"query": _graphql_query(len(chunk)), "variables": variables},
+            )
+            body = response.json() if response.ok else None
+        except (HttpError, ValueError) as exc:
+            raise GithubRefreshError(f"GitHub GraphQL 请求失败: {exc}") from exc
+        result.requests += 1
+        if not isinstance(body, dict) or not isinstance(body.get("data"), dict):
+            raise GithubRefreshError(f"GitHub GraphQL 请求失败（HTTP {response.status}）: {response.text()[:300]}")
+        # Missing repositories come back as null with a NOT_FOUND error; the rest of the chunk is still valid.
+        for index, full_name in enumerate(chunk):
+            node = body["data"].get(f"r{index}")
+            if isinstance(node, dict):
+                fetched[full_name] = graphql_project_fields(node)
+    return fetched
+
+
+def _etag_cache_path() -> Path:
+    return Path(settings.SYNC_CACHE_DIR) / ETAG_CACHE_FILE
+
+
+def _load_etag_cache() -> dict[str, dict]:
+    try:
+        data = json.loads(_etag_cache_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_etag_cache(cache: dict[str, dict]) -> None:
+    path = _etag_cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(cache, handle, ensure_ascii=False)
+        os.replace(temp_name, path)
+    except OSError:
+        # Without the cache the next run simply gets 200s instead of 304s.
+        return
+
+
+def fetch_via_rest(full_names: list[str], *, token: str, client: HttpClient, result: RefreshResult) -> dict[str, dict]:
+    """Conditional ``GET /repos/...`` per repository, for when no token allows GraphQL.
+
+    A 304 answer to ``If-None-Match`` reuses the cached fields and does not
+    count against GitHub's rate limit.
+    """
+    cache = _load_etag_cache()
+    fetched: dict[str, dict] = {}
+    for full_name in full_names:
+        owner, name = split_full_name(full_name)
+        headers = _github_headers(token)
+        cached = cache.get(full_name)
+        if isinstance(cached, dict) and cached.get("etag") and isinstance(cached.get("fields"), dict):
+            headers["If-None-Match"] = cached["etag"]
+        try:
+            response = client.request(
+                "GET", f"{GITHUB_API}/repos/{parse.quote(owner)}/{parse.quote(name)}", headers=headers
+            )
+        except HttpError as exc:
+            raise GithubRefreshError(f"GitHub API 请求失败: {exc}") from exc
+        result.requests += 1
+        if response.status == 304 and "If-None-Match" in headers:
+            result.not_modified += 1
+            fetched[full_name] = cached["fields"]
+            continue
+        if response.status == 404:
+            continue
+        try:
+            payload = response.json() if response.ok else None
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            raise GithubRefreshError(f"GitHub API 请求失败（HTTP {response.status}）: {full_name}")
+        fetched[full_name] = rest_project_fields(payload)
+        if response.header("ETag"):
+            cache[full_name] = {"etag": response.header("ETag"), "fields": fetched[full_name]}
+    _save_etag_cache(cache)
+    return fetched
+
+
+def apply_project_fields(
+    projects: list[GithubProject], fetched: dict[str, dict], result: RefreshResult, *, dry_run: bool = False
+) -> None:
+    """Write changed rows with one ``bulk_update``; unchanged rows only get ``synced_at``."""
+    now = timezone.now()
+    changed: list[GithubProject] = []
+    unchanged_ids: list[int] = []
+    for project in projects:
+        fields = fetched.get(project.full_name)
+        if fields is None:
+            result.missing.append(project.full_name)
+            continue
+        if all(getattr(project, name) == fields[name] for name in REFRESHED_FIELDS):
+            unchanged_ids.append(project.id)
+            continue
+        for name in REFRESHED_FIELDS:
+            setattr(project, name, fields[name])
+        project.synced_at = now
+        project.updated_at = now
+        changed.append(project)
+
+    result.updated += len(changed)
+    result.unchanged += len(unchanged_ids)
+    if dry_run:
+        return
+    with transaction.atomic():
+        GithubProject.objects.bulk_update(
+            changed, [*REFRESHED_FIELDS, "synced_at", "updated_at"], batch_size=BULK_UPDATE_BATCH_SIZE
+        )
+        if unchanged_ids:
+            GithubProject.objects.filter(id__in=unchanged_ids).update(synced_at=now)
+
+
+def refresh_github_projects(
+    *,
+    token: str = "",
+    client: HttpClient | None = None,
+    chunk_size: int = GRAPHQL_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> RefreshResult:
+    """Refresh stars, forks, issues and repository metadata for every tracked project.
+
+    With a token this is one GraphQL request per ``chunk_size`` projects;
+    GitHub's GraphQL API needs authentication, so without one it falls back to
+    ETag-conditional REST requests.
+    """
+    client = client or shared_client()
+    result = RefreshResult()
+    projects = list(GithubProject.objects.only("id", "full_name", *REFRESHED_FIELDS).order_by("id"))
+    full_names = [project.full_name for project in projects if all(split_full_name(project.full_name))]
+    if not full_names:
+        return result
+    if token:
+        fetched = fetch_via_graphql(full_names, token=token, client=client, result=result, chunk_size=chunk_size)
+    else:
+        fetched = fetch_via_rest(full_names, token=token, client=client, result=result)
+    apply_project_fields(projects, fetched, result, dry_run=dry_run)
+    return result
@@ -1,20 +1,39 @@
 from __future__ import annotations
 
 import base64
+import hashlib
 import json
-from dataclasses import dataclass
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from urllib import error, request
-from uuid import uuid4
+from urllib import parse
 
 from django.conf import settings
-from django.utils import timezone
+
+from sync.http_client import HttpError, shared_client
+
+INDEX_FILE_NAME = "image_bed_index.json"
+# Multiple of 3 so every chunk base64-encodes without padding.
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+REF_UPDATE_ATTEMPTS = 3
+_index_lock = threading.Lock()
+# ((path, inode, mtime_ns, size), parsed index) of the last index read by this process.
+_index_cache: tuple[tuple[str, int, int, int], dict] | None = None
 
 
 class ImageBedUploadError(ValueError):
     pass
 
 
+class _GitHubHTTPError(ImageBedUploadError):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
 @dataclass(frozen=True)
 class UploadedImageResult:
     image_url: str
@@ -23,6 +42,57 @@ class UploadedImageResult:
     sha: str
 
 
+@dataclass
+class _PendingImage:
+    upload: object
+    digest: str
+    size: int
+    path: str
+
+
+class _Base64JsonBody:
+    """File-like JSON body whose ``content`` field is base64-encoded from ``source`` as it is read.
+
+    The image is never held base64-inflated in memory; the HTTP client pulls
+    the body in blocks and ``Content-Length`` is known up front.
+    """
+
+    def __init__(self, fields: dict, source, size: int):
+        head = json.dumps({**fields, "content": ""})
+        self._head = head[:-2].encode("utf-8")
+        self._tail = b'"}'
+        self._source = source
+        self._buffer = b""
+        self._stage = 0
+        self.length = len(self._head) + 4 * ((size + 2) // 3) + len(self._tail)
+
+    def _next_piece(self) -> bytes:
+        if self._stage == 0:
+            self._stage = 1
+            return self._head
+        if self._stage == 1:
+            chunk = self._source.read(BASE64_CHUNK_SIZE)
+            if chunk:
+                return base64.b64encode(chunk)
+            self._stage = 2
+        if self._stage == 2:
+            self._stage = 3
+            return self._tail
+        return b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            piece = self._next_piece()
+            if not piece:
+                break
+            self._buffer += piece
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
 def _ensure_repo_config() -> tuple[str, str, str, str, str]:
     token = str(getattr(settings, "OBSIDIAN_IMAGES_GITHUB_TOKEN", "")).strip()
     owner = str(getattr(settings, "OBSIDIAN_IMAGES_REPO_OWNER", "hqy2020")).strip()
@@ -52,79 +122,309 @@ def _resolve_suffix(filename: str, content_type: str) -> str:
     return mapping.get(content_type, ".bin")
 
 
-def _upload_via_github_api(*, token: str, owner: str, repo: str, branch: str, path: str, content: bytes, message: str) -> dict:
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-    payload = {
-        "message": message,
-        "content": base64.b64encode(content).decode("ascii"),
-        "branch": branch,
-    }
+def _content_path(prefix: str, digest: str, suffix: str) -> str:
+    # Same bytes always land on the same path, so re-uploads are detectable.
+    relative = f"sha256/{digest[:2]}/{digest}{suffix}"
+    return f"{prefix}/{relative}" if prefix else relative
+
 
+def _build_result(owner: str, repo: str, branch: str, path: str, sha: str) -> UploadedImageResult:
+    return UploadedImageResult(
+        image_url=f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}",
+        source_url=f"https://github.com/{owner}/{repo}/blob/{branch}/{path}",
+        path=path,
+        sha=sha,
+    )
+
+
+def _hash_upload(upload) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: upload.read(BASE64_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    upload.seek(0)
+    return digest.hexdigest(), size
+
+
+def _committer_payload() -> dict:
     committer_name = str(getattr(settings, "OBSIDIAN_IMAGES_COMMITTER_NAME", "")).strip()
     committer_email = str(getattr(settings, "OBSIDIAN_IMAGES_COMMITTER_EMAIL", "")).strip()
     if committer_name and committer_email:
-        payload["committer"] = {"name": committer_name, "email": committer_email}
-
-    data = json.dumps(payload).encode("utf-8")
-    req = request.Request(
-        url=url,
-        data=data,
-        method="PUT",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/vnd.github+json",
-            "Content-Type": "application/json",
-            "User-Agent": "openingclouds-photo-wall-uploader",
-        },
-    )
+        return {"committer": {"name": committer_name, "email": committer_email}}
+    return {}
+
+
+def _index_path() -> Path:
+    return Path(settings.SYNC_CACHE_DIR) / INDEX_FILE_NAME
 
+
+def _load_index() -> dict:
+    """Parsed index, re-read from disk only when the file changed since the last call.
+
+    The returned dict is shared; copy before mutating it.
+    """
+    global _index_cache
+    path = _index_path()
     try:
-        with request.urlopen(req, timeout=30) as resp:
-            body = resp.read()
-    except error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore")
-        raise ImageBedUploadError(f"图床上传失败（HTTP {exc.code}）: {detail or exc.reason}") from exc
-    except Exception as exc:  # noqa: BLE001
-        raise ImageBedUploadError(f"图床上传失败: {exc}") from exc
+        stat = path.stat()
+    except OSError:
+        return {}
+    key = (str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _index_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    index = data if isinstance(data, dict) else {}
+    _index_cache = (key, index)
+    return index
+
+
+def _lookup_index(entries: dict, digest: str) -> UploadedImageResult | None:
+    entry = entries.get(digest)
+    if not isinstance(entry, dict):
+        return None
+    try:
+        return UploadedImageResult(**entry)
+    except TypeError:
+        return None
+
+
+def _remember_uploads(repo_key: str, results: dict[str, UploadedImageResult]) -> None:
+    if not results:
+        return
+    path = _index_path()
+    with _index_lock:
+        index = dict(_load_index())
+        entries = index[repo_key] = dict(index.get(repo_key) or {})
+        for digest, result in results.items():
+            entries[digest] = asdict(result)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(index, handle, ensure_ascii=False)
+            os.replace(temp_name, path)
+        except OSError:
+            # The index only saves a round trip; the existence check still dedupes.
+            return
+
+
+def _github_request(
+    method: str,
+    endpoint: str,
+    *,
+    token: str,
+    payload: dict | None = None,
+    body: _Base64JsonBody | None = None,
+    action: str = "图床上传",
+) -> dict:
+    api_base = str(getattr(settings, "OBSIDIAN_IMAGES_API_BASE", "") or "https://api.github.com").rstrip("/")
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json",
+        "User-Agent": "openingclouds-photo-wall-uploader",
+    }
+    data = None
+    if body is not None:
+        data = body
+        headers["Content-Type"] = "application/json"
+        headers["Content-Length"] = str(body.length)
+    elif payload is not None:
+        data = json.dumps(payload).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    try:
+        response = shared_client().request(
+            method, f"{api_base}/{endpoint.lstrip('/')}", headers=headers, body=data, timeout=30
+        )
+    except HttpError as exc:
+        raise ImageBedUploadError(f"{action}失败: {exc}") from exc
+    if not response.ok:
+        detail = response.text()
+        raise _GitHubHTTPError(f"{action}失败（HTTP {response.status}）: {detail or response.reason}", response.status)
+    raw = response.body
 
     try:
-        return json.loads(body.decode("utf-8"))
+        result = json.loads(raw.decode("utf-8"))
     except Exception as exc:  # noqa: BLE001
-        raise ImageBedUploadError("图床上传响应解析失败") from exc
+        raise ImageBedUploadError(f"{action}响应解析失败") from exc
+    return result if isinstance(result, dict) else {}
+
+
+def _find_via_github_api(*, token: str, owner: str, repo: str, branch: str, path: str) -> dict | None:
+    endpoint = f"repos/{owner}/{repo}/contents/{parse.quote(path)}?ref={parse.quote(branch)}"
+    try:
+        return _github_request("GET", endpoint, token=token, action="图床查询")
+    except _GitHubHTTPError as exc:
+        if exc.status == 404:
+            return None
+        raise
+
+
+def _upload_via_github_api(
+    *, token: str, owner: str, repo: str, branch: str, path: str, upload, size: int, message: str
+) -> dict:
+    body = _Base64JsonBody({"message": message, "branch": branch, **_committer_payload()}, upload, size)
+    return _github_request("PUT", f"repos/{owner}/{repo}/contents/{parse.quote(path)}", token=token, body=body)
+
+
+def _create_blob(*, token: str, owner: str, repo: str, upload, size: int) -> str:
+    body = _Base64JsonBody({"encoding": "base64"}, upload, size)
+    payload = _github_request("POST", f"repos/{owner}/{repo}/git/blobs", token=token, body=body)
+    sha = str(payload.get("sha") or "").strip()
+    if not sha:
+        raise ImageBedUploadError("图床上传失败: 创建 blob 未返回 sha")
+    return sha
+
+
+def _commit_files(*, token: str, owner: str, repo: str, branch: str, files: dict[str, str], message: str) -> str:
+    """Commit ``{path: blob_sha}`` on top of ``branch`` as one commit and move the ref.
+
+    A ref update rejected because the branch moved meanwhile is retried on the
+    new head; the blobs are reused.
+    """
+    tree_entries = [{"path": path, "mode": "100644", "type": "blob", "sha": sha} for path, sha in sorted(files.items())]
+    ref_endpoint = f"repos/{owner}/{repo}/git/refs/heads/{parse.quote(branch)}"
+    for attempt in range(1, REF_UPDATE_ATTEMPTS + 1):
+        head = _github_request("GET", f"repos/{owner}/{repo}/git/ref/heads/{parse.quote(branch)}", token=token)
+        head_sha = str((head.get("object") or {}).get("sha") or "")
+        head_commit = _github_request("GET", f"repos/{owner}/{repo}/git/commits/{head_sha}", token=token)
+        tree = _github_request(
+            "POST",
+            f"repos/{owner}/{repo}/git/trees",
+            token=token,
+            payload={"base_tree": str((head_commit.get("tree") or {}).get("sha") or ""), "tree": tree_entries},
+        )
+        commit = _github_request(
+            "POST",
+            f"repos/{owner}/{repo}/git/commits",
+            token=token,
+            payload={"message": message, "tree": tree.get("sha"), "parents": [head_sha], **_committer_payload()},
+        )
+        try:
+            _github_request("PATCH", ref_endpoint, token=token, payload={"sha": commit.get("sha"), "force": False})
+        except _GitHubHTTPError as exc:
+            if exc.status == 422 and attempt < REF_UPDATE_ATTEMPTS:
+                continue
+            raise
+        return str(commit.get("sha") or "")
+    return ""
+
+
+def _upload_message(paths: list[str], operator: str) -> str:
+    message = f"chore(photo-wall): upload {paths[0]}" if len(paths) == 1 else f"chore(photo-wall): upload {len(paths)} images"
+    return f"{message} by {operator}" if operator else message
+
+
+def _prepare(uploads, prefix: str) -> list[_PendingImage]:
+    pending = []
+    for upload in uploads:
+        digest, size = _hash_upload(upload)
+        if not size:
+            raise ImageBedUploadError("上传文件为空")
+        suffix = _resolve_suffix(getattr(upload, "name", ""), getattr(upload, "content_type", ""))
+        pending.append(_PendingImage(upload=upload, digest=digest, size=size, path=_content_path(prefix, digest, suffix)))
+    return pending
 
 
 def upload_photo_to_obsidian_images(upload, *, operator: str = "") -> UploadedImageResult:
+    """Store an image in the image-bed repo under a path derived from its SHA-256.
+
+    Bytes that were uploaded before resolve from the local index, or from a
+    contents lookup on GitHub, without creating another commit.
+    """
     token, owner, repo, branch, prefix = _ensure_repo_config()
+    (image,) = _prepare([upload], prefix)
+    repo_key = f"{owner}/{repo}@{branch}"
+    cached = _lookup_index(_load_index().get(repo_key, {}), image.digest)
+    if cached is not None:
+        return cached
 
-    content = upload.read()
-    if not content:
-        raise ImageBedUploadError("上传文件为空")
-
-    suffix = _resolve_suffix(getattr(upload, "name", ""), getattr(upload, "content_type", ""))
-    now = timezone.now()
-    target_path = f"{prefix}/{now:%Y/%m}/{uuid4().hex}{suffix}" if prefix else f"{now:%Y/%m}/{uuid4().hex}{suffix}"
-    message = f"chore(photo-wall): upload {target_path}"
-    if operator:
-        message = f"{message} by {operator}"
-
-    payload = _upload_via_github_api(
-        token=token,
-        owner=owner,
-        repo=repo,
-        branch=branch,
-        path=target_path,
-        content=content,
-        message=message,
-    )
+    existing = _find_via_github_api(token=token, owner=owner, repo=repo, branch=branch, path=image.path)
+    if existing is None:
+        try:
+            payload = _upload_via_github_api(
+                token=token,
+                owner=owner,
+                repo=repo,
+                branch=branch,
+                path=image.path,
+                upload=upload,
+                size=image.size,
+                message=_upload_message([image.path], operator),
+            )
+        except ImageBedUploadError as exc:
+            # 422 means a concurrent upload of the same bytes won the race.
+            existing = _find_via_github_api(token=token, owner=owner, repo=repo, branch=branch, path=image.path)
+            if existing is None:
+                raise exc
+        else:
+            existing = payload.get("content")
 
-    content_info = payload.get("content") if isinstance(payload, dict) else None
-    actual_path = str((content_info or {}).get("path") or target_path).strip()
-    sha = str((content_info or {}).get("sha") or "").strip()
-    image_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{actual_path}"
-    source_url = f"https://github.com/{owner}/{repo}/blob/{branch}/{actual_path}"
-    return UploadedImageResult(
-        image_url=image_url,
-        source_url=source_url,
-        path=actual_path,
-        sha=sha,
-    )
+    actual_path = str((existing or {}).get("path") or image.path).strip()
+    result = _build_result(owner, repo, branch, actual_path, str((existing or {}).get("sha") or "").strip())
+    _remember_uploads(repo_key, {image.digest: result})
+    return result
+
+
+def upload_photos_to_obsidian_images(uploads, *, operator: str = "") -> list[UploadedImageResult]:
+    """Upload several images as a single commit through the Git Data API.
+
+    Already-known images are answered from the index or an existence check;
+    the rest become blobs (created concurrently, streamed as base64), one tree,
+    one commit and one ref update. Results follow the order of ``uploads``.
+    """
+    uploads = list(uploads)
+    if not uploads:
+        return []
+    token, owner, repo, branch, prefix = _ensure_repo_config()
+    images = _prepare(uploads, prefix)
+    repo_key = f"{owner}/{repo}@{branch}"
+
+    results: dict[str, UploadedImageResult] = {}
+    unknown: dict[str, _PendingImage] = {}
+    known = _load_index().get(repo_key, {})
+    for image in images:
+        cached = _lookup_index(known, image.digest)
+        if cached is not None:
+            results[image.digest] = cached
+        else:
+            unknown.setdefault(image.digest, image)
+
+    found: dict[str, UploadedImageResult] = {}
+    workers = max(1, int(getattr(settings, "OBSIDIAN_IMAGES_UPLOAD_WORKERS", 4) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        checks = pool.map(
+            lambda image: _find_via_github_api(token=token, owner=owner, repo=repo, branch=branch, path=image.path),
+            unknown.values(),
+        )
+        for image, existing in zip(list(unknown.values()), checks):
+            if existing is not None:
+                found[image.digest] = _build_result(owner, repo, branch, image.path, str(existing.get("sha") or ""))
+
+        missing = [image for image in unknown.values() if image.digest not in found]
+        blob_shas = list(
+            pool.map(
+                lambda image: _create_blob(token=token, owner=owner, repo=repo, upload=image.upload, size=image.size),
+                missing,
+            )
+        )
+
+    if missing:
+        _commit_files(
+            token=token,
+            owner=owner,
+            repo=repo,
+            branch=branch,
+            files={image.path: sha for image, sha in zip(missing, blob_shas)},
+            message=_upload_message([image.path for image in missing], operator),
+        )
+        for image, sha in zip(missing, blob_shas):
+            found[image.digest] = _build_result(owner, repo, branch, image.path, sha)
+
+    _remember_uploads(repo_key, found)
+    results.update(found)
+    return [results[image.digest] for image in images]
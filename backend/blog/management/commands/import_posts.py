@@ -5,7 +5,7 @@ from django.utils.text import slugify
 
 from blog.models import Post
 from sync.parser import parse_markdown
-from sync.scanner import scan_markdown_files
+from sync.scanner import iter_markdown_files
 
 
 class Command(BaseCommand):
@@ -19,13 +19,11 @@ class Command(BaseCommand):
         source = options["source"]
         dry_run = options["dry_run"]
 
-        files = scan_markdown_files(source)
-        if not files:
-            self.stdout.write(self.style.WARNING("No markdown files found"))
-            return
-
+        scanned = 0
         imported = 0
-        for file_path in files:
+        for entry in iter_markdown_files(source):
+            scanned += 1
+            file_path = entry.path
             payload = parse_markdown(file_path)
             if not payload.get("title"):
                 self.stdout.write(self.style.WARNING(f"Skip missing title: {file_path}"))
@@ -56,4 +54,8 @@ class Command(BaseCommand):
             )
             imported += 1
 
+        if not scanned:
+            self.stdout.write(self.style.WARNING("No markdown files found"))
+            return
+
         self.stdout.write(self.style.SUCCESS(f"Imported {imported} posts"))
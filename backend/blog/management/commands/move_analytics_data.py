@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.constants import OnConflict
+
+from blog.models import HomeLike, HomeLikeVote, PostLike, PostLikeVote, PostView, SiteVisit
+from blog.routers import ANALYTICS_DB
+
+COPY_BATCH_SIZE = 1000
+ANALYTICS_MODEL_CLASSES = (PostView, PostLike, PostLikeVote, HomeLike, HomeLikeVote, SiteVisit)
+
+
+class Command(BaseCommand):
+    help = "Move engagement rows written before the analytics database existed out of the default database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=COPY_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if ANALYTICS_DB not in connections.databases:
+            raise CommandError(f"未配置 {ANALYTICS_DB} 数据库")
+        batch_size = max(1, int(options["batch_size"]))
+        legacy_tables = set(connections[DEFAULT_DB_ALIAS].introspection.table_names())
+
+        for model in ANALYTICS_MODEL_CLASSES:
+            label = model._meta.label
+            if model._meta.db_table not in legacy_tables:
+                self.stdout.write(f"  {label}: no legacy table")
+                continue
+            total = model.objects.using(DEFAULT_DB_ALIAS).count()
+            if options["dry_run"] or not total:
+                self.stdout.write(f"  {label}: {total} rows")
+                continue
+            # Rows are moved newest first, so the first committed batch already pushes the
+            # analytics id sequence past every legacy id: live writes made after an
+            # interrupted run can never take an id a remaining legacy row still needs.
+            moved = kept = 0
+            below = None
+            while True:
+                source = model.objects.using(DEFAULT_DB_ALIAS).order_by("-pk")
+                if below is not None:
+                    source = source.filter(pk__lt=below)
+                ids = list(source.values_list("pk", flat=True)[:batch_size])
+                if not ids:
+                    break
+                below = ids[-1]
+                confirmed = self._move_batch(model, ids)
+                moved += confirmed
+                kept += len(ids) - confirmed
+            self.stdout.write(f"  {label}: moved {moved} rows")
+            if kept:
+                self.stdout.write(
+                    self.style.WARNING(f"  {label}: {kept} rows conflict with newer analytics rows, left in place")
+                )
+
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}analytics data move complete"))
+
+    def _move_batch(self, model, ids: list) -> int:
+        """Copy the legacy rows ``ids`` into analytics and delete the ones now stored there verbatim.
+
+        Raw rows are copied so ``auto_now`` timestamps keep their original values.
+        Already-copied rows are ignored, which makes an interrupted move resumable.
+        """
+        default, analytics = connections[DEFAULT_DB_ALIAS], connections[ANALYTICS_DB]
+        quote = default.ops.quote_name
+        table = quote(model._meta.db_table)
+        pk_column = model._meta.pk.column
+        columns = [pk_column, *(field.column for field in model._meta.concrete_fields if field.column != pk_column)]
+        column_sql = ", ".join(quote(column) for column in columns)
+        id_params = ", ".join(["%s"] * len(ids))
+        select = f"SELECT {column_sql} FROM {table} WHERE {quote(pk_column)} IN ({id_params})"
+
+        with default.cursor() as cursor:
+            cursor.execute(select, ids)
+            rows = [tuple(row) for row in cursor.fetchall()]
+        insert = analytics.ops.insert_statement(on_conflict=OnConflict.IGNORE)
+        with transaction.atomic(using=ANALYTICS_DB), analytics.cursor() as cursor:
+            cursor.executemany(
+                f"{insert} {table} ({column_sql}) VALUES ({', '.join(['%s'] * len(columns))})",
+                rows,
+            )
+            cursor.execute(select, ids)
+            stored = {tuple(row) for row in cursor.fetchall()}
+
+        # Legacy rows still carry a foreign key to blog_post that would block deleting posts;
+        # only rows confirmed in analytics are removed.
+        confirmed = [row[0] for row in rows if row in stored]
+        if confirmed:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS), default.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {quote(pk_column)} IN ({', '.join(['%s'] * len(confirmed))})",
+                    confirmed,
+                )
+        return len(confirmed)
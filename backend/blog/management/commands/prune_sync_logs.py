@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sync.payload_store import DEFAULT_RETENTION_DAYS, PRUNE_BATCH_SIZE, compact_existing_logs, prune_sync_logs
+
+
+class Command(BaseCommand):
+    help = "Roll old SyncLog rows up into daily counts, delete them in bounded batches and reclaim unused payload blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=int(os.environ.get("SYNC_LOG_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)),
+        )
+        parser.add_argument("--batch-size", type=int, default=PRUNE_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=0, help="0 means no limit")
+        parser.add_argument(
+            "--compact-existing",
+            action="store_true",
+            help="Also move large payload values of existing logs into the blob store",
+        )
+
+    def handle(self, *args, **options):
+        keep_days = int(options["keep_days"])
+        batch_size = int(options["batch_size"])
+        if keep_days < 1:
+            raise CommandError("--keep-days 至少为 1")
+        if batch_size < 1:
+            raise CommandError("--batch-size 至少为 1")
+        max_batches = int(options["max_batches"]) or None
+
+        if options["compact_existing"]:
+            compacted = compact_existing_logs(batch_size=batch_size, max_batches=max_batches)
+            self.stdout.write(f"compacted payloads: {compacted}")
+        result = prune_sync_logs(keep_days=keep_days, batch_size=batch_size, max_batches=max_batches)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"sync logs pruned: logs={result.logs} batches={result.batches} "
+                f"rollups={result.rollups} blobs={result.blobs} keep_days={keep_days}"
+            )
+        )
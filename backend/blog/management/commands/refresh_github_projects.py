@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.github_projects import GRAPHQL_CHUNK_SIZE, GithubRefreshError, refresh_github_projects
+
+
+class Command(BaseCommand):
+    help = "Refresh stars, forks and issues of every tracked GitHub project in batched GraphQL requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--token", default=os.environ.get("GITHUB_TOKEN", ""))
+        parser.add_argument("--chunk-size", type=int, default=GRAPHQL_CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        token = str(options["token"] or "").strip()
+        if not token:
+            self.stdout.write(self.style.WARNING("GITHUB_TOKEN not set; GraphQL needs a token, using conditional REST requests."))
+        try:
+            result = refresh_github_projects(
+                token=token,
+                chunk_size=max(1, min(int(options["chunk_size"]), GRAPHQL_CHUNK_SIZE)),
+                dry_run=bool(options["dry_run"]),
+            )
+        except GithubRefreshError as exc:
+            raise CommandError(str(exc)) from exc
+
+        for full_name in result.missing:
+            self.stdout.write(self.style.WARNING(f"  not found on GitHub: {full_name}"))
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}github projects refreshed: updated={result.updated} unchanged={result.unchanged} "
+                f"missing={len(result.missing)} requests={result.requests} not_modified={result.not_modified}"
+            )
+        )
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from blog.models import SyncJobRun
+from sync.locks import SyncLockBusy, sync_lease
+from sync.schedule import CronSchedule
+
+OUTPUT_TAIL_CHARS = 4000
+MAX_BACKOFF_SECONDS = 3600
+LEASE_WAIT_SECONDS = 60
+TERMINATE_GRACE_SECONDS = 15
+
+
+@dataclass(frozen=True)
+class ScheduledJob:
+    name: str
+    command: tuple[str, ...]
+    schedule: str
+    max_runtime: int = 3600
+    retries: int = 2
+    backoff: int = 60
+    cron: CronSchedule = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "cron", CronSchedule.parse(self.schedule))
+
+    def retry_delay(self, attempt: int) -> int:
+        return min(self.backoff * (2 ** max(attempt - 1, 0)), MAX_BACKOFF_SECONDS)
+
+
+def default_jobs() -> list[ScheduledJob]:
+    vault = os.environ.get("OBSIDIAN_VAULT_PATH", settings.OBSIDIAN_VAULT_PATH)
+    repo_url = os.environ.get("OBSIDIAN_VAULT_REPO_URL", settings.OBSIDIAN_VAULT_REPO_URL)
+    repo_branch = os.environ.get("OBSIDIAN_VAULT_REPO_BRANCH", settings.OBSIDIAN_VAULT_REPO_BRANCH)
+    structured_root = os.environ.get("OBSIDIAN_SITE_SYNC_ROOT", "2-Resource/90_网站同步")
+    return [
+        ScheduledJob(
+            name="knowledge",
+            command=("sync_knowledge_github", "--local-root", str(Path(vault) / "3-Knowledge")),
+            schedule="0 4 * * *",
+            max_runtime=1800,
+        ),
+        ScheduledJob(
+            name="site-sources",
+            command=(
+                "sync_site_sources",
+                vault,
+                "--structured-root",
+                structured_root,
+                "--repo-url",
+                repo_url,
+                "--repo-branch",
+                repo_branch,
+                "--skip-knowledge",
+            ),
+            schedule="20 4 * * *",
+            max_runtime=3600,
+        ),
+        ScheduledJob(
+            name="github-projects",
+            command=("refresh_github_projects",),
+            schedule="40 */6 * * *",
+            max_runtime=300,
+        ),
+        ScheduledJob(
+            name="sync-log-retention",
+            command=("prune_sync_logs",),
+            schedule="50 4 * * *",
+            max_runtime=600,
+        ),
+    ]
+
+
+def load_jobs(jobs_file: str = "") -> list[ScheduledJob]:
+    """Default jobs, overridden or extended by a JSON list of job objects keyed by ``name``."""
+    jobs = {job.name: job for job in default_jobs()}
+    if not jobs_file:
+        return list(jobs.values())
+    try:
+        entries = json.loads(Path(jobs_file).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise CommandError(f"Invalid jobs file {jobs_file}: {exc}") from exc
+    if not isinstance(entries, list):
+        raise CommandError(f"Jobs file must contain a JSON list: {jobs_file}")
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("name"):
+            raise CommandError(f"Job entry needs a name: {entry!r}")
+        name = str(entry["name"])
+        if entry.get("enabled") is False:
+            jobs.pop(name, None)
+            continue
+        values = {key: entry[key] for key in ("schedule", "max_runtime", "retries", "backoff") if key in entry}
+        if "command" in entry:
+            command = entry["command"]
+            values["command"] = tuple(command.split() if isinstance(command, str) else command)
+        try:
+            if name in jobs:
+                jobs[name] = replace(jobs[name], **values)
+            else:
+                jobs[name] = ScheduledJob(name=name, **values)
+        except (TypeError, ValueError) as exc:
+            raise CommandError(f"Invalid job {name}: {exc}") from exc
+    return list(jobs.values())
+
+
+class Command(BaseCommand):
+    help = "Run the sync_* commands as scheduled jobs with retries, runtime limits and a shared sync lease"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs-file", default=os.environ.get("SYNC_SCHEDULE_FILE", ""))
+        parser.add_argument("--list", action="store_true", help="print jobs and their next run time")
+        parser.add_argument("--run", default="", help="run one job now (with its retries) and exit")
+
+    def handle(self, *args, **options):
+        jobs = load_jobs(str(options["jobs_file"] or ""))
+        by_name = {job.name: job for job in jobs}
+
+        if options["list"]:
+            now = timezone.localtime()
+            for job in jobs:
+                self.stdout.write(f"{job.name:<16} {job.schedule:<16} next={job.cron.next_after(now):%Y-%m-%d %H:%M}")
+            return
+
+        if options["run"]:
+            job = by_name.get(options["run"])
+            if job is None:
+                raise CommandError(f"Unknown job: {options['run']} (known: {', '.join(sorted(by_name))})")
+            for attempt in range(1, job.retries + 2):
+                run = self._run_job(job, attempt)
+                if run.status == SyncJobRun.Status.SUCCESS:
+                    return
+                if attempt <= job.retries:
+                    time.sleep(job.retry_delay(attempt))
+            raise CommandError(f"job {job.name} failed after {job.retries + 1} attempts")
+
+        self._loop(jobs)
+
+    def _loop(self, jobs: list[ScheduledJob]) -> None:
+        now = timezone.localtime()
+        next_run: dict[str, datetime] = {job.name: job.cron.next_after(now) for job in jobs}
+        attempts: dict[str, int] = {job.name: 0 for job in jobs}
+        self.stdout.write(f"scheduler started with {len(jobs)} job(s)")
+        for job in jobs:
+            self.stdout.write(f"  {job.name}: {job.schedule} (next {next_run[job.name]:%Y-%m-%d %H:%M})")
+
+        while True:
+            now = timezone.localtime()
+            for job in sorted(jobs, key=lambda item: next_run[item.name]):
+                if next_run[job.name] > now:
+                    continue
+                attempts[job.name] += 1
+                run = self._run_job(job, attempts[job.name])
+                finished = timezone.localtime()
+                scheduled = job.cron.next_after(finished)
+                if run.status != SyncJobRun.Status.SUCCESS and attempts[job.name] <= job.retries:
+                    retry_at = finished + timedelta(seconds=job.retry_delay(attempts[job.name]))
+                    next_run[job.name] = min(retry_at, scheduled)
+                    self.stdout.write(f"{job.name}: retry at {next_run[job.name]:%H:%M:%S}")
+                else:
+                    attempts[job.name] = 0
+                    next_run[job.name] = scheduled
+            wake_at = min(next_run.values())
+            # wake at least once a minute so wall-clock jumps do not stall the loop
+            time.sleep(min(max((wake_at - timezone.localtime()).total_seconds(), 1.0), 60.0))
+
+    def _run_job(self, job: ScheduledJob, attempt: int) -> SyncJobRun:
+        manage_py = Path(settings.BASE_DIR) / "manage.py"
+        argv = [sys.executable, str(manage_py), *job.command]
+        started_at = timezone.now()
+        started = time.monotonic()
+        exit_code: int | None = None
+        output = ""
+        self.stdout.write(f"[{job.name}] attempt {attempt}: {' '.join(job.command)}")
+        try:
+            with sync_lease(holder=f"scheduler:{job.name}", wait=LEASE_WAIT_SECONDS):
+                proc = subprocess.Popen(
+                    argv,
+                    cwd=str(settings.BASE_DIR),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    errors="replace",
+                )
+                try:
+                    output, _ = proc.communicate(timeout=job.max_runtime)
+                    exit_code = proc.returncode
+                    status = SyncJobRun.Status.SUCCESS if exit_code == 0 else SyncJobRun.Status.FAILED
+                except subprocess.TimeoutExpired:
+                    proc.terminate()
+                    try:
+                        output, _ = proc.communicate(timeout=TERMINATE_GRACE_SECONDS)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+                        output, _ = proc.communicate()
+                    exit_code = proc.returncode
+                    status = SyncJobRun.Status.TIMEOUT
+                    output = f"{output or ''}\nterminated after max_runtime={job.max_runtime}s"
+        except SyncLockBusy as exc:
+            status = SyncJobRun.Status.BUSY
+            output = str(exc)
+        except OSError as exc:
+            status = SyncJobRun.Status.FAILED
+            output = str(exc)
+
+        duration_ms = int((time.monotonic() - started) * 1000)
+        output = (output or "").strip()
+        run = SyncJobRun.objects.create(
+            job=job.name,
+            command=" ".join(job.command)[:500],
+            attempt=attempt,
+            status=status,
+            exit_code=exit_code,
+            output=output[-OUTPUT_TAIL_CHARS:],
+            started_at=started_at,
+            finished_at=timezone.now(),
+            duration_ms=duration_ms,
+        )
+        line = f"[{job.name}] {run.get_status_display()} in {duration_ms} ms"
+        if status == SyncJobRun.Status.SUCCESS:
+            self.stdout.write(self.style.SUCCESS(line))
+        else:
+            self.stderr.write(f"{line}\n{output[-1000:]}")
+        return run
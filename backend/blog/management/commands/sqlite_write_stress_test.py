@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import asdict, dataclass
@@ -8,15 +9,17 @@ from datetime import date
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db import OperationalError, close_old_connections, connection
+from django.db import OperationalError, close_old_connections, connection, router
 from django.db.models import F
 from django.utils import timezone
 
 from blog.models import Post, PostView, TravelPlace
+from blog.write_executor import WriteExecutor
 
 
 @dataclass
 class TestResult:
+    mode: str
     total_requests: int
     concurrency: int
     rounds: int
@@ -25,6 +28,8 @@ class TestResult:
     latency_p50_ms: float
     latency_p95_ms: float
     latency_max_ms: float
+    throughput_per_s: float
+    avg_batch: float
 
 
 def percentile(values: list[float], p: float) -> float:
@@ -46,6 +51,12 @@ class Command(BaseCommand):
         parser.add_argument("--p95-threshold-ms", type=float, default=100.0)
         parser.add_argument("--report", type=str, default="")
         parser.add_argument("--strict", action="store_true", default=False)
+        parser.add_argument(
+            "--mode",
+            choices=["direct", "executor", "both"],
+            default="direct",
+            help="direct: every thread writes with a retry loop; executor: writes go through WriteExecutor",
+        )
 
     def handle(self, *args, **options):
         concurrency = options["concurrency"]
@@ -117,76 +128,99 @@ class Command(BaseCommand):
                         raise
                     time.sleep(0.01 * (attempt + 1))
 
-        def run_task(task_id: int):
-            close_old_connections()
-            start = time.perf_counter()
-            try:
-                operation = task_id % 3
-                target_index = task_id % target_size
-                if operation == 0:
-                    def op():
-                        PostView.objects.filter(post_id=view_targets[target_index]).update(views=F("views") + 1)
-
-                    run_with_retry(op)
-                elif operation == 1:
-                    def op():
-                        TravelPlace.objects.filter(id=travel_targets[target_index]).update(
-                            notes=f"admin-write-{task_id}",
-                            sort_order=target_index,
-                        )
-
-                    run_with_retry(op)
-                else:
-                    def op():
-                        Post.objects.filter(id=sync_targets[target_index]).update(
-                            content=f"sync-content-{task_id}",
-                            sync_source=Post.SyncSource.OBSIDIAN,
-                            obsidian_path=f"/vault/stress-{task_id}.md",
-                            last_synced_at=timezone.now(),
-                        )
-
-                    run_with_retry(op)
-                elapsed_ms = (time.perf_counter() - start) * 1000
-                return elapsed_ms, None
-            except Exception as exc:  # noqa: BLE001
-                elapsed_ms = (time.perf_counter() - start) * 1000
-                return elapsed_ms, str(exc)
-            finally:
-                close_old_connections()
+        def build_op(task_id: int):
+            operation = task_id % 3
+            target_index = task_id % target_size
+            if operation == 0:
+                return PostView, lambda: PostView.objects.filter(post_id=view_targets[target_index]).update(
+                    views=F("views") + 1
+                )
+            if operation == 1:
+                return TravelPlace, lambda: TravelPlace.objects.filter(id=travel_targets[target_index]).update(
+                    notes=f"admin-write-{task_id}",
+                    sort_order=target_index,
+                )
+            return Post, lambda: Post.objects.filter(id=sync_targets[target_index]).update(
+                content=f"sync-content-{task_id}",
+                sync_source=Post.SyncSource.OBSIDIAN,
+                obsidian_path=f"/vault/stress-{task_id}.md",
+                last_synced_at=timezone.now(),
+            )
+
+        def run_mode(mode: str) -> TestResult:
+            # One writer per database file, as blog.write_executor keeps them.
+            executors: dict[str, WriteExecutor] = {}
+            executors_lock = threading.Lock()
 
-        total_requests = concurrency * rounds
-        latencies: list[float] = []
-        locked_errors = 0
-        other_errors = 0
-
-        with ThreadPoolExecutor(max_workers=concurrency) as executor:
-            futures = [executor.submit(run_task, i) for i in range(total_requests)]
-            for future in as_completed(futures):
-                latency, error = future.result()
-                latencies.append(latency)
-                if error:
-                    if "locked" in error.lower():
-                        locked_errors += 1
+            def run_task(task_id: int):
+                close_old_connections()
+                start = time.perf_counter()
+                try:
+                    model, op = build_op(task_id)
+                    if mode == "executor":
+                        using = router.db_for_write(model)
+                        with executors_lock:
+                            executor = executors.setdefault(using, WriteExecutor(using=using))
+                        executor.run(op)
                     else:
-                        other_errors += 1
-
-        result = TestResult(
-            total_requests=total_requests,
-            concurrency=concurrency,
-            rounds=rounds,
-            locked_errors=locked_errors,
-            other_errors=other_errors,
-            latency_p50_ms=round(percentile(latencies, 0.5), 2),
-            latency_p95_ms=round(percentile(latencies, 0.95), 2),
-            latency_max_ms=round(max(latencies) if latencies else 0.0, 2),
-        )
+                        run_with_retry(op)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    return elapsed_ms, None
+                except Exception as exc:  # noqa: BLE001
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    return elapsed_ms, str(exc)
+                finally:
+                    close_old_connections()
+
+            total_requests = concurrency * rounds
+            latencies: list[float] = []
+            locked_errors = 0
+            other_errors = 0
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                futures = [pool.submit(run_task, i) for i in range(total_requests)]
+                for future in as_completed(futures):
+                    latency, error = future.result()
+                    latencies.append(latency)
+                    if error:
+                        if "locked" in error.lower():
+                            locked_errors += 1
+                        else:
+                            other_errors += 1
+            elapsed = time.perf_counter() - started
+
+            writes = sum(executor.writes for executor in executors.values())
+            batches = sum(executor.batches for executor in executors.values())
+            avg_batch = round(writes / batches, 2) if batches else 0.0
+            for executor in executors.values():
+                executor.close()
+            return TestResult(
+                mode=mode,
+                total_requests=total_requests,
+                concurrency=concurrency,
+                rounds=rounds,
+                locked_errors=locked_errors,
+                other_errors=other_errors,
+                latency_p50_ms=round(percentile(latencies, 0.5), 2),
+                latency_p95_ms=round(percentile(latencies, 0.95), 2),
+                latency_max_ms=round(max(latencies) if latencies else 0.0, 2),
+                throughput_per_s=round(total_requests / elapsed, 1) if elapsed else 0.0,
+                avg_batch=avg_batch,
+            )
 
-        self.stdout.write(self.style.SUCCESS(json.dumps(asdict(result), ensure_ascii=False)))
+        modes = ["direct", "executor"] if options["mode"] == "both" else [options["mode"]]
+        results = [run_mode(mode) for mode in modes]
+        for item in results:
+            self.stdout.write(self.style.SUCCESS(json.dumps(asdict(item), ensure_ascii=False)))
+        # The last mode run is the one --strict judges; with "both" that is the executor.
+        result = results[-1]
 
         if report_path:
             path = Path(report_path)
             path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(json.dumps(asdict(result), ensure_ascii=False, indent=2), encoding="utf-8")
+            report = asdict(result) if len(results) == 1 else [asdict(item) for item in results]
+            path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
             self.stdout.write(f"Report saved to: {path}")
 
         if strict and (result.locked_errors > 0 or result.latency_p95_ms > threshold):
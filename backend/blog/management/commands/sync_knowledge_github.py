@@ -5,13 +5,16 @@ import hashlib
 import json
 import os
 import re
-import urllib.error
+import subprocess
+import tarfile
+import threading
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
@@ -23,14 +26,26 @@ except Exception:  # pragma: no cover
     yaml = None
 
 from blog.models import KnowledgeEdge, KnowledgeNode
+from sync.git_history import GitPathHistory, load_subtree_history
+from sync.http_client import HttpClient, HttpError, shared_client
+from sync.markdown import analyze_markdown
+from sync.shadow import content_db_alias
+from sync.wikilinks import WikilinkIndex
 
 
+GITHUB_API = "https://api.github.com"
 GITHUB_REPO = os.environ.get("KNOWLEDGE_GITHUB_REPO", "hqy2020/GardenOfOpeningClouds")
 GITHUB_BRANCH = os.environ.get("KNOWLEDGE_GITHUB_BRANCH", "main")
 ROOT_PREFIX = "3-Knowledge/"
 SYSTEM_BASENAMES = {"index.md", "log.md", "SCHEMA.md", "CLAUDE.md", "README.md", "_README.md"}
 
-WIKILINK_RE = re.compile(r"\[\[([^\]|#]+)(?:#[^\]|]*)?(?:\|[^\]]*)?\]\]")
+FETCH_WORKERS = int(os.environ.get("KNOWLEDGE_FETCH_WORKERS", "8"))
+# More uncached blobs than this → one tarball download instead of N blob calls.
+ARCHIVE_THRESHOLD = int(os.environ.get("KNOWLEDGE_ARCHIVE_THRESHOLD", "100"))
+MAX_RETRIES = 4
+ARCHIVE_TIMEOUT_SECONDS = 120
+EDGE_BATCH_SIZE = 500
+
 FRONTMATTER_RE = re.compile(r"^---\s*\n(.*?)\n---\s*\n", re.DOTALL)
 
 
@@ -41,34 +56,167 @@ class RemoteFile:
     local_path: Path | None = None
 
 
+def git_blob_sha(content: bytes) -> str:
+    header = f"blob {len(content)}\0".encode("ascii")
+    return hashlib.sha1(header + content).hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _header(headers: dict[str, str], name: str) -> str:
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return str(value)
+    return ""
+
+
+class KnowledgeCache:
+    """Blobs keyed by git SHA, ETag'd API responses and first-commit dates.
+
+    Blobs are content-addressed and never go stale, so an unchanged SHA costs
+    zero requests across runs. ``root=None`` keeps everything in memory.
+    """
+
+    def __init__(self, root: Path | None):
+        self.root = root
+        self._lock = threading.Lock()
+        self._memory_blobs: dict[str, bytes] = {}
+        self._memory_responses: dict[str, dict] = {}
+        self._first_commits: dict[str, str] = {}
+        self._first_commits_dirty = False
+        if root is not None:
+            try:
+                loaded = json.loads((root / "first_commits.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                loaded = {}
+            if isinstance(loaded, dict):
+                self._first_commits = {str(k): str(v) for k, v in loaded.items()}
+
+    def _blob_path(self, sha: str) -> Path:
+        return self.root / "blobs" / sha[:2] / sha
+
+    def _response_path(self, url: str) -> Path:
+        return self.root / "responses" / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+    def get_blob(self, sha: str) -> bytes | None:
+        if self.root is None:
+            return self._memory_blobs.get(sha)
+        try:
+            return self._blob_path(sha).read_bytes()
+        except OSError:
+            return None
+
+    def has_blob(self, sha: str) -> bool:
+        if self.root is None:
+            return sha in self._memory_blobs
+        return self._blob_path(sha).exists()
+
+    def put_blob(self, sha: str, content: bytes) -> None:
+        if self.root is None:
+            self._memory_blobs[sha] = content
+            return
+        _atomic_write(self._blob_path(sha), content)
+
+    def get_response(self, url: str) -> dict | None:
+        if self.root is None:
+            return self._memory_responses.get(url)
+        try:
+            cached = json.loads(self._response_path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return cached if isinstance(cached, dict) and cached.get("etag") else None
+
+    def put_response(self, url: str, etag: str, body: object) -> None:
+        record = {"url": url, "etag": etag, "body": body}
+        if self.root is None:
+            self._memory_responses[url] = record
+            return
+        _atomic_write(self._response_path(url), json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+    def get_first_commit(self, path: str) -> datetime | None:
+        with self._lock:
+            value = self._first_commits.get(path)
+        return _parse_gh_time(value)
+
+    def put_first_commit(self, path: str, value: datetime) -> None:
+        with self._lock:
+            self._first_commits[path] = value.isoformat()
+            self._first_commits_dirty = True
+
+    def save(self) -> None:
+        if self.root is None:
+            return
+        with self._lock:
+            if not self._first_commits_dirty:
+                return
+            payload = json.dumps(self._first_commits, ensure_ascii=False, sort_keys=True).encode("utf-8")
+            self._first_commits_dirty = False
+        _atomic_write(self.root / "first_commits.json", payload)
+
+
 class GitHubClient:
-    def __init__(self, token: str | None):
+    def __init__(
+        self,
+        token: str | None,
+        *,
+        cache: KnowledgeCache | None = None,
+        max_workers: int = FETCH_WORKERS,
+        http: HttpClient | None = None,
+    ):
         self.token = token
-
-    def _request(self, url: str) -> tuple[int, dict[str, str], bytes]:
-        req = urllib.request.Request(url)
-        req.add_header("Accept", "application/vnd.github+json")
-        req.add_header("X-GitHub-Api-Version", "2022-11-28")
+        self.cache = cache or KnowledgeCache(None)
+        self.max_workers = max(1, max_workers)
+        self.http = http or shared_client()
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate_remaining(self) -> int | None:
+        return self.http.rate_limit(urllib.parse.urlsplit(GITHUB_API).hostname or "")[0]
+
+    def _headers(self, extra: dict[str, str] | None = None) -> dict[str, str]:
+        headers = {"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"}
         if self.token:
-            req.add_header("Authorization", f"Bearer {self.token}")
+            headers["Authorization"] = f"Bearer {self.token}"
+        headers.update(extra or {})
+        return headers
+
+    def _request(self, url: str, headers: dict[str, str] | None = None) -> tuple[int, dict[str, str], bytes]:
+        """Retries, backoff and rate-limit waits happen in the shared HTTP client."""
+        with self._lock:
+            self.request_count += 1
         try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                return resp.status, dict(resp.headers.items()), resp.read()
-        except urllib.error.HTTPError as exc:
-            return exc.code, dict(exc.headers.items() if exc.headers else {}), exc.read() or b""
-
-    def _get_json(self, url: str) -> tuple[int, dict[str, str], object]:
-        status, headers, body = self._request(url)
+            response = self.http.request("GET", url, headers=self._headers(headers), retries=MAX_RETRIES)
+        except HttpError as exc:
+            raise RuntimeError(f"GitHub request failed: {url}: {exc}") from exc
+        return response.status, response.headers, response.body
+
+    def _get_json(self, url: str, *, conditional: bool = False) -> tuple[int, dict[str, str], object]:
+        cached = self.cache.get_response(url) if conditional else None
+        headers = {"If-None-Match": cached["etag"]} if cached else None
+        status, resp_headers, body = self._request(url, headers)
+        if status == 304 and cached:
+            return 200, resp_headers, cached.get("body")
         if not body:
-            return status, headers, None
+            return status, resp_headers, None
         try:
-            return status, headers, json.loads(body.decode("utf-8"))
+            payload = json.loads(body.decode("utf-8"))
         except json.JSONDecodeError:
-            return status, headers, None
+            return status, resp_headers, None
+        etag = _header(resp_headers, "ETag")
+        if conditional and status == 200 and etag:
+            self.cache.put_response(url, etag, payload)
+        return status, resp_headers, payload
 
     def get_tree(self) -> list[RemoteFile]:
-        url = f"https://api.github.com/repos/{GITHUB_REPO}/git/trees/{GITHUB_BRANCH}?recursive=1"
-        status, _, body = self._get_json(url)
+        url = f"{GITHUB_API}/repos/{GITHUB_REPO}/git/trees/{GITHUB_BRANCH}?recursive=1"
+        status, _, body = self._get_json(url, conditional=True)
         if status != 200 or not isinstance(body, dict):
             raise RuntimeError(f"GitHub tree returned {status}: {body}")
         tree = body.get("tree", [])
@@ -87,9 +235,78 @@ class GitHubClient:
             files.append(RemoteFile(path=path, sha=entry["sha"]))
         return files
 
+    def get_blob(self, sha: str) -> bytes:
+        cached = self.cache.get_blob(sha)
+        if cached is not None:
+            return cached
+        url = f"{GITHUB_API}/repos/{GITHUB_REPO}/git/blobs/{sha}"
+        status, _, payload = self._get_json(url)
+        if status != 200 or not isinstance(payload, dict):
+            raise RuntimeError(f"blob fetch {sha} -> {status}")
+        raw = payload.get("content") or ""
+        if payload.get("encoding") == "base64":
+            content = base64.b64decode(raw)
+        else:
+            content = str(raw).encode("utf-8")
+        self.cache.put_blob(sha, content)
+        return content
+
+    def prefetch_archive(self, wanted: set[str]) -> int:
+        """Download the branch tarball once and cache every wanted blob found in it."""
+        url = f"{GITHUB_API}/repos/{GITHUB_REPO}/tarball/{GITHUB_BRANCH}"
+        with self._lock:
+            self.request_count += 1
+        found = 0
+        try:
+            with self.http.stream("GET", url, headers=self._headers(), timeout=ARCHIVE_TIMEOUT_SECONDS) as response:
+                if response.status != 200:
+                    return found
+                with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+                    for member in archive:
+                        if not member.isfile():
+                            continue
+                        _, _, relative = member.name.partition("/")
+                        if not relative.startswith(ROOT_PREFIX) or not relative.endswith(".md"):
+                            continue
+                        handle = archive.extractfile(member)
+                        if handle is None:
+                            continue
+                        data = handle.read()
+                        sha = git_blob_sha(data)
+                        if sha in wanted and not self.cache.has_blob(sha):
+                            self.cache.put_blob(sha, data)
+                            found += 1
+        except (HttpError, tarfile.TarError, OSError):
+            return found
+        return found
+
+    def fetch_contents(self, files: list[RemoteFile]) -> tuple[dict[str, str], dict[str, str]]:
+        """Return ``(contents_by_path, errors_by_path)``; each blob is fetched at most once."""
+        missing = {f.sha for f in files if not self.cache.has_blob(f.sha)}
+        if len(missing) > ARCHIVE_THRESHOLD:
+            self.prefetch_archive(missing)
+
+        contents: dict[str, str] = {}
+        errors: dict[str, str] = {}
+
+        def load(remote: RemoteFile) -> tuple[str, str | None, str | None]:
+            try:
+                data = self.get_blob(remote.sha)
+            except Exception as exc:  # noqa: BLE001
+                return remote.path, None, str(exc)
+            return remote.path, data.decode("utf-8", errors="replace"), None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for path, content, error in executor.map(load, files):
+                if error is not None:
+                    errors[path] = error
+                else:
+                    contents[path] = content or ""
+        return contents, errors
+
     def get_content(self, path: str) -> str:
         encoded = urllib.parse.quote(path, safe="/")
-        url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{encoded}?ref={GITHUB_BRANCH}"
+        url = f"{GITHUB_API}/repos/{GITHUB_REPO}/contents/{encoded}?ref={GITHUB_BRANCH}"
         status, _, payload = self._get_json(url)
         if status != 200 or not isinstance(payload, dict):
             raise RuntimeError(f"content fetch {path} -> {status}")
@@ -99,30 +316,45 @@ class GitHubClient:
         return base64.b64decode(raw).decode("utf-8", errors="replace")
 
     def get_first_commit_at(self, path: str) -> datetime | None:
+        cached = self.cache.get_first_commit(path)
+        if cached:
+            return cached
         encoded = urllib.parse.quote(path, safe="/")
-        url = f"https://api.github.com/repos/{GITHUB_REPO}/commits?path={encoded}&per_page=1"
+        url = f"{GITHUB_API}/repos/{GITHUB_REPO}/commits?path={encoded}&per_page=1"
         status, headers, body = self._get_json(url)
         if status != 200:
             return None
-        link = headers.get("Link") or headers.get("link") or ""
+        link = _header(headers, "Link")
         last_page = 1
         m = re.search(r'<[^>]+?[?&]page=(\d+)>;\s*rel="last"', link)
         if m:
             last_page = int(m.group(1))
+        first_commit: datetime | None = None
         if last_page > 1:
             status2, _, body2 = self._get_json(f"{url}&page={last_page}")
             if status2 == 200 and isinstance(body2, list) and body2:
-                return _parse_gh_time(
+                first_commit = _parse_gh_time(
                     body2[0].get("commit", {}).get("committer", {}).get("date")
                 )
-        if isinstance(body, list) and body:
-            return _parse_gh_time(body[0].get("commit", {}).get("committer", {}).get("date"))
-        return None
+        if first_commit is None and isinstance(body, list) and body:
+            first_commit = _parse_gh_time(body[0].get("commit", {}).get("committer", {}).get("date"))
+        if first_commit:
+            self.cache.put_first_commit(path, first_commit)
+        return first_commit
+
+    def get_path_history(self) -> dict[str, GitPathHistory]:
+        return {}
+
+    def close(self) -> None:
+        self.cache.save()
 
 
 class LocalKnowledgeSource:
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, *, history_cache: Path | None = None):
         self.root = root
+        self.history_cache = history_cache
+        self.shallow = False
+        self._history: dict[str, GitPathHistory] | None = None
 
     def get_tree(self) -> list[RemoteFile]:
         files: list[RemoteFile] = []
@@ -151,7 +383,39 @@ class LocalKnowledgeSource:
             raise RuntimeError(f"local path escapes root: {path}")
         return local_path.read_text(encoding="utf-8", errors="replace")
 
+    def fetch_contents(self, files: list[RemoteFile]) -> tuple[dict[str, str], dict[str, str]]:
+        contents: dict[str, str] = {}
+        errors: dict[str, str] = {}
+        for f in files:
+            try:
+                if f.local_path is not None:
+                    contents[f.path] = f.local_path.read_text(encoding="utf-8", errors="replace")
+                else:
+                    contents[f.path] = self.get_content(f.path)
+            except Exception as exc:  # noqa: BLE001
+                errors[f.path] = str(exc)
+        return contents, errors
+
+    def get_path_history(self) -> dict[str, GitPathHistory]:
+        """Creation/last-modified times for every file, from one ``git log`` over the clone."""
+        if self._history is not None:
+            return self._history
+        self._history = {}
+        try:
+            history, prefix = load_subtree_history(self.root, cache_file=self.history_cache)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return self._history
+        self.shallow = history.shallow
+        for git_path, item in history.paths.items():
+            if git_path.startswith(prefix):
+                self._history[f"{ROOT_PREFIX}{git_path[len(prefix):]}"] = item
+        return self._history
+
     def get_first_commit_at(self, path: str) -> datetime | None:
+        item = self.get_path_history().get(path)
+        return item.created_at if item else None
+
+    def close(self) -> None:
         return None
 
 
@@ -178,12 +442,7 @@ def parse_frontmatter_and_wikilinks(content: str) -> tuple[dict, list[str], str]
                     fm = loaded
             except Exception:
                 fm = {}
-    wikilinks = []
-    for m2 in WIKILINK_RE.finditer(body):
-        target = m2.group(1).strip()
-        if target:
-            wikilinks.append(target)
-    return fm, wikilinks, body
+    return fm, analyze_markdown(body).wikilinks, body
 
 
 def slug_from_path(path: str) -> str:
@@ -196,25 +455,6 @@ def slug_from_path(path: str) -> str:
     return s or raw[:200]
 
 
-def slug_from_wikilink(target: str, name_to_slug: dict[str, str]) -> str | None:
-    """wikilink target 可能是"karpathy"或"entities/karpathy"，在已知 slug 池里查。"""
-    t = target.strip()
-    if not t:
-        return None
-    # 直接命中
-    direct = slugify(t, allow_unicode=True)
-    if direct in name_to_slug.values():
-        return direct
-    # 按 name 索引（frontmatter name 或 path basename）
-    if t in name_to_slug:
-        return name_to_slug[t]
-    # 带路径
-    normalized = slugify(t.replace("/", "__"), allow_unicode=True)
-    if normalized in name_to_slug.values():
-        return normalized
-    return None
-
-
 def infer_category(path: str, frontmatter: dict) -> str:
     fm_type = (frontmatter.get("type") or "").lower().strip()
     if fm_type in {"entity", "source", "exploration", "hub", "index"}:
@@ -237,19 +477,35 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--dry-run", action="store_true")
-        parser.add_argument("--full", action="store_true", help="ignore sha cache; refetch all")
+        parser.add_argument("--full", action="store_true", help="ignore node sha cache; reprocess all files")
         parser.add_argument(
             "--local-root",
             default=os.environ.get("KNOWLEDGE_LOCAL_ROOT"),
             help="sync from a mounted local 3-Knowledge directory instead of GitHub",
         )
-
-    def handle(self, *args, dry_run: bool = False, full: bool = False, local_root: str | None = None, **kwargs):
+        parser.add_argument(
+            "--cache-dir",
+            default=os.environ.get("KNOWLEDGE_CACHE_DIR") or str(Path(settings.SYNC_CACHE_DIR) / "knowledge_github"),
+            help="on-disk blob/ETag (GitHub) and git-history (local) cache; empty string disables it",
+        )
+        parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="concurrent GitHub blob fetches")
+
+    def handle(
+        self,
+        *args,
+        dry_run: bool = False,
+        full: bool = False,
+        local_root: str | None = None,
+        cache_dir: str = "",
+        workers: int = FETCH_WORKERS,
+        **kwargs,
+    ):
         if local_root:
             root = Path(local_root).expanduser()
             if not root.exists() or not root.is_dir():
                 raise RuntimeError(f"KNOWLEDGE_LOCAL_ROOT is not a directory: {root}")
-            client = LocalKnowledgeSource(root)
+            history_cache = Path(cache_dir).expanduser() / "git_history.json" if cache_dir else None
+            client = LocalKnowledgeSource(root, history_cache=history_cache)
             self.stdout.write(f"fetching tree from local root {root} ...")
         else:
             token = os.environ.get("GITHUB_TOKEN") or os.environ.get("KNOWLEDGE_GITHUB_TOKEN")
@@ -257,7 +513,8 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING(
                     "GITHUB_TOKEN not set; using unauthenticated (60 req/h rate limit)."
                 ))
-            client = GitHubClient(token)
+            cache = KnowledgeCache(Path(cache_dir).expanduser() if cache_dir else None)
+            client = GitHubClient(token, cache=cache, max_workers=workers)
             self.stdout.write(f"fetching tree for {GITHUB_REPO}@{GITHUB_BRANCH} ...")
 
         remote_files = client.get_tree()
@@ -298,16 +555,20 @@ class Command(BaseCommand):
                 self.stdout.write(f"    - {p}")
             return
 
+        # Each changed file is fetched once; pass 2 reuses the parsed wikilinks.
+        contents, fetch_errors = client.fetch_contents(to_create + to_update)
+        for path, error in fetch_errors.items():
+            self.stderr.write(f"  fetch {path} failed: {error}")
+
         # Pass 1: create or update all nodes (without edges)
         created_nodes: dict[str, KnowledgeNode] = {}
+        wikilinks_by_path: dict[str, list[str]] = {}
         for f in to_create + to_update:
-            content = ""
-            try:
-                content = client.get_content(f.path)
-            except Exception as exc:
-                self.stderr.write(f"  fetch {f.path} failed: {exc}")
+            content = contents.get(f.path)
+            if content is None:
                 continue
-            fm, _, _ = parse_frontmatter_and_wikilinks(content)
+            fm, wikilinks, _ = parse_frontmatter_and_wikilinks(content)
+            wikilinks_by_path[f.path] = wikilinks
             title = (fm.get("name") or fm.get("title") or f.path.rsplit("/", 1)[-1][:-3])
             title = str(title).strip() or f.path
             slug = slug_from_path(f.path)
@@ -331,51 +592,87 @@ class Command(BaseCommand):
                 node.save(update_fields=["git_created_at"])
             created_nodes[f.path] = node
 
-        # Pass 2: edges — only for files that were create/update this run
-        slug_to_node = {n.slug: n for n in KnowledgeNode.objects.filter(is_active=True)}
-        name_to_slug: dict[str, str] = {}
-        for n in slug_to_node.values():
-            name_to_slug[n.title] = n.slug
-            stem = n.path.rsplit("/", 1)[-1][:-3]
-            name_to_slug.setdefault(stem, n.slug)
-
-        changed_paths = [f.path for f in (to_create + to_update)]
-        for path in changed_paths:
-            node = created_nodes.get(path)
-            if not node:
-                continue
-            try:
-                content = client.get_content(path)
-            except Exception:
-                continue
-            _, wikilinks, _ = parse_frontmatter_and_wikilinks(content)
-            with transaction.atomic():
-                KnowledgeEdge.objects.filter(source=node).delete()
-                seen_targets: set[int] = set()
-                for target_text in wikilinks:
-                    target_slug = slug_from_wikilink(target_text, name_to_slug)
-                    if not target_slug:
-                        continue
-                    target_node = slug_to_node.get(target_slug)
-                    if not target_node or target_node.id == node.id:
-                        continue
-                    if target_node.id in seen_targets:
-                        continue
-                    seen_targets.add(target_node.id)
-                    KnowledgeEdge.objects.create(
-                        source=node, target=target_node, wikilink_text=target_text[:255]
-                    )
+        # Local clones: refresh git timestamps for every node from the one git-log pass.
+        path_history = client.get_path_history()
+        if path_history:
+            if getattr(client, "shallow", False):
+                self.stderr.write("  vault clone is shallow; git_created_at reflects the shallow boundary")
+            dated_nodes: list[KnowledgeNode] = []
+            for node in KnowledgeNode.objects.only("id", "path", "git_created_at", "git_last_modified_at"):
+                item = path_history.get(node.path)
+                if item is None:
+                    continue
+                if node.git_created_at != item.created_at or node.git_last_modified_at != item.modified_at:
+                    node.git_created_at = item.created_at
+                    node.git_last_modified_at = item.modified_at
+                    dated_nodes.append(node)
+            KnowledgeNode.objects.bulk_update(
+                dated_nodes, ["git_created_at", "git_last_modified_at"], batch_size=EDGE_BATCH_SIZE
+            )
+            self.stdout.write(f"  git history: {len(path_history)} paths, {len(dated_nodes)} nodes re-dated")
+
+        # Pass 2: edges — only for files that were create/update this run.
+        # The diff is computed in memory and applied in one transaction.
+        active_nodes = list(KnowledgeNode.objects.filter(is_active=True))
+        slug_to_node = {n.slug: n for n in active_nodes}
+        index = WikilinkIndex.from_nodes(active_nodes)
+
+        desired_edges: dict[tuple[int, int], str] = {}
+        for path, node in created_nodes.items():
+            for target_text in wikilinks_by_path.get(path, []):
+                target_node = slug_to_node.get(index.resolve(target_text) or "")
+                if not target_node or target_node.id == node.id:
+                    continue
+                desired_edges.setdefault((node.id, target_node.id), target_text[:255])
+
+        source_ids = [node.id for node in created_nodes.values()]
+        stale_edge_ids: list[int] = []
+        existing_pairs: set[tuple[int, int]] = set()
+        for batch in _batched(source_ids, EDGE_BATCH_SIZE):
+            for edge_id, source_id, target_id in KnowledgeEdge.objects.filter(source_id__in=batch).values_list(
+                "id", "source_id", "target_id"
+            ):
+                pair = (source_id, target_id)
+                if pair in desired_edges:
+                    existing_pairs.add(pair)
+                else:
+                    stale_edge_ids.append(edge_id)
+
+        new_edges = [
+            KnowledgeEdge(source_id=source_id, target_id=target_id, wikilink_text=text)
+            for (source_id, target_id), text in desired_edges.items()
+            if (source_id, target_id) not in existing_pairs
+        ]
+        # One short transaction: readers never see a half-rebuilt edge set. The
+        # diff is computed above, so only the changed edges are written here.
+        with transaction.atomic(using=content_db_alias()):
+            KnowledgeEdge.objects.bulk_create(new_edges, batch_size=EDGE_BATCH_SIZE, ignore_conflicts=True)
+            for batch in _batched(stale_edge_ids, EDGE_BATCH_SIZE):
+                KnowledgeEdge.objects.filter(id__in=batch).delete()
+        self.stdout.write(f"  edges +{len(new_edges)} -{len(stale_edge_ids)}")
 
         # Soft delete
         if to_soft_delete:
             KnowledgeNode.objects.filter(path__in=to_soft_delete).update(is_active=False)
 
+        client.close()
+        if isinstance(client, GitHubClient):
+            self.stdout.write(
+                f"  github requests={client.request_count} rate_remaining={client.rate_remaining}"
+            )
+            self.stdout.write(f"  http {client.http.format_metrics()}")
+
         self.stdout.write(self.style.SUCCESS(
             f"sync complete: +{len(to_create)} ~{len(to_update)} "
             f"-{len(to_soft_delete)} skip={len(to_skip)}"
         ))
 
 
+def _batched(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 def _json_safe(v) -> bool:
     if v is None or isinstance(v, (bool, int, float, str)):
         return True
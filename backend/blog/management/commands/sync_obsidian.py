@@ -1,27 +1,42 @@
 from __future__ import annotations
 
+import gzip
 import json
 import os
 import re
 from datetime import datetime
 from pathlib import Path
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
 
 import frontmatter
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
 from blog.models import Post, SyncLog
 from sync.mapper import resolve_category, resolve_slug
-from sync.parser import build_excerpt, contains_publish_tag, normalize_tags, remove_publish_tag
-from sync.scanner import scan_markdown_files
-from sync.service import reconcile_obsidian_publications, sync_post_payload
+from sync.parser import (
+    build_excerpt,
+    contains_publish_tag,
+    normalize_tags,
+    read_frontmatter_header,
+    remove_publish_tag,
+)
+from sync.attachments import STORAGE_CHOICES, PostAttachments
+from sync.scanner import iter_markdown_files
+from sync.generations import next_generation, stamp_generation
+from sync.http_client import HttpError, shared_client
+from sync.service import reconcile_obsidian_publications, sync_payload_hash, sync_post_payload
+from sync.timing import StageTimer
 
 DEFAULT_INCLUDE_ROOTS = [
     "3-Knowledge",
     "2-Resource",
 ]
+DEFAULT_REMOTE_BATCH_SIZE = 50
+# Uncompressed JSON per bulk request; gzip brings Markdown well under nginx's 10m body limit.
+REMOTE_BATCH_MAX_BYTES = 4 * 1024 * 1024
+# Keys the bulk endpoint takes from the request rather than from each note.
+REMOTE_SESSION_KEYS = ("mode", "dry_run", "sync_generation")
 
 
 def _raw_contains_publish_tag(raw_text: str, publish_tag: str) -> bool:
@@ -40,33 +55,62 @@ def _build_remote_url(base_url: str, endpoint: str) -> str:
     return f"{base_url.rstrip('/')}/{endpoint.lstrip('/')}"
 
 
-def _post_remote_json(url: str, token: str, payload: dict, timeout_seconds: int) -> dict:
-    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    request = Request(
-        url=url,
-        data=body,
-        method="POST",
-        headers={
-            "Content-Type": "application/json",
-            "X-Obsidian-Sync-Token": token,
-        },
-    )
+class RemoteEndpointMissing(ValueError):
+    """The remote site predates an endpoint (HTTP 404)."""
+
+
+def _post_remote_json(url: str, token: str, payload: dict, timeout_seconds: int, *, compress: bool = False) -> dict:
+    headers = {"X-Obsidian-Sync-Token": token}
+    body = None
+    if compress:
+        body = gzip.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        headers.update({"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    try:
+        response = shared_client().request(
+            "POST",
+            url,
+            payload=None if compress else payload,
+            body=body,
+            headers=headers,
+            timeout=timeout_seconds,
+        )
+    except HttpError as exc:
+        raise ValueError(f"remote request failed: {exc}") from exc
+    if response.status == 404:
+        raise RemoteEndpointMissing(f"remote endpoint not found: {url}")
+    if not response.ok:
+        raise ValueError(f"remote request failed: {response.status} {response.text()}")
     try:
-        with urlopen(request, timeout=timeout_seconds) as response:  # noqa: S310
-            data = json.loads(response.read().decode("utf-8"))
-    except HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore")
-        raise ValueError(f"remote request failed: {exc.code} {detail}") from exc
-    except URLError as exc:
-        raise ValueError(f"remote request failed: {exc.reason}") from exc
+        data = response.json()
+    except ValueError:
+        data = None
 
     if not isinstance(data, dict) or not data.get("ok"):
         raise ValueError(f"remote response invalid: {data}")
     return data.get("data", {})
 
 
+def _remote_batches(payloads: list[dict], max_items: int, max_bytes: int) -> list[list[dict]]:
+    """Group note payloads into bulk requests of at most ``max_items`` notes and about ``max_bytes`` of JSON."""
+    batches: list[list[dict]] = []
+    batch: list[dict] = []
+    size = 0
+    for payload in payloads:
+        item_size = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        if batch and (len(batch) >= max_items or size + item_size > max_bytes):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(payload)
+        size += item_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
 class Command(BaseCommand):
     help = "Sync publish-tagged Obsidian markdown notes into blog posts"
+    # sync_site_sources passes notes already parsed by its worker processes.
+    stealth_options = ("prepared_notes",)
 
     def add_arguments(self, parser):
         parser.add_argument("source", help="Obsidian vault root path")
@@ -111,6 +155,24 @@ class Command(BaseCommand):
             default="publish",
             help="Tag name used as publish switch",
         )
+        parser.add_argument(
+            "--attachments",
+            choices=STORAGE_CHOICES,
+            default=None,
+            help="Where embedded images go: local media, the image bed, or nowhere (default: POST_ATTACHMENT_STORAGE)",
+        )
+        parser.add_argument(
+            "--remote-protocol",
+            choices=["bulk", "per-note"],
+            default="bulk",
+            help="bulk: manifest + gzip batches + reconcile in one session; per-note: one request per note",
+        )
+        parser.add_argument(
+            "--remote-batch-size",
+            type=int,
+            default=DEFAULT_REMOTE_BATCH_SIZE,
+            help="Notes per bulk upload request",
+        )
         parser.add_argument(
             "--request-timeout",
             type=int,
@@ -130,9 +192,20 @@ class Command(BaseCommand):
         remote_base_url = str(options["remote_base_url"]).strip()
         remote_token_env = str(options["remote_token_env"]).strip()
         request_timeout = int(options["request_timeout"])
+        remote_protocol = options["remote_protocol"]
+        remote_batch_size = max(1, min(int(options["remote_batch_size"]), 100))
+        prepared_notes = options.get("prepared_notes") or {}
+        attachment_storage = options["attachments"] or str(getattr(settings, "POST_ATTACHMENT_STORAGE", "local"))
+        if attachment_storage not in STORAGE_CHOICES:
+            raise CommandError(f"Invalid POST_ATTACHMENT_STORAGE: {attachment_storage}")
 
         if not source.exists() or not source.is_dir():
             raise CommandError(f"Invalid source path: {source}")
+        if target == "remote" and attachment_storage == "local":
+            # Local media would land on this machine, not on the remote site.
+            if options["attachments"]:
+                self.stdout.write(self.style.WARNING("--attachments local does not reach a remote target; images left as-is"))
+            attachment_storage = "none"
 
         remote_token = ""
         if target == "remote":
@@ -142,10 +215,9 @@ class Command(BaseCommand):
             if not remote_token:
                 raise CommandError(f"Missing remote sync token in env: {remote_token_env}")
 
-        files = scan_markdown_files(str(source), include_roots=include_roots)
-        if not files:
-            self.stdout.write(self.style.WARNING("No markdown files found under selected roots"))
-            return
+        timer = StageTimer()
+        entries = iter_markdown_files(source, include_roots=include_roots)
+        attachments = PostAttachments(source, storage=attachment_storage, dry_run=dry_run)
 
         stats = {
             "created": 0,
@@ -159,21 +231,49 @@ class Command(BaseCommand):
             "failed": 0,
         }
         published_paths: list[str] = []
+        # Posts this run saw but did not write still need the run's generation. A remote
+        # run's generation is issued by the server, so sweeps never compare two clocks.
+        generation = None if dry_run or target == "remote" else next_generation()
+        seen_post_ids: list[int] = []
+        remote_payloads: list[dict] = []
 
         self.stdout.write(
             (
-                f"Sync start: files={len(files)}, target={target}, mode={mode}, "
+                f"Sync start: target={target}, mode={mode}, "
                 f"dry_run={dry_run}, force={force}, publish_tag={publish_tag}, "
                 f"include_roots={include_roots}"
             )
         )
 
-        for file_path in files:
-            relative_path = str(file_path.relative_to(source)).replace("\\", "/")
+        scanned = 0
+        for entry in timer.iterate("scan", entries):
+            scanned += 1
+            file_path = entry.path
+            relative_path = entry.relative_path
+            prepared = prepared_notes.get(relative_path)
+            if prepared is not None and (prepared.lossy or not prepared.matches(entry)):
+                prepared = None
             try:
                 try:
-                    note = frontmatter.load(file_path)
-                    metadata = dict(note.metadata)
+                    if prepared is not None:
+                        if prepared.metadata is None:
+                            raise ValueError(prepared.error)
+                        metadata = dict(prepared.metadata)
+                        content = prepared.content
+                    else:
+                        # Most notes are private: decide from the header alone and only
+                        # load the body of publish candidates.
+                        with timer.item("parse_header"):
+                            header = read_frontmatter_header(file_path)
+                        if header is not None and not contains_publish_tag(
+                            normalize_tags(header.get("tags", [])), publish_tag
+                        ):
+                            stats["skipped_unpublished"] += 1
+                            continue
+                        with timer.item("parse_yaml"):
+                            note = frontmatter.load(file_path)
+                            metadata = dict(note.metadata)
+                            content = note.content or ""
                     tags = normalize_tags(metadata.get("tags", []))
                     if not contains_publish_tag(tags, publish_tag):
                         stats["skipped_unpublished"] += 1
@@ -193,9 +293,8 @@ class Command(BaseCommand):
                     continue
 
                 category = resolve_category(metadata, relative_path)
-                excerpt = build_excerpt(metadata, note.content or "")
+                excerpt = build_excerpt(metadata, content)
                 cover = str(metadata.get("cover") or "").strip()
-                content = note.content or ""
                 payload = {
                     "title": title,
                     "slug": slug,
@@ -208,40 +307,81 @@ class Command(BaseCommand):
                     "mode": mode,
                     "dry_run": dry_run,
                 }
+                if generation:
+                    payload["sync_generation"] = generation
 
                 if target == "local":
                     modified_at = timezone.make_aware(
-                        datetime.fromtimestamp(file_path.stat().st_mtime),
+                        datetime.fromtimestamp(entry.mtime),
                         timezone.get_current_timezone(),
                     )
-                    existing = Post.objects.filter(slug=slug).first()
+                    with timer.item("db_read"):
+                        existing = Post.objects.filter(slug=slug).first()
                     if existing and not force and existing.last_synced_at and modified_at <= existing.last_synced_at:
                         stats["skipped_unchanged"] += 1
+                        seen_post_ids.append(existing.pk)
+                        published_paths.append(relative_path)
                         continue
                     if existing and mode == "skip":
                         stats["skipped_mode"] += 1
+                        seen_post_ids.append(existing.pk)
+                        published_paths.append(relative_path)
                         continue
-                    outcome = sync_post_payload(
-                        payload,
-                        mode=mode,
-                        source=SyncLog.Source.COMMAND,
-                        operator=None,
-                        dry_run=dry_run,
-                    )
+                    with timer.item("attachments"):
+                        payload["content"] = self._rewrite_attachments(attachments, content, relative_path)
+                    with timer.item("publish"):
+                        outcome = sync_post_payload(
+                            payload,
+                            mode=mode,
+                            source=SyncLog.Source.COMMAND,
+                            operator=None,
+                            dry_run=dry_run,
+                            generation=generation,
+                        )
                     self._accumulate_sync_action(stats, outcome.action)
                 else:
-                    endpoint = _build_remote_url(remote_base_url, "admin/obsidian-sync/")
-                    response = _post_remote_json(endpoint, remote_token, payload, request_timeout)
-                    action = str(response.get("action") or "")
-                    self._accumulate_sync_action(stats, action)
+                    # Remote notes are sent after the scan, once the server said which it needs.
+                    with timer.item("attachments"):
+                        payload["content"] = self._rewrite_attachments(attachments, content, relative_path)
+                    remote_payloads.append(payload)
+                    continue
 
                 published_paths.append(relative_path)
             except Exception as exc:  # noqa: BLE001
                 stats["failed"] += 1
                 self.stdout.write(self.style.WARNING(f"Failed {relative_path}: {exc}"))
 
-        if unpublish_behavior != "none":
-            if target == "local":
+        attachments.save()
+        if not scanned:
+            # Nothing matched (e.g. a mistyped include root): reconciling now would
+            # unpublish every synced post.
+            self.stdout.write(self.style.WARNING("No markdown files found under selected roots"))
+            return
+
+        if target == "remote":
+            remote = {
+                "base_url": remote_base_url,
+                "token": remote_token,
+                "timeout": request_timeout,
+                "mode": mode,
+                "dry_run": dry_run,
+                "scope_prefixes": include_roots,
+                "unpublish_behavior": unpublish_behavior,
+            }
+            if remote_protocol == "bulk":
+                try:
+                    self._push_remote_bulk(remote_payloads, stats, timer, batch_size=remote_batch_size, **remote)
+                    remote_payloads = []
+                except RemoteEndpointMissing as exc:
+                    self.stdout.write(self.style.WARNING(f"{exc}; falling back to one request per note"))
+                except ValueError as exc:
+                    raise CommandError(f"remote manifest failed: {exc}") from exc
+            if remote_payloads:
+                self._push_remote_each(remote_payloads, stats, timer, **remote)
+        elif unpublish_behavior != "none":
+            with timer.stage("reconcile"):
+                if generation:
+                    stamp_generation(Post, seen_post_ids, generation)
                 reconcile = reconcile_obsidian_publications(
                     published_paths=published_paths,
                     scope_prefixes=include_roots,
@@ -249,28 +389,15 @@ class Command(BaseCommand):
                     source=SyncLog.Source.COMMAND,
                     operator=None,
                     dry_run=dry_run,
+                    generation=generation,
                 )
                 stats["drafted"] += reconcile.drafted
                 stats["deleted"] += reconcile.deleted
-            else:
-                try:
-                    endpoint = _build_remote_url(remote_base_url, "admin/obsidian-sync/reconcile/")
-                    reconcile_payload = {
-                        "published_paths": published_paths,
-                        "scope_prefixes": include_roots,
-                        "behavior": unpublish_behavior,
-                        "dry_run": dry_run,
-                    }
-                    response = _post_remote_json(endpoint, remote_token, reconcile_payload, request_timeout)
-                    stats["drafted"] += int(response.get("drafted") or 0)
-                    stats["deleted"] += int(response.get("deleted") or 0)
-                except Exception as exc:  # noqa: BLE001
-                    stats["failed"] += 1
-                    self.stdout.write(self.style.WARNING(f"Failed reconcile: {exc}"))
 
         self.stdout.write(
             self.style.SUCCESS(
                 "Sync completed: "
+                f"files={scanned}, "
                 f"created={stats['created']}, "
                 f"updated={stats['updated']}, "
                 f"skipped_unpublished={stats['skipped_unpublished']}, "
@@ -282,6 +409,125 @@ class Command(BaseCommand):
                 f"failed={stats['failed']}"
             )
         )
+        if attachments.stored or attachments.reused or attachments.missing or attachments.failed:
+            self.stdout.write(attachments.summary())
+        self.stdout.write(f"stages: {timer.format()}")
+
+    def _push_remote_bulk(
+        self, payloads, stats, timer, *, base_url, token, timeout, mode, dry_run, scope_prefixes, unpublish_behavior,
+        batch_size,
+    ) -> None:
+        """Manifest first, then only the notes the server lacks in gzip batches; reconcile rides on the last request.
+
+        An unchanged vault costs the manifest request alone. The manifest
+        issues the run's generation, which goes with every later request: the
+        manifest stamps the posts it reports unchanged, batches stamp what they
+        write, and the reconcile sweeps whatever is left with an older
+        generation. Candidate paths are only sent when there is no generation
+        (dry runs, servers that do not issue one).
+        """
+        hashes = {payload["obsidian_path"]: sync_payload_hash(payload, mode) for payload in payloads}
+        reconcile = None
+        if unpublish_behavior != "none":
+            reconcile = {"scope_prefixes": scope_prefixes, "behavior": unpublish_behavior}
+        session = {"mode": mode, "dry_run": dry_run}
+        request = {
+            "items": [{"obsidian_path": path, "content_hash": content_hash} for path, content_hash in hashes.items()],
+            "new_generation": not dry_run,
+            **session,
+        }
+        if reconcile:
+            request["reconcile"] = reconcile
+        with timer.stage("manifest", items=len(hashes)):
+            manifest = _post_remote_json(
+                _build_remote_url(base_url, "admin/obsidian-sync/manifest/"), token, request, timeout, compress=True
+            )
+        generation = manifest.get("sync_generation")
+        if generation:
+            session["sync_generation"] = generation
+        stats["skipped_unchanged"] += int(manifest.get("unchanged") or 0)
+        needed = set(manifest.get("needed") or [])
+        self._accumulate_reconcile(stats, manifest.get("reconcile"))
+
+        pending = [
+            {key: value for key, value in payload.items() if key not in REMOTE_SESSION_KEYS}
+            for payload in payloads
+            if payload["obsidian_path"] in needed
+        ]
+        batches = _remote_batches(pending, batch_size, REMOTE_BATCH_MAX_BYTES)
+        endpoint = _build_remote_url(base_url, "admin/obsidian-sync/bulk/")
+        batch_failed = False
+        for index, batch in enumerate(batches):
+            body = {"items": batch, **session}
+            if reconcile and index == len(batches) - 1:
+                if batch_failed:
+                    # Posts of a lost batch were never stamped; a generation sweep would draft them.
+                    self.stdout.write(self.style.WARNING("Skip reconcile: an earlier bulk batch failed"))
+                else:
+                    body["reconcile"] = reconcile if generation else {**reconcile, "published_paths": list(hashes)}
+            try:
+                with timer.item("upload"):
+                    response = _post_remote_json(endpoint, token, body, timeout, compress=True)
+            except Exception as exc:  # noqa: BLE001
+                stats["failed"] += len(batch)
+                batch_failed = True
+                self.stdout.write(self.style.WARNING(f"Failed bulk batch {index + 1}/{len(batches)}: {exc}"))
+                continue
+            for result in response.get("results") or []:
+                if result.get("action") == "failed":
+                    stats["failed"] += 1
+                    self.stdout.write(self.style.WARNING(f"Failed {result.get('obsidian_path')}: {result.get('error')}"))
+                else:
+                    self._accumulate_sync_action(stats, str(result.get("action") or ""))
+            self._accumulate_reconcile(stats, response.get("reconcile"))
+
+    def _push_remote_each(
+        self, payloads, stats, timer, *, base_url, token, timeout, mode, dry_run, scope_prefixes, unpublish_behavior,
+    ) -> None:
+        """Fallback for servers without the bulk protocol; the reconcile gets the published paths."""
+        published_paths: list[str] = []
+        endpoint = _build_remote_url(base_url, "admin/obsidian-sync/")
+        for payload in payloads:
+            try:
+                with timer.item("publish"):
+                    response = _post_remote_json(endpoint, token, payload, timeout)
+            except Exception as exc:  # noqa: BLE001
+                stats["failed"] += 1
+                self.stdout.write(self.style.WARNING(f"Failed {payload['obsidian_path']}: {exc}"))
+                continue
+            self._accumulate_sync_action(stats, str(response.get("action") or ""))
+            published_paths.append(payload["obsidian_path"])
+
+        if unpublish_behavior == "none":
+            return
+        with timer.stage("reconcile"):
+            try:
+                reconcile_payload = {
+                    "published_paths": published_paths,
+                    "scope_prefixes": scope_prefixes,
+                    "behavior": unpublish_behavior,
+                    "dry_run": dry_run,
+                }
+                response = _post_remote_json(
+                    _build_remote_url(base_url, "admin/obsidian-sync/reconcile/"), token, reconcile_payload, timeout
+                )
+                self._accumulate_reconcile(stats, response)
+            except Exception as exc:  # noqa: BLE001
+                stats["failed"] += 1
+                self.stdout.write(self.style.WARNING(f"Failed reconcile: {exc}"))
+
+    def _rewrite_attachments(self, attachments: PostAttachments, content: str, relative_path: str) -> str:
+        content = attachments.rewrite(content, relative_path)
+        for error in attachments.errors:
+            self.stdout.write(self.style.WARNING(f"Image kept as written in {relative_path}: {error}"))
+        attachments.errors.clear()
+        return content
+
+    @staticmethod
+    def _accumulate_reconcile(stats: dict[str, int], result: dict | None) -> None:
+        if result:
+            stats["drafted"] += int(result.get("drafted") or 0)
+            stats["deleted"] += int(result.get("deleted") or 0)
 
     @staticmethod
     def _accumulate_sync_action(stats: dict[str, int], action: str) -> None:
@@ -1,27 +1,45 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import re
-import urllib.error
-import urllib.request
-from dataclasses import dataclass
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
 from typing import Any
 
 import frontmatter
 import yaml
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 
 from blog.models import Book, WishItem
+from sync.chunked import ChunkedCommit
+from sync.generations import next_generation
+from sync.http_client import HttpError, shared_client
+from sync.shadow import content_db_alias
 
 
 DEFAULT_BOOK_ROOT = "1-Information"
 DEFAULT_BOOK_FALLBACK_ROOT = "2-Resource/20_书籍文献"
 DEFAULT_WISH_PATH = "2-Resource/80_生活记录/消费/愿望清单.md"
 DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+DEEPSEEK_PROMPT = (
+    "你是个人网站内容同步助手。根据输入补全公开展示需要的上下文。"
+    "只返回 JSON，不要 Markdown。字段允许为空但不要编造具体价格。"
+    "book 输出: review, tags, info_url, cover, rating。"
+    "wish 输出: emoji, description, priority, purchase_url。"
+)
+DEEPSEEK_CACHE_FILE = "deepseek_enrichment.json"
+# Layout-only fields; a new position in the note must not trigger a re-ask.
+AI_PAYLOAD_EXCLUDE = ("sort_order", "ai_context")
 
 BOOK_TITLE_PATTERNS = [re.compile(r"《([^》]{1,120})》")]
 BOOK_PLAN_KEYWORDS = ("读书计划", "阅读计划", "书单", "书架", "在读", "想读", "已读", "待读")
@@ -326,42 +344,97 @@ def _scan_book_plans(vault: Path, book_root: str, limit: int) -> list[BookCandid
     return candidates
 
 
+def _deepseek_model() -> str:
+    return os.environ.get("DEEPSEEK_MODEL", "deepseek-v4-pro").strip() or "deepseek-v4-pro"
+
+
+def _ai_payload(candidate: BookCandidate | WishCandidate) -> dict[str, Any]:
+    payload = asdict(candidate)
+    for key in AI_PAYLOAD_EXCLUDE:
+        payload.pop(key, None)
+    return json.loads(json.dumps(payload, ensure_ascii=False, default=str))
+
+
+def _ai_cache_key(kind: str, payload: dict[str, Any]) -> str:
+    raw = json.dumps(
+        {"model": _deepseek_model(), "prompt": DEEPSEEK_PROMPT, "kind": kind, "item": payload},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _ai_cache_path() -> Path:
+    return Path(settings.SYNC_CACHE_DIR) / DEEPSEEK_CACHE_FILE
+
+
+def _load_ai_cache() -> dict[str, dict[str, Any]]:
+    try:
+        data = json.loads(_ai_cache_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_ai_cache(cache: dict[str, dict[str, Any]]) -> None:
+    path = _ai_cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(cache, handle, ensure_ascii=False)
+        os.replace(temp_name, path)
+    except OSError:
+        # Losing the cache only costs model calls on the next run.
+        return
+
+
+class _RateLimiter:
+    """Spaces calls at least ``1 / per_second`` apart across all worker threads."""
+
+    def __init__(self, per_second: float, *, clock=time.monotonic, sleep=time.sleep):
+        self._interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
 def _deepseek_complete(kind: str, payload: dict[str, Any], *, timeout: int) -> dict[str, Any]:
     api_key = os.environ.get("DEEPSEEK_API_KEY", "").strip()
     if not api_key:
         return {}
-    model = os.environ.get("DEEPSEEK_MODEL", "deepseek-v4-pro").strip() or "deepseek-v4-pro"
-    prompt = (
-        "你是个人网站内容同步助手。根据输入补全公开展示需要的上下文。"
-        "只返回 JSON，不要 Markdown。字段允许为空但不要编造具体价格。"
-        "book 输出: review, tags, info_url, cover, rating。"
-        "wish 输出: emoji, description, priority, purchase_url。"
-    )
-    body = json.dumps(
-        {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": json.dumps({"kind": kind, "item": payload}, ensure_ascii=False)},
-            ],
-            "temperature": 0.2,
-            "response_format": {"type": "json_object"},
-        },
-        ensure_ascii=False,
-    ).encode("utf-8")
-    req = urllib.request.Request(
-        DEEPSEEK_API_URL,
-        data=body,
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        method="POST",
-    )
+    request_payload = {
+        "model": _deepseek_model(),
+        "messages": [
+            {"role": "system", "content": DEEPSEEK_PROMPT},
+            {"role": "user", "content": json.dumps({"kind": kind, "item": payload}, ensure_ascii=False)},
+        ],
+        "temperature": 0.2,
+        "response_format": {"type": "json_object"},
+    }
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:  # noqa: S310
-            data = json.loads(resp.read().decode("utf-8"))
-    except (urllib.error.URLError, TimeoutError, json.JSONDecodeError):
+        response = shared_client().request(
+            "POST",
+            DEEPSEEK_API_URL,
+            payload=request_payload,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+        data = response.json() if response.ok else {}
+    except (HttpError, ValueError):
+        return {}
+    if not isinstance(data, dict):
         return {}
 
     content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
@@ -372,6 +445,106 @@ def _deepseek_complete(kind: str, payload: dict[str, Any], *, timeout: int) -> d
     return parsed if isinstance(parsed, dict) else {}
 
 
+def _apply_book_ai(book: BookCandidate, ai: dict[str, Any]) -> None:
+    book.review = book.review or str(ai.get("review") or "")[:280]
+    book.tags = book.tags or _as_tags(ai.get("tags"))[:6]
+    book.info_url = book.info_url or _first_text(ai.get("info_url"))
+    book.cover = book.cover or _first_text(ai.get("cover"))
+    book.rating = book.rating or _as_rating(ai.get("rating"))
+
+
+def _apply_wish_ai(wish: WishCandidate, ai: dict[str, Any]) -> None:
+    wish.emoji = wish.emoji if wish.emoji != "✨" else _first_text(ai.get("emoji"))[:10] or "✨"
+    wish.description = wish.description or str(ai.get("description") or "")[:500]
+    wish.priority = _priority_from_text(str(ai.get("priority") or wish.priority))
+    wish.purchase_url = wish.purchase_url or _first_text(ai.get("purchase_url"))
+
+
+@dataclass
+class EnrichStats:
+    calls: int = 0
+    cached: int = 0
+    unchanged: int = 0
+    failed: int = 0
+
+
+def _stored_ai_contexts(model, obsidian_paths: set[str]) -> dict[tuple[str, str], dict[str, Any]]:
+    rows = model.objects.filter(obsidian_path__in=obsidian_paths).values_list("obsidian_path", "title", "ai_context")
+    return {(path, title): context for path, title, context in rows if isinstance(context, dict)}
+
+
+def _enrich_candidates(
+    books: list[BookCandidate],
+    wishes: list[WishCandidate],
+    *,
+    timeout: int,
+    workers: int,
+    rate: float,
+) -> EnrichStats:
+    """Fill missing book/wish fields from DeepSeek, asking only about new or edited candidates.
+
+    Each candidate is keyed by a hash of its scanned fields (plus model and
+    prompt). A key already recorded in the row's ``ai_context`` or in the disk
+    cache reuses that answer; the rest go through a bounded, rate-limited pool.
+    """
+    stats = EnrichStats()
+    keyed: list[tuple[str, str, BookCandidate | WishCandidate]] = []
+    answers: dict[str, dict[str, Any]] = {}
+    to_fetch: dict[str, tuple[str, dict[str, Any]]] = {}
+    cache: dict[str, dict[str, Any]] | None = None
+    for kind, items, model, complete in (
+        ("book", books, Book, lambda book: book.review and book.tags and book.info_url),
+        ("wish", wishes, WishItem, lambda wish: wish.description and wish.purchase_url),
+    ):
+        pending = [item for item in items if not complete(item)]
+        if not pending:
+            continue
+        if cache is None:
+            cache = _load_ai_cache()
+        stored = _stored_ai_contexts(model, {item.obsidian_path for item in pending})
+        for item in pending:
+            payload = _ai_payload(item)
+            key = _ai_cache_key(kind, payload)
+            keyed.append((kind, key, item))
+            previous = stored.get((item.obsidian_path, item.title)) or {}
+            if previous.get("deepseek_key") == key and isinstance(previous.get("deepseek"), dict):
+                answers[key] = previous["deepseek"]
+                stats.unchanged += 1
+            elif isinstance(cache.get(key), dict):
+                answers[key] = cache[key]
+                stats.cached += 1
+            elif key not in to_fetch:
+                to_fetch[key] = (kind, payload)
+
+    if to_fetch:
+        limiter = _RateLimiter(rate)
+
+        def fetch(job: tuple[str, tuple[str, dict[str, Any]]]) -> tuple[str, dict[str, Any]]:
+            key, (kind, payload) = job
+            limiter.wait()
+            return key, _deepseek_complete(kind, payload, timeout=timeout)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(to_fetch)))) as pool:
+            for key, ai in pool.map(fetch, to_fetch.items()):
+                stats.calls += 1
+                if ai:
+                    answers[key] = cache[key] = ai
+                else:
+                    stats.failed += 1
+        _save_ai_cache(cache)
+
+    for kind, key, item in keyed:
+        ai = answers.get(key)
+        if not ai:
+            continue
+        if kind == "book":
+            _apply_book_ai(item, ai)
+        else:
+            _apply_wish_ai(item, ai)
+        item.ai_context = {**(item.ai_context or {}), "deepseek": ai, "deepseek_key": key}
+    return stats
+
+
 def _scan_books(vault: Path, book_root: str, repo_url: str, branch: str, limit: int) -> list[BookCandidate]:
     plan_candidates = _scan_book_plans(vault, book_root, limit)
     if plan_candidates or book_root.rstrip("/") == DEFAULT_BOOK_ROOT:
@@ -460,6 +633,21 @@ def _scan_wishes(vault: Path, wish_path: str) -> list[WishCandidate]:
     return candidates
 
 
+def _upsert_staged(model, title: str, obsidian_path: str, defaults: dict[str, Any]) -> None:
+    """Update the matching row in place; a new row is created inactive until the run's final swap."""
+    existing = (
+        model.objects.filter(obsidian_path=obsidian_path, title=title).first()
+        or model.objects.filter(title=title).first()
+    )
+    if existing is None:
+        model.objects.create(title=title, is_active=False, **defaults)
+        return
+    for key, value in defaults.items():
+        setattr(existing, key, value)
+    existing.title = title
+    existing.save()
+
+
 class Command(BaseCommand):
     help = "Sync Bookshelf and WishItem records from Obsidian vault, with optional DeepSeek V4 enrichment."
 
@@ -474,6 +662,18 @@ class Command(BaseCommand):
         parser.add_argument("--skip-ai", action="store_true")
         parser.add_argument("--dry-run", action="store_true")
         parser.add_argument("--request-timeout", type=int, default=30)
+        parser.add_argument(
+            "--ai-workers",
+            type=int,
+            default=int(os.environ.get("DEEPSEEK_WORKERS", "4")),
+            help="Concurrent DeepSeek requests for candidates missing from the cache.",
+        )
+        parser.add_argument(
+            "--ai-rate",
+            type=float,
+            default=float(os.environ.get("DEEPSEEK_RATE_LIMIT", "2")),
+            help="Maximum DeepSeek requests per second (0 disables the limit).",
+        )
 
     def handle(self, *args, **options):
         vault = Path(options["vault"]).expanduser().resolve()
@@ -488,27 +688,17 @@ class Command(BaseCommand):
         wishes = _scan_wishes(vault, options["wish_path"])
 
         if not options["skip_ai"]:
-            for book in books:
-                if book.review and book.tags and book.info_url:
-                    continue
-                ai = _deepseek_complete("book", book.__dict__, timeout=options["request_timeout"])
-                if ai:
-                    book.review = book.review or str(ai.get("review") or "")[:280]
-                    book.tags = book.tags or _as_tags(ai.get("tags"))[:6]
-                    book.info_url = book.info_url or _first_text(ai.get("info_url"))
-                    book.cover = book.cover or _first_text(ai.get("cover"))
-                    book.rating = book.rating or _as_rating(ai.get("rating"))
-                    book.ai_context = {**(book.ai_context or {}), "deepseek": ai}
-            for wish in wishes:
-                if wish.description and wish.purchase_url:
-                    continue
-                ai = _deepseek_complete("wish", wish.__dict__, timeout=options["request_timeout"])
-                if ai:
-                    wish.emoji = wish.emoji if wish.emoji != "✨" else _first_text(ai.get("emoji"))[:10] or "✨"
-                    wish.description = wish.description or str(ai.get("description") or "")[:500]
-                    wish.priority = _priority_from_text(str(ai.get("priority") or wish.priority))
-                    wish.purchase_url = wish.purchase_url or _first_text(ai.get("purchase_url"))
-                    wish.ai_context = {**(wish.ai_context or {}), "deepseek": ai}
+            ai_stats = _enrich_candidates(
+                books,
+                wishes,
+                timeout=options["request_timeout"],
+                workers=options["ai_workers"],
+                rate=options["ai_rate"],
+            )
+            self.stdout.write(
+                f"deepseek calls={ai_stats.calls} cached={ai_stats.cached} "
+                f"unchanged={ai_stats.unchanged} failed={ai_stats.failed}"
+            )
 
         self.stdout.write(f"found books={len(books)} wishes={len(wishes)}")
         if options["dry_run"]:
@@ -518,12 +708,10 @@ class Command(BaseCommand):
                 self.stdout.write(f"  wish: {wish.title} / {wish.price}")
             return
 
-        with transaction.atomic():
-            active_book_keys: set[tuple[str, str]] = set()
+        generation = next_generation()
+        with ChunkedCommit() as writer:
             for book in books:
-                active_book_keys.add((book.obsidian_path, book.title))
-                source_url = _obsidian_source_url(repo_url, repo_branch, book.obsidian_path)
-                defaults = {
+                _upsert_staged(Book, book.title, book.obsidian_path, {
                     "author": book.author,
                     "cover": book.cover,
                     "status": book.status,
@@ -532,56 +720,36 @@ class Command(BaseCommand):
                     "tags": book.tags or [],
                     "review": book.review,
                     "info_url": book.info_url,
-                    "source_url": source_url,
+                    "source_url": _obsidian_source_url(repo_url, repo_branch, book.obsidian_path),
                     "obsidian_path": book.obsidian_path,
                     "ai_context": book.ai_context or {},
                     "sort_order": book.sort_order,
-                    "is_active": True,
-                }
-                existing = Book.objects.filter(obsidian_path=book.obsidian_path, title=book.title).first() or Book.objects.filter(title=book.title).first()
-                if existing:
-                    for key, value in defaults.items():
-                        setattr(existing, key, value)
-                    existing.title = book.title
-                    existing.save()
-                else:
-                    Book.objects.create(title=book.title, **defaults)
-
-            synced_books = Book.objects.exclude(obsidian_path="")
-            for existing in synced_books:
-                if (existing.obsidian_path, existing.title) not in active_book_keys and existing.is_active:
-                    existing.is_active = False
-                    existing.save(update_fields=["is_active", "updated_at"])
+                    "sync_generation": generation,
+                })
+                writer.tick()
 
-            active_wish_keys: set[tuple[str, str]] = set()
             for wish in wishes:
-                active_wish_keys.add((wish.obsidian_path, wish.title))
-                source_url = _obsidian_source_url(repo_url, repo_branch, wish.obsidian_path)
-                defaults = {
+                _upsert_staged(WishItem, wish.title, wish.obsidian_path, {
                     "emoji": wish.emoji,
                     "description": wish.description,
                     "price": wish.price,
                     "priority": wish.priority,
                     "purchase_url": wish.purchase_url,
-                    "source_url": source_url,
+                    "source_url": _obsidian_source_url(repo_url, repo_branch, wish.obsidian_path),
                     "obsidian_path": wish.obsidian_path,
                     "ai_context": wish.ai_context or {},
                     "sort_order": wish.sort_order,
-                    "is_active": True,
-                }
-                existing = WishItem.objects.filter(obsidian_path=wish.obsidian_path, title=wish.title).first() or WishItem.objects.filter(title=wish.title).first()
-                if existing:
-                    for key, value in defaults.items():
-                        setattr(existing, key, value)
-                    existing.title = wish.title
-                    existing.save()
-                else:
-                    WishItem.objects.create(title=wish.title, **defaults)
-
-            synced_wishes = WishItem.objects.exclude(obsidian_path="")
-            for existing in synced_wishes:
-                if (existing.obsidian_path, existing.title) not in active_wish_keys and existing.is_active:
-                    existing.is_active = False
-                    existing.save(update_fields=["is_active", "updated_at"])
+                    "sync_generation": generation,
+                })
+                writer.tick()
+
+        # Rows seen this run go live and unseen ones drop out in one short transaction.
+        now = timezone.now()
+        with transaction.atomic(using=content_db_alias()):
+            for model in (Book, WishItem):
+                model.objects.filter(sync_generation=generation, is_active=False).update(is_active=True, updated_at=now)
+                model.objects.exclude(obsidian_path="").filter(is_active=True, sync_generation__lt=generation).update(
+                    is_active=False, updated_at=now
+                )
 
         self.stdout.write(self.style.SUCCESS(f"sync complete: books={len(books)} wishes={len(wishes)}"))
@@ -6,10 +6,13 @@ from django.core.management.base import BaseCommand, CommandError
 
 from blog.models import ObsidianSyncRun
 from sync.document_pool import sync_obsidian_documents
+from sync.timing import format_stage_timings
 
 
 class Command(BaseCommand):
     help = "Index all Obsidian markdown files into document pool and optionally auto-update published posts"
+    # sync_site_sources passes notes already parsed by its worker processes.
+    stealth_options = ("prepared_notes",)
 
     def add_arguments(self, parser):
         parser.add_argument("source", help="Obsidian vault root path")
@@ -56,6 +59,7 @@ class Command(BaseCommand):
                 repo_branch=options["repo_branch"],
                 repo_commit=options["repo_commit"],
                 operator=None,
+                prepared=options.get("prepared_notes"),
             )
         except ValueError as exc:
             raise CommandError(str(exc)) from exc
@@ -69,3 +73,5 @@ class Command(BaseCommand):
                 f"missing={run.missing_count}, published_updated={run.published_updated_count}, drafted={run.drafted_count}"
             )
         )
+        if run.stage_timings:
+            self.stdout.write(f"stages: {format_stage_timings(run.stage_timings)}")
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
 import os
+import time
+from functools import partial
 from pathlib import Path
 
+from django.conf import settings
 from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
 
+from blog.management.commands.sync_obsidian import DEFAULT_INCLUDE_ROOTS
+from sync.pipeline import PipelineStage, run_pipeline
+from sync.prepare import prepare_notes, vault_shards, warm_subtree_history
+from sync.shadow import DEFAULT_MAX_DROP_RATIO, ShadowPublishError, staged_publish
+
 
 class Command(BaseCommand):
     help = "Run the full one-way Obsidian -> personal website sync pipeline"
@@ -34,6 +42,29 @@ class Command(BaseCommand):
         parser.add_argument("--skip-documents", action="store_true")
         parser.add_argument("--skip-knowledge", action="store_true")
         parser.add_argument("--skip-structured", action="store_true")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=int(os.environ.get("SITE_SYNC_WORKERS") or min(4, os.cpu_count() or 1)),
+            help="Worker processes for the parse/fetch phases; 0 parses in this process",
+        )
+        parser.add_argument(
+            "--knowledge-cache-dir",
+            default=os.environ.get("KNOWLEDGE_CACHE_DIR") or str(Path(settings.SYNC_CACHE_DIR) / "knowledge_github"),
+            help="sync_knowledge_github --cache-dir; its git history is warmed in a worker",
+        )
+        parser.add_argument(
+            "--staged",
+            action="store_true",
+            default=os.environ.get("SITE_SYNC_STAGED", "0") == "1",
+            help="Build into a shadow copy of the database and publish it in one swap transaction",
+        )
+        parser.add_argument(
+            "--max-drop-ratio",
+            type=float,
+            default=DEFAULT_MAX_DROP_RATIO,
+            help="Staged mode refuses to publish when a domain loses more than this share of its visible rows",
+        )
 
     def handle(self, *args, **options):
         source = Path(options["source"]).expanduser().resolve()
@@ -41,61 +72,126 @@ class Command(BaseCommand):
             raise CommandError(f"Invalid source path: {source}")
 
         dry_run = bool(options["dry_run"])
-        publish_tag = str(options["publish_tag"] or "").strip() or "publish"
+        staged = bool(options["staged"]) and not dry_run
+        max_drop_ratio = float(options["max_drop_ratio"])
+        if not 0 <= max_drop_ratio <= 1:
+            raise CommandError("--max-drop-ratio 必须在 0 到 1 之间")
 
-        self.stdout.write(f"site sync start: source={source}, dry_run={dry_run}")
+        self.stdout.write(f"site sync start: source={source}, dry_run={dry_run}, staged={staged}")
+        if not staged:
+            self._run_steps(source, options, dry_run=dry_run)
+            self.stdout.write(self.style.SUCCESS("site sync completed"))
+            return
 
-        if not options["skip_posts"]:
-            self.stdout.write("step 1/4: sync publish-tagged posts")
+        try:
+            with staged_publish(max_drop_ratio=max_drop_ratio) as build:
+                self._run_steps(source, options, dry_run=False)
+        except ShadowPublishError as exc:
+            raise CommandError(f"site sync not published: {exc}") from exc
+        visible = ", ".join(
+            f"{label.split('.')[-1]}={build.live_visible[label]}->{count}" for label, count in build.shadow_visible.items()
+        )
+        self.stdout.write(f"published {build.published_rows} rows in {build.swap_ms}ms ({visible})")
+        self.stdout.write(self.style.SUCCESS("site sync completed"))
+
+    def _run_steps(self, source: Path, options, *, dry_run: bool) -> None:
+        """Parse/fetch phases run in worker processes; database writes run here, one stage at a time."""
+        publish_tag = str(options["publish_tag"] or "").strip() or "publish"
+        workers = max(0, int(options["workers"]))
+        notes: dict = {}
+        stages: list[PipelineStage] = []
+
+        def apply_posts(_results) -> None:
+            self.stdout.write("stage posts: sync publish-tagged posts")
             post_args = [str(source), "--mode", "overwrite", "--publish-tag", publish_tag]
             if dry_run:
                 post_args.append("--dry-run")
-            call_command("sync_obsidian", *post_args)
+            call_command("sync_obsidian", *post_args, prepared_notes=notes)
 
-        if not options["skip_documents"]:
-            if dry_run:
-                self.stdout.write("step 2/4: skip document pool in dry-run mode")
-            else:
-                self.stdout.write("step 2/4: sync document pool")
-                call_command(
-                    "sync_obsidian_documents",
-                    str(source),
-                    "--trigger",
-                    str(options["trigger"]),
-                    "--auto-update-published",
-                    "--missing-behavior",
-                    str(options["missing_behavior"]),
-                    "--publish-tag",
-                    publish_tag,
-                    "--repo-url",
-                    str(options["repo_url"]),
-                    "--repo-branch",
-                    str(options["repo_branch"]),
-                    "--repo-commit",
-                    str(options["repo_commit"]),
+        def apply_documents(_results) -> None:
+            self.stdout.write("stage documents: sync document pool")
+            call_command(
+                "sync_obsidian_documents",
+                str(source),
+                "--trigger",
+                str(options["trigger"]),
+                "--auto-update-published",
+                "--missing-behavior",
+                str(options["missing_behavior"]),
+                "--publish-tag",
+                publish_tag,
+                "--repo-url",
+                str(options["repo_url"]),
+                "--repo-branch",
+                str(options["repo_branch"]),
+                "--repo-commit",
+                str(options["repo_commit"]),
+                prepared_notes=notes,
+            )
+
+        def merge_notes(results) -> None:
+            for shard in results:
+                notes.update(shard)
+
+        run_documents = not options["skip_documents"] and not dry_run
+        if dry_run and not options["skip_documents"]:
+            self.stdout.write("stage documents: skip document pool in dry-run mode")
+        if not options["skip_posts"] or run_documents:
+            # The document pool reads the whole vault; posts alone only need their include roots.
+            shards = vault_shards(source, workers, roots=None if run_documents else DEFAULT_INCLUDE_ROOTS)
+            stages.append(
+                PipelineStage(
+                    name="vault",
+                    tasks=[partial(prepare_notes, str(source), shard) for shard in shards],
+                    apply=merge_notes,
                 )
+            )
+        if not options["skip_posts"]:
+            stages.append(PipelineStage(name="posts", apply=apply_posts, after=("vault",)))
+        if run_documents:
+            # Both write Post rows; the document pool links to what the posts stage published.
+            after = ("vault", "posts") if not options["skip_posts"] else ("vault",)
+            stages.append(PipelineStage(name="documents", apply=apply_documents, after=after))
 
         if not options["skip_knowledge"]:
             knowledge_root = (source / str(options["knowledge_root"]).strip().strip("/")).resolve()
             if knowledge_root.exists() and knowledge_root.is_dir():
-                self.stdout.write("step 3/4: sync knowledge graph")
-                knowledge_args = ["--local-root", str(knowledge_root)]
+                cache_dir = str(options["knowledge_cache_dir"] or "")
+                knowledge_args = ["--local-root", str(knowledge_root), "--cache-dir", cache_dir]
                 if dry_run:
                     knowledge_args.append("--dry-run")
-                call_command("sync_knowledge_github", *knowledge_args)
+                tasks = []
+                if cache_dir:
+                    tasks.append(partial(warm_subtree_history, str(knowledge_root), str(Path(cache_dir) / "git_history.json")))
+
+                def apply_knowledge(_results, knowledge_args=knowledge_args) -> None:
+                    self.stdout.write("stage knowledge: sync knowledge graph")
+                    call_command("sync_knowledge_github", *knowledge_args)
+
+                stages.append(PipelineStage(name="knowledge", tasks=tasks, apply=apply_knowledge))
             else:
-                self.stdout.write(f"step 3/4: skip knowledge graph, root missing: {knowledge_root}")
+                self.stdout.write(f"stage knowledge: skip knowledge graph, root missing: {knowledge_root}")
 
         if not options["skip_structured"]:
-            self.stdout.write("step 4/4: sync structured website sources")
-            structured_args = [
-                "--vault",
-                str(source),
-                "--root",
-                str(options["structured_root"]),
-            ]
+            structured_args = ["--vault", str(source), "--root", str(options["structured_root"])]
             if dry_run:
                 structured_args.append("--dry-run")
-            call_command("sync_site_structured", *structured_args)
 
-        self.stdout.write(self.style.SUCCESS("site sync completed"))
+            def apply_structured(_results) -> None:
+                self.stdout.write("stage structured: sync structured website sources")
+                call_command("sync_site_structured", *structured_args)
+
+            stages.append(PipelineStage(name="structured", apply=apply_structured))
+
+        started = time.perf_counter()
+        timer = run_pipeline(
+            stages,
+            workers=workers,
+            on_prepare_error=lambda name, exc: self.stdout.write(
+                self.style.WARNING(f"stage {name}: prepare failed, parsing during apply instead: {exc}")
+            ),
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        stage_ms = sum(values["ms"] for values in timer.as_dict().values())
+        self.stdout.write(f"pipeline: wall={wall_ms:.0f}ms, stage_sum={stage_ms:.0f}ms, workers={workers}")
+        self.stdout.write(f"stages: {timer.format()}")
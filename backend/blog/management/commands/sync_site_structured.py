@@ -5,22 +5,27 @@ import json
 import mimetypes
 import os
 import re
-from dataclasses import dataclass
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import date
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from urllib.error import HTTPError, URLError
 from urllib.parse import unquote
-from urllib.request import Request, urlopen
 
 from django.conf import settings
-from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.dateparse import parse_date
 
-from blog.image_bed import ImageBedUploadError, upload_photo_to_obsidian_images
+from blog.image_bed import ImageBedUploadError, upload_photos_to_obsidian_images
 from blog.models import Book, GameItem, PhotoWallImage, SocialMediaStat, WikiQuote, WishItem
+from sync.chunked import ChunkedCommit
+from sync.http_client import HttpError, shared_client
+from sync.shadow import content_db_alias
+from sync.timing import StageTimer
 
 
 DEFAULT_SYNC_ROOT = "2-Resource/90_网站同步"
@@ -87,6 +92,10 @@ GAME_TITLE_RE = re.compile(
     r"^(?:\*\*(?P<title_bold>.+?)\*\*|(?P<title_plain>.*?))"
     r"(?:（(?P<english_cn>[^）]+)）|\((?P<english_en>[^)]+)\))?\s*$"
 )
+BULK_BATCH_SIZE = 500
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_UPLOAD_ATTEMPTS = 3
+HASH_CHUNK_SIZE = 1024 * 1024
 
 
 @dataclass
@@ -95,6 +104,16 @@ class SyncStats:
     updated: int = 0
     deactivated: int = 0
     skipped: int = 0
+    unchanged: int = 0
+
+
+@dataclass
+class _RemotePhoto:
+    sync_key: str
+    payload: dict[str, str]
+    local_path: Path | None = None
+    content_sha256: str = ""
+    manifest_item: dict = field(default_factory=dict)
 
 
 def _read_text(path: Path) -> str:
@@ -312,46 +331,59 @@ def _build_photo_sync_key(note_rel: str, title: str, image_ref: str) -> str:
     return hashlib.sha1(f"{note_rel}|{title}|{image_ref}".encode("utf-8")).hexdigest()
 
 
-def _upload_photo_asset(local_path: Path) -> tuple[str, str]:
-    content = local_path.read_bytes()
-    content_type = mimetypes.guess_type(local_path.name)[0] or "application/octet-stream"
-    upload = SimpleUploadedFile(local_path.name, content, content_type=content_type)
-    try:
-        result = upload_photo_to_obsidian_images(upload, operator="obsidian-sync")
-    except ImageBedUploadError as exc:
-        raise CommandError(str(exc)) from exc
-    return result.image_url, result.source_url
+def _upload_photo_assets(local_paths: list[Path]) -> dict[Path, tuple[str, str]]:
+    """Upload local photo files to the image bed in one commit."""
+    unique_paths = list(dict.fromkeys(local_paths))
+    if not unique_paths:
+        return {}
+    with ExitStack() as stack:
+        handles = [stack.enter_context(path.open("rb")) for path in unique_paths]
+        try:
+            results = upload_photos_to_obsidian_images(handles, operator="obsidian-sync")
+        except ImageBedUploadError as exc:
+            raise CommandError(str(exc)) from exc
+    return {path: (result.image_url, result.source_url) for path, result in zip(unique_paths, results)}
 
 
 def _build_remote_url(base_url: str, endpoint: str) -> str:
     return f"{base_url.rstrip('/')}/{endpoint.lstrip('/')}"
 
 
-def _post_remote_json(url: str, token: str, payload: dict, timeout_seconds: int) -> dict:
-    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    request = Request(
-        url=url,
-        data=body,
-        method="POST",
-        headers={
-            "Content-Type": "application/json",
-            "X-Obsidian-Sync-Token": token,
-        },
-    )
+def _post_remote(
+    url: str,
+    token: str,
+    *,
+    timeout_seconds: int,
+    retries: int | None,
+    payload: dict | None = None,
+    body: bytes | None = None,
+    content_type: str = "",
+) -> dict:
+    headers = {"X-Obsidian-Sync-Token": token}
+    if content_type:
+        headers["Content-Type"] = content_type
+    try:
+        response = shared_client().request(
+            "POST", url, headers=headers, payload=payload, body=body, timeout=timeout_seconds, retries=retries
+        )
+    except HttpError as exc:
+        raise CommandError(f"remote request failed: {exc}") from exc
+    if not response.ok:
+        raise CommandError(f"remote request failed: {response.status} {response.text()}")
     try:
-        with urlopen(request, timeout=timeout_seconds) as response:  # noqa: S310
-            data = json.loads(response.read().decode("utf-8"))
-    except HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore")
-        raise CommandError(f"remote request failed: {exc.code} {detail}") from exc
-    except URLError as exc:
-        raise CommandError(f"remote request failed: {exc.reason}") from exc
+        data = response.json()
+    except ValueError:
+        data = None
 
     if not isinstance(data, dict) or not data.get("ok"):
         raise CommandError(f"remote response invalid: {data}")
     return data.get("data", {})
 
 
+def _post_remote_json(url: str, token: str, payload: dict, timeout_seconds: int, *, retries: int | None = None) -> dict:
+    return _post_remote(url, token, payload=payload, timeout_seconds=timeout_seconds, retries=retries)
+
+
 def _post_remote_multipart(
     url: str,
     token: str,
@@ -362,6 +394,7 @@ def _post_remote_multipart(
     file_content: bytes,
     content_type: str,
     timeout_seconds: int,
+    retries: int | None = None,
 ) -> dict:
     boundary = f"----openingcloud-sync-{hashlib.sha1(os.urandom(16)).hexdigest()}"
     body = bytearray()
@@ -384,27 +417,14 @@ def _post_remote_multipart(
     body.extend(b"\r\n")
     body.extend(f"--{boundary}--\r\n".encode("utf-8"))
 
-    request = Request(
-        url=url,
-        data=bytes(body),
-        method="POST",
-        headers={
-            "Content-Type": f"multipart/form-data; boundary={boundary}",
-            "X-Obsidian-Sync-Token": token,
-        },
+    return _post_remote(
+        url,
+        token,
+        body=bytes(body),
+        content_type=f"multipart/form-data; boundary={boundary}",
+        timeout_seconds=timeout_seconds,
+        retries=retries,
     )
-    try:
-        with urlopen(request, timeout=timeout_seconds) as response:  # noqa: S310
-            data = json.loads(response.read().decode("utf-8"))
-    except HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore")
-        raise CommandError(f"remote request failed: {exc.code} {detail}") from exc
-    except URLError as exc:
-        raise CommandError(f"remote request failed: {exc.reason}") from exc
-
-    if not isinstance(data, dict) or not data.get("ok"):
-        raise CommandError(f"remote response invalid: {data}")
-    return data.get("data", {})
 
 
 def _resolve_photo_urls(
@@ -414,7 +434,8 @@ def _resolve_photo_urls(
     image_cell: str,
     existing: PhotoWallImage | None,
     dry_run: bool,
-) -> tuple[str, str]:
+) -> tuple[str, str, Path | None]:
+    """Return ``(image_url, source_url, upload_path)``; ``upload_path`` still has to go to the image bed."""
     image_ref = _extract_image_reference(image_cell)
     if not image_ref:
         raise CommandError(f"照片墙缺少图片地址: {note_path}")
@@ -422,24 +443,122 @@ def _resolve_photo_urls(
     vault_repo_relative_path = _extract_vault_repo_relative_path(image_ref)
     if vault_repo_relative_path:
         if existing and existing.image_url and not _extract_vault_repo_relative_path(existing.image_url):
-            return existing.image_url, existing.source_url
+            return existing.image_url, existing.source_url, None
         if dry_run:
-            return "", ""
-        local_path = _resolve_local_media_path(vault, note_path, vault_repo_relative_path)
-        return _upload_photo_asset(local_path)
+            return "", "", None
+        return "", "", _resolve_local_media_path(vault, note_path, vault_repo_relative_path)
 
     normalized_remote_url, derived_source_url = _normalize_github_image_url(image_ref)
     if normalized_remote_url.startswith("http://") or normalized_remote_url.startswith("https://"):
-        return normalized_remote_url, derived_source_url
+        return normalized_remote_url, derived_source_url, None
 
     if existing and existing.image_url:
-        return existing.image_url, existing.source_url
+        return existing.image_url, existing.source_url, None
 
     if dry_run:
-        return "", ""
+        return "", "", None
+
+    return "", "", _resolve_local_media_path(vault, note_path, image_ref)
+
+
+def _assign_changed(instance, values: dict) -> bool:
+    changed = False
+    for field, value in values.items():
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
+
+
+def _bulk_write(model, creates: list, updates: list, fields: list[str], *, touch: bool = True) -> None:
+    """Write rows in chunked commits so public writes are not locked out for the whole run."""
+    if not creates and not updates:
+        return
+    if touch and updates:
+        # bulk_update bypasses auto_now, so stamp updated_at explicitly.
+        now = timezone.now()
+        for instance in updates:
+            instance.updated_at = now
+        fields = [*fields, "updated_at"]
+    with ChunkedCommit(max_rows=BULK_BATCH_SIZE) as writer:
+        for batch in writer.batches(creates):
+            model.objects.bulk_create(batch)
+        if fields:
+            for batch in writer.batches(updates):
+                model.objects.bulk_update(batch, fields)
+
+
+def _upsert_note_rows(
+    model,
+    note_rel: str,
+    items: list[tuple[str, dict]],
+    *,
+    key_field: str,
+    max_length: int,
+    scoped_lookup: bool,
+    stats: SyncStats,
+    dry_run: bool,
+) -> None:
+    """Upsert ``(key, defaults)`` rows of one note and deactivate the ones it dropped.
+
+    Existing rows are loaded once; with ``scoped_lookup`` a row of the same
+    note wins over a same-keyed row elsewhere. Unchanged rows are not written.
+    """
+    keys = {key for key, _ in items}
+    loaded = list(model.objects.filter(Q(obsidian_path=note_rel) | Q(**{f"{key_field}__in": keys})))
+    by_key: dict[str, object] = {}
+    by_note_key: dict[str, object] = {}
+    for instance in loaded:
+        key = getattr(instance, key_field)
+        by_key.setdefault(key, instance)
+        if instance.obsidian_path == note_rel:
+            by_note_key.setdefault(key, instance)
+
+    creates: list = []
+    updates: dict[int, object] = {}
+    fields: set[str] = set()
+    active_keys: set[str] = set()
+    for key, defaults in items:
+        active_keys.add(key)
+        values = {**defaults, key_field: key[:max_length]}
+        existing = (by_note_key.get(key) if scoped_lookup else None) or by_key.get(key)
+        if existing is None:
+            stats.created += 1
+            if not dry_run:
+                instance = model(**values)
+                creates.append(instance)
+                by_key[key] = by_note_key[key] = instance
+            continue
+        if not _assign_changed(existing, values):
+            stats.unchanged += 1
+            continue
+        stats.updated += 1
+        fields.update(values)
+        if existing.pk is not None:
+            updates[existing.pk] = existing
 
-    local_path = _resolve_local_media_path(vault, note_path, image_ref)
-    return _upload_photo_asset(local_path)
+    if dry_run:
+        return
+
+    stale_ids = [
+        instance.pk
+        for instance in loaded
+        if instance.obsidian_path == note_rel
+        and instance.is_active
+        and getattr(instance, key_field) not in active_keys
+    ]
+    # New rows are staged inactive and go live together with the stale sweep.
+    publish = [instance for instance in creates if instance.is_active]
+    for instance in publish:
+        instance.is_active = False
+    _bulk_write(model, creates, list(updates.values()), sorted(fields))
+    if publish or stale_ids:
+        with transaction.atomic(using=content_db_alias()):
+            model.objects.filter(pk__in=[instance.pk for instance in publish]).update(is_active=True)
+            model.objects.filter(pk__in=stale_ids).update(is_active=False, updated_at=timezone.now())
+    for instance in publish:
+        instance.is_active = True
+    stats.deactivated += len(stale_ids)
 
 
 def _sync_wishes(vault: Path, note_rel: str, *, dry_run: bool, stdout) -> SyncStats:
@@ -456,47 +575,27 @@ def _sync_wishes(vault: Path, note_rel: str, *, dry_run: bool, stdout) -> SyncSt
 
     header, rows = tables[0]
     mapping = _header_map(header)
-    active_keys: set[tuple[str, str]] = set()
-
-    with transaction.atomic():
-        for index, row in enumerate(rows, start=1):
-            title = _cell(mapping, row, "标题", "物品", "名称", "title", "item")
-            if not title:
-                stats.skipped += 1
-                continue
-            active_keys.add((note_rel, title))
-            defaults = {
-                "emoji": (_cell(mapping, row, "emoji", "表情") or "✨")[:10],
-                "description": _cell(mapping, row, "描述", "备注", "description", "note")[:500],
-                "price": _as_price(_cell(mapping, row, "价格", "price")),
-                "priority": _normalize_priority(_cell(mapping, row, "优先级", "priority")),
-                "purchase_url": _cell(mapping, row, "购买链接", "链接", "purchase_url", "url")[:800],
-                "obsidian_path": note_rel,
-                "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
-                "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
-            }
-            existing = WishItem.objects.filter(obsidian_path=note_rel, title=title).first() or WishItem.objects.filter(title=title).first()
-            if dry_run:
-                stats.updated += int(existing is not None)
-                stats.created += int(existing is None)
-                continue
-            if existing is None:
-                WishItem.objects.create(title=title[:100], **defaults)
-                stats.created += 1
-            else:
-                for field, value in defaults.items():
-                    setattr(existing, field, value)
-                existing.title = title[:100]
-                existing.save()
-                stats.updated += 1
-
-        if not dry_run:
-            for existing in WishItem.objects.filter(obsidian_path=note_rel, is_active=True):
-                if (note_rel, existing.title) not in active_keys:
-                    existing.is_active = False
-                    existing.save(update_fields=["is_active", "updated_at"])
-                    stats.deactivated += 1
+    items: list[tuple[str, dict]] = []
+    for index, row in enumerate(rows, start=1):
+        title = _cell(mapping, row, "标题", "物品", "名称", "title", "item")
+        if not title:
+            stats.skipped += 1
+            continue
+        items.append((title, {
+            "emoji": (_cell(mapping, row, "emoji", "表情") or "✨")[:10],
+            "description": _cell(mapping, row, "描述", "备注", "description", "note")[:500],
+            "price": _as_price(_cell(mapping, row, "价格", "price")),
+            "priority": _normalize_priority(_cell(mapping, row, "优先级", "priority")),
+            "purchase_url": _cell(mapping, row, "购买链接", "链接", "purchase_url", "url")[:800],
+            "obsidian_path": note_rel,
+            "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
+            "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
+        }))
 
+    _upsert_note_rows(
+        WishItem, note_rel, items,
+        key_field="title", max_length=100, scoped_lookup=True, stats=stats, dry_run=dry_run,
+    )
     return stats
 
 
@@ -514,50 +613,30 @@ def _sync_books(vault: Path, note_rel: str, *, dry_run: bool, stdout) -> SyncSta
 
     header, rows = tables[0]
     mapping = _header_map(header)
-    active_keys: set[tuple[str, str]] = set()
-
-    with transaction.atomic():
-        for index, row in enumerate(rows, start=1):
-            title = _cell(mapping, row, "标题", "书名", "title")
-            if not title:
-                stats.skipped += 1
-                continue
-            active_keys.add((note_rel, title))
-            defaults = {
-                "author": _cell(mapping, row, "作者", "author")[:200],
-                "status": _normalize_status(_cell(mapping, row, "状态", "status")),
-                "progress": _as_int(_cell(mapping, row, "进度", "progress"), 0),
-                "rating": _as_int(_cell(mapping, row, "评分", "rating"), 0) or None,
-                "tags": _as_tags(_cell(mapping, row, "标签", "tags")),
-                "review": _cell(mapping, row, "感想", "短评", "review")[:280],
-                "cover": _cell(mapping, row, "封面", "cover")[:500],
-                "info_url": _cell(mapping, row, "信息链接", "豆瓣链接", "info_url", "url")[:800],
-                "obsidian_path": note_rel,
-                "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
-                "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
-            }
-            existing = Book.objects.filter(obsidian_path=note_rel, title=title).first() or Book.objects.filter(title=title).first()
-            if dry_run:
-                stats.updated += int(existing is not None)
-                stats.created += int(existing is None)
-                continue
-            if existing is None:
-                Book.objects.create(title=title[:200], **defaults)
-                stats.created += 1
-            else:
-                for field, value in defaults.items():
-                    setattr(existing, field, value)
-                existing.title = title[:200]
-                existing.save()
-                stats.updated += 1
-
-        if not dry_run:
-            for existing in Book.objects.filter(obsidian_path=note_rel, is_active=True):
-                if (note_rel, existing.title) not in active_keys:
-                    existing.is_active = False
-                    existing.save(update_fields=["is_active", "updated_at"])
-                    stats.deactivated += 1
+    items: list[tuple[str, dict]] = []
+    for index, row in enumerate(rows, start=1):
+        title = _cell(mapping, row, "标题", "书名", "title")
+        if not title:
+            stats.skipped += 1
+            continue
+        items.append((title, {
+            "author": _cell(mapping, row, "作者", "author")[:200],
+            "status": _normalize_status(_cell(mapping, row, "状态", "status")),
+            "progress": _as_int(_cell(mapping, row, "进度", "progress"), 0),
+            "rating": _as_int(_cell(mapping, row, "评分", "rating"), 0) or None,
+            "tags": _as_tags(_cell(mapping, row, "标签", "tags")),
+            "review": _cell(mapping, row, "感想", "短评", "review")[:280],
+            "cover": _cell(mapping, row, "封面", "cover")[:500],
+            "info_url": _cell(mapping, row, "信息链接", "豆瓣链接", "info_url", "url")[:800],
+            "obsidian_path": note_rel,
+            "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
+            "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
+        }))
 
+    _upsert_note_rows(
+        Book, note_rel, items,
+        key_field="title", max_length=200, scoped_lookup=True, stats=stats, dry_run=dry_run,
+    )
     return stats
 
 
@@ -633,50 +712,28 @@ def _sync_games(vault: Path, note_rel: str, *, dry_run: bool, stdout) -> SyncSta
         stdout.write(f"skip games: no checklist items found in {note_rel}")
         return stats
 
-    active_keys: set[tuple[str, str]] = set()
-    with transaction.atomic():
-        for item in items:
-            title = str(item["title"]).strip()
-            if not title:
-                stats.skipped += 1
-                continue
-            active_keys.add((note_rel, title))
-            defaults = {
-                "english_title": str(item["english_title"] or "")[:240],
-                "platform": str(item["platform"] or "Switch")[:60],
-                "status": str(item["status"] or GameItem.Status.WISHLIST),
-                "notes": "",
-                "info_url": "",
-                "source_url": "",
-                "obsidian_path": note_rel,
-                "sort_order": int(item["sort_order"]),
-                "is_active": True,
-            }
-            existing = (
-                GameItem.objects.filter(obsidian_path=note_rel, title=title).first()
-                or GameItem.objects.filter(title=title).first()
-            )
-            if dry_run:
-                stats.updated += int(existing is not None)
-                stats.created += int(existing is None)
-                continue
-            if existing is None:
-                GameItem.objects.create(title=title[:200], **defaults)
-                stats.created += 1
-            else:
-                for field, value in defaults.items():
-                    setattr(existing, field, value)
-                existing.title = title[:200]
-                existing.save()
-                stats.updated += 1
-
-        if not dry_run:
-            for existing in GameItem.objects.filter(obsidian_path=note_rel, is_active=True):
-                if (note_rel, existing.title) not in active_keys:
-                    existing.is_active = False
-                    existing.save(update_fields=["is_active", "updated_at"])
-                    stats.deactivated += 1
+    rows: list[tuple[str, dict]] = []
+    for item in items:
+        title = str(item["title"]).strip()
+        if not title:
+            stats.skipped += 1
+            continue
+        rows.append((title, {
+            "english_title": str(item["english_title"] or "")[:240],
+            "platform": str(item["platform"] or "Switch")[:60],
+            "status": str(item["status"] or GameItem.Status.WISHLIST),
+            "notes": "",
+            "info_url": "",
+            "source_url": "",
+            "obsidian_path": note_rel,
+            "sort_order": int(item["sort_order"]),
+            "is_active": True,
+        }))
 
+    _upsert_note_rows(
+        GameItem, note_rel, rows,
+        key_field="title", max_length=200, scoped_lookup=True, stats=stats, dry_run=dry_run,
+    )
     return stats
 
 
@@ -692,45 +749,64 @@ def _sync_social(vault: Path, note_rel: str, *, dry_run: bool, stdout) -> SyncSt
         stdout.write(f"skip social: no markdown table found in {note_rel}")
         return stats
 
-    with transaction.atomic():
-        for header, rows in tables:
-            mapping = _header_map(header)
-            for row in rows:
-                raw_platform = _cell(mapping, row, "平台", "platform")
-                raw_date = _cell(mapping, row, "日期", "date")
-                platform = _normalize_platform(raw_platform)
-                snapshot_date = _as_date(raw_date)
-                if not platform or snapshot_date is None:
-                    stats.skipped += 1
-                    continue
-                defaults = {
-                    "account_name": _cell(mapping, row, "账号", "账号名", "account_name")[:100],
-                    "followers": _as_int(_cell(mapping, row, "粉丝", "粉丝数", "followers")),
-                    "total_views": _as_int(_cell(mapping, row, "播放", "阅读", "播放/阅读", "累计播放/阅读", "views")),
-                    "total_likes": _as_int(_cell(mapping, row, "点赞", "获赞", "累计获赞", "likes")),
-                    "comments": _as_int(_cell(mapping, row, "评论", "comments")),
-                    "shares": _as_int(_cell(mapping, row, "分享", "shares")),
-                    "posts_count": _as_int(_cell(mapping, row, "内容数", "发文数", "articles", "posts_count")),
-                    "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
-                    "sort_order": _as_int(
-                        _cell(mapping, row, "排序", "sort_order"),
-                        PLATFORM_SORT_ORDER.get(platform, 999),
-                    ),
-                }
-                existing = SocialMediaStat.objects.filter(platform=platform, date=snapshot_date).first()
-                if dry_run:
-                    stats.updated += int(existing is not None)
-                    stats.created += int(existing is None)
-                    continue
-                if existing is None:
-                    SocialMediaStat.objects.create(platform=platform, date=snapshot_date, **defaults)
-                    stats.created += 1
-                else:
-                    for field, value in defaults.items():
-                        setattr(existing, field, value)
-                    existing.save()
-                    stats.updated += 1
+    snapshots: list[tuple[tuple[str, date], dict]] = []
+    for header, rows in tables:
+        mapping = _header_map(header)
+        for row in rows:
+            raw_platform = _cell(mapping, row, "平台", "platform")
+            raw_date = _cell(mapping, row, "日期", "date")
+            platform = _normalize_platform(raw_platform)
+            snapshot_date = _as_date(raw_date)
+            if not platform or snapshot_date is None:
+                stats.skipped += 1
+                continue
+            snapshots.append(((platform, snapshot_date), {
+                "account_name": _cell(mapping, row, "账号", "账号名", "account_name")[:100],
+                "followers": _as_int(_cell(mapping, row, "粉丝", "粉丝数", "followers")),
+                "total_views": _as_int(_cell(mapping, row, "播放", "阅读", "播放/阅读", "累计播放/阅读", "views")),
+                "total_likes": _as_int(_cell(mapping, row, "点赞", "获赞", "累计获赞", "likes")),
+                "comments": _as_int(_cell(mapping, row, "评论", "comments")),
+                "shares": _as_int(_cell(mapping, row, "分享", "shares")),
+                "posts_count": _as_int(_cell(mapping, row, "内容数", "发文数", "articles", "posts_count")),
+                "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
+                "sort_order": _as_int(
+                    _cell(mapping, row, "排序", "sort_order"),
+                    PLATFORM_SORT_ORDER.get(platform, 999),
+                ),
+            }))
+    if not snapshots:
+        return stats
+
+    existing_by_key: dict[tuple[str, date], SocialMediaStat] = {}
+    for existing in SocialMediaStat.objects.filter(
+        platform__in={platform for (platform, _), _ in snapshots},
+        date__in={snapshot_date for (_, snapshot_date), _ in snapshots},
+    ):
+        existing_by_key.setdefault((existing.platform, existing.date), existing)
+
+    creates: list[SocialMediaStat] = []
+    updates: dict[int, SocialMediaStat] = {}
+    fields: set[str] = set()
+    for (platform, snapshot_date), defaults in snapshots:
+        existing = existing_by_key.get((platform, snapshot_date))
+        if existing is None:
+            stats.created += 1
+            if not dry_run:
+                existing_by_key[(platform, snapshot_date)] = SocialMediaStat(
+                    platform=platform, date=snapshot_date, **defaults
+                )
+                creates.append(existing_by_key[(platform, snapshot_date)])
+            continue
+        if not _assign_changed(existing, defaults):
+            stats.unchanged += 1
+            continue
+        stats.updated += 1
+        fields.update(defaults)
+        if existing.pk is not None:
+            updates[existing.pk] = existing
 
+    if not dry_run:
+        _bulk_write(SocialMediaStat, creates, list(updates.values()), sorted(fields), touch=False)
     return stats
 
 
@@ -748,71 +824,177 @@ def _sync_photos(vault: Path, note_rel: str, *, dry_run: bool, stdout) -> SyncSt
 
     header, rows = tables[0]
     mapping = _header_map(header)
-    active_sync_keys: set[str] = set()
+    parsed: list[tuple[int, list[str], str, str, str]] = []
+    for index, row in enumerate(rows, start=1):
+        title = _cell(mapping, row, "标题", "title")
+        image_cell = _cell(mapping, row, "图片", "图片链接", "image", "image_url")
+        if not image_cell:
+            stats.skipped += 1
+            continue
+        sync_key = _cell(mapping, row, "同步键", "sync_key") or _build_photo_sync_key(note_rel, title, image_cell)
+        parsed.append((index, row, title, image_cell, sync_key))
 
-    with transaction.atomic():
-        for index, row in enumerate(rows, start=1):
-            title = _cell(mapping, row, "标题", "title")
-            image_cell = _cell(mapping, row, "图片", "图片链接", "image", "image_url")
-            if not image_cell:
-                stats.skipped += 1
-                continue
+    active_sync_keys = {sync_key for *_, sync_key in parsed}
+    loaded = {
+        photo.pk: photo
+        for photo in PhotoWallImage.objects.filter(Q(sync_key__in=active_sync_keys) | Q(obsidian_path=note_rel))
+    }
+    by_sync_key = {photo.sync_key: photo for photo in loaded.values() if photo.sync_key}
 
-            sync_key = _cell(mapping, row, "同步键", "sync_key") or _build_photo_sync_key(note_rel, title, image_cell)
-            active_sync_keys.add(sync_key)
-            existing = PhotoWallImage.objects.filter(sync_key=sync_key).first()
+    if dry_run:
+        for *_, sync_key in parsed:
+            stats.updated += int(sync_key in by_sync_key)
+            stats.created += int(sync_key not in by_sync_key)
+        return stats
 
-            if dry_run:
-                stats.updated += int(existing is not None)
-                stats.created += int(existing is None)
-                continue
+    resolved: list[tuple[str, dict]] = []
+    upload_paths: dict[str, tuple[Path, str, str]] = {}
+    for index, row, title, image_cell, sync_key in parsed:
+        image_url, auto_source_url, upload_path = _resolve_photo_urls(
+            vault=vault,
+            note_path=note_path,
+            image_cell=image_cell,
+            existing=by_sync_key.get(sync_key),
+            dry_run=dry_run,
+        )
+        manual_source_url = _cell(mapping, row, "来源链接", "source_url", "原图链接")
+        normalized_source_url = _normalize_github_image_url(manual_source_url)[1] if manual_source_url else ""
+        if upload_path is not None:
+            upload_paths[sync_key] = (upload_path, normalized_source_url, manual_source_url)
+        source_url = normalized_source_url or auto_source_url or manual_source_url
+        resolved.append((sync_key, {
+            "title": title[:120],
+            "description": _cell(mapping, row, "描述", "说明", "description"),
+            "image_url": image_url,
+            "source_url": source_url[:800],
+            "captured_at": _as_date(_cell(mapping, row, "拍摄日期", "日期", "captured_at")),
+            "is_public": _as_bool(_cell(mapping, row, "是否公开", "公开", "is_public"), True),
+            "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
+            "obsidian_path": note_rel,
+            "sync_key": sync_key,
+        }))
+
+    # New local images go to the image bed together, as one commit.
+    uploaded = _upload_photo_assets([path for path, _, _ in upload_paths.values()])
+    for sync_key, values in resolved:
+        if sync_key in upload_paths:
+            upload_path, normalized_source_url, manual_source_url = upload_paths[sync_key]
+            image_url, auto_source_url = uploaded[upload_path]
+            values["image_url"] = image_url
+            values["source_url"] = (normalized_source_url or auto_source_url or manual_source_url)[:800]
+
+    # Rows without a sync_key match fall back to an existing photo with the same URL.
+    fallback_image_urls = {values["image_url"] for key, values in resolved if key not in by_sync_key and values["image_url"]}
+    fallback_source_urls = {values["source_url"] for key, values in resolved if key not in by_sync_key and values["source_url"]}
+    by_image_url: dict[str, PhotoWallImage] = {}
+    by_source_url: dict[str, PhotoWallImage] = {}
+    if fallback_image_urls or fallback_source_urls:
+        for photo in PhotoWallImage.objects.filter(
+            Q(image_url__in=fallback_image_urls) | Q(source_url__in=fallback_source_urls)
+        ):
+            photo = loaded.setdefault(photo.pk, photo)
+            by_image_url.setdefault(photo.image_url, photo)
+            if photo.source_url:
+                by_source_url.setdefault(photo.source_url, photo)
+
+    creates: list[PhotoWallImage] = []
+    updates: dict[int, PhotoWallImage] = {}
+    fields: set[str] = set()
+    for sync_key, values in resolved:
+        candidate = by_sync_key.get(sync_key)
+        if candidate is None and values["image_url"]:
+            candidate = by_image_url.get(values["image_url"])
+        if candidate is None and values["source_url"]:
+            candidate = by_source_url.get(values["source_url"])
+
+        if candidate is None:
+            candidate = PhotoWallImage(**values)
+            creates.append(candidate)
+            stats.created += 1
+        elif _assign_changed(candidate, values):
+            stats.updated += 1
+            fields.update(values)
+            if candidate.pk is not None:
+                updates[candidate.pk] = candidate
+        else:
+            stats.unchanged += 1
+        by_sync_key[sync_key] = candidate
+        by_image_url.setdefault(candidate.image_url, candidate)
+        if candidate.source_url:
+            by_source_url.setdefault(candidate.source_url, candidate)
+
+    stale_ids = [
+        photo.pk
+        for photo in loaded.values()
+        if photo.obsidian_path == note_rel
+        and photo.sync_key is not None
+        and photo.sync_key not in active_sync_keys
+        and photo.is_public
+    ]
+    # New photos are staged private and go public together with the stale sweep.
+    publish = [photo for photo in creates if photo.is_public]
+    for photo in publish:
+        photo.is_public = False
+    _bulk_write(PhotoWallImage, creates, list(updates.values()), sorted(fields))
+    if publish or stale_ids:
+        with transaction.atomic(using=content_db_alias()):
+            PhotoWallImage.objects.filter(pk__in=[photo.pk for photo in publish]).update(is_public=True)
+            PhotoWallImage.objects.filter(pk__in=stale_ids).update(is_public=False, updated_at=timezone.now())
+    for photo in publish:
+        photo.is_public = True
+    stats.deactivated += len(stale_ids)
+    return stats
 
-            image_url, auto_source_url = _resolve_photo_urls(
-                vault=vault,
-                note_path=note_path,
-                image_cell=image_cell,
-                existing=existing,
-                dry_run=dry_run,
-            )
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _collect_remote_photos(vault: Path, note_path: Path, note_rel: str, rows, mapping, stats: SyncStats) -> list[_RemotePhoto]:
+    photos: list[_RemotePhoto] = []
+    for index, row in enumerate(rows, start=1):
+        title = _cell(mapping, row, "标题", "title")
+        image_cell = _cell(mapping, row, "图片", "图片链接", "image", "image_url")
+        if not image_cell:
+            stats.skipped += 1
+            continue
+
+        sync_key = _cell(mapping, row, "同步键", "sync_key") or _build_photo_sync_key(note_rel, title, image_cell)
+        captured_at = _as_date(_cell(mapping, row, "拍摄日期", "日期", "captured_at"))
+        payload = {
+            "title": title,
+            "description": _cell(mapping, row, "描述", "说明", "description"),
+            "is_public": "true" if _as_bool(_cell(mapping, row, "是否公开", "公开", "is_public"), True) else "false",
+            "sort_order": str(_as_int(_cell(mapping, row, "排序", "sort_order"), index * 10)),
+            "obsidian_path": note_rel,
+            "sync_key": sync_key,
+        }
+        if captured_at is not None:
+            payload["captured_at"] = captured_at.isoformat()
+        photo = _RemotePhoto(sync_key=sync_key, payload=payload)
+
+        image_ref = _extract_image_reference(image_cell)
+        vault_repo_relative_path = _extract_vault_repo_relative_path(image_ref)
+        normalized_remote_url, derived_source_url = _normalize_github_image_url(image_ref)
+        if vault_repo_relative_path:
+            photo.local_path = _resolve_local_media_path(vault, note_path, vault_repo_relative_path)
+        elif normalized_remote_url.startswith("http://") or normalized_remote_url.startswith("https://"):
             manual_source_url = _cell(mapping, row, "来源链接", "source_url", "原图链接")
             normalized_source_url = _normalize_github_image_url(manual_source_url)[1] if manual_source_url else ""
-            source_url = normalized_source_url or auto_source_url or manual_source_url
-
-            candidate = existing
-            if candidate is None and image_url:
-                candidate = PhotoWallImage.objects.filter(image_url=image_url).first()
-            if candidate is None and source_url:
-                candidate = PhotoWallImage.objects.filter(source_url=source_url).first()
-
-            defaults = {
-                "title": title[:120],
-                "description": _cell(mapping, row, "描述", "说明", "description"),
-                "image_url": image_url,
-                "source_url": source_url[:800],
-                "captured_at": _as_date(_cell(mapping, row, "拍摄日期", "日期", "captured_at")),
-                "is_public": _as_bool(_cell(mapping, row, "是否公开", "公开", "is_public"), True),
-                "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
-                "obsidian_path": note_rel,
-                "sync_key": sync_key,
-            }
-
-            if candidate is None:
-                PhotoWallImage.objects.create(**defaults)
-                stats.created += 1
-            else:
-                for field, value in defaults.items():
-                    setattr(candidate, field, value)
-                candidate.save()
-                stats.updated += 1
-
-        stale_rows = PhotoWallImage.objects.filter(obsidian_path=note_rel).exclude(sync_key__isnull=True).exclude(sync_key__in=active_sync_keys)
-        for stale in stale_rows:
-            if stale.is_public:
-                stale.is_public = False
-                stale.save(update_fields=["is_public", "updated_at"])
-                stats.deactivated += 1
+            payload["image_url"] = normalized_remote_url
+            payload["source_url"] = normalized_source_url or derived_source_url or manual_source_url
+        else:
+            photo.local_path = _resolve_local_media_path(vault, note_path, image_ref)
 
-    return stats
+        if photo.local_path is not None:
+            photo.content_sha256 = _file_sha256(photo.local_path)
+        photo.manifest_item = {**payload, "content_sha256": photo.content_sha256}
+        photos.append(photo)
+    return photos
 
 
 def _sync_photos_remote(
@@ -824,7 +1006,16 @@ def _sync_photos_remote(
     remote_base_url: str,
     remote_token: str,
     request_timeout: int,
+    upload_workers: int = DEFAULT_UPLOAD_WORKERS,
+    upload_attempts: int = DEFAULT_UPLOAD_ATTEMPTS,
 ) -> SyncStats:
+    """Push the photo table to a remote site, uploading only images it has not seen.
+
+    Local images are identified by SHA-256. One manifest request tells us which
+    rows are already current and which hashes are on the image bed, so an
+    unchanged table costs a single round trip; the rest go through a bounded
+    worker pool with retries on transient failures.
+    """
     stats = SyncStats()
     note_path = vault / note_rel
     if not note_path.exists():
@@ -837,73 +1028,87 @@ def _sync_photos_remote(
         return stats
 
     header, rows = tables[0]
-    mapping = _header_map(header)
-    active_sync_keys: list[str] = []
+    photos = _collect_remote_photos(vault, note_path, note_rel, rows, _header_map(header), stats)
     sync_endpoint = _build_remote_url(remote_base_url, "admin/obsidian-sync/photos/")
+    manifest_endpoint = _build_remote_url(remote_base_url, "admin/obsidian-sync/photos/manifest/")
     reconcile_endpoint = _build_remote_url(remote_base_url, "admin/obsidian-sync/photos/reconcile/")
 
-    for index, row in enumerate(rows, start=1):
-        title = _cell(mapping, row, "标题", "title")
-        image_cell = _cell(mapping, row, "图片", "图片链接", "image", "image_url")
-        if not image_cell:
-            stats.skipped += 1
-            continue
-
-        sync_key = _cell(mapping, row, "同步键", "sync_key") or _build_photo_sync_key(note_rel, title, image_cell)
-        active_sync_keys.append(sync_key)
-        captured_at = _as_date(_cell(mapping, row, "拍摄日期", "日期", "captured_at"))
-        payload = {
-            "title": title,
-            "description": _cell(mapping, row, "描述", "说明", "description"),
-            "is_public": "true" if _as_bool(_cell(mapping, row, "是否公开", "公开", "is_public"), True) else "false",
-            "sort_order": str(_as_int(_cell(mapping, row, "排序", "sort_order"), index * 10)),
-            "obsidian_path": note_rel,
-            "sync_key": sync_key,
-            "dry_run": "true" if dry_run else "false",
-        }
-        if captured_at is not None:
-            payload["captured_at"] = captured_at.isoformat()
+    try:
+        manifest = _post_remote_json(
+            manifest_endpoint,
+            remote_token,
+            {
+                "obsidian_path": note_rel,
+                "photos": [photo.manifest_item for photo in photos],
+                "hashes": sorted({photo.content_sha256 for photo in photos if photo.content_sha256}),
+            },
+            request_timeout,
+            retries=upload_attempts - 1,
+        )
+    except CommandError as exc:
+        stdout.write(f"photo manifest unavailable, sending every row: {exc}")
+        manifest = None
+
+    unchanged = set((manifest or {}).get("unchanged") or [])
+    known_hashes: dict[str, dict] = dict((manifest or {}).get("hashes") or {})
+    pending = [photo for photo in photos if photo.sync_key not in unchanged]
+    stats.unchanged += len(photos) - len(pending)
+
+    if dry_run and manifest is not None:
+        existing = set(manifest.get("existing") or [])
+        for photo in pending:
+            stats.updated += int(photo.sync_key in existing)
+            stats.created += int(photo.sync_key not in existing)
+        stats.deactivated += int(manifest.get("stale") or 0)
+        return stats
 
-        image_ref = _extract_image_reference(image_cell)
-        manual_source_url = _cell(mapping, row, "来源链接", "source_url", "原图链接")
-        normalized_source_url = _normalize_github_image_url(manual_source_url)[1] if manual_source_url else ""
-        vault_repo_relative_path = _extract_vault_repo_relative_path(image_ref)
+    def _send(photo: _RemotePhoto) -> dict:
+        payload = {**photo.payload, "dry_run": "true" if dry_run else "false"}
+        known = known_hashes.get(photo.content_sha256) if photo.content_sha256 else None
+        if known:
+            payload.update(image_url=known.get("image_url") or "", source_url=known.get("source_url") or "")
+            payload["content_sha256"] = photo.content_sha256
+        if photo.local_path is None or known:
+            return _post_remote_json(sync_endpoint, remote_token, payload, request_timeout, retries=upload_attempts - 1)
+        return _post_remote_multipart(
+            sync_endpoint,
+            remote_token,
+            payload,
+            file_field_name="image_file",
+            file_name=photo.local_path.name,
+            file_content=photo.local_path.read_bytes(),
+            content_type=mimetypes.guess_type(photo.local_path.name)[0] or "application/octet-stream",
+            timeout_seconds=request_timeout,
+            retries=upload_attempts - 1,
+        )
 
-        if vault_repo_relative_path:
-            local_path = _resolve_local_media_path(vault, note_path, vault_repo_relative_path)
-            file_content = local_path.read_bytes()
-            content_type = mimetypes.guess_type(local_path.name)[0] or "application/octet-stream"
-            response = _post_remote_multipart(
-                sync_endpoint,
-                remote_token,
-                payload,
-                file_field_name="image_file",
-                file_name=local_path.name,
-                file_content=file_content,
-                content_type=content_type,
-                timeout_seconds=request_timeout,
-            )
+    # The first row of each unseen image uploads it; rows sharing that image
+    # wait for its URL so the bytes cross the wire once.
+    uploads: list[_RemotePhoto] = []
+    followers: list[_RemotePhoto] = []
+    uploading: set[str] = set()
+    for photo in pending:
+        if photo.content_sha256 and photo.content_sha256 not in known_hashes:
+            if photo.content_sha256 in uploading:
+                followers.append(photo)
+                continue
+            uploading.add(photo.content_sha256)
+            uploads.append(photo)
         else:
-            normalized_remote_url, derived_source_url = _normalize_github_image_url(image_ref)
-            if normalized_remote_url.startswith("http://") or normalized_remote_url.startswith("https://"):
-                payload["image_url"] = normalized_remote_url
-                payload["source_url"] = normalized_source_url or derived_source_url or manual_source_url
-                response = _post_remote_json(sync_endpoint, remote_token, payload, request_timeout)
-            else:
-                local_path = _resolve_local_media_path(vault, note_path, image_ref)
-                file_content = local_path.read_bytes()
-                content_type = mimetypes.guess_type(local_path.name)[0] or "application/octet-stream"
-                response = _post_remote_multipart(
-                    sync_endpoint,
-                    remote_token,
-                    payload,
-                    file_field_name="image_file",
-                    file_name=local_path.name,
-                    file_content=file_content,
-                    content_type=content_type,
-                    timeout_seconds=request_timeout,
-                )
+            followers.append(photo)
+
+    responses: list[dict] = []
+    with ThreadPoolExecutor(max_workers=max(1, upload_workers)) as pool:
+        for photo, response in zip(uploads, pool.map(_send, uploads)):
+            responses.append(response)
+            if response.get("image_url"):
+                known_hashes[photo.content_sha256] = {
+                    "image_url": response.get("image_url"),
+                    "source_url": response.get("source_url") or "",
+                }
+        responses.extend(pool.map(_send, followers))
 
+    for response in responses:
         action = str(response.get("action") or "")
         if action == "created":
             stats.created += 1
@@ -912,12 +1117,14 @@ def _sync_photos_remote(
         else:
             stats.skipped += 1
 
+    if manifest is not None and not int(manifest.get("stale") or 0):
+        return stats
     reconcile = _post_remote_json(
         reconcile_endpoint,
         remote_token,
         {
             "obsidian_path": note_rel,
-            "active_sync_keys": active_sync_keys,
+            "active_sync_keys": [photo.sync_key for photo in photos],
             "dry_run": dry_run,
         },
         request_timeout,
@@ -940,46 +1147,25 @@ def _sync_quotes(vault: Path, note_rel: str, *, dry_run: bool, stdout) -> SyncSt
 
     header, rows = tables[0]
     mapping = _header_map(header)
-    active_texts: set[str] = set()
-
-    with transaction.atomic():
-        for index, row in enumerate(rows, start=1):
-            text = _cell(mapping, row, "感悟", "文案", "金句", "内容", "text", "quote")
-            if not text:
-                stats.skipped += 1
-                continue
-
-            active_texts.add(text)
-            defaults = {
-                "emphasis": _cell(mapping, row, "高亮", "强调", "emphasis")[:64],
-                "tier": _normalize_quote_tier(_cell(mapping, row, "类型", "tier", "分类")),
-                "source": (_cell(mapping, row, "来源", "source") or "90_网站同步/人生感悟")[:120],
-                "obsidian_path": note_rel,
-                "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
-                "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
-            }
-            existing = WikiQuote.objects.filter(text=text).first()
-            if dry_run:
-                stats.updated += int(existing is not None)
-                stats.created += int(existing is None)
-                continue
-            if existing is None:
-                WikiQuote.objects.create(text=text[:240], **defaults)
-                stats.created += 1
-            else:
-                for field, value in defaults.items():
-                    setattr(existing, field, value)
-                existing.text = text[:240]
-                existing.save()
-                stats.updated += 1
-
-        if not dry_run:
-            for existing in WikiQuote.objects.filter(obsidian_path=note_rel, is_active=True):
-                if existing.text not in active_texts:
-                    existing.is_active = False
-                    existing.save(update_fields=["is_active", "updated_at"])
-                    stats.deactivated += 1
+    items: list[tuple[str, dict]] = []
+    for index, row in enumerate(rows, start=1):
+        text = _cell(mapping, row, "感悟", "文案", "金句", "内容", "text", "quote")
+        if not text:
+            stats.skipped += 1
+            continue
+        items.append((text, {
+            "emphasis": _cell(mapping, row, "高亮", "强调", "emphasis")[:64],
+            "tier": _normalize_quote_tier(_cell(mapping, row, "类型", "tier", "分类")),
+            "source": (_cell(mapping, row, "来源", "source") or "90_网站同步/人生感悟")[:120],
+            "obsidian_path": note_rel,
+            "sort_order": _as_int(_cell(mapping, row, "排序", "sort_order"), index * 10),
+            "is_active": _as_bool(_cell(mapping, row, "是否启用", "启用", "is_active"), True),
+        }))
 
+    _upsert_note_rows(
+        WikiQuote, note_rel, items,
+        key_field="text", max_length=240, scoped_lookup=False, stats=stats, dry_run=dry_run,
+    )
     return stats
 
 
@@ -993,6 +1179,13 @@ class Command(BaseCommand):
         parser.add_argument("--remote-base-url", default=os.environ.get("OBSIDIAN_SYNC_BASE_URL", "https://blog.openingclouds.xyz/api"))
         parser.add_argument("--remote-token-env", default="OBSIDIAN_SYNC_TOKEN")
         parser.add_argument("--request-timeout", type=int, default=30)
+        parser.add_argument(
+            "--upload-workers",
+            type=int,
+            default=int(os.environ.get("OBSIDIAN_PHOTO_UPLOAD_WORKERS", DEFAULT_UPLOAD_WORKERS)),
+            help="Concurrent photo uploads for the remote target",
+        )
+        parser.add_argument("--upload-attempts", type=int, default=DEFAULT_UPLOAD_ATTEMPTS)
         parser.add_argument("--photo-file", default=DEFAULT_PHOTO_FILE)
         parser.add_argument("--social-file", default=DEFAULT_SOCIAL_FILE)
         parser.add_argument("--wish-file", default=DEFAULT_WISH_FILE)
@@ -1052,50 +1245,67 @@ class Command(BaseCommand):
         game_rel = f"{root}/{str(options['game_file']).strip().lstrip('/')}"
 
         self.stdout.write(f"structured sync start: root={root}, target={target}, dry_run={options['dry_run']}")
+        timer = StageTimer()
 
         if not options["skip_wishes"]:
-            stats = _sync_wishes(vault, wish_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            with timer.stage("wishes"):
+                stats = _sync_wishes(vault, wish_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            timer.count("wishes", stats.created + stats.updated + stats.deactivated + stats.unchanged + stats.skipped)
             self.stdout.write(
-                f"wishes: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} skipped={stats.skipped}"
+                f"wishes: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} unchanged={stats.unchanged} skipped={stats.skipped}"
             )
 
         if not options["skip_books"]:
-            stats = _sync_books(vault, book_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            with timer.stage("books"):
+                stats = _sync_books(vault, book_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            timer.count("books", stats.created + stats.updated + stats.deactivated + stats.unchanged + stats.skipped)
             self.stdout.write(
-                f"books: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} skipped={stats.skipped}"
+                f"books: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} unchanged={stats.unchanged} skipped={stats.skipped}"
             )
 
         if not options["skip_games"]:
-            stats = _sync_games(vault, game_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            with timer.stage("games"):
+                stats = _sync_games(vault, game_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            timer.count("games", stats.created + stats.updated + stats.deactivated + stats.unchanged + stats.skipped)
             self.stdout.write(
-                f"games: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} skipped={stats.skipped}"
+                f"games: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} unchanged={stats.unchanged} skipped={stats.skipped}"
             )
 
         if not options["skip_social"]:
-            stats = _sync_social(vault, social_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            with timer.stage("social"):
+                stats = _sync_social(vault, social_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            timer.count("social", stats.created + stats.updated + stats.deactivated + stats.unchanged + stats.skipped)
             self.stdout.write(
-                f"social: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} skipped={stats.skipped}"
+                f"social: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} unchanged={stats.unchanged} skipped={stats.skipped}"
             )
 
         if not options["skip_photos"]:
-            if target == "remote":
-                stats = _sync_photos_remote(
-                    vault,
-                    photo_rel,
-                    dry_run=bool(options["dry_run"]),
-                    stdout=self.stdout,
-                    remote_base_url=remote_base_url,
-                    remote_token=remote_token,
-                    request_timeout=request_timeout,
-                )
-            else:
-                stats = _sync_photos(vault, photo_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            with timer.stage("photos"):
+                if target == "remote":
+                    stats = _sync_photos_remote(
+                        vault,
+                        photo_rel,
+                        dry_run=bool(options["dry_run"]),
+                        stdout=self.stdout,
+                        remote_base_url=remote_base_url,
+                        remote_token=remote_token,
+                        request_timeout=request_timeout,
+                        upload_workers=int(options["upload_workers"]),
+                        upload_attempts=max(1, int(options["upload_attempts"])),
+                    )
+                else:
+                    stats = _sync_photos(vault, photo_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            timer.count("photos", stats.created + stats.updated + stats.deactivated + stats.unchanged + stats.skipped)
             self.stdout.write(
-                f"photos: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} skipped={stats.skipped}"
+                f"photos: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} unchanged={stats.unchanged} skipped={stats.skipped}"
             )
 
         if not options["skip_quotes"]:
-            stats = _sync_quotes(vault, insight_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            with timer.stage("quotes"):
+                stats = _sync_quotes(vault, insight_rel, dry_run=bool(options["dry_run"]), stdout=self.stdout)
+            timer.count("quotes", stats.created + stats.updated + stats.deactivated + stats.unchanged + stats.skipped)
             self.stdout.write(
-                f"quotes: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} skipped={stats.skipped}"
+                f"quotes: created={stats.created} updated={stats.updated} deactivated={stats.deactivated} unchanged={stats.unchanged} skipped={stats.skipped}"
             )
+
+        self.stdout.write(f"stages: {timer.format()}")
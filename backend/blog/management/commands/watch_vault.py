@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import time
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.management.commands.sync_obsidian_collections import (
+    DEFAULT_BOOK_FALLBACK_ROOT,
+    DEFAULT_BOOK_ROOT,
+    DEFAULT_WISH_PATH,
+)
+from blog.management.commands.sync_site_structured import (
+    DEFAULT_BOOK_FILE,
+    DEFAULT_GAME_FILE,
+    DEFAULT_INSIGHT_FILE,
+    DEFAULT_PHOTO_FILE,
+    DEFAULT_SOCIAL_FILE,
+    DEFAULT_SYNC_ROOT,
+    DEFAULT_WISH_FILE,
+)
+from sync.locks import SyncLockBusy, sync_lease
+from sync.scanner import ROOT_ALIAS_MAP
+from sync.watcher import RESCAN, Debouncer, open_watcher
+
+DOMAINS = ("knowledge", "documents", "collections", "structured")
+LEASE_WAIT_SECONDS = 30
+
+# sync_site_structured sections keyed by the folder of their source file.
+STRUCTURED_SECTIONS = {
+    DEFAULT_PHOTO_FILE.split("/", 1)[0]: "photos",
+    DEFAULT_SOCIAL_FILE.split("/", 1)[0]: "social",
+    DEFAULT_WISH_FILE.split("/", 1)[0]: "wishes",
+    DEFAULT_BOOK_FILE.split("/", 1)[0]: "books",
+    DEFAULT_INSIGHT_FILE.split("/", 1)[0]: "quotes",
+    DEFAULT_GAME_FILE.split("/", 1)[0]: "games",
+}
+
+
+def _canonical(path: str) -> str:
+    """Map vault root aliases (``3-Knowledge（知识库）``) onto one spelling."""
+    value = str(path or "").strip().replace("\\", "/").strip("/")
+    head, sep, tail = value.partition("/")
+    group = ROOT_ALIAS_MAP.get(head)
+    if group:
+        head = group[-1]
+    return f"{head}{sep}{tail}"
+
+
+def _under(path: str, root: str) -> bool:
+    root = _canonical(root)
+    return bool(root) and (path == root or path.startswith(root + "/"))
+
+
+def route_changes(
+    paths: set[str],
+    *,
+    knowledge_root: str = "3-Knowledge",
+    structured_root: str = DEFAULT_SYNC_ROOT,
+    collection_roots: tuple[str, ...] = (DEFAULT_BOOK_ROOT, DEFAULT_BOOK_FALLBACK_ROOT, DEFAULT_WISH_PATH),
+) -> dict[str, set[str]]:
+    """Return ``{domain: sections}`` for a batch of vault-relative changed paths.
+
+    An empty section set means the whole domain; ``structured`` lists the
+    ``sync_site_structured`` sections whose source folders changed.
+    """
+    if RESCAN in paths:
+        return {domain: set() for domain in DOMAINS}
+
+    routed: dict[str, set[str]] = {}
+    for raw in paths:
+        is_dir = raw.endswith("/")
+        path = _canonical(raw)
+        if not path:
+            continue
+        markdown = path.lower().endswith(".md") or is_dir
+        if markdown:
+            # the document pool and publish-tag posts scan the whole vault
+            routed.setdefault("documents", set())
+        if _under(path, knowledge_root) and markdown:
+            routed.setdefault("knowledge", set())
+        if any(_under(path, root) for root in collection_roots) and markdown:
+            routed.setdefault("collections", set())
+        if _under(path, structured_root):
+            relative = path[len(_canonical(structured_root)):].strip("/")
+            section = STRUCTURED_SECTIONS.get(relative.split("/", 1)[0])
+            sections = routed.setdefault("structured", set())
+            sections.add(section or "*")
+    if "*" in routed.get("structured", set()):
+        routed["structured"] = set()
+    return routed
+
+
+def _authenticated_repo_url(repo_url: str) -> str:
+    token = os.environ.get("OBSIDIAN_VAULT_GITHUB_TOKEN") or os.environ.get("GITHUB_TOKEN") or ""
+    if token and repo_url.startswith("https://github.com/"):
+        return f"https://x-access-token:{token}@{repo_url[len('https://'):]}"
+    return repo_url
+
+
+def _git(vault: Path, *args: str) -> str:
+    result = subprocess.run(["git", "-C", str(vault), *args], check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = "Watch the Obsidian vault and run incremental syncs for the domains that changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vault", default=os.environ.get("OBSIDIAN_VAULT_PATH", "/app/data/knowledge"))
+        parser.add_argument("--repo-url", default=os.environ.get("OBSIDIAN_VAULT_REPO_URL", ""))
+        parser.add_argument("--repo-branch", default=os.environ.get("OBSIDIAN_VAULT_REPO_BRANCH", "main"))
+        parser.add_argument("--knowledge-root", default="3-Knowledge")
+        parser.add_argument("--structured-root", default=os.environ.get("OBSIDIAN_SITE_SYNC_ROOT", DEFAULT_SYNC_ROOT))
+        parser.add_argument("--publish-tag", default=os.environ.get("OBSIDIAN_DOC_SYNC_PUBLISH_TAG", "publish"))
+        parser.add_argument(
+            "--domains",
+            default=",".join(DOMAINS),
+            help=f"comma separated subset of {', '.join(DOMAINS)}",
+        )
+        parser.add_argument("--debounce", type=float, default=float(os.environ.get("VAULT_WATCH_DEBOUNCE", "3")))
+        parser.add_argument("--max-delay", type=float, default=30.0, help="flush a continuous burst after this many seconds")
+        parser.add_argument(
+            "--pull-interval",
+            type=float,
+            default=float(os.environ.get("VAULT_PULL_INTERVAL", "60")),
+            help="seconds between git fetches of the vault clone; 0 disables pulling",
+        )
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="stat-polling interval without inotify")
+        parser.add_argument("--force-polling", action="store_true")
+        parser.add_argument("--skip-initial-sync", action="store_true")
+        parser.add_argument("--max-batches", type=int, default=0, help="exit after N dispatched batches (0 = run forever)")
+
+    def handle(self, *args, **options):
+        vault = Path(options["vault"]).expanduser()
+        self.repo_url = str(options["repo_url"] or "")
+        self.repo_branch = str(options["repo_branch"] or "main")
+        self.knowledge_root = str(options["knowledge_root"]).strip().strip("/")
+        self.structured_root = str(options["structured_root"]).strip().strip("/")
+        self.publish_tag = str(options["publish_tag"] or "").strip() or "publish"
+        enabled = {item.strip() for item in str(options["domains"]).split(",") if item.strip()}
+        unknown = enabled - set(DOMAINS)
+        if unknown:
+            raise CommandError(f"Unknown domains: {', '.join(sorted(unknown))}")
+        self.enabled = enabled
+
+        pull_interval = float(options["pull_interval"])
+        if pull_interval > 0 and self.repo_url:
+            try:
+                with sync_lease(holder="watch_vault:pull", wait=LEASE_WAIT_SECONDS):
+                    self._pull(vault)
+            except SyncLockBusy as exc:
+                self.stderr.write(f"{exc}; skipping startup pull")
+        vault = vault.resolve()
+        if not vault.is_dir():
+            raise CommandError(f"Invalid vault path: {vault}")
+        self.vault = vault
+
+        watcher = open_watcher(
+            vault,
+            poll_interval=float(options["poll_interval"]),
+            force_polling=bool(options["force_polling"]),
+        )
+        self.stdout.write(f"watching {vault} with {type(watcher).__name__}, domains={','.join(sorted(enabled))}")
+
+        if not options["skip_initial_sync"]:
+            self._locked_dispatch({domain: set() for domain in DOMAINS})
+
+        debouncer = Debouncer(quiet=float(options["debounce"]), max_delay=float(options["max_delay"]))
+        max_batches = int(options["max_batches"])
+        batches = 0
+        next_pull = time.monotonic() + pull_interval
+        try:
+            while True:
+                timeouts = [1.0]
+                pending = debouncer.time_until_ready()
+                if pending is not None:
+                    timeouts.append(pending)
+                if pull_interval > 0 and self.repo_url:
+                    timeouts.append(max(next_pull - time.monotonic(), 0.0))
+                debouncer.add(watcher.wait(min(timeouts)))
+
+                if pull_interval > 0 and self.repo_url and time.monotonic() >= next_pull:
+                    # a fast-forward rewrites files, which the watcher then reports;
+                    # never under a running sync, so skip this round if the lease is taken
+                    try:
+                        with sync_lease(holder="watch_vault:pull"):
+                            self._pull(vault)
+                    except SyncLockBusy:
+                        pass
+                    next_pull = time.monotonic() + pull_interval
+
+                batch = debouncer.pop_ready()
+                if not batch:
+                    continue
+                routed = route_changes(
+                    batch,
+                    knowledge_root=self.knowledge_root,
+                    structured_root=self.structured_root,
+                )
+                self.stdout.write(f"{len(batch)} change(s) -> {', '.join(sorted(routed)) or 'nothing to sync'}")
+                if routed and not self._locked_dispatch(routed):
+                    debouncer.add(batch)
+                    continue
+                batches += 1
+                if max_batches and batches >= max_batches:
+                    return
+        except KeyboardInterrupt:
+            self.stdout.write("watcher stopped")
+        finally:
+            watcher.close()
+
+    def _pull(self, vault: Path) -> None:
+        try:
+            if not (vault / ".git").exists():
+                if vault.exists() and any(vault.iterdir()):
+                    return
+                subprocess.run(
+                    [
+                        "git",
+                        "clone",
+                        "--filter=blob:none",
+                        "--branch",
+                        self.repo_branch,
+                        _authenticated_repo_url(self.repo_url),
+                        str(vault),
+                    ],
+                    check=True,
+                    capture_output=True,
+                )
+                return
+            fetch = ["fetch", "--filter=blob:none"]
+            if _git(vault, "rev-parse", "--is-shallow-repository") == "true":
+                fetch.append("--unshallow")
+            _git(vault, *fetch, "origin", self.repo_branch)
+            if _git(vault, "rev-parse", "HEAD") != _git(vault, "rev-parse", "FETCH_HEAD"):
+                _git(vault, "checkout", "-q", self.repo_branch)
+                _git(vault, "reset", "-q", "--hard", "FETCH_HEAD")
+                self.stdout.write(f"vault updated to {_git(vault, 'rev-parse', '--short', 'HEAD')}")
+        except (OSError, subprocess.CalledProcessError) as exc:
+            stderr = getattr(exc, "stderr", "") or ""
+            if isinstance(stderr, bytes):
+                stderr = stderr.decode("utf-8", errors="replace")
+            self.stderr.write(f"vault pull failed: {stderr.strip() or exc}")
+
+    def _repo_commit(self) -> str:
+        try:
+            return _git(self.vault, "rev-parse", "HEAD")
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    def _locked_dispatch(self, routed: dict[str, set[str]]) -> bool:
+        """Run under the shared vault-sync lease; False when another sync holds it."""
+        try:
+            with sync_lease(holder="watch_vault", wait=LEASE_WAIT_SECONDS):
+                self._dispatch(routed)
+        except SyncLockBusy as exc:
+            self.stderr.write(f"{exc}; batch re-queued")
+            return False
+        return True
+
+    def _dispatch(self, routed: dict[str, set[str]]) -> None:
+        for domain in DOMAINS:
+            if domain not in routed or domain not in self.enabled:
+                continue
+            started = time.monotonic()
+            try:
+                self._run_domain(domain, routed[domain])
+            except Exception as exc:  # noqa: BLE001 - keep watching after a failed sync
+                self.stderr.write(f"{domain} sync failed: {exc}")
+                continue
+            self.stdout.write(f"{domain} sync finished in {time.monotonic() - started:.1f}s")
+
+    def _run_domain(self, domain: str, sections: set[str]) -> None:
+        vault = str(self.vault)
+        if domain == "knowledge":
+            knowledge_root = self.vault / self.knowledge_root
+            if knowledge_root.is_dir():
+                call_command("sync_knowledge_github", "--local-root", str(knowledge_root))
+        elif domain == "documents":
+            call_command("sync_obsidian", vault, "--mode", "overwrite", "--publish-tag", self.publish_tag)
+            call_command(
+                "sync_obsidian_documents",
+                vault,
+                "--trigger",
+                "scheduled",
+                "--auto-update-published",
+                "--publish-tag",
+                self.publish_tag,
+                "--repo-url",
+                self.repo_url,
+                "--repo-branch",
+                self.repo_branch,
+                "--repo-commit",
+                self._repo_commit(),
+            )
+        elif domain == "collections":
+            call_command(
+                "sync_obsidian_collections",
+                "--vault",
+                vault,
+                "--repo-url",
+                self.repo_url,
+                "--repo-branch",
+                self.repo_branch,
+            )
+        elif domain == "structured":
+            structured_args = ["--vault", vault, "--root", self.structured_root]
+            if sections:
+                for section in sorted(set(STRUCTURED_SECTIONS.values()) - sections):
+                    structured_args.append(f"--skip-{section}")
+            call_command("sync_site_structured", *structured_args)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0052_gameitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncJobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job', models.CharField(db_index=True, max_length=80)),
+                ('command', models.CharField(blank=True, max_length=500)),
+                ('attempt', models.PositiveSmallIntegerField(default=1)),
+                ('status', models.CharField(choices=[('success', '成功'), ('failed', '失败'), ('timeout', '超时'), ('busy', '锁占用')], default='success', max_length=20)),
+                ('exit_code', models.IntegerField(blank=True, null=True)),
+                ('output', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': '同步任务运行',
+                'verbose_name_plural': '同步任务运行',
+                'ordering': ['-started_at', '-id'],
+            },
+        ),
+    ]
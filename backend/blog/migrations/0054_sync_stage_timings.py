@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-19 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0053_syncjobrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='obsidiansyncrun',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='synclog',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
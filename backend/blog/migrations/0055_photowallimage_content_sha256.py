@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0054_sync_stage_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photowallimage',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
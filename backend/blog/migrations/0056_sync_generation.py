@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0055_photowallimage_content_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='sync_generation',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='obsidiandocument',
+            name='sync_generation',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='sync_generation',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='wishitem',
+            name='sync_generation',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
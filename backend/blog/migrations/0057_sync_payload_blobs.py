@@ -0,0 +1,50 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0056_sync_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncPayloadBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': '同步载荷块',
+                'verbose_name_plural': '同步载荷块',
+            },
+        ),
+        migrations.AlterField(
+            model_name='synclog',
+            name='started_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.CreateModel(
+            name='SyncLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('source', models.CharField(choices=[('api', 'API'), ('command', 'Command')], max_length=20)),
+                ('action', models.CharField(choices=[('created', '创建'), ('updated', '更新'), ('skipped', '跳过'), ('failed', '失败')], max_length=20)),
+                ('status', models.CharField(choices=[('success', '成功'), ('failed', '失败'), ('dry_run', '预演')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('duration_ms', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': '同步日志汇总',
+                'verbose_name_plural': '同步日志汇总',
+                'ordering': ['-day', 'source', 'action', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'source', 'action', 'status'), name='uniq_sync_log_rollup')],
+            },
+        ),
+    ]
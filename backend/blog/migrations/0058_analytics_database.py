@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0057_sync_payload_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postlike',
+            name='post',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='like_record', to='blog.post'),
+        ),
+        migrations.AlterField(
+            model_name='postlikevote',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='like_votes', to='blog.post'),
+        ),
+        migrations.AlterField(
+            model_name='postview',
+            name='post',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='view_record', to='blog.post'),
+        ),
+    ]
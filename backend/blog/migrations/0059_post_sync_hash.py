@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0058_analytics_database'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='sync_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -41,6 +41,9 @@ class Post(TimeStampedModel):
         choices=SyncSource.choices,
         default=SyncSource.MANUAL,
     )
+    sync_generation = models.BigIntegerField(default=0, db_index=True, editable=False)
+    # Digest of the last Obsidian payload written (sync.service.sync_payload_hash).
+    sync_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
 
     class Meta:
         ordering = ["-created_at"]
@@ -68,8 +71,10 @@ class Post(TimeStampedModel):
         return 0
 
 
+# PostView, PostLike and PostLikeVote live in the analytics database (blog.routers):
+# no database-level foreign key to Post, and Post deletion cleans them up in blog.signals.
 class PostView(models.Model):
-    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name="view_record")
+    post = models.OneToOneField(Post, on_delete=models.DO_NOTHING, db_constraint=False, related_name="view_record")
     views = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -83,7 +88,7 @@ class PostView(models.Model):
 
 
 class PostLike(models.Model):
-    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name="like_record")
+    post = models.OneToOneField(Post, on_delete=models.DO_NOTHING, db_constraint=False, related_name="like_record")
     likes = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -97,7 +102,7 @@ class PostLike(models.Model):
 
 
 class PostLikeVote(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="like_votes")
+    post = models.ForeignKey(Post, on_delete=models.DO_NOTHING, db_constraint=False, related_name="like_votes")
     ip_hash = models.CharField(max_length=64, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -392,6 +397,7 @@ class PhotoWallImage(TimeStampedModel):
     source_url = models.URLField(max_length=800, blank=True)
     obsidian_path = models.CharField(max_length=500, blank=True, db_index=True)
     sync_key = models.CharField(max_length=64, null=True, blank=True, unique=True)
+    content_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     captured_at = models.DateField(null=True, blank=True)
     width = models.PositiveIntegerField(null=True, blank=True)
     height = models.PositiveIntegerField(null=True, blank=True)
@@ -463,6 +469,7 @@ class ObsidianDocument(TimeStampedModel):
         blank=True,
         related_name="obsidian_documents",
     )
+    sync_generation = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ["-last_indexed_at", "vault_path"]
@@ -496,6 +503,7 @@ class ObsidianSyncRun(TimeStampedModel):
     started_at = models.DateTimeField()
     finished_at = models.DateTimeField()
     duration_ms = models.PositiveIntegerField(default=0)
+    stage_timings = models.JSONField(default=dict, blank=True)
     message = models.TextField(blank=True)
     operator = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -544,11 +552,13 @@ class SyncLog(TimeStampedModel):
     action = models.CharField(max_length=20, choices=Action.choices, default=Action.CREATED)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.SUCCESS)
     message = models.TextField(blank=True)
+    # Large values are stored as {"$blob": sha256} references into SyncPayloadBlob; see sync.payload_store.
     payload = models.JSONField(default=dict, blank=True)
     result = models.JSONField(default=dict, blank=True)
-    started_at = models.DateTimeField()
+    started_at = models.DateTimeField(db_index=True)
     finished_at = models.DateTimeField()
     duration_ms = models.PositiveIntegerField(default=0)
+    stage_timings = models.JSONField(default=dict, blank=True)
     operator = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -566,6 +576,67 @@ class SyncLog(TimeStampedModel):
         return f"{self.slug or '-'} [{self.source}/{self.mode}] {self.status}"
 
 
+class SyncPayloadBlob(models.Model):
+    digest = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "同步载荷块"
+        verbose_name_plural = "同步载荷块"
+
+    def __str__(self) -> str:
+        return f"{self.digest[:12]} ({self.size} B)"
+
+
+class SyncLogRollup(models.Model):
+    day = models.DateField()
+    source = models.CharField(max_length=20, choices=SyncLog.Source.choices)
+    action = models.CharField(max_length=20, choices=SyncLog.Action.choices)
+    status = models.CharField(max_length=20, choices=SyncLog.Status.choices)
+    count = models.PositiveIntegerField(default=0)
+    duration_ms = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-day", "source", "action", "status"]
+        verbose_name = "同步日志汇总"
+        verbose_name_plural = "同步日志汇总"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "source", "action", "status"], name="uniq_sync_log_rollup"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} [{self.source}/{self.action}] {self.status} x{self.count}"
+
+
+class SyncJobRun(TimeStampedModel):
+    class Status(models.TextChoices):
+        SUCCESS = "success", "成功"
+        FAILED = "failed", "失败"
+        TIMEOUT = "timeout", "超时"
+        BUSY = "busy", "锁占用"
+
+    job = models.CharField(max_length=80, db_index=True)
+    command = models.CharField(max_length=500, blank=True)
+    attempt = models.PositiveSmallIntegerField(default=1)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.SUCCESS)
+    exit_code = models.IntegerField(null=True, blank=True)
+    output = models.TextField(blank=True)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-started_at", "-id"]
+        verbose_name = "同步任务运行"
+        verbose_name_plural = "同步任务运行"
+
+    def __str__(self) -> str:
+        return f"{self.job} #{self.attempt} {self.get_status_display()}"
+
+
 class SiteVisit(models.Model):
     path = models.CharField(max_length=500, db_index=True)
     referrer = models.URLField(max_length=1000, blank=True)
@@ -746,6 +817,7 @@ class WishItem(TimeStampedModel):
     ai_context = models.JSONField(default=dict, blank=True, verbose_name="AI 补全上下文")
     sort_order = models.PositiveIntegerField(default=0, db_index=True)
     is_active = models.BooleanField(default=True)
+    sync_generation = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ["sort_order", "-priority"]
@@ -779,6 +851,7 @@ class Book(TimeStampedModel):
     )
     sort_order = models.PositiveIntegerField(default=0, db_index=True)
     is_active = models.BooleanField(default=True)
+    sync_generation = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ["sort_order", "-updated_at"]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from django.db import DEFAULT_DB_ALIAS
+
+from sync.shadow import PUBLISHED_MODELS, SHADOW_DB, active_shadow_alias
+
+ANALYTICS_DB = "analytics"
+# High-churn engagement tables; every public view/like/visit writes one of these.
+ANALYTICS_MODELS = frozenset({"postview", "postlike", "postlikevote", "homelike", "homelikevote", "sitevisit"})
+
+
+def is_analytics_model(model) -> bool:
+    return model._meta.app_label == "blog" and model._meta.model_name in ANALYTICS_MODELS
+
+
+class AnalyticsRouter:
+    """Keep engagement tables in their own SQLite file so their WAL writer lock
+    never serializes against content edits and syncs.
+
+    Joins between the two files are impossible: content queries read
+    engagement through ``prefetch_related`` or a separate query instead of
+    ``select_related`` / ``view_record__`` lookups.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_analytics_model(model):
+            return ANALYTICS_DB
+        return self._content_db(hints)
+
+    def db_for_write(self, model, **hints):
+        if is_analytics_model(model):
+            return ANALYTICS_DB
+        return self._content_db(hints)
+
+    @staticmethod
+    def _content_db(hints):
+        # Without an answer Django reads a related object from its instance's
+        # database, so ``view.post`` (and its prefetch) would query analytics.
+        instance = hints.get("instance")
+        if instance is not None and is_analytics_model(type(instance)):
+            return active_shadow_alias() or DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_analytics_model(type(obj1)) or is_analytics_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == "blog" and model_name in ANALYTICS_MODELS:
+            return db == ANALYTICS_DB
+        if db == ANALYTICS_DB:
+            # Content tables, contrib apps and data migrations (no model_name) stay in default.
+            return False
+        return None
+
+
+class ShadowBuildRouter:
+    """While ``sync.shadow.staged_publish`` runs, send published content queries to the shadow copy.
+
+    Only ``sync.shadow.PUBLISHED_MODELS`` are copied back to live, so every
+    other table (users, sessions, barrage, scheduler and sync runs, logs) keeps
+    reading and writing live; engagement stays in analytics.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._shadow_db(model)
+
+    def db_for_write(self, model, **hints):
+        return self._shadow_db(model)
+
+    @staticmethod
+    def _shadow_db(model):
+        alias = active_shadow_alias()
+        if alias is None or is_analytics_model(model):
+            return None
+        # Explicit, or a row related to a shadow-read instance would follow it into the copy.
+        return alias if model._meta.label in PUBLISHED_MODELS else DEFAULT_DB_ALIAS
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The shadow is a backup of a migrated default database.
+        return False if db == SHADOW_DB else None
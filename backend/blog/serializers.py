@@ -762,6 +762,7 @@ class AdminObsidianPhotoSyncRequestSerializer(serializers.Serializer):
     sort_order = serializers.IntegerField(required=False, default=0, min_value=0)
     obsidian_path = serializers.CharField(required=False, allow_blank=True, default="")
     sync_key = serializers.CharField(required=False, allow_blank=True, default="")
+    content_sha256 = serializers.RegexField(r"^[0-9a-f]{64}$", required=False, allow_blank=True, default="")
     dry_run = serializers.BooleanField(required=False, default=False)
 
     def validate(self, attrs):
@@ -784,6 +785,26 @@ class AdminObsidianPhotoSyncRequestSerializer(serializers.Serializer):
         return attrs
 
 
+class AdminObsidianPhotoManifestItemSerializer(serializers.Serializer):
+    sync_key = serializers.CharField()
+    title = serializers.CharField(required=False, allow_blank=True, default="")
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    image_url = serializers.CharField(required=False, allow_blank=True, default="")
+    source_url = serializers.CharField(required=False, allow_blank=True, default="")
+    content_sha256 = serializers.RegexField(r"^[0-9a-f]{64}$", required=False, allow_blank=True, default="")
+    captured_at = serializers.DateField(required=False, allow_null=True, default=None)
+    is_public = serializers.BooleanField(required=False, default=True)
+    sort_order = serializers.IntegerField(required=False, default=0, min_value=0)
+
+
+class AdminObsidianPhotoManifestRequestSerializer(serializers.Serializer):
+    obsidian_path = serializers.CharField()
+    photos = AdminObsidianPhotoManifestItemSerializer(many=True, required=False, default=list)
+    hashes = serializers.ListField(
+        child=serializers.RegexField(r"^[0-9a-f]{64}$"), required=False, default=list
+    )
+
+
 class AdminObsidianPhotoReconcileRequestSerializer(serializers.Serializer):
     obsidian_path = serializers.CharField()
     active_sync_keys = serializers.ListField(child=serializers.CharField(), default=list)
@@ -802,6 +823,7 @@ class AdminObsidianSyncRequestSerializer(serializers.Serializer):
     obsidian_path = serializers.CharField(required=False, allow_blank=True)
     mode = serializers.ChoiceField(choices=["overwrite", "skip", "merge"], default="overwrite")
     dry_run = serializers.BooleanField(required=False, default=False)
+    sync_generation = serializers.IntegerField(required=False, min_value=1)
 
     def validate(self, attrs):
         title = str(attrs.get("title") or "").strip()
@@ -838,6 +860,48 @@ class AdminObsidianReconcileRequestSerializer(serializers.Serializer):
     scope_prefixes = serializers.ListField(child=serializers.CharField(), required=False, default=list)
     behavior = serializers.ChoiceField(choices=["draft", "delete", "none"], default="draft")
     dry_run = serializers.BooleanField(required=False, default=False)
+    sync_generation = serializers.IntegerField(required=False, min_value=1)
+
+
+# Notes per bulk sync request; the client also caps a batch by its uncompressed size.
+BULK_SYNC_MAX_ITEMS = 100
+
+
+class AdminObsidianManifestItemSerializer(serializers.Serializer):
+    obsidian_path = serializers.CharField()
+    content_hash = serializers.RegexField(r"^[0-9a-f]{64}$")
+
+
+class AdminObsidianSessionReconcileSerializer(serializers.Serializer):
+    # Omitted on the manifest request, where it defaults to the manifest's paths.
+    published_paths = serializers.ListField(child=serializers.CharField(), required=False)
+    scope_prefixes = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    behavior = serializers.ChoiceField(choices=["draft", "delete", "none"], default="draft")
+
+
+class AdminObsidianManifestRequestSerializer(serializers.Serializer):
+    items = AdminObsidianManifestItemSerializer(many=True, required=False, default=list)
+    mode = serializers.ChoiceField(choices=["overwrite", "skip", "merge"], default="overwrite")
+    dry_run = serializers.BooleanField(required=False, default=False)
+    sync_generation = serializers.IntegerField(required=False, min_value=1)
+    # Ask the server to issue the session's generation instead of trusting the client's clock.
+    new_generation = serializers.BooleanField(required=False, default=False)
+    reconcile = AdminObsidianSessionReconcileSerializer(required=False)
+
+
+class AdminObsidianBulkSyncRequestSerializer(serializers.Serializer):
+    # Items are validated one by one with AdminObsidianSyncRequestSerializer so one bad note fails alone.
+    items = serializers.ListField(child=serializers.DictField(), required=False, default=list, max_length=BULK_SYNC_MAX_ITEMS)
+    mode = serializers.ChoiceField(choices=["overwrite", "skip", "merge"], default="overwrite")
+    dry_run = serializers.BooleanField(required=False, default=False)
+    sync_generation = serializers.IntegerField(required=False, min_value=1)
+    reconcile = AdminObsidianSessionReconcileSerializer(required=False)
+
+    def validate(self, attrs):
+        # A batch only carries some notes, so without a generation sweep it cannot stand in for the published set.
+        if "reconcile" in attrs and not attrs.get("sync_generation") and "published_paths" not in attrs["reconcile"]:
+            raise serializers.ValidationError({"reconcile": "批量同步的 reconcile 必须提供 sync_generation 或 published_paths"})
+        return attrs
 
 
 class AdminObsidianReconcileResponseSerializer(serializers.Serializer):
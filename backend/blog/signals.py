@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from django.db import DEFAULT_DB_ALIAS
+
+
+def delete_engagement_for_posts(post_ids) -> None:
+    from .models import PostLike, PostLikeVote, PostView
+
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    for model in (PostView, PostLike, PostLikeVote):
+        model.objects.filter(post_id__in=post_ids).delete()
+
+
+def delete_post_engagement(sender, instance, using=DEFAULT_DB_ALIAS, **_kwargs):
+    """Replace the cascade a cross-database foreign key cannot have.
+
+    Deletes inside a staged build only touch the shadow copy; ``sync.shadow.publish_shadow``
+    cleans up engagement once the build is actually published.
+    """
+    if using != DEFAULT_DB_ALIAS:
+        return
+    delete_engagement_for_posts([instance.pk])
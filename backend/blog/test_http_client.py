@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from sync.http_client import HttpClient, HttpError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._dispatch(b"")
+
+    def do_POST(self):
+        self._dispatch(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+
+    def _dispatch(self, body: bytes):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path, self.client_address[1], body))
+            scripted = server.script.pop(0) if server.script else (200, {})
+        status, headers = scripted
+        data = json.dumps({"path": self.path}).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if server.drop_after_response:
+            # Close without announcing it, like a server reaping idle keep-alive sockets.
+            self.close_connection = True
+
+    def log_message(self, format, *args):  # noqa: A002
+        return None
+
+
+class HttpClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.script = []
+        self.server.drop_after_response = False
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.sleeps: list[float] = []
+        self.now = 1_000_000.0
+        self.client = HttpClient(proxies={}, sleep=self.sleeps.append, clock=lambda: self.now)
+        self.addCleanup(self.client.close)
+
+    def test_requests_to_one_host_share_a_keep_alive_connection(self):
+        for index in range(3):
+            response = self.client.request("GET", f"{self.base}/item/{index}")
+            self.assertEqual(response.json(), {"path": f"/item/{index}"})
+
+        self.assertEqual(len({port for _, _, port, _ in self.server.requests}), 1)
+        metrics = self.client.metrics()
+        self.assertEqual((metrics["opened"], metrics["reused"]), (1, 2))
+        self.assertEqual(metrics["hosts"]["127.0.0.1"]["count"], 3)
+
+    def test_retry_after_is_honored_and_the_body_is_resent(self):
+        self.server.script = [(503, {"Retry-After": "7"}), (200, {})]
+        response = self.client.request("POST", f"{self.base}/sync/", payload={"title": "标题"})
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.attempts, 2)
+        self.assertEqual(self.sleeps, [7.0])
+        bodies = [json.loads(body) for _, _, _, body in self.server.requests]
+        self.assertEqual(bodies, [{"title": "标题"}, {"title": "标题"}])
+
+    def test_exhausted_rate_limit_waits_for_reset_or_gives_up(self):
+        reset = int(self.now) + 20
+        self.server.script = [(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)})]
+        self.client.request("GET", f"{self.base}/first")
+        self.client.request("GET", f"{self.base}/second")
+        self.assertEqual(self.sleeps, [21.0])
+
+        self.server.script = [(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset + 3600)})]
+        self.client.request("GET", f"{self.base}/third")
+        with self.assertRaises(HttpError):
+            self.client.request("GET", f"{self.base}/fourth")
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.client.rate_limit("127.0.0.1"), (0, reset + 3600))
+
+    def test_connection_closed_by_server_is_not_reused(self):
+        self.server.drop_after_response = True
+        self.client.request("GET", f"{self.base}/first")
+        time.sleep(0.05)
+        response = self.client.request("GET", f"{self.base}/second")
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.client.opened, 2)
+        self.assertEqual(self.client.retried, 0)
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import unquote, urlsplit
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from blog.image_bed import _Base64JsonBody, upload_photo_to_obsidian_images, upload_photos_to_obsidian_images
+
+REPO_PREFIX = "/repos/hqy2020/obsidian-images/"
+
+
+class FakeGitHub:
+    """In-memory stand-in for the parts of the GitHub contents and Git Data APIs the image bed uses."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.blobs: dict[str, bytes] = {}
+        self.trees: dict[str, dict[str, str]] = {"tree-0": {}}
+        self.commits: dict[str, tuple[str, list[str]]] = {"commit-0": ("tree-0", [])}
+        self.head = "commit-0"
+        self.requests: list[tuple[str, str]] = []
+        self.race_next_ref_update = False
+
+    def files(self) -> dict[str, bytes]:
+        return {path: self.blobs[sha] for path, sha in self.trees[self.commits[self.head][0]].items()}
+
+    def _store_blob(self, content: bytes) -> str:
+        sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+        self.blobs[sha] = content
+        return sha
+
+    def _store_tree(self, base: str, entries: dict[str, str]) -> str:
+        sha = f"tree-{len(self.trees)}"
+        self.trees[sha] = {**self.trees.get(base, {}), **entries}
+        return sha
+
+    def _store_commit(self, tree: str, parents: list[str]) -> str:
+        sha = f"commit-{len(self.commits)}"
+        self.commits[sha] = (tree, parents)
+        return sha
+
+    def handle(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        self.requests.append((method, path))
+        head_tree = self.commits[self.head][0]
+        if path.startswith("contents/"):
+            file_path = unquote(path.removeprefix("contents/"))
+            if method == "GET":
+                sha = self.trees[head_tree].get(file_path)
+                return (200, {"path": file_path, "sha": sha}) if sha else (404, {"message": "Not Found"})
+            if file_path in self.trees[head_tree]:
+                return 422, {"message": "sha wasn't supplied"}
+            sha = self._store_blob(base64.b64decode(body["content"]))
+            self.head = self._store_commit(self._store_tree(head_tree, {file_path: sha}), [self.head])
+            return 201, {"content": {"path": file_path, "sha": sha}}
+        if path == "git/blobs":
+            return 201, {"sha": self._store_blob(base64.b64decode(body["content"]))}
+        if path == "git/ref/heads/main":
+            return 200, {"object": {"sha": self.head}}
+        if path.startswith("git/commits/"):
+            return 200, {"tree": {"sha": self.commits[path.removeprefix("git/commits/")][0]}}
+        if path == "git/trees":
+            return 201, {"sha": self._store_tree(body["base_tree"], {item["path"]: item["sha"] for item in body["tree"]})}
+        if path == "git/commits":
+            return 201, {"sha": self._store_commit(body["tree"], body["parents"])}
+        if path == "git/refs/heads/main":
+            if self.race_next_ref_update:
+                self.race_next_ref_update = False
+                other = self._store_blob(b"pushed-elsewhere")
+                self.head = self._store_commit(self._store_tree(head_tree, {"elsewhere.txt": other}), [self.head])
+            if self.commits[body["sha"]][1] != [self.head]:
+                return 422, {"message": "Update is not a fast forward"}
+            self.head = body["sha"]
+            return 200, {"object": {"sha": self.head}}
+        return 404, {"message": "Not Found"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        path = urlsplit(self.path).path.removeprefix(REPO_PREFIX)
+        with self.server.github.lock:
+            status, payload = self.server.github.handle(self.command, path, json.loads(raw) if raw else {})
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = _dispatch
+
+    def log_message(self, format, *args):  # noqa: A002
+        return None
+
+
+class ImageBedTests(SimpleTestCase):
+    def setUp(self):
+        self.github = FakeGitHub()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.github = self.github
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.settings_override = override_settings(
+            OBSIDIAN_IMAGES_GITHUB_TOKEN="image-token",
+            OBSIDIAN_IMAGES_REPO_PREFIX="gallery",
+            OBSIDIAN_IMAGES_API_BASE=f"http://127.0.0.1:{self.server.server_port}",
+            SYNC_CACHE_DIR=Path(cache_dir.name),
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def _reset_index(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        override = override_settings(SYNC_CACHE_DIR=Path(cache_dir.name))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_single_upload_is_content_addressed_and_deduplicated(self):
+        digest = hashlib.sha256(b"photo-bytes").hexdigest()
+        first = upload_photo_to_obsidian_images(SimpleUploadedFile("a.jpg", b"photo-bytes"))
+        self.assertEqual(first.path, f"gallery/sha256/{digest[:2]}/{digest}.jpg")
+        self.assertEqual(self.github.files()[first.path], b"photo-bytes")
+        self.assertEqual([method for method, _ in self.github.requests], ["GET", "PUT"])
+
+        self.github.requests.clear()
+        self.assertEqual(upload_photo_to_obsidian_images(SimpleUploadedFile("b.jpg", b"photo-bytes")), first)
+        self.assertEqual(self.github.requests, [])
+
+        self._reset_index()
+        again = upload_photo_to_obsidian_images(SimpleUploadedFile("c.jpg", b"photo-bytes"))
+        self.assertEqual(again.image_url, first.image_url)
+        self.assertEqual([method for method, _ in self.github.requests], ["GET"])
+
+    def test_batch_upload_creates_one_commit(self):
+        results = upload_photos_to_obsidian_images(
+            [
+                SimpleUploadedFile("a.png", b"first"),
+                SimpleUploadedFile("b.png", b"second"),
+                SimpleUploadedFile("copy.png", b"first"),
+            ],
+            operator="tester",
+        )
+
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(len(self.github.commits), 2)
+        self.assertEqual({self.github.files()[result.path] for result in results}, {b"first", b"second"})
+        methods = [method for method, path in self.github.requests if path == "git/blobs"]
+        self.assertEqual(methods, ["POST", "POST"])
+        self.assertNotIn("PUT", {method for method, _ in self.github.requests})
+
+        self._reset_index()
+        self.github.requests.clear()
+        self.assertEqual(
+            upload_photos_to_obsidian_images([SimpleUploadedFile("b.png", b"second")])[0].path,
+            results[1].path,
+        )
+        self.assertEqual([method for method, _ in self.github.requests], ["GET"])
+
+    def test_index_is_read_once_per_batch_and_reused_until_it_changes(self):
+        first = upload_photos_to_obsidian_images([SimpleUploadedFile("a.png", b"first")])
+        uploads = [SimpleUploadedFile(f"{n}.png", b"first") for n in range(5)]
+
+        with patch.object(Path, "read_text", autospec=True, side_effect=Path.read_text) as read_text:
+            self.github.requests.clear()
+            self.assertEqual(upload_photos_to_obsidian_images(uploads), first * 5)
+            self.assertEqual(self.github.requests, [])
+            self.assertEqual(read_text.call_count, 1)
+
+            upload_photo_to_obsidian_images(SimpleUploadedFile("again.png", b"first"))
+            self.assertEqual(read_text.call_count, 1)
+
+            upload_photos_to_obsidian_images([SimpleUploadedFile("b.png", b"second")])
+            (second,) = upload_photos_to_obsidian_images([SimpleUploadedFile("c.png", b"second")])
+            self.assertEqual(read_text.call_count, 2)
+        self.assertEqual(self.github.files()[second.path], b"second")
+
+    def test_batch_upload_retries_when_branch_moves(self):
+        self.github.race_next_ref_update = True
+        (result,) = upload_photos_to_obsidian_images([SimpleUploadedFile("a.webp", b"racing")])
+
+        files = self.github.files()
+        self.assertEqual(files[result.path], b"racing")
+        self.assertIn("elsewhere.txt", files)
+
+    def test_streamed_body_matches_json_encoding(self):
+        content = bytes(range(256)) * 5000
+        body = _Base64JsonBody({"message": "m"}, io.BytesIO(content), len(content))
+        chunks = []
+        while chunk := body.read(8192):
+            chunks.append(chunk)
+        raw = b"".join(chunks)
+
+        self.assertEqual(len(raw), body.length)
+        self.assertEqual(json.loads(raw), {"message": "m", "content": base64.b64encode(content).decode("ascii")})
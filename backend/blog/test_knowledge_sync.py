@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+
+from blog.management.commands.sync_knowledge_github import (
+    GitHubClient,
+    KnowledgeCache,
+    RemoteFile,
+    git_blob_sha,
+)
+from blog.models import KnowledgeEdge, KnowledgeNode
+from sync import git_history
+from sync.git_history import load_git_history
+from sync.http_client import HttpClient
+from sync.markdown import analyze_markdown
+from sync.parser import build_excerpt
+from sync.wikilinks import WikilinkIndex
+
+
+def _write(path: Path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content.strip() + "\n", encoding="utf-8")
+
+
+def _commit(repo: Path, message: str, when: str):
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "t",
+        "GIT_AUTHOR_EMAIL": "t@example.com",
+        "GIT_COMMITTER_NAME": "t",
+        "GIT_COMMITTER_EMAIL": "t@example.com",
+        "GIT_AUTHOR_DATE": when,
+        "GIT_COMMITTER_DATE": when,
+    }
+    subprocess.run(["git", "-C", str(repo), "add", "-A"], check=True, env=env)
+    subprocess.run(["git", "-C", str(repo), "commit", "-q", "-m", message], check=True, env=env)
+
+
+def _init_repo(repo: Path):
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+
+
+class _FakeGitHub:
+    """Canned GitHub API responses; records every path requested."""
+
+    def __init__(self, blobs: dict[str, bytes]):
+        self.blobs = blobs
+        self.calls: list[str] = []
+        self.fail_once: set[str] = set()
+
+    def handle(self, path: str, headers) -> tuple[int, object, dict[str, str]]:
+        self.calls.append(path)
+        if path in self.fail_once:
+            self.fail_once.discard(path)
+            return 502, None, {}
+        if "/git/trees/" in path:
+            if headers.get("If-None-Match") == '"tree-v1"':
+                return 304, None, {"ETag": '"tree-v1"'}
+            tree = [{"type": "blob", "path": f"3-Knowledge/{sha}.md", "sha": sha} for sha in self.blobs]
+            return 200, {"tree": tree}, {"ETag": '"tree-v1"', "X-RateLimit-Remaining": "4999"}
+        if "/git/blobs/" in path:
+            sha = path.rsplit("/", 1)[-1]
+            return 200, {"encoding": "base64", "content": base64.b64encode(self.blobs[sha]).decode("ascii")}, {}
+        return 404, {"message": "Not Found"}, {}
+
+
+class _GitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        status, payload, headers = self.server.github.handle(self.path, self.headers)
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # noqa: A002
+        return None
+
+
+class KnowledgeGitHubClientTests(SimpleTestCase):
+    def setUp(self):
+        self.blobs = {git_blob_sha(body): body for body in (b"# a\n[[b]]\n", b"# b\n")}
+        self.fake = _FakeGitHub(self.blobs)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _GitHubHandler)
+        server.daemon_threads = True
+        server.github = self.fake
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        api = patch(
+            "blog.management.commands.sync_knowledge_github.GITHUB_API",
+            f"http://127.0.0.1:{server.server_port}",
+        )
+        api.start()
+        self.addCleanup(api.stop)
+
+    def _client(self, token, *, cache=None, sleep=lambda _s: None) -> GitHubClient:
+        http = HttpClient(proxies={}, sleep=sleep)
+        self.addCleanup(http.close)
+        return GitHubClient(token, cache=cache, http=http)
+
+    def test_blobs_are_cached_on_disk_across_clients(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            files = [RemoteFile(path=f"3-Knowledge/{sha}.md", sha=sha) for sha in self.blobs]
+
+            first = self._client("token", cache=KnowledgeCache(Path(tmp)))
+            contents, errors = first.fetch_contents(files)
+            self.assertEqual(errors, {})
+            self.assertEqual(first.request_count, 2)
+            self.assertEqual(sorted(contents.values()), sorted(b.decode() for b in self.blobs.values()))
+
+            second = self._client("token", cache=KnowledgeCache(Path(tmp)))
+            cached_contents, _ = second.fetch_contents(files)
+            self.assertEqual(second.request_count, 0)
+            self.assertEqual(cached_contents, contents)
+
+    def test_tree_uses_etag_and_serves_cached_body_on_304(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = self._client(None, cache=KnowledgeCache(Path(tmp)))
+            tree = first.get_tree()
+            self.assertEqual(first.rate_remaining, 4999)
+
+            second = self._client(None, cache=KnowledgeCache(Path(tmp)))
+            self.assertEqual([f.sha for f in second.get_tree()], [f.sha for f in tree])
+
+    def test_server_errors_are_retried(self):
+        sha = next(iter(self.blobs))
+        blob_path = f"/repos/hqy2020/GardenOfOpeningClouds/git/blobs/{sha}"
+        self.fake.fail_once.add(blob_path)
+        sleeps: list[float] = []
+        client = self._client(None, sleep=sleeps.append)
+        self.assertEqual(client.get_blob(sha), self.blobs[sha])
+        self.assertEqual(len(sleeps), 1)
+        self.assertEqual(self.fake.calls.count(blob_path), 2)
+        self.assertEqual(client.http.opened, 1)
+
+
+class WikilinkIndexTests(SimpleTestCase):
+    def test_resolves_title_stem_alias_and_path_suffix(self):
+        index = WikilinkIndex()
+        index.add("entities__karpathy", path="3-Knowledge/entities/karpathy.md", title="Andrej Karpathy",
+                  frontmatter={"aliases": ["AK"]})
+        index.add("sources__karpathy", path="3-Knowledge/sources/karpathy.md", title="Karpathy talk")
+
+        self.assertEqual(index.resolve("Andrej Karpathy"), "entities__karpathy")
+        self.assertEqual(index.resolve("ak"), "entities__karpathy")
+        self.assertEqual(index.resolve("karpathy"), "entities__karpathy")
+        self.assertEqual(index.resolve("sources/karpathy.md"), "sources__karpathy")
+        self.assertIsNone(index.resolve("missing"))
+
+
+
+class MarkdownAnalysisTests(SimpleTestCase):
+    def test_single_pass_collects_excerpt_counts_links_images_and_tables(self):
+        analysis = analyze_markdown(
+            "# 标题 One\n"
+            "Intro **bold** [link](https://x.dev) [[Target#part|别名]] ![[Other note]] `skip`\n"
+            "![封面](cover.png) ![[pic.jpg|300]]\n"
+            "```python\n[[in code]]\n```\n"
+            "## Sub\n"
+            "| 书名 | 状态 |\n| --- | --- |\n| 三体 | 在读 |\n"
+            "## Sub\n"
+        )
+
+        self.assertEqual(analysis.first_heading, "标题 One")
+        self.assertEqual([item["anchor"] for item in analysis.toc()], ["标题-one", "sub", "sub-1"])
+        self.assertEqual(analysis.wikilinks, ["Target", "Other note"])
+        self.assertEqual([(image.target, image.embed) for image in analysis.images], [("cover.png", False), ("pic.jpg", True)])
+        self.assertEqual(analysis.tables, [[["书名", "状态"], ["三体", "在读"]]])
+        self.assertTrue(analysis.excerpt.startswith("标题 One Intro bold link 别名"))
+        self.assertNotIn("skip", analysis.excerpt)
+        self.assertEqual(analysis.cjk_count, 12)
+        self.assertEqual(analysis.word_count, 12 + 6)
+        self.assertEqual(analysis.reading_minutes, 1)
+
+    def test_build_excerpt_prefers_metadata_and_truncates(self):
+        self.assertEqual(build_excerpt({"description": "摘要"}, "正文"), "摘要")
+        self.assertEqual(build_excerpt({}, "- 一二三四五\n", max_length=3), "一二三")
+        self.assertEqual(build_excerpt({}, "字" * 200, max_length=180), "字" * 180)
+
+    def test_build_excerpt_text_is_unchanged_by_the_markdown_analyzer(self):
+        # Output of the pre-analyzer implementation; stored excerpts must not drift.
+        body = (
+            "# 标题 One\n"
+            "Intro **bold** [link](https://x.dev) [[Target#part|别名]] ![[Other note]] `skip`\n"
+            "![封面](cover.png) > 引用 - 列表\n"
+            "```python\n[[in code]]\n```\n"
+            "尾巴"
+        )
+        self.assertEqual(build_excerpt({}, body), "标题 One Intro bold [[Target part|别名]] ![[Other note]] 引用 列表 尾巴")
+
+
+class GitHistoryTests(SimpleTestCase):
+    def test_rename_keeps_creation_date_and_cache_is_incremental(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = Path(tmp) / "vault"
+            _init_repo(repo)
+            _write(repo / "3-Knowledge" / "old.md", "# note")
+            _write(repo / "outside.md", "# ignored")
+            _commit(repo, "add", "2024-01-01T00:00:00+00:00")
+            (repo / "3-Knowledge" / "old.md").rename(repo / "3-Knowledge" / "new.md")
+            _commit(repo, "rename", "2024-02-01T00:00:00+00:00")
+
+            cache_file = Path(tmp) / "cache" / "git_history.json"
+            history = load_git_history(repo, pathspec="3-Knowledge/", cache_file=cache_file)
+            self.assertEqual(set(history.paths), {"3-Knowledge/new.md"})
+            item = history.paths["3-Knowledge/new.md"]
+            self.assertEqual(item.created_at, datetime.fromisoformat("2024-01-01T00:00:00+00:00"))
+            self.assertEqual(item.modified_at, datetime.fromisoformat("2024-02-01T00:00:00+00:00"))
+
+            _write(repo / "3-Knowledge" / "new.md", "# note v2")
+            _commit(repo, "edit", "2024-03-01T00:00:00+00:00")
+            with patch.object(git_history, "_stream_log", wraps=git_history._stream_log) as stream:
+                updated = load_git_history(repo, pathspec="3-Knowledge/", cache_file=cache_file)
+            self.assertIn("..", stream.call_args.args[1])
+            item = updated.paths["3-Knowledge/new.md"]
+            self.assertEqual(item.created_at, datetime.fromisoformat("2024-01-01T00:00:00+00:00"))
+            self.assertEqual(item.modified_at, datetime.fromisoformat("2024-03-01T00:00:00+00:00"))
+
+    def test_history_scan_pairs_renames_by_blob_without_rename_detection(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = Path(tmp) / "vault"
+            _init_repo(repo)
+            _write(repo / "3-Knowledge" / "moved.md", "# moved")
+            _write(repo / "3-Knowledge" / "edited.md", "# edited")
+            _commit(repo, "add", "2024-01-01T00:00:00+00:00")
+            (repo / "3-Knowledge" / "moved.md").rename(repo / "3-Knowledge" / "moved-2.md")
+            (repo / "3-Knowledge" / "edited.md").unlink()
+            _write(repo / "3-Knowledge" / "edited-2.md", "# edited, then renamed")
+            _commit(repo, "rename", "2024-02-01T00:00:00+00:00")
+
+            with patch.object(git_history.subprocess, "Popen", wraps=subprocess.Popen) as popen:
+                history = load_git_history(repo, pathspec="3-Knowledge/")
+            command = popen.call_args.args[0]
+            self.assertIn("--no-renames", command)
+            self.assertNotIn("-M", command)
+            self.assertEqual(set(history.paths), {"3-Knowledge/moved-2.md", "3-Knowledge/edited-2.md"})
+            self.assertEqual(
+                history.paths["3-Knowledge/moved-2.md"].created_at,
+                datetime.fromisoformat("2024-01-01T00:00:00+00:00"),
+            )
+            self.assertEqual(
+                history.paths["3-Knowledge/edited-2.md"].created_at,
+                datetime.fromisoformat("2024-02-01T00:00:00+00:00"),
+            )
+
+
+class KnowledgeSyncCommandTests(TestCase):
+    def test_local_git_clone_populates_git_timestamps(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = Path(tmp) / "vault"
+            _init_repo(repo)
+            _write(repo / "3-Knowledge" / "a.md", "# a")
+            _commit(repo, "add a", "2024-01-01T00:00:00+00:00")
+            _write(repo / "3-Knowledge" / "a.md", "# a v2")
+            _commit(repo, "edit a", "2024-05-01T00:00:00+00:00")
+            call_command(
+                "sync_knowledge_github",
+                "--local-root", str(repo / "3-Knowledge"),
+                "--cache-dir", str(Path(tmp) / "cache"),
+            )
+
+        node = KnowledgeNode.objects.get(path="3-Knowledge/a.md")
+        self.assertEqual(node.git_created_at, datetime.fromisoformat("2024-01-01T00:00:00+00:00"))
+        self.assertEqual(node.git_last_modified_at, datetime.fromisoformat("2024-05-01T00:00:00+00:00"))
+
+    def test_local_root_sync_creates_nodes_and_edges(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write(root / "entities" / "karpathy.md", "---\nname: Karpathy\n---\nsee [[micrograd]]")
+            _write(root / "sources" / "micrograd.md", "# micrograd\nback to [[Karpathy]]")
+            call_command("sync_knowledge_github", "--local-root", str(root))
+
+        karpathy = KnowledgeNode.objects.get(path="3-Knowledge/entities/karpathy.md")
+        micrograd = KnowledgeNode.objects.get(path="3-Knowledge/sources/micrograd.md")
+        self.assertEqual(karpathy.category, KnowledgeNode.Category.ENTITY)
+        self.assertTrue(KnowledgeEdge.objects.filter(source=karpathy, target=micrograd).exists())
+        self.assertTrue(KnowledgeEdge.objects.filter(source=micrograd, target=karpathy).exists())
+
+    def test_resync_applies_edge_diff(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write(root / "a.md", "[[b]] [[c]]")
+            _write(root / "b.md", "# b")
+            _write(root / "c.md", "# c")
+            call_command("sync_knowledge_github", "--local-root", str(root))
+            kept = KnowledgeEdge.objects.get(source__path="3-Knowledge/a.md", target__path="3-Knowledge/b.md")
+
+            _write(root / "a.md", "[[b]] only")
+            call_command("sync_knowledge_github", "--local-root", str(root))
+
+        targets = set(KnowledgeEdge.objects.filter(source__path="3-Knowledge/a.md").values_list("target__path", flat=True))
+        self.assertEqual(targets, {"3-Knowledge/b.md"})
+        self.assertTrue(KnowledgeEdge.objects.filter(id=kept.id).exists())
+
+    def test_edge_diff_is_applied_in_one_transaction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write(root / "a.md", "[[b]]")
+            _write(root / "b.md", "# b")
+            _write(root / "c.md", "# c")
+            call_command("sync_knowledge_github", "--local-root", str(root))
+
+            _write(root / "a.md", "[[c]]")
+            with patch.object(QuerySet, "delete", side_effect=RuntimeError("boom")), self.assertRaises(RuntimeError):
+                call_command("sync_knowledge_github", "--local-root", str(root))
+
+        # The failed stale-edge delete took the new edge with it.
+        targets = set(KnowledgeEdge.objects.filter(source__path="3-Knowledge/a.md").values_list("target__path", flat=True))
+        self.assertEqual(targets, {"3-Knowledge/b.md"})
@@ -1,15 +1,40 @@
 from __future__ import annotations
 
+import hashlib
 import os
 import tempfile
+import time
+from dataclasses import replace
+from functools import partial
+from io import StringIO
 from pathlib import Path
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
-from django.core.management.base import CommandError
-from django.test import TestCase
-
-from blog.models import Book, GameItem, PhotoWallImage, SocialMediaStat, WikiQuote, WishItem
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.models import (
+    Book,
+    GameItem,
+    ObsidianDocument,
+    PhotoWallImage,
+    Post,
+    PostLike,
+    PostView,
+    SocialMediaStat,
+    SyncLog,
+    WikiQuote,
+    WishItem,
+)
+from sync.chunked import ChunkedCommit
+from sync.document_pool import sync_obsidian_documents
+from sync.pipeline import PipelineStage, run_pipeline
+from sync.prepare import prepare_notes, vault_shards
+from sync.shadow import SHADOW_DB, ShadowPublishError, shadow_path, staged_publish
 
 
 SYNC_ROOT = "2-Resource/90_网站同步"
@@ -130,6 +155,29 @@ class StructuredSiteSyncCommandTests(TestCase):
         self.assertEqual(owned_game.status, GameItem.Status.OWNED)
         self.assertEqual(owned_game.sort_order, 1020)
 
+    def test_sync_site_structured_rerun_skips_unchanged_rows_in_bulk(self):
+        skip_others = ["--skip-photos", "--skip-social", "--skip-wishes", "--skip-books", "--skip-quotes"]
+        with tempfile.TemporaryDirectory() as tmp:
+            vault = Path(tmp)
+            games = "\n".join(f"- [ ] **游戏{index}**" for index in range(40))
+            _write(vault / GAME_NOTE, f"## 🎮 想买的游戏（Switch）\n\n{games}")
+            call_command("sync_site_structured", "--vault", str(vault), *skip_others, stdout=StringIO())
+
+            output = StringIO()
+            with CaptureQueriesContext(connection) as queries:
+                call_command("sync_site_structured", "--vault", str(vault), *skip_others, stdout=output)
+            self.assertIn("games: created=0 updated=0 deactivated=0 unchanged=40", output.getvalue())
+            self.assertLessEqual(len(queries), 3)
+            self.assertFalse([q["sql"] for q in queries if not q["sql"].startswith(("SELECT", "SAVEPOINT", "RELEASE"))])
+
+            _write(vault / GAME_NOTE, "## 🎮 已买的游戏（Switch）\n\n- [ ] **游戏0**\n- [ ] **新游戏**")
+            output = StringIO()
+            call_command("sync_site_structured", "--vault", str(vault), *skip_others, stdout=output)
+
+        self.assertIn("games: created=1 updated=1 deactivated=39 unchanged=0", output.getvalue())
+        self.assertEqual(GameItem.objects.get(title="游戏0").status, GameItem.Status.OWNED)
+        self.assertEqual(GameItem.objects.filter(is_active=True).count(), 2)
+
     def test_sync_site_structured_deactivates_removed_items(self):
         with tempfile.TemporaryDirectory() as tmp:
             vault = Path(tmp)
@@ -264,13 +312,13 @@ class StructuredSiteSyncCommandTests(TestCase):
         self.assertTrue(GameItem.objects.get(title="保留游戏").is_active)
         self.assertFalse(GameItem.objects.get(title="旧游戏").is_active)
 
-    @patch("blog.management.commands.sync_site_structured.upload_photo_to_obsidian_images")
+    @patch("blog.management.commands.sync_site_structured.upload_photos_to_obsidian_images")
     def test_sync_site_structured_uploads_local_photo_assets(self, mock_upload):
         class MockUploadResult:
             image_url = "https://raw.githubusercontent.com/hqy2020/obsidian-images/main/gallery/uploaded.jpg"
             source_url = "https://github.com/hqy2020/obsidian-images/blob/main/gallery/uploaded.jpg"
 
-        mock_upload.return_value = MockUploadResult()
+        mock_upload.return_value = [MockUploadResult()]
 
         with tempfile.TemporaryDirectory() as tmp:
             vault = Path(tmp)
@@ -300,13 +348,13 @@ class StructuredSiteSyncCommandTests(TestCase):
         self.assertEqual(photo.source_url, MockUploadResult.source_url)
         self.assertEqual(mock_upload.call_count, 1)
 
-    @patch("blog.management.commands.sync_site_structured.upload_photo_to_obsidian_images")
+    @patch("blog.management.commands.sync_site_structured.upload_photos_to_obsidian_images")
     def test_sync_site_structured_uploads_vault_repo_photo_urls_only_once(self, mock_upload):
         class MockUploadResult:
             image_url = "https://raw.githubusercontent.com/hqy2020/obsidian-images/main/gallery/vault-uploaded.jpg"
             source_url = "https://github.com/hqy2020/obsidian-images/blob/main/gallery/vault-uploaded.jpg"
 
-        mock_upload.return_value = MockUploadResult()
+        mock_upload.return_value = [MockUploadResult()]
 
         with tempfile.TemporaryDirectory() as tmp:
             vault = Path(tmp)
@@ -361,27 +409,15 @@ class StructuredSiteSyncCommandTests(TestCase):
                 ) as remote_upload:
                     with patch(
                         "blog.management.commands.sync_site_structured._post_remote_json",
-                        return_value={"action": "updated", "deactivated": 0},
+                        side_effect=[{"stale": 1}, {"action": "updated", "deactivated": 1}],
                     ) as remote_json:
-                        call_command(
-                            "sync_site_structured",
-                            "--vault",
-                            str(vault),
-                            "--target",
-                            "remote",
-                            "--remote-base-url",
-                            "https://example.com/api",
-                            "--remote-token-env",
-                            "TEST_SYNC_TOKEN",
-                            "--skip-social",
-                            "--skip-wishes",
-                            "--skip-books",
-                            "--skip-games",
-                            "--skip-quotes",
-                        )
+                        self._run_remote_photo_sync(vault)
 
         self.assertEqual(remote_upload.call_count, 1)
-        self.assertEqual(remote_json.call_count, 1)
+        self.assertEqual(remote_json.call_count, 2)
+        manifest_payload = remote_json.call_args_list[0].args[2]
+        self.assertIn("photos/manifest/", remote_json.call_args_list[0].args[0])
+        self.assertEqual(manifest_payload["hashes"], [hashlib.sha256(b"fake-jpg").hexdigest()])
         upload_args = remote_upload.call_args
         self.assertIn("admin/obsidian-sync/photos/", upload_args.args[0])
         self.assertEqual(upload_args.kwargs["file_name"], "sample.jpg")
@@ -408,28 +444,81 @@ class StructuredSiteSyncCommandTests(TestCase):
             with patch.dict(os.environ, {"TEST_SYNC_TOKEN": "sync-token"}, clear=False):
                 with patch(
                     "blog.management.commands.sync_site_structured._post_remote_json",
-                    side_effect=[{"action": "updated"}, {"action": "updated", "deactivated": 0}],
+                    side_effect=[{"stale": 0}, {"action": "updated"}],
                 ) as remote_json:
-                    call_command(
-                        "sync_site_structured",
-                        "--vault",
-                        str(vault),
-                        "--target",
-                        "remote",
-                        "--remote-base-url",
-                        "https://example.com/api",
-                        "--remote-token-env",
-                        "TEST_SYNC_TOKEN",
-                        "--skip-social",
-                        "--skip-wishes",
-                        "--skip-books",
-                        "--skip-games",
-                        "--skip-quotes",
-                    )
-
-        sync_payload = remote_json.call_args_list[0].args[2]
+                    self._run_remote_photo_sync(vault)
+
+        self.assertEqual(remote_json.call_count, 2)
+        sync_payload = remote_json.call_args_list[1].args[2]
         self.assertNotIn("captured_at", sync_payload)
 
+    def test_sync_site_structured_remote_mode_uploads_only_unknown_images_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vault = Path(tmp)
+            assets = vault / SYNC_ROOT / "01_照片墙" / "assets"
+            assets.mkdir(parents=True, exist_ok=True)
+            (assets / "known.jpg").write_bytes(b"known")
+            (assets / "new.jpg").write_bytes(b"new")
+            (assets / "new-copy.jpg").write_bytes(b"new")
+            (assets / "same.jpg").write_bytes(b"same")
+            _write(
+                vault / PHOTO_NOTE,
+                """
+                # 照片墙
+
+                | 标题 | 图片 |
+                | --- | --- |
+                | 已有图片 | ![[assets/known.jpg]] |
+                | 新图片 | ![[assets/new.jpg]] |
+                | 新图片副本 | ![[assets/new-copy.jpg]] |
+                | 未变化 | ![[assets/same.jpg]] |
+                """,
+            )
+            known_hash = hashlib.sha256(b"known").hexdigest()
+            sent: list[tuple[str, dict]] = []
+
+            def fake_json(url, token, payload, timeout, *, retries=None):
+                sent.append((url, payload))
+                if url.endswith("photos/manifest/"):
+                    unchanged = [item["sync_key"] for item in payload["photos"] if item["title"] == "未变化"]
+                    return {"unchanged": unchanged, "hashes": {known_hash: {"image_url": "https://img/known.jpg"}}, "stale": 0}
+                return {"action": "updated"}
+
+            def fake_upload(url, token, fields, **kwargs):
+                return {"action": "created", "image_url": "https://img/new.jpg", "source_url": "https://src/new.jpg"}
+
+            with patch.dict(os.environ, {"TEST_SYNC_TOKEN": "sync-token"}, clear=False), \
+                    patch("blog.management.commands.sync_site_structured._post_remote_json", side_effect=fake_json), \
+                    patch("blog.management.commands.sync_site_structured._post_remote_multipart", side_effect=fake_upload) as upload:
+                self._run_remote_photo_sync(vault)
+
+        self.assertEqual(upload.call_count, 1)
+        self.assertEqual(upload.call_args.args[2]["title"], "新图片")
+        self.assertEqual(upload.call_args.kwargs["retries"], 2)
+        posted = {payload["title"]: payload for url, payload in sent[1:]}
+        self.assertEqual(set(posted), {"已有图片", "新图片副本"})
+        self.assertEqual(posted["已有图片"]["image_url"], "https://img/known.jpg")
+        self.assertEqual(posted["新图片副本"]["image_url"], "https://img/new.jpg")
+        self.assertFalse([url for url, _ in sent if "reconcile" in url])
+
+    def _run_remote_photo_sync(self, vault: Path):
+        call_command(
+            "sync_site_structured",
+            "--vault",
+            str(vault),
+            "--target",
+            "remote",
+            "--remote-base-url",
+            "https://example.com/api",
+            "--remote-token-env",
+            "TEST_SYNC_TOKEN",
+            "--skip-social",
+            "--skip-wishes",
+            "--skip-books",
+            "--skip-games",
+            "--skip-quotes",
+        )
+
 
 class SiteSyncPipelineCommandTests(TestCase):
     @patch("blog.management.commands.sync_site_sources.call_command")
@@ -444,3 +533,196 @@ class SiteSyncPipelineCommandTests(TestCase):
         self.assertIn("sync_knowledge_github", called_names)
         self.assertIn("sync_site_structured", called_names)
         self.assertNotIn("sync_obsidian_documents", called_names)
+
+    def test_pipeline_applies_stages_whose_inputs_are_ready_first(self):
+        applied: list[str] = []
+        stages = [
+            PipelineStage(name="posts", tasks=[partial(time.sleep, 0.3)], apply=lambda _r: applied.append("posts")),
+            PipelineStage(name="documents", after=("posts",), apply=lambda _r: applied.append("documents")),
+            PipelineStage(name="structured", apply=lambda _r: applied.append("structured")),
+        ]
+
+        timer = run_pipeline(stages, workers=1)
+
+        self.assertEqual(applied, ["structured", "posts", "documents"])
+        self.assertGreaterEqual(timer.as_dict()["posts.prepare"]["ms"], 300)
+
+    def test_vault_shards_accept_nested_include_roots(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vault = Path(tmp)
+            _write(vault / "2-Resource/90_网站同步/01_照片墙/照片墙.md", "照片")
+            _write(vault / "2-Resource/other/note.md", "其他")
+            _write(vault / "3-Knowledge/a/note.md", "知识")
+            _write(vault / "3-Knowledge/b/note.md", "知识")
+
+            shards = vault_shards(vault, 2, roots=["2-Resource/90_网站同步", "2-Resource/90_网站同步/01_照片墙", "3-Knowledge"])
+
+        self.assertEqual(
+            sorted(unit for shard in shards for unit in shard),
+            ["2-Resource/90_网站同步", "3-Knowledge/a", "3-Knowledge/b"],
+        )
+
+    def test_document_pool_reuses_prepared_notes_and_reparses_changed_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vault = Path(tmp)
+            _write(vault / "3-Knowledge/kept.md", "---\ntitle: 原标题\n---\n正文")
+            _write(vault / "3-Knowledge/edited.md", "---\ntitle: 旧标题\n---\n正文")
+            prepared = prepare_notes(vault, ["3-Knowledge"])
+            # A marker only the prepared copy carries proves the parse was reused.
+            prepared["3-Knowledge/kept.md"] = replace(prepared["3-Knowledge/kept.md"], metadata={"title": "预解析"})
+            _write(vault / "3-Knowledge/edited.md", "---\ntitle: 新标题（已修改）\n---\n正文")
+
+            sync_obsidian_documents(vault, prepared=prepared)
+
+        titles = dict(ObsidianDocument.objects.values_list("vault_path", "title"))
+        self.assertEqual(titles["3-Knowledge/kept.md"], "预解析")
+        self.assertEqual(titles["3-Knowledge/edited.md"], "新标题（已修改）")
+
+    def test_sync_site_sources_parses_in_workers_and_reports_stage_timings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vault = Path(tmp)
+            _write(vault / "2-Resource/notes/hello.md", "---\ntitle: 你好\nslug: hello-pipeline\ntags: [publish]\n---\n正文")
+            output = StringIO()
+            call_command(
+                "sync_site_sources", str(vault), "--workers", "2", "--skip-knowledge", "--skip-structured",
+                stdout=output,
+            )
+
+        self.assertTrue(Post.objects.filter(slug="hello-pipeline").exists())
+        self.assertTrue(ObsidianDocument.objects.filter(vault_path="2-Resource/notes/hello.md").exists())
+        self.assertIn("vault.prepare=", output.getvalue())
+        self.assertIn("documents.apply=", output.getvalue())
+
+
+class StagedPublishTests(TransactionTestCase):
+    databases = {"default", "analytics"}
+    serialized_rollback = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The shadow alias only exists while a build runs, so it cannot be declared up front.
+        cls.databases = frozenset(cls.databases) | {SHADOW_DB}
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        override = override_settings(SYNC_CACHE_DIR=self.root / "cache")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_shadow_writes_stay_invisible_until_published(self):
+        with staged_publish() as build:
+            Book.objects.create(title="影子书")
+            self.assertTrue(Book.objects.filter(title="影子书").exists())
+            self.assertFalse(Book.objects.using("default").filter(title="影子书").exists())
+
+        self.assertTrue(Book.objects.filter(title="影子书").exists())
+        self.assertGreater(build.published_rows, 0)
+        self.assertFalse(shadow_path().exists())
+
+    def test_live_edit_during_the_build_blocks_publishing(self):
+        with self.assertRaises(ShadowPublishError):
+            with staged_publish():
+                Book.objects.using("default").create(title="后台编辑")
+                Book.objects.create(title="影子书")
+
+        self.assertTrue(Book.objects.filter(title="后台编辑").exists())
+        self.assertFalse(Book.objects.filter(title="影子书").exists())
+
+    def test_non_content_writes_during_the_build_go_to_live_and_are_not_swapped(self):
+        now = timezone.now()
+        with staged_publish() as build:
+            Book.objects.create(title="影子书")
+            SyncLog.objects.create(slug="during-build", started_at=now, finished_at=now)
+            self.assertTrue(SyncLog.objects.using("default").filter(slug="during-build").exists())
+            get_user_model().objects.create_user(username="created-during-build")
+
+        self.assertTrue(Book.objects.filter(title="影子书").exists())
+        self.assertTrue(SyncLog.objects.filter(slug="during-build").exists())
+        self.assertTrue(get_user_model().objects.filter(username="created-during-build").exists())
+        self.assertNotIn("blog.SyncLog", build.fingerprint)
+
+        with self.assertRaises(RuntimeError):
+            with staged_publish():
+                SyncLog.objects.create(slug="discarded-build", started_at=now, finished_at=now)
+                raise RuntimeError("boom")
+        self.assertTrue(SyncLog.objects.filter(slug="discarded-build").exists())
+
+    def test_chunked_commits_wrap_the_shadow_writes_during_a_build(self):
+        with staged_publish():
+            with ChunkedCommit() as writer:
+                Book.objects.create(title="影子书")
+                self.assertEqual(writer.using, SHADOW_DB)
+                self.assertTrue(connections[SHADOW_DB].in_atomic_block)
+                self.assertFalse(connections["default"].in_atomic_block)
+
+        self.assertEqual(ChunkedCommit().using, "default")
+        self.assertTrue(Book.objects.filter(title="影子书").exists())
+
+    def test_post_engagement_is_dropped_only_when_the_deletion_is_published(self):
+        post = Post.objects.create(title="旧文", slug="old-post", content="# old", draft=False)
+        PostView.objects.create(post=post, views=3)
+        PostLike.objects.create(post=post, likes=2)
+
+        with self.assertRaises(RuntimeError):
+            with staged_publish():
+                Post.objects.filter(pk=post.pk).delete()
+                raise RuntimeError("boom")
+        self.assertTrue(PostView.objects.filter(post_id=post.pk).exists())
+
+        with staged_publish() as build:
+            Post.objects.get(pk=post.pk).delete()
+            self.assertTrue(PostView.objects.filter(post_id=post.pk).exists())
+
+        self.assertEqual(build.removed_post_ids, [post.pk])
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertFalse(PostView.objects.filter(post_id=post.pk).exists())
+        self.assertFalse(PostLike.objects.filter(post_id=post.pk).exists())
+
+    def test_build_hiding_most_visible_rows_is_refused(self):
+        Book.objects.bulk_create([Book(title=f"书{index}") for index in range(12)])
+        visible = Book.objects.filter(is_active=True).count()
+        with self.assertRaisesMessage(ShadowPublishError, "blog.Book"):
+            with staged_publish():
+                Book.objects.update(is_active=False)
+
+        self.assertEqual(Book.objects.filter(is_active=True).count(), visible)
+
+    def test_sync_site_sources_staged_publishes_structured_rows(self):
+        vault = self.root / "vault"
+        _write(vault / WISH_NOTE, "| 标题 | 价格 |\n| --- | --- |\n| 新相机 | 100 |")
+        output = StringIO()
+        call_command(
+            "sync_site_sources", str(vault), "--staged", "--skip-posts", "--skip-documents", "--skip-knowledge",
+            stdout=output,
+        )
+
+        self.assertTrue(WishItem.objects.filter(title="新相机", is_active=True).exists())
+        self.assertIn("published", output.getvalue())
+
+
+class ChunkedCommitTests(TestCase):
+    def test_committed_chunks_survive_a_failure_in_a_later_chunk(self):
+        sleeps: list[float] = []
+        with self.assertRaises(RuntimeError):
+            with ChunkedCommit(max_rows=2, sleep=sleeps.append) as writer:
+                for index in range(3):
+                    Book.objects.create(title=f"chunk-{index}")
+                    writer.tick()
+                raise RuntimeError("boom")
+
+        self.assertEqual(sorted(Book.objects.filter(title__startswith="chunk-").values_list("title", flat=True)), ["chunk-0", "chunk-1"])
+        self.assertEqual((writer.rows, writer.commits), (3, 1))
+        # Inside the test's outer transaction there is no lock to hand over.
+        self.assertEqual(sleeps, [])
+
+    def test_slow_chunks_commit_on_elapsed_time(self):
+        now = [0.0]
+        with ChunkedCommit(max_rows=100, max_ms=50, clock=lambda: now[0]) as writer:
+            self.assertFalse(writer.tick())
+            now[0] = 0.06
+            self.assertTrue(writer.tick())
+            self.assertFalse(writer.tick())
+        self.assertEqual(writer.commits, 2)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from blog.management.commands.run_scheduler import load_jobs
+from blog.models import SyncJobRun
+from sync.locks import SyncLockBusy, sync_lease
+from sync.schedule import CronSchedule
+from sync.timing import StageTimer, format_stage_timings
+
+
+class CronScheduleTests(SimpleTestCase):
+    def test_next_after(self):
+        daily = CronSchedule.parse("20 4 * * *")
+        self.assertEqual(daily.next_after(datetime(2026, 1, 1, 5, 0)), datetime(2026, 1, 2, 4, 20))
+        self.assertEqual(daily.next_after(datetime(2026, 1, 1, 4, 19, 30)), datetime(2026, 1, 1, 4, 20))
+
+        weekdays = CronSchedule.parse("*/15 9-17 * * 1-5")
+        # 2026-01-03 is a Saturday
+        self.assertEqual(weekdays.next_after(datetime(2026, 1, 3, 10, 0)), datetime(2026, 1, 5, 9, 0))
+        self.assertEqual(CronSchedule.parse("0 0 * * 7").next_after(datetime(2026, 1, 3, 12, 0)), datetime(2026, 1, 4, 0, 0))
+
+    def test_rejects_invalid_expressions(self):
+        for expression in ("* * * *", "61 * * * *", "*/0 * * * *", "5-1 * * * *"):
+            with self.subTest(expression=expression), self.assertRaises(ValueError):
+                CronSchedule.parse(expression)
+
+    def test_jobs_file_overrides_and_extends_defaults(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs_file = Path(tmp) / "jobs.json"
+            jobs_file.write_text(json.dumps([
+                {"name": "knowledge", "schedule": "*/30 * * * *"},
+                {"name": "site-sources", "enabled": False},
+                {"name": "projects", "command": "check --deploy", "schedule": "@hourly", "max_runtime": 60},
+            ]), encoding="utf-8")
+            jobs = {job.name: job for job in load_jobs(str(jobs_file))}
+
+        self.assertEqual(set(jobs), {"knowledge", "github-projects", "projects", "sync-log-retention"})
+        self.assertEqual(jobs["knowledge"].cron.minutes, frozenset({0, 30}))
+        self.assertEqual(jobs["knowledge"].command[0], "sync_knowledge_github")
+        self.assertEqual(jobs["projects"].command, ("check", "--deploy"))
+
+
+class SyncLeaseTests(SimpleTestCase):
+    def test_second_holder_is_rejected_until_release(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(SYNC_CACHE_DIR=Path(tmp)):
+            with sync_lease(holder="first"):
+                with self.assertRaises(SyncLockBusy) as ctx:
+                    with sync_lease(holder="second"):
+                        pass
+                self.assertEqual(ctx.exception.holder.get("holder"), "first")
+            with sync_lease(holder="second") as info:
+                self.assertEqual(info["holder"], "second")
+
+
+class RunSchedulerCommandTests(TestCase):
+    def _jobs_file(self, tmp: str, **job) -> str:
+        path = Path(tmp) / "jobs.json"
+        path.write_text(json.dumps([{"schedule": "@daily", "backoff": 0, **job}]), encoding="utf-8")
+        return str(path)
+
+    def test_run_records_success(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(SYNC_CACHE_DIR=Path(tmp)):
+            call_command("run_scheduler", "--jobs-file", self._jobs_file(tmp, name="ok", command=["check"]), "--run", "ok")
+
+        run = SyncJobRun.objects.get(job="ok")
+        self.assertEqual(run.status, SyncJobRun.Status.SUCCESS)
+        self.assertEqual(run.exit_code, 0)
+
+    def test_failed_job_is_retried_then_reported(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(SYNC_CACHE_DIR=Path(tmp)):
+            jobs_file = self._jobs_file(tmp, name="broken", command=["no_such_command"], retries=1)
+            with self.assertRaises(CommandError):
+                call_command("run_scheduler", "--jobs-file", jobs_file, "--run", "broken")
+
+        runs = list(SyncJobRun.objects.filter(job="broken").order_by("attempt"))
+        self.assertEqual([run.attempt for run in runs], [1, 2])
+        self.assertTrue(all(run.status == SyncJobRun.Status.FAILED for run in runs))
+
+    def test_busy_lease_is_recorded(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(SYNC_CACHE_DIR=Path(tmp)), \
+                patch("blog.management.commands.run_scheduler.LEASE_WAIT_SECONDS", 0):
+            jobs_file = self._jobs_file(tmp, name="ok", command=["check"], retries=0)
+            with sync_lease(holder="admin"), self.assertRaises(CommandError):
+                call_command("run_scheduler", "--jobs-file", jobs_file, "--run", "ok")
+
+        self.assertEqual(SyncJobRun.objects.get(job="ok").status, SyncJobRun.Status.BUSY)
+
+
+class StageTimerTests(SimpleTestCase):
+    def test_accumulates_stages_and_item_percentiles(self):
+        clock = iter([0.0, 1.0, 1.0, 1.002, 2.0, 2.010])
+        timer = StageTimer(clock=lambda: next(clock))
+        with timer.stage("scan", items=3):
+            pass
+        with timer.item("read"):
+            pass
+        with timer.item("read"):
+            pass
+
+        timings = timer.as_dict()
+        self.assertEqual(timings["scan"], {"ms": 1000.0, "count": 3, "p95_ms": None})
+        self.assertEqual(timings["read"]["count"], 2)
+        self.assertAlmostEqual(timings["read"]["p95_ms"], 10.0, places=2)
+        self.assertEqual(format_stage_timings(timings), "scan=1000ms n=3, read=12ms n=2 p95=10.0ms")
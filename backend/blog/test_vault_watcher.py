@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from blog.management.commands.watch_vault import route_changes
+from sync.scanner import iter_markdown_files, scan_markdown_files
+from sync.watcher import RESCAN, Debouncer, InotifyWatcher, PollingWatcher
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _ScriptedWatcher:
+    def __init__(self, batches: list[set[str]]):
+        self.batches = list(batches)
+
+    def wait(self, timeout: float) -> set[str]:
+        return self.batches.pop(0) if self.batches else set()
+
+    def close(self):
+        return None
+
+
+def _wait_for(watcher, predicate, attempts: int = 20) -> set[str]:
+    seen: set[str] = set()
+    for _ in range(attempts):
+        seen |= watcher.wait(0.2)
+        if predicate(seen):
+            break
+    return seen
+
+
+class RouteChangesTests(SimpleTestCase):
+    def test_routes_paths_to_domains_and_structured_sections(self):
+        routed = route_changes({
+            "3-Knowledge（知识库）/entities/a.md",
+            "2-Resource/90_网站同步/01_照片墙/cat.jpg",
+        })
+        self.assertEqual(set(routed), {"knowledge", "documents", "structured"})
+        self.assertEqual(routed["structured"], {"photos"})
+
+        self.assertEqual(route_changes({"1-Information/reading.md"}).keys(), {"documents", "collections"})
+        self.assertEqual(route_changes({"attachments/a.png"}), {})
+        self.assertEqual(route_changes({RESCAN})["structured"], set())
+
+
+class DebouncerTests(SimpleTestCase):
+    def test_waits_for_quiet_period_but_caps_total_delay(self):
+        clock = _Clock()
+        debouncer = Debouncer(quiet=2, max_delay=5, clock=clock)
+        debouncer.add({"a.md"})
+        clock.now = 1.5
+        debouncer.add({"b.md"})
+        self.assertEqual(debouncer.pop_ready(), set())
+        clock.now = 3.5
+        self.assertEqual(debouncer.pop_ready(), {"a.md", "b.md"})
+
+        for step in range(6):
+            clock.now = 10 + step
+            debouncer.add({f"{step}.md"})
+        self.assertEqual(len(debouncer.pop_ready()), 6)
+
+
+
+class ScannerTests(SimpleTestCase):
+    def test_walk_prunes_excluded_dirs_and_streams_sorted_entries(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for relative in (
+                "3-Knowledge/b.md",
+                "3-Knowledge/a/z.md",
+                "3-Knowledge/a.md",
+                "3-Knowledge/a/notes.txt",
+                "3-Knowledge（知识库）/x.md",
+                "2-Resource/r.md",
+                ".obsidian/plugin.md",
+                "3-Knowledge/.trash/gone.md",
+            ):
+                (root / relative).parent.mkdir(parents=True, exist_ok=True)
+                (root / relative).write_text("x", encoding="utf-8")
+
+            entries = list(iter_markdown_files(root, include_roots=["3-Knowledge", "3-Knowledge/a"]))
+            self.assertEqual(
+                [entry.relative_path for entry in entries],
+                ["3-Knowledge/a/z.md", "3-Knowledge/a.md", "3-Knowledge/b.md", "3-Knowledge（知识库）/x.md"],
+            )
+            self.assertEqual(entries[1].mtime, (root / "3-Knowledge/a.md").stat().st_mtime)
+
+            everything = scan_markdown_files(root)
+            self.assertEqual(everything, sorted(everything))
+            self.assertEqual(len(everything), 5)
+
+            visited: list[str] = []
+            real_scandir = os.scandir
+
+            def recording_scandir(path):
+                visited.append(Path(path).name)
+                return real_scandir(path)
+
+            with patch("sync.scanner.os.scandir", side_effect=recording_scandir):
+                list(iter_markdown_files(root))
+            self.assertIn("a", visited)
+            self.assertNotIn(".obsidian", visited)
+            self.assertNotIn(".trash", visited)
+
+
+class WatcherTests(SimpleTestCase):
+    def test_polling_watcher_reports_changed_and_deleted_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "keep.md").write_text("a", encoding="utf-8")
+            (root / "gone.md").write_text("a", encoding="utf-8")
+            (root / ".git").mkdir()
+            watcher = PollingWatcher(root, interval=0)
+            (root / "keep.md").write_text("changed", encoding="utf-8")
+            (root / "gone.md").unlink()
+            (root / ".git" / "index").write_text("x", encoding="utf-8")
+            self.assertEqual(watcher.wait(0), {"keep.md", "gone.md"})
+
+    def test_inotify_watcher_picks_up_files_in_new_directories(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            try:
+                watcher = InotifyWatcher(root)
+            except OSError:
+                self.skipTest("inotify unavailable")
+            try:
+                (root / "notes").mkdir()
+                (root / "notes" / "a.md").write_text("x", encoding="utf-8")
+                seen = _wait_for(watcher, lambda s: "notes/a.md" in s)
+                self.assertIn("notes/a.md", seen)
+
+                time.sleep(0.05)
+                (root / "notes" / "a.md").write_text("y", encoding="utf-8")
+                self.assertIn("notes/a.md", _wait_for(watcher, lambda s: "notes/a.md" in s))
+            finally:
+                watcher.close()
+
+
+class WatchVaultCommandTests(SimpleTestCase):
+    def test_dispatches_only_affected_domains(self):
+        watcher = _ScriptedWatcher([{"2-Resource/90_网站同步/06_游戏库/游戏库.md"}])
+        with tempfile.TemporaryDirectory() as tmp, \
+                override_settings(SYNC_CACHE_DIR=Path(tmp) / "cache"), \
+                patch("blog.management.commands.watch_vault.open_watcher", return_value=watcher), \
+                patch("blog.management.commands.watch_vault.call_command") as sync:
+            call_command(
+                "watch_vault",
+                "--vault", tmp,
+                "--repo-url", "",
+                "--skip-initial-sync",
+                "--debounce", "0",
+                "--max-batches", "1",
+            )
+
+        commands = [call.args[0] for call in sync.call_args_list]
+        self.assertEqual(commands, ["sync_obsidian", "sync_obsidian_documents", "sync_site_structured"])
+        structured_args = sync.call_args_list[-1].args
+        self.assertNotIn("--skip-games", structured_args)
+        self.assertIn("--skip-photos", structured_args)
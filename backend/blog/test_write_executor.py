@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import threading
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from blog.models import Post, PostLikeVote, PostView, SiteVisit
+from blog.write_executor import WriteExecutor, WriteStalled, WriteTimeout, write_executor
+
+
+class WriteExecutorTests(TestCase):
+    def setUp(self):
+        self.executor = WriteExecutor(linger=0)
+        self.addCleanup(self.executor.close)
+
+    def test_writes_queued_behind_a_slow_one_commit_as_one_group(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return threading.current_thread().name
+
+        first = self.executor.submit(slow)
+        started.wait(5)
+        queued = [self.executor.submit(lambda index=index: index) for index in range(5)]
+        release.set()
+
+        self.assertEqual(first.result(5), "db-writer-default")
+        self.assertEqual([future.result(5) for future in queued], [0, 1, 2, 3, 4])
+        self.assertEqual(self.executor.metrics()["batches"], 2)
+        self.assertEqual(self.executor.largest_batch, 5)
+
+    def test_failing_write_does_not_fail_its_group(self):
+        release = threading.Event()
+        self.executor.submit(lambda: release.wait(5))
+
+        def broken():
+            raise ValueError("bad write")
+
+        failed = self.executor.submit(broken)
+        ok = self.executor.submit(lambda: "ok")
+        release.set()
+
+        with self.assertRaisesMessage(ValueError, "bad write"):
+            failed.result(5)
+        self.assertEqual(ok.result(5), "ok")
+
+    def test_caller_inside_a_transaction_runs_inline(self):
+        # TestCase wraps every test in a transaction.
+        self.assertEqual(self.executor.run(lambda: threading.current_thread().name), threading.current_thread().name)
+        self.assertEqual(self.executor.writes, 0)
+
+
+class WriteExecutorTimeoutTests(TransactionTestCase):
+    # Outside a test transaction, so ``run`` really goes through the writer thread.
+
+    def setUp(self):
+        self.executor = WriteExecutor(linger=0)
+        self.addCleanup(self.executor.close)
+
+    def test_started_write_is_awaited_past_the_timeout(self):
+        release = threading.Event()
+        threading.Timer(0.2, release.set).start()
+
+        self.assertEqual(self.executor.run(lambda: release.wait(5) and "committed", timeout=0.05), "committed")
+
+    def test_write_that_never_started_times_out_and_is_dropped(self):
+        started, release = threading.Event(), threading.Event()
+        ran = []
+        self.executor.submit(lambda: started.set() or release.wait(5))
+        started.wait(5)
+
+        with self.assertRaises(WriteTimeout):
+            self.executor.run(lambda: ran.append(1), timeout=0.05)
+        release.set()
+        self.executor.submit(lambda: None).result(5)
+        self.assertEqual(ran, [])
+
+    def test_started_write_that_never_commits_stops_waiting(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with self.assertRaises(WriteStalled):
+            self.executor.run(lambda: release.wait(5), timeout=0.05, commit_timeout=0.05)
+
+
+class PublicWriteEndpointTests(TransactionTestCase):
+    # TestCase's transaction would make run_write execute inline; these go through the writer thread.
+    databases = {"default", "analytics"}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.post = Post.objects.create(title="写入", slug="group-commit", content="正文", draft=False)
+
+    def test_views_likes_and_visits_commit_through_the_writer_thread(self):
+        writer = write_executor("analytics")
+        writes_before = writer.writes
+
+        resp = self.client.post(reverse("posts-view", kwargs={"slug": self.post.slug}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["data"]["views"], 1)
+
+        for _ in range(2):
+            resp = self.client.post(reverse("posts-like", kwargs={"slug": self.post.slug}), {"liked": True}, format="json")
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual((resp.data["data"]["liked"], resp.data["data"]["likes"]), (True, 1))
+        resp = self.client.post(reverse("home-like"), {"liked": True}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.post(reverse("record-site-visit"), {"path": "/posts/group-commit"}, format="json")
+        self.assertEqual(resp.data["data"]["recorded"], True)
+
+        self.assertEqual(writer.writes - writes_before, 5)
+        self.assertEqual(PostView.objects.get(post=self.post).views, 1)
+        self.assertEqual(PostLikeVote.objects.filter(post=self.post).count(), 1)
+        self.assertTrue(SiteVisit.objects.filter(path="/posts/group-commit").exists())
@@ -1,45 +1,69 @@
 from __future__ import annotations
 
+import gzip
 import hashlib
+import json
 import os
+import struct
 import tempfile
 from datetime import timedelta
+from io import StringIO
 from pathlib import Path
 from unittest.mock import patch
 
+import frontmatter
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, override_settings
+from django.db import connection, connections, router
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIClient
 
-from .image_bed import ImageBedUploadError
+from sync.http_client import HttpResponse
+from sync.parser import read_frontmatter_header
+from sync.payload_store import expand_payload
+from sync.service import sync_post_payload
+
+from .github_projects import GITHUB_API, GITHUB_GRAPHQL_URL
+from .image_bed import ImageBedUploadError, UploadedImageResult
+from .management.commands.move_analytics_data import Command as MoveAnalyticsDataCommand
+from .management.commands.sync_obsidian_collections import _RateLimiter
 from .models import (
     BarrageComment,
     GameItem,
+    GithubProject,
     HighlightItem,
     HighlightStage,
     HomeLike,
     HomeLikeVote,
+    ObsidianDocument,
+    ObsidianSyncRun,
     PhotoWallImage,
     Post,
     PostLike,
     PostLikeVote,
     PostView,
+    SiteVisit,
     SocialFriend,
     SocialMediaStat,
     SyncLog,
+    SyncLogRollup,
+    SyncPayloadBlob,
     TimelineNode,
     TimeSeriesConfig,
     TravelPlace,
+    WishItem,
 )
 
 
 class ApiTests(TestCase):
+    databases = {"default", "analytics"}
+
     def setUp(self):
         self.client = APIClient()
         cache.clear()
@@ -210,10 +234,17 @@ class ApiTests(TestCase):
         PostView.objects.create(post=mid, views=6)
         PostView.objects.create(post=top, views=12)
 
-        resp = self.client.get(reverse("posts-list"), {"sort": "views"})
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse("posts-list"), {"sort": "views"})
         self.assertEqual(resp.status_code, 200)
         slugs = [item["slug"] for item in resp.data["data"]["results"]]
         self.assertEqual(slugs[:3], ["views-top", "views-mid", "hello"])
+        self.assertEqual(resp.data["data"]["count"], 3)
+        # The SQL does not grow with the number of viewed posts.
+        self.assertFalse(any("CASE" in query["sql"] for query in queries.captured_queries))
+
+        resp = self.client.get(reverse("posts-list"), {"sort": "views", "page_size": 1, "page": 2})
+        self.assertEqual([item["slug"] for item in resp.data["data"]["results"]], ["views-mid"])
 
     def test_posts_list_filters_tag_case_insensitive(self):
         resp = self.client.get(reverse("posts-list"), {"tag": "DJANGO"})
@@ -283,6 +314,28 @@ class ApiTests(TestCase):
         self.assertEqual(HomeLikeVote.objects.count(), 0)
         self.assertEqual(HomeLike.objects.first().likes, 0)  # type: ignore[union-attr]
 
+    def test_like_endpoints_with_explicit_state_are_idempotent(self):
+        # A retry after a timeout repeats the same desired state instead of flipping it back.
+        post_like = reverse("posts-like", args=[self.post.slug])
+        for _ in range(2):
+            resp = self.client.post(post_like, {"liked": True}, format="json", REMOTE_ADDR="5.6.7.8")
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.data["data"]["liked"])
+            self.assertEqual(resp.data["data"]["likes"], 1)
+            resp = self.client.post(reverse("home-like"), {"liked": True}, format="json", REMOTE_ADDR="5.6.7.8")
+            self.assertTrue(resp.data["data"]["liked"])
+            self.assertEqual(resp.data["data"]["likes"], 1)
+
+        for _ in range(2):
+            resp = self.client.post(post_like, {"liked": False}, format="json", REMOTE_ADDR="5.6.7.8")
+            self.assertFalse(resp.data["data"]["liked"])
+            self.assertEqual(resp.data["data"]["likes"], 0)
+        self.assertEqual(PostLike.objects.get(post=self.post).likes, 0)
+
+        resp = self.client.post(reverse("home-like"), {"liked": "maybe"}, format="json", REMOTE_ADDR="5.6.7.8")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(HomeLikeVote.objects.count(), 1)
+
     def test_home_stats_include_home_likes_in_total(self):
         PostLike.objects.create(post=self.post, likes=2)
         PostLikeVote.objects.create(post=self.post, ip_hash="post-ip")
@@ -565,6 +618,91 @@ class ApiTests(TestCase):
         self.assertNotIn("/posts/draft/", content)
 
 
+class AnalyticsRouterTests(TestCase):
+    databases = {"default", "analytics"}
+
+    def test_engagement_rows_live_in_the_analytics_database(self):
+        post = Post.objects.create(title="统计", slug="stats", content="正文")
+        PostView.objects.create(post=post, views=3)
+        PostLikeVote.objects.create(post=post, ip_hash="a" * 32)
+
+        self.assertEqual(PostView.objects.using("analytics").get().views, 3)
+        self.assertEqual(router.db_for_write(SiteVisit), "analytics")
+        self.assertEqual(router.db_for_write(Post), "default")
+        self.assertEqual(Post.objects.prefetch_related("view_record").get().views_count, 3)
+
+        post.delete()
+        self.assertFalse(PostView.objects.exists())
+        self.assertFalse(PostLikeVote.objects.exists())
+
+
+    def test_engagement_admin_changelists_and_search_stay_in_the_analytics_database(self):
+        staff = get_user_model().objects.create_user(username="stats-admin", password="x", is_staff=True, is_superuser=True)
+        self.client.force_login(staff)
+        post = Post.objects.create(title="统计文章", slug="stats-admin", content="正文")
+        PostView.objects.create(post=post, views=5)
+        PostLike.objects.create(post=post, likes=2)
+
+        for name in ("postview", "postlike"):
+            changelist = reverse(f"admin:blog_{name}_changelist")
+            resp = self.client.get(changelist)
+            self.assertEqual(resp.status_code, 200)
+            self.assertContains(resp, "统计文章")
+            resp = self.client.get(changelist, {"q": str(post.pk)})
+            self.assertEqual(resp.status_code, 200)
+            self.assertContains(resp, "统计文章")
+            resp = self.client.get(changelist, {"q": "no-such-post"})
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotContains(resp, "统计文章")
+
+
+class MoveAnalyticsDataTests(TransactionTestCase):
+    databases = {"default", "analytics"}
+
+    def setUp(self):
+        # The legacy table is what pre-analytics deployments still have in the default database.
+        with connections["default"].schema_editor() as editor:
+            editor.create_model(SiteVisit)
+        self.addCleanup(self._drop_legacy_table)
+
+    def _drop_legacy_table(self):
+        with connections["default"].schema_editor() as editor:
+            editor.delete_model(SiteVisit)
+
+    def test_interrupted_move_resumes_after_live_writes(self):
+        legacy = SiteVisit.objects.using("default")
+        legacy.bulk_create([SiteVisit(path=f"/legacy/{index}", ip_hash="a" * 32) for index in range(5)])
+        first_seen = timezone.now() - timedelta(days=30)
+        legacy.update(created_at=first_seen)
+
+        move_batch = MoveAnalyticsDataCommand._move_batch
+        batches: list[int] = []
+
+        def interrupted(command, model, ids):
+            if batches:
+                raise RuntimeError("killed")
+            batches.append(len(ids))
+            return move_batch(command, model, ids)
+
+        with patch.object(MoveAnalyticsDataCommand, "_move_batch", interrupted), self.assertRaises(RuntimeError):
+            call_command("move_analytics_data", "--batch-size", "2", stdout=StringIO())
+        self.assertEqual(legacy.count(), 3)
+
+        # The app starts and records visits before the next run.
+        live = SiteVisit.objects.create(path="/live", ip_hash="b" * 32)
+        self.assertGreater(live.pk, max(SiteVisit.objects.using("default").values_list("pk", flat=True)))
+
+        output = StringIO()
+        call_command("move_analytics_data", "--batch-size", "2", stdout=output)
+
+        self.assertIn("moved 3 rows", output.getvalue())
+        self.assertFalse(legacy.exists())
+        self.assertEqual(SiteVisit.objects.using("analytics").count(), 6)
+        self.assertEqual(
+            SiteVisit.objects.using("analytics").filter(path__startswith="/legacy/", created_at=first_seen).count(), 5
+        )
+
+
 class AuthTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -687,6 +825,23 @@ class SyncObsidianCommandTests(TestCase):
             post.refresh_from_db()
             self.assertTrue(post.draft)
 
+    def test_sync_obsidian_generation_sweep_keeps_unchanged_posts(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vault = Path(temp_dir)
+            note = "---\ntags:\n  - publish\n---\n\n正文\n"
+            self._write_note(vault, "3-Knowledge/keep.md", note)
+            removed = self._write_note(vault, "3-Knowledge/removed.md", note)
+            call_command("sync_obsidian", str(vault), stdout=StringIO())
+            self.assertEqual(Post.objects.filter(draft=False).count(), 2)
+
+            removed.unlink()
+            with CaptureQueriesContext(connection) as queries:
+                call_command("sync_obsidian", str(vault), stdout=StringIO())
+
+            self.assertFalse(Post.objects.get(obsidian_path="3-Knowledge/keep.md").draft)
+            self.assertTrue(Post.objects.get(obsidian_path="3-Knowledge/removed.md").draft)
+            self.assertFalse(any("NOT" in query["sql"] and "obsidian_path\" IN" in query["sql"] for query in queries))
+
     def test_sync_obsidian_whitelist_excludes_other_roots(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             vault = Path(temp_dir)
@@ -792,6 +947,8 @@ class SyncObsidianCommandTests(TestCase):
                         "https://example.com/api",
                         "--remote-token-env",
                         "TEST_SYNC_TOKEN",
+                        "--remote-protocol",
+                        "per-note",
                     )
 
             self.assertEqual(remote_post.call_count, 2)
@@ -800,6 +957,266 @@ class SyncObsidianCommandTests(TestCase):
             self.assertEqual(sync_payload["tags"], ["kb"])
             self.assertEqual(sync_payload["obsidian_path"], "3-Knowledge（知识库）/remote.md")
 
+    @override_settings(OBSIDIAN_SYNC_TOKEN="sync-token")
+    def test_sync_obsidian_remote_bulk_sends_only_changed_notes(self):
+        requests: list[tuple[str, str, dict]] = []
+        api = APIClient()
+
+        def forward(method, url, *, headers=None, body=None, payload=None, **kwargs):
+            # Route the command's HTTP calls into this test's API so both ends of the protocol run.
+            headers = dict(headers or {})
+            encoding = headers.get("Content-Encoding", "")
+            raw = body if body is not None else json.dumps(payload).encode("utf-8")
+            sent = json.loads(gzip.decompress(raw) if encoding == "gzip" else raw)
+            requests.append((url.rsplit("/api/", 1)[-1], encoding, sent))
+            response = api.post(
+                url.replace("https://example.com", ""),
+                data=raw,
+                content_type="application/json",
+                HTTP_X_OBSIDIAN_SYNC_TOKEN=headers.get("X-Obsidian-Sync-Token", ""),
+                **({"HTTP_CONTENT_ENCODING": encoding} if encoding else {}),
+            )
+            return HttpResponse(status=response.status_code, reason="", headers={}, body=response.content, url=url)
+
+        def sync():
+            requests.clear()
+            with patch.dict(os.environ, {"TEST_SYNC_TOKEN": "sync-token"}, clear=False):
+                with patch("blog.management.commands.sync_obsidian.shared_client") as client:
+                    client.return_value.request.side_effect = forward
+                    call_command(
+                        "sync_obsidian", str(vault), "--target", "remote", "--remote-base-url",
+                        "https://example.com/api", "--remote-token-env", "TEST_SYNC_TOKEN", stdout=StringIO(),
+                    )
+            return [(endpoint, encoding) for endpoint, encoding, _sent in requests]
+
+        with tempfile.TemporaryDirectory() as temp_dir, override_settings(SYNC_CACHE_DIR=Path(temp_dir) / "cache"):
+            vault = Path(temp_dir) / "vault"
+            note = "---\ntitle: {title}\nslug: {slug}\ntags: [publish]\n---\n\n{body}\n"
+            self._write_note(vault, "3-Knowledge/a.md", note.format(title="甲", slug="bulk-a", body="正文甲"))
+            self._write_note(vault, "3-Knowledge/b.md", note.format(title="乙", slug="bulk-b", body="正文乙"))
+
+            self.assertEqual(
+                sync(), [("admin/obsidian-sync/manifest/", "gzip"), ("admin/obsidian-sync/bulk/", "gzip")]
+            )
+            self.assertEqual(Post.objects.filter(slug__in=["bulk-a", "bulk-b"], draft=False).count(), 2)
+
+            # Nothing changed: the manifest alone, with the reconcile applied on the server.
+            self.assertEqual(sync(), [("admin/obsidian-sync/manifest/", "gzip")])
+
+            self._write_note(vault, "3-Knowledge/a.md", note.format(title="甲", slug="bulk-a", body="新正文"))
+            (vault / "3-Knowledge/b.md").unlink()
+            self.assertEqual(len(sync()), 2)
+            uploaded = requests[1][2]
+            self.assertEqual([item["obsidian_path"] for item in uploaded["items"]], ["3-Knowledge/a.md"])
+            # The server issues the generation; the client's clock is never used.
+            self.assertTrue(requests[0][2]["new_generation"])
+            self.assertNotIn("sync_generation", requests[0][2])
+            self.assertEqual(uploaded["sync_generation"], Post.objects.get(slug="bulk-a").sync_generation)
+            self.assertNotIn("published_paths", uploaded["reconcile"])
+
+        self.assertEqual(Post.objects.get(slug="bulk-a").content.strip(), "新正文")
+        self.assertTrue(Post.objects.get(slug="bulk-b").draft)
+
+    @override_settings(OBSIDIAN_SYNC_TOKEN="sync-token")
+    def test_obsidian_manifest_stamps_unchanged_posts_and_reconciles_by_generation(self):
+        self.enterContext(override_settings(SYNC_CACHE_DIR=Path(self.enterContext(tempfile.TemporaryDirectory()))))
+        payload = {"title": "保留", "slug": "gen-keep", "content": "正文", "obsidian_path": "3-Knowledge/keep.md"}
+        sync_post_payload(dict(payload), source=SyncLog.Source.API, operator=None, generation=1)
+        sync_post_payload(
+            {"title": "过期", "slug": "gen-stale", "content": "正文", "obsidian_path": "3-Knowledge/stale.md"},
+            source=SyncLog.Source.API,
+            operator=None,
+            generation=1,
+        )
+        keep = Post.objects.get(slug="gen-keep")
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = APIClient().post(
+                reverse("admin-obsidian-manifest"),
+                {
+                    "items": [{"obsidian_path": keep.obsidian_path, "content_hash": keep.sync_hash}],
+                    "sync_generation": 5,
+                    "reconcile": {"scope_prefixes": ["3-Knowledge"], "behavior": "draft"},
+                },
+                format="json",
+                HTTP_X_OBSIDIAN_SYNC_TOKEN="sync-token",
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["data"]["needed"], [])
+        self.assertEqual(resp.data["data"]["reconcile"]["drafted"], 1)
+        keep.refresh_from_db()
+        self.assertEqual(keep.sync_generation, 5)
+        self.assertFalse(keep.draft)
+        self.assertTrue(Post.objects.get(slug="gen-stale").draft)
+        self.assertFalse(any(" NOT IN " in query["sql"] for query in queries.captured_queries))
+
+    @override_settings(OBSIDIAN_SYNC_TOKEN="sync-token")
+    def test_obsidian_manifest_issues_a_generation_above_every_stored_stamp(self):
+        self.enterContext(override_settings(SYNC_CACHE_DIR=Path(self.enterContext(tempfile.TemporaryDirectory()))))
+        # Stamped by a machine whose clock ran far ahead of the server's.
+        ahead = 10**18
+        sync_post_payload(
+            {"title": "过期", "slug": "gen-ahead", "content": "正文", "obsidian_path": "3-Knowledge/ahead.md"},
+            source=SyncLog.Source.API,
+            operator=None,
+            generation=ahead,
+        )
+
+        resp = APIClient().post(
+            reverse("admin-obsidian-manifest"),
+            {"items": [], "new_generation": True, "reconcile": {"scope_prefixes": ["3-Knowledge"], "behavior": "draft"}},
+            format="json",
+            HTTP_X_OBSIDIAN_SYNC_TOKEN="sync-token",
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreater(resp.data["data"]["sync_generation"], ahead)
+        self.assertTrue(Post.objects.get(slug="gen-ahead").draft)
+
+    @override_settings(OBSIDIAN_SYNC_TOKEN="sync-token")
+    def test_obsidian_bulk_endpoint_rejects_corrupt_gzip(self):
+        response = APIClient().post(
+            reverse("admin-obsidian-bulk-sync"),
+            data=b"not gzip",
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+            HTTP_X_OBSIDIAN_SYNC_TOKEN="sync-token",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def _write_image(self, vault: Path, relative_path: str, width: int, height: int, *, salt: bytes = b"") -> Path:
+        # A PNG header is all the size probe reads; ``salt`` makes distinct bytes for the same size.
+        path = vault / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+        path.write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + b"\0\0\0\0" + salt)
+        return path
+
+    def test_sync_obsidian_stores_embedded_images_once_and_rewrites_references(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            vault = root / "vault"
+            image = self._write_image(vault, "9-Assets/pic.png", 40, 30)
+            self._write_image(vault, "3-Knowledge/img/copy.png", 40, 30)
+            self._write_note(
+                vault,
+                "3-Knowledge/images.md",
+                "---\ntitle: 图片\nslug: post-images\ntags: [publish]\n---\n\n"
+                "![[pic.png]]\n![[pic.png|20]]\n![图注](img/copy.png)\n![[gone.png]]\n"
+                "`![[pic.png]]`\n```\n![[pic.png]]\n```\n",
+            )
+            settings_override = override_settings(
+                MEDIA_ROOT=root / "media",
+                SYNC_CACHE_DIR=root / "cache",
+                POST_ATTACHMENT_URL="https://cdn.example.com/posts/",
+            )
+            digest = hashlib.sha256(image.read_bytes()).hexdigest()
+            url = f"https://cdn.example.com/posts/sha256/{digest[:2]}/{digest}.png"
+
+            with settings_override:
+                out = StringIO()
+                call_command("sync_obsidian", str(vault), "--attachments", "local", stdout=out)
+                self.assertIn("attachments: storage=local, stored=1, reused=0, missing=1", out.getvalue())
+                self.assertTrue((root / "media/posts/sha256" / digest[:2] / f"{digest}.png").is_file())
+                content = Post.objects.get(slug="post-images").content
+                self.assertIn(f"![]({url}#w=40&h=30)", content)
+                self.assertIn(f"![]({url}#w=20&h=15)", content)
+                self.assertIn(f"![图注]({url}#w=40&h=30)", content)
+                self.assertIn("![[gone.png]]", content)
+                self.assertIn("`![[pic.png]]`\n```\n![[pic.png]]\n```", content)
+
+                out = StringIO()
+                call_command("sync_obsidian", str(vault), "--attachments", "local", "--force", stdout=out)
+                self.assertIn("stored=0, reused=1", out.getvalue())
+
+    def test_sync_obsidian_uploads_new_images_to_image_bed_in_one_call(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            vault = root / "vault"
+            self._write_image(vault, "3-Knowledge/a.png", 10, 10)
+            self._write_image(vault, "3-Knowledge/b.png", 10, 10, salt=b"b")
+            self._write_note(
+                vault,
+                "3-Knowledge/bed.md",
+                "---\ntitle: 图床\nslug: post-image-bed\ntags: [publish]\n---\n\n![[a.png]] ![[b.png]]\n",
+            )
+
+            def upload(handles, operator=""):
+                return [
+                    UploadedImageResult(image_url=f"https://img.example.com/{Path(handle.name).name}", source_url="", path="", sha="")
+                    for handle in handles
+                ]
+
+            with override_settings(SYNC_CACHE_DIR=root / "cache"):
+                with patch("sync.attachments.upload_photos_to_obsidian_images", side_effect=upload) as uploader:
+                    call_command("sync_obsidian", str(vault), "--attachments", "image-bed", stdout=StringIO())
+                    call_command(
+                        "sync_obsidian", str(vault), "--attachments", "image-bed", "--force", stdout=StringIO()
+                    )
+
+        self.assertEqual(uploader.call_count, 1)
+        self.assertEqual(len(uploader.call_args.args[0]), 2)
+        self.assertEqual(
+            Post.objects.get(slug="post-image-bed").content.strip(),
+            "![](https://img.example.com/a.png#w=10&h=10) ![](https://img.example.com/b.png#w=10&h=10)",
+        )
+
+    def test_sync_obsidian_keeps_publishing_notes_when_the_image_bed_fails(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            vault = root / "vault"
+            self._write_image(vault, "3-Knowledge/a.png", 10, 10)
+            self._write_image(vault, "3-Knowledge/b.png", 10, 10, salt=b"b")
+            self._write_note(
+                vault,
+                "3-Knowledge/outage.md",
+                "---\ntitle: 故障\nslug: post-image-outage\ntags: [publish]\n---\n\n![[a.png]] ![[b.png]]\n",
+            )
+
+            def upload(handles, operator=""):
+                if len(handles) > 1 or Path(handles[0].name).name == "b.png":
+                    raise ImageBedUploadError("图床上传失败（HTTP 502）")
+                return [UploadedImageResult(image_url="https://img.example.com/a.png", source_url="", path="", sha="")]
+
+            out = StringIO()
+            with override_settings(SYNC_CACHE_DIR=root / "cache"):
+                with patch("sync.attachments.upload_photos_to_obsidian_images", side_effect=upload):
+                    call_command("sync_obsidian", str(vault), "--attachments", "image-bed", stdout=out)
+
+        self.assertIn("failed=0", out.getvalue().split("Sync completed:")[1].splitlines()[0])
+        self.assertIn("stored=1, reused=0, missing=0, failed=1", out.getvalue())
+        self.assertIn("Image kept as written in 3-Knowledge/outage.md: 3-Knowledge/b.png", out.getvalue())
+        post = Post.objects.get(slug="post-image-outage")
+        self.assertFalse(post.draft)
+        self.assertEqual(post.content.strip(), "![](https://img.example.com/a.png#w=10&h=10) ![[b.png]]")
+
+    def test_sync_obsidian_loads_full_note_only_for_publish_candidates(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vault = Path(temp_dir)
+            self._write_note(vault, "3-Knowledge/private.md", "---\ntags: [note]\n---\n\n" + "私密正文\n" * 5000)
+            self._write_note(vault, "3-Knowledge/plain.md", "没有 frontmatter 的笔记\n")
+            self._write_note(vault, "3-Knowledge/public.md", "---\ntitle: 公开\ntags:\n  - publish\n---\n\n正文\n")
+
+            with patch("blog.management.commands.sync_obsidian.frontmatter.load", wraps=frontmatter.load) as load:
+                call_command("sync_obsidian", str(vault), "--force", stdout=StringIO())
+
+            self.assertEqual([Path(call.args[0]).name for call in load.call_args_list], ["public.md"])
+            self.assertEqual(list(Post.objects.values_list("title", flat=True)), ["公开"])
+
+    def test_read_frontmatter_header_is_bounded(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vault = Path(temp_dir)
+            cases = {
+                "yaml.md": ("\n---\ntags: [publish]\n---\nbody\n", {"tags": ["publish"]}),
+                "none.md": ("# 标题\n---\ntags: [publish]\n---\n", {}),
+                "open.md": ("---\ntags: [publish]\n" + "x: 1\n" * 20000, None),
+                "toml.md": ("+++\ntags = ['publish']\n+++\n", None),
+            }
+            for name, (content, expected) in cases.items():
+                path = self._write_note(vault, name, content)
+                self.assertEqual(read_frontmatter_header(path), expected, name)
+
     def test_sync_obsidian_remote_mode_requires_token_env(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             vault = Path(temp_dir)
@@ -815,6 +1232,242 @@ class SyncObsidianCommandTests(TestCase):
                     "MISSING_SYNC_TOKEN",
                 )
 
+    def test_sync_obsidian_documents_sweeps_missing_documents(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vault = Path(temp_dir)
+            self._write_note(vault, "1-Information/keep.md", "# 保留\n")
+            broken = self._write_note(vault, "1-Information/broken.md", "# 之后损坏\n")
+            gone = self._write_note(vault, "1-Information/gone.md", "# 删除\n")
+            call_command("sync_obsidian_documents", str(vault), stdout=StringIO())
+            post = Post.objects.create(title="已发布", slug="gone", content="x", category="tech", draft=False)
+            ObsidianDocument.objects.filter(vault_path="1-Information/gone.md").update(linked_post=post)
+
+            gone.unlink()
+            broken.write_text("---\ntitle: [\n---\n", encoding="utf-8")
+            call_command("sync_obsidian_documents", str(vault), stdout=StringIO())
+
+        self.assertEqual(
+            dict(ObsidianDocument.objects.values_list("vault_path", "source_exists")),
+            {"1-Information/keep.md": True, "1-Information/broken.md": True, "1-Information/gone.md": False},
+        )
+        post.refresh_from_db()
+        self.assertTrue(post.draft)
+        run = ObsidianSyncRun.objects.latest("id")
+        self.assertEqual((run.missing_count, run.drafted_count), (1, 1))
+
+    def test_sync_obsidian_documents_records_stage_timings(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vault = Path(temp_dir)
+            self._write_note(vault, "1-Information/a.md", "---\ntitle: A\n---\n\n正文\n")
+            self._write_note(vault, "1-Information/b.md", "# B\n\n正文\n")
+            call_command("sync_obsidian_documents", str(vault))
+
+        run = ObsidianSyncRun.objects.get()
+        self.assertEqual(run.stage_timings["scan"]["count"], 2)
+        self.assertEqual(run.stage_timings["parse_yaml"]["count"], 2)
+        self.assertIsNotNone(run.stage_timings["read"]["p95_ms"])
+        self.assertIn("reconcile", run.stage_timings)
+
+        sync_post_payload(
+            {"title": "计时", "slug": "timed", "content": "正文"},
+            mode=SyncLog.Mode.OVERWRITE,
+            source=SyncLog.Source.API,
+        )
+        self.assertEqual(set(SyncLog.objects.get().stage_timings), {"coerce", "db_read", "db_write"})
+
+
+
+class SyncObsidianCollectionsTests(TestCase):
+    WISH_PATH = "2-Resource/80_生活记录/消费/愿望清单.md"
+
+    def _write_wishes(self, vault: Path, *rows: str) -> None:
+        path = vault / self.WISH_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("| 物品 | 价格 | 备注 |\n| --- | --- | --- |\n" + "\n".join(rows) + "\n", encoding="utf-8")
+
+    def _sync(self, vault: Path):
+        with patch(
+            "blog.management.commands.sync_obsidian_collections._deepseek_complete",
+            side_effect=lambda kind, payload, timeout: {"description": f"AI {payload['title']}"},
+        ) as complete:
+            call_command("sync_obsidian_collections", "--vault", str(vault), "--ai-rate", "0", stdout=StringIO())
+        return complete
+
+    def test_deepseek_enrichment_only_asks_about_new_or_changed_candidates(self):
+        with tempfile.TemporaryDirectory() as temp_dir, override_settings(SYNC_CACHE_DIR=Path(temp_dir) / "cache"):
+            vault = Path(temp_dir) / "vault"
+            self._write_wishes(vault, "| 键盘 | 699 | |", "| 耳机 | 1299 | |")
+
+            self.assertEqual(self._sync(vault).call_count, 2)
+            self.assertEqual(WishItem.objects.get(title="键盘").description, "AI 键盘")
+
+            self.assertEqual(self._sync(vault).call_count, 0)
+
+            WishItem.objects.all().delete()
+            self.assertEqual(self._sync(vault).call_count, 0)
+            self.assertEqual(WishItem.objects.get(title="耳机").description, "AI 耳机")
+
+            self._write_wishes(vault, "| 键盘 | 599 | |", "| 耳机 | 1299 | |")
+            complete = self._sync(vault)
+            self.assertEqual([call.args[1]["title"] for call in complete.call_args_list], ["键盘"])
+
+    def test_dropped_wishes_are_swept_by_generation(self):
+        with tempfile.TemporaryDirectory() as temp_dir, override_settings(SYNC_CACHE_DIR=Path(temp_dir) / "cache"):
+            vault = Path(temp_dir) / "vault"
+            self._write_wishes(vault, "| 键盘 | 699 | |", "| 耳机 | 1299 | |")
+            self._sync(vault)
+            self._write_wishes(vault, "| 键盘 | 699 | |")
+            self._sync(vault)
+
+            self.assertEqual(
+                dict(WishItem.objects.filter(obsidian_path=self.WISH_PATH).values_list("title", "is_active")),
+                {"键盘": True, "耳机": False},
+            )
+
+    def test_rate_limiter_spaces_calls(self):
+        now = [10.0]
+        sleeps: list[float] = []
+
+        def sleep(seconds: float) -> None:
+            sleeps.append(seconds)
+
+        limiter = _RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            limiter.wait()
+        self.assertEqual(sleeps, [0.25, 0.5])
+
+
+class _ScriptedHttpClient:
+    def __init__(self, *responses: HttpResponse):
+        self.responses = list(responses)
+        self.calls: list[tuple[str, str, dict, dict | None]] = []
+
+    def request(self, method, url, *, headers=None, payload=None, **kwargs):
+        self.calls.append((method, url, dict(headers or {}), payload))
+        return self.responses.pop(0)
+
+
+def _json_response(status: int, body, headers: dict[str, str] | None = None) -> HttpResponse:
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    return HttpResponse(status=status, reason="", headers=headers or {}, body=data, url="")
+
+
+def _graphql_repo(name: str, stars: int, issues: int = 0, pulls: int = 0) -> dict:
+    return {
+        "name": name,
+        "description": f"{name} desc",
+        "url": f"https://github.com/hqy2020/{name}",
+        "homepageUrl": "",
+        "stargazerCount": stars,
+        "forkCount": 1,
+        "primaryLanguage": {"name": "Python"},
+        "repositoryTopics": {"nodes": [{"topic": {"name": "blog"}}]},
+        "issues": {"totalCount": issues},
+        "pullRequests": {"totalCount": pulls},
+    }
+
+
+class RefreshGithubProjectsTests(TestCase):
+    def setUp(self):
+        GithubProject.objects.all().delete()
+
+    def _project(self, name: str, **fields) -> GithubProject:
+        defaults = {
+            "name": name,
+            "description": f"{name} desc",
+            "html_url": f"https://github.com/hqy2020/{name}",
+            "language": "Python",
+            "topics": ["blog"],
+            "forks_count": 1,
+        }
+        return GithubProject.objects.create(full_name=f"hqy2020/{name}", **{**defaults, **fields})
+
+    def _refresh(self, client, *args):
+        with patch("blog.github_projects.shared_client", return_value=client):
+            call_command("refresh_github_projects", *args, stdout=StringIO())
+
+    def test_graphql_refresh_batches_projects_and_bulk_updates_changes(self):
+        self._project("alpha", stars_count=5)
+        self._project("beta", stars_count=7)
+        self._project("gone", stars_count=1)
+        client = _ScriptedHttpClient(
+            _json_response(200, {"data": {"r0": _graphql_repo("alpha", 9, issues=2, pulls=1), "r1": _graphql_repo("beta", 7)}}),
+            _json_response(200, {"data": {"r0": None}, "errors": [{"type": "NOT_FOUND"}]}),
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self._refresh(client, "--token", "t", "--chunk-size", "2")
+
+        self.assertEqual([(method, url) for method, url, _, _ in client.calls], [("POST", GITHUB_GRAPHQL_URL)] * 2)
+        self.assertEqual(client.calls[0][3]["variables"], {"o0": "hqy2020", "n0": "alpha", "o1": "hqy2020", "n1": "beta"})
+        self.assertEqual(client.calls[0][2]["Authorization"], "Bearer t")
+        alpha = GithubProject.objects.get(name="alpha")
+        self.assertEqual((alpha.stars_count, alpha.open_issues_count), (9, 3))
+        self.assertIsNotNone(alpha.synced_at)
+        self.assertIsNotNone(GithubProject.objects.get(name="beta").synced_at)
+        self.assertIsNone(GithubProject.objects.get(name="gone").synced_at)
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("UPDATE")]), 2)
+
+    def test_rest_fallback_sends_etag_and_reuses_cached_fields_on_304(self):
+        self._project("alpha", stars_count=5)
+        repo = {"name": "alpha", "html_url": "https://github.com/hqy2020/alpha", "stargazers_count": 6, "forks_count": 1}
+        with tempfile.TemporaryDirectory() as temp_dir, override_settings(SYNC_CACHE_DIR=Path(temp_dir)):
+            self._refresh(_ScriptedHttpClient(_json_response(200, repo, {"etag": '"v1"'})), "--token", "")
+            self.assertEqual(GithubProject.objects.get().stars_count, 6)
+
+            client = _ScriptedHttpClient(_json_response(304, None))
+            self._refresh(client, "--token", "")
+
+        self.assertEqual(client.calls[0][1], f"{GITHUB_API}/repos/hqy2020/alpha")
+        self.assertEqual(client.calls[0][2]["If-None-Match"], '"v1"')
+        self.assertEqual(GithubProject.objects.get().stars_count, 6)
+
+
+class SyncLogRetentionTests(TestCase):
+    def _sync(self, slug: str, content: str):
+        sync_post_payload({"title": slug, "slug": slug, "content": content}, source=SyncLog.Source.API)
+
+    def test_unchanged_content_is_stored_once_and_expands_back(self):
+        content = "长正文 " * 200
+        self._sync("same", content)
+        self._sync("same", content)
+
+        logs = list(SyncLog.objects.order_by("id"))
+        self.assertEqual(len(logs), 2)
+        self.assertEqual(SyncPayloadBlob.objects.count(), 1)
+        self.assertEqual(logs[0].payload["content"], logs[1].payload["content"])
+        self.assertIn("$blob", logs[0].payload["content"])
+        self.assertEqual(logs[0].payload["title"], "same")
+        self.assertEqual(expand_payload(logs[1].payload)["content"], content)
+
+    def test_prune_rolls_up_old_logs_in_batches_and_reclaims_blobs(self):
+        for index in range(3):
+            self._sync(f"old-{index}", f"旧正文 {index} " * 200)
+        old = timezone.now() - timedelta(days=40)
+        SyncLog.objects.update(started_at=old)
+        SyncPayloadBlob.objects.update(last_used_at=old)
+        self._sync("fresh", "新正文 " * 200)
+
+        stdout = StringIO()
+        call_command("prune_sync_logs", "--keep-days", "30", "--batch-size", "2", stdout=stdout)
+
+        self.assertIn("logs=3 batches=2", stdout.getvalue())
+        self.assertEqual(list(SyncLog.objects.values_list("slug", flat=True)), ["fresh"])
+        rollup = SyncLogRollup.objects.get()
+        self.assertEqual((rollup.day, rollup.count), (timezone.localdate(old), 3))
+        self.assertEqual(SyncPayloadBlob.objects.count(), 1)
+        self.assertEqual(expand_payload(SyncLog.objects.get().payload)["content"], "新正文 " * 200)
+
+    def test_max_batches_bounds_a_single_run(self):
+        for index in range(3):
+            self._sync(f"old-{index}", "正文")
+        SyncLog.objects.update(started_at=timezone.now() - timedelta(days=40))
+
+        call_command("prune_sync_logs", "--batch-size", "1", "--max-batches", "2", stdout=StringIO())
+
+        self.assertEqual(SyncLog.objects.count(), 1)
+        self.assertEqual(SyncLogRollup.objects.get().count, 2)
+
 
 class AdminApiTests(TestCase):
     def setUp(self):
@@ -1068,9 +1721,53 @@ class AdminApiTests(TestCase):
         self.assertEqual(photo.title, "Token 照片")
         self.assertTrue(photo.image_url.endswith("/from-token.jpg"))
         self.assertEqual(photo.obsidian_path, "2-Resource/90_网站同步/01_照片墙/照片墙.md")
+        self.assertEqual(photo.content_sha256, hashlib.sha256(b"fake-jpg").hexdigest())
+
+    @override_settings(OBSIDIAN_SYNC_TOKEN="sync-token")
+    def test_obsidian_photo_manifest_reports_unchanged_rows_and_known_hashes(self):
+        note = "2-Resource/90_网站同步/01_照片墙/照片墙.md"
+        content_sha256 = hashlib.sha256(b"fake-jpg").hexdigest()
+        PhotoWallImage.objects.create(
+            title="本地照片",
+            image_url="https://raw.githubusercontent.com/hqy2020/obsidian-images/main/gallery/local.jpg",
+            source_url="https://github.com/hqy2020/obsidian-images/blob/main/gallery/local.jpg",
+            content_sha256=content_sha256,
+            sort_order=10,
+            obsidian_path=note,
+            sync_key="local-key",
+        )
+        PhotoWallImage.objects.create(
+            title="旧照片",
+            image_url="https://example.com/old.jpg",
+            obsidian_path=note,
+            sync_key="old-key",
+        )
+
+        resp = self.client.post(
+            reverse("admin-obsidian-photo-manifest"),
+            {
+                "obsidian_path": note,
+                "photos": [
+                    {"sync_key": "local-key", "title": "本地照片", "sort_order": "10", "is_public": "true", "content_sha256": content_sha256},
+                    {"sync_key": "remote-key", "title": "远端照片", "image_url": "https://example.com/remote.jpg"},
+                ],
+                "hashes": [content_sha256, "0" * 64],
+            },
+            format="json",
+            HTTP_X_OBSIDIAN_SYNC_TOKEN="sync-token",
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        data = resp.data["data"]
+        self.assertEqual(data["unchanged"], ["local-key"])
+        self.assertEqual(data["existing"], ["local-key"])
+        self.assertEqual(list(data["hashes"]), [content_sha256])
+        self.assertEqual(data["stale"], 1)
 
     @override_settings(OBSIDIAN_SYNC_TOKEN="sync-token")
     def test_obsidian_photo_reconcile_deactivates_missing_rows(self):
+        # A private cache dir per test, so lock and index files never leak between tests.
+        self.enterContext(override_settings(SYNC_CACHE_DIR=Path(self.enterContext(tempfile.TemporaryDirectory()))))
         PhotoWallImage.objects.create(
             title="旧同步照片",
             image_url="https://raw.githubusercontent.com/hqy2020/obsidian-images/main/gallery/old-sync.jpg",
@@ -1131,6 +1828,8 @@ class AdminApiTests(TestCase):
 
     @override_settings(OBSIDIAN_SYNC_TOKEN="sync-token")
     def test_obsidian_reconcile_draft_with_token(self):
+        # A private cache dir per test, so lock and index files never leak between tests.
+        self.enterContext(override_settings(SYNC_CACHE_DIR=Path(self.enterContext(tempfile.TemporaryDirectory()))))
         Post.objects.create(
             title="A",
             slug="reconcile-a",
@@ -1240,6 +1939,23 @@ class PhotoWallAdminUploadTests(TestCase):
         self.assertIn("raw.githubusercontent.com/hqy2020/obsidian-images", payload["data"]["image_url"])
         self.assertIn("/blob/main/", payload["data"]["source_url"])
 
+    def test_upload_image_sends_multiple_files_as_one_batch(self):
+        self.client.force_login(self.staff_user)
+        uploads = [
+            SimpleUploadedFile(f"cloud-{index}.png", b"\x89PNG\r\n\x1a\n%d" % index, content_type="image/png")
+            for index in range(2)
+        ]
+        results = [
+            type("UploadResult", (), {"image_url": f"https://img/{index}.png", "source_url": "", "path": f"{index}.png", "sha": ""})()
+            for index in range(2)
+        ]
+        with patch("blog.admin.upload_photos_to_obsidian_images", return_value=results) as batch:
+            resp = self.client.post(reverse("admin:blog_photowallimage_upload_image"), {"file": uploads})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(batch.call_count, 1)
+        self.assertEqual([item["image_url"] for item in resp.json()["data"]["items"]], ["https://img/0.png", "https://img/1.png"])
+
     def test_upload_image_propagates_image_bed_error(self):
         self.client.force_login(self.staff_user)
         upload = SimpleUploadedFile("cloud.png", b"\x89PNG\r\n\x1a\nmock", content_type="image/png")
@@ -1252,6 +1968,8 @@ class PhotoWallAdminUploadTests(TestCase):
 
 
 class AdminContentCrudApiTests(TestCase):
+    databases = {"default", "analytics"}
+
     def setUp(self):
         self.client = APIClient()
         self.staff_user = get_user_model().objects.create_user(
@@ -11,7 +11,10 @@ from .views import (
     AdminHighlightStageCreateView,
     AdminHighlightStageDetailView,
     AdminHighlightsView,
+    AdminObsidianBulkSyncView,
+    AdminObsidianManifestView,
     AdminObsidianReconcileView,
+    AdminObsidianPhotoManifestView,
     AdminObsidianPhotoReconcileView,
     AdminObsidianPhotoSyncView,
     AdminObsidianSyncView,
@@ -153,7 +156,10 @@ urlpatterns = [
     path("admin/games/<int:game_id>/", AdminGameItemDetailView.as_view()),
     path("admin/obsidian-sync/", AdminObsidianSyncView.as_view(), name="admin-obsidian-sync"),
     path("admin/obsidian-sync/reconcile/", AdminObsidianReconcileView.as_view(), name="admin-obsidian-reconcile"),
+    path("admin/obsidian-sync/manifest/", AdminObsidianManifestView.as_view(), name="admin-obsidian-manifest"),
+    path("admin/obsidian-sync/bulk/", AdminObsidianBulkSyncView.as_view(), name="admin-obsidian-bulk-sync"),
     path("admin/obsidian-sync/photos/", AdminObsidianPhotoSyncView.as_view(), name="admin-obsidian-photo-sync"),
+    path("admin/obsidian-sync/photos/manifest/", AdminObsidianPhotoManifestView.as_view(), name="admin-obsidian-photo-manifest"),
     path("admin/obsidian-sync/photos/reconcile/", AdminObsidianPhotoReconcileView.as_view(), name="admin-obsidian-photo-reconcile"),
     path("admin/analytics", AdminAnalyticsView.as_view(), name="admin-analytics"),
     path("admin/analytics/", AdminAnalyticsView.as_view()),
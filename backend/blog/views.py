@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import math
 from datetime import date, timedelta
 from pathlib import Path
@@ -8,10 +9,9 @@ from uuid import uuid4
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.storage import default_storage
-from django.db import connection, transaction
-from django.db.models import BooleanField, Case, F, IntegerField, Q, Sum, Value, When
+from django.db import connection, router, transaction
+from django.db.models import BooleanField, Case, F, IntegerField, Max, Q, Sum, Value, When
 from django.db.models.expressions import RawSQL
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
@@ -20,6 +20,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .github_projects import GITHUB_API, rest_project_fields
 from .image_bed import ImageBedUploadError, upload_photo_to_obsidian_images
 from .models import (
     BarrageComment,
@@ -46,6 +47,7 @@ from .models import (
     WikiQuote,
     WishItem,
 )
+from .parsers import GzipJSONParser
 from .permissions import IsStaffOrSyncToken, IsStaffUser
 from .serializers import (
     BarrageCommentPublicSerializer,
@@ -53,6 +55,9 @@ from .serializers import (
     AdminImageUploadSerializer,
     BookAdminSerializer,
     BookSerializer,
+    AdminObsidianBulkSyncRequestSerializer,
+    AdminObsidianManifestRequestSerializer,
+    AdminObsidianPhotoManifestRequestSerializer,
     AdminObsidianPhotoReconcileRequestSerializer,
     AdminObsidianPhotoSyncRequestSerializer,
     AdminObsidianReconcileRequestSerializer,
@@ -86,9 +91,15 @@ from .serializers import (
     WishItemAdminSerializer,
     WishItemSerializer,
 )
-from sync.service import reconcile_obsidian_publications, sync_post_payload
+from .write_executor import WriteTimeout, run_write
+from sync.generations import next_generation, stamp_generation
+from sync.http_client import HttpError, shared_client
+from sync.locks import SyncLockBusy, sync_lease
+from sync.service import reconcile_obsidian_publications, sync_payload_hash, sync_post_payload
 
 OBSIDIAN_IMAGES_REPO_URL = "https://github.com/hqy2020/obsidian-images"
+# Bulk reconcile endpoints wait this long for a running vault sync before answering 409.
+SYNC_LEASE_WAIT_SECONDS = 10
 
 
 def api_ok(data, status_code=status.HTTP_200_OK):
@@ -106,6 +117,10 @@ def api_error(code, message, status_code):
     return Response({"ok": False, "code": code, "message": message}, status=status_code)
 
 
+def _write_busy():
+    return api_error("busy", "写入繁忙，请稍后再试", status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
 def filter_posts_by_tag(queryset, tag: str):
     normalized_tag = str(tag or "").strip()
     if not normalized_tag:
@@ -137,6 +152,20 @@ def _parse_bool_query(raw_value: str | None):
     return None
 
 
+def _desired_like_state(request) -> tuple[bool | None, bool]:
+    """``(liked, valid)`` from the request body.
+
+    Clients send the state they want, which makes a retried request
+    harmless; ``liked`` is ``None`` when the body omits it (older clients
+    that still toggle).
+    """
+    raw_value = request.data.get("liked") if hasattr(request.data, "get") else None
+    if raw_value is None:
+        return None, True
+    liked = _parse_bool_query(raw_value)
+    return liked, liked is not None
+
+
 def _is_staff_viewer(request) -> bool:
     user = getattr(request, "user", None)
     if bool(getattr(user, "is_authenticated", False) and getattr(user, "is_staff", False)):
@@ -193,6 +222,29 @@ def _resolve_photo_sync_source_url(image_url: str, source_url: str) -> str:
     return normalized_image or OBSIDIAN_IMAGES_REPO_URL
 
 
+def _photo_sync_defaults(payload: dict, *, image_url: str, source_url: str, content_sha256: str) -> dict:
+    return {
+        "title": str(payload.get("title") or "")[:120],
+        "description": str(payload.get("description") or ""),
+        "image_url": image_url,
+        "source_url": source_url[:800],
+        "content_sha256": content_sha256,
+        "captured_at": payload.get("captured_at"),
+        "is_public": bool(payload.get("is_public", True)),
+        "sort_order": int(payload.get("sort_order", 0)),
+        "obsidian_path": str(payload.get("obsidian_path") or ""),
+        "sync_key": str(payload.get("sync_key") or "").strip(),
+    }
+
+
+def _uploaded_file_sha256(upload) -> str:
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
 def _find_photo_sync_candidate(sync_key: str, image_url: str, source_url: str) -> PhotoWallImage | None:
     candidate = None
     if sync_key:
@@ -217,15 +269,37 @@ class HealthCheckView(APIView):
         )
 
 
-class PostListView(generics.ListAPIView):
+class _ViewsSortedPostsMixin:
+    """Serve ``sort=views`` for post lists.
+
+    View counts live in the analytics database, which SQL cannot join against,
+    so post ids are ordered in Python and only the requested page is loaded.
+    """
+
+    def paginate_queryset(self, queryset):
+        if str(self.request.query_params.get("sort", "")).strip() != "views":
+            return super().paginate_queryset(queryset)
+        views = dict(PostView.objects.filter(views__gt=0).values_list("post_id", "views"))
+        # sorted() is stable, so posts with equal views keep the recency order.
+        ids = sorted(
+            queryset.order_by("-updated_at", "-id").values_list("id", flat=True),
+            key=lambda post_id: -views.get(post_id, 0),
+        )
+        page_ids = super().paginate_queryset(ids)
+        if page_ids is None:
+            return None
+        posts = queryset.in_bulk(page_ids)
+        return [posts[post_id] for post_id in page_ids if post_id in posts]
+
+
+class PostListView(_ViewsSortedPostsMixin, generics.ListAPIView):
     serializer_class = PostListSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        queryset = Post.objects.filter(draft=False).select_related("view_record", "like_record")
+        queryset = Post.objects.filter(draft=False).prefetch_related("view_record", "like_record")
         category = self.request.query_params.get("category")
         tag = self.request.query_params.get("tag")
-        sort = self.request.query_params.get("sort", "latest")
 
         if category:
             queryset = queryset.filter(category=category)
@@ -233,14 +307,8 @@ class PostListView(generics.ListAPIView):
         if tag:
             queryset = filter_posts_by_tag(queryset, tag)
 
-        if sort == "views":
-            queryset = queryset.annotate(
-                sort_views=Coalesce("view_record__views", Value(0), output_field=IntegerField())
-            ).order_by("-sort_views", "-updated_at", "-id")
-        else:
-            queryset = queryset.order_by("-updated_at", "-id")
-
-        return queryset
+        # sort=views is ordered page by page in _ViewsSortedPostsMixin.
+        return queryset.order_by("-updated_at", "-id")
 
     def list(self, request, *args, **kwargs):
         response = super().list(request, *args, **kwargs)
@@ -253,7 +321,7 @@ class PostDetailView(generics.RetrieveAPIView):
     lookup_field = "slug"
 
     def get_queryset(self):
-        return Post.objects.filter(draft=False).select_related("view_record", "like_record")
+        return Post.objects.filter(draft=False).prefetch_related("view_record", "like_record")
 
     def retrieve(self, request, *args, **kwargs):
         response = super().retrieve(request, *args, **kwargs)
@@ -275,8 +343,14 @@ class IncrementPostView(APIView):
             record, _ = PostView.objects.get_or_create(post=post)
             return api_ok({"slug": slug, "views": record.views, "throttled": True})
 
-        PostView.objects.get_or_create(post=post)
-        PostView.objects.filter(post=post).update(views=F("views") + 1)
+        def increment():
+            PostView.objects.get_or_create(post=post)
+            PostView.objects.filter(post=post).update(views=F("views") + 1)
+
+        try:
+            run_write(increment, using=router.db_for_write(PostView))
+        except WriteTimeout:
+            return _write_busy()
         cache.set(cache_key, True, timeout=int(timedelta(minutes=30).total_seconds()))
 
         record = PostView.objects.get(post=post)
@@ -315,17 +389,25 @@ class TogglePostLike(APIView):
             return api_error("not_found", "文章不存在", status.HTTP_404_NOT_FOUND)
 
         ip_hash = self._get_ip_hash(request)
-        vote = PostLikeVote.objects.filter(post=post, ip_hash=ip_hash).first()
+        desired, valid = _desired_like_state(request)
+        if not valid:
+            return api_error("invalid_liked", "liked 必须是布尔值", status.HTTP_400_BAD_REQUEST)
+
+        def toggle() -> tuple[bool, int]:
+            vote = PostLikeVote.objects.filter(post=post, ip_hash=ip_hash).first()
+            liked = vote is None if desired is None else desired
+            if liked and vote is None:
+                PostLikeVote.objects.create(post=post, ip_hash=ip_hash)
+            elif not liked and vote is not None:
+                vote.delete()
+            likes = PostLikeVote.objects.filter(post=post).count()
+            PostLike.objects.update_or_create(post=post, defaults={"likes": likes})
+            return liked, likes
 
-        if vote:
-            vote.delete()
-            liked = False
-        else:
-            PostLikeVote.objects.create(post=post, ip_hash=ip_hash)
-            liked = True
-
-        likes = PostLikeVote.objects.filter(post=post).count()
-        PostLike.objects.update_or_create(post=post, defaults={"likes": likes})
+        try:
+            liked, likes = run_write(toggle, using=router.db_for_write(PostLikeVote))
+        except WriteTimeout:
+            return _write_busy()
         return api_ok({"slug": slug, "likes": likes, "liked": liked})
 
 
@@ -357,21 +439,30 @@ class ToggleHomeLike(APIView):
 
     def post(self, request):
         ip_hash = self._get_ip_hash(request)
-        vote = HomeLikeVote.objects.filter(ip_hash=ip_hash).first()
-        if vote:
-            vote.delete()
-            liked = False
-        else:
-            HomeLikeVote.objects.create(ip_hash=ip_hash)
-            liked = True
+        desired, valid = _desired_like_state(request)
+        if not valid:
+            return api_error("invalid_liked", "liked 必须是布尔值", status.HTTP_400_BAD_REQUEST)
+
+        def toggle() -> tuple[bool, int]:
+            vote = HomeLikeVote.objects.filter(ip_hash=ip_hash).first()
+            liked = vote is None if desired is None else desired
+            if liked and vote is None:
+                HomeLikeVote.objects.create(ip_hash=ip_hash)
+            elif not liked and vote is not None:
+                vote.delete()
+            likes = int(HomeLikeVote.objects.count())
+            summary = HomeLike.objects.order_by("id").first()
+            if summary is None:
+                HomeLike.objects.create(likes=likes)
+            else:
+                summary.likes = likes
+                summary.save(update_fields=["likes", "updated_at"])
+            return liked, likes
 
-        likes = int(HomeLikeVote.objects.count())
-        summary = HomeLike.objects.order_by("id").first()
-        if summary is None:
-            HomeLike.objects.create(likes=likes)
-        else:
-            summary.likes = likes
-            summary.save(update_fields=["likes", "updated_at"])
+        try:
+            liked, likes = run_write(toggle, using=router.db_for_write(HomeLikeVote))
+        except WriteTimeout:
+            return _write_busy()
         return api_ok({"likes": likes, "liked": liked})
 
 
@@ -412,13 +503,19 @@ class RecordSiteVisitView(APIView):
 
         user_agent = str(request.META.get("HTTP_USER_AGENT", ""))[:500]
 
-        SiteVisit.objects.create(
-            path=path,
-            referrer=referrer,
-            referrer_domain=referrer_domain,
-            ip_hash=ip_hash,
-            user_agent=user_agent,
-        )
+        try:
+            run_write(
+                lambda: SiteVisit.objects.create(
+                    path=path,
+                    referrer=referrer,
+                    referrer_domain=referrer_domain,
+                    ip_hash=ip_hash,
+                    user_agent=user_agent,
+                ),
+                using=router.db_for_write(SiteVisit),
+            )
+        except WriteTimeout:
+            return _write_busy()
         cache.set(cache_key, True, timeout=int(timedelta(minutes=5).total_seconds()))
         return api_ok({"recorded": True, "throttled": False})
 
@@ -462,15 +559,21 @@ class BarrageCommentListCreateView(APIView):
             return api_error("throttled", "发言太快，请稍后再试", status.HTTP_429_TOO_MANY_REQUESTS)
 
         data = serializer.validated_data
-        comment = BarrageComment.objects.create(
-            nickname="匿名云友",
-            content=data["content"],
-            page_path=data.get("page_path", ""),
-            ip_hash=ip_hash,
-            user_agent=str(request.META.get("HTTP_USER_AGENT", ""))[:500],
-            status=BarrageComment.ReviewStatus.APPROVED,
-            reviewed_at=timezone.now(),
-        )
+        user_agent = str(request.META.get("HTTP_USER_AGENT", ""))[:500]
+        try:
+            comment = run_write(
+                lambda: BarrageComment.objects.create(
+                    nickname="匿名云友",
+                    content=data["content"],
+                    page_path=data.get("page_path", ""),
+                    ip_hash=ip_hash,
+                    user_agent=user_agent,
+                    status=BarrageComment.ReviewStatus.APPROVED,
+                    reviewed_at=timezone.now(),
+                )
+            )
+        except WriteTimeout:
+            return _write_busy()
         cache.set(cache_key, True, timeout=int(timedelta(seconds=30).total_seconds()))
 
         return api_ok(
@@ -680,12 +783,12 @@ class AdminDetailView(generics.RetrieveUpdateDestroyAPIView):
         return api_ok({"deleted": True, "id": deleted_id})
 
 
-class AdminPostListCreateView(AdminListCreateView):
+class AdminPostListCreateView(_ViewsSortedPostsMixin, AdminListCreateView):
     serializer_class = PostAdminSerializer
-    queryset = Post.objects.select_related("view_record").all()
+    queryset = Post.objects.prefetch_related("view_record").all()
 
     def get_queryset(self):
-        queryset = Post.objects.all().select_related("view_record")
+        queryset = Post.objects.all().prefetch_related("view_record")
         category = self.request.query_params.get("category")
         draft = _parse_bool_query(self.request.query_params.get("draft"))
         keyword = str(self.request.query_params.get("q", "")).strip()
@@ -701,10 +804,6 @@ class AdminPostListCreateView(AdminListCreateView):
         if tag:
             queryset = filter_posts_by_tag(queryset, tag)
 
-        if sort == "views":
-            return queryset.annotate(
-                sort_views=Coalesce("view_record__views", Value(0), output_field=IntegerField())
-            ).order_by("-sort_views", "-updated_at", "-id")
         if sort == "oldest":
             return queryset.order_by("updated_at", "id")
         if sort == "title_asc":
@@ -717,7 +816,7 @@ class AdminPostListCreateView(AdminListCreateView):
 
 class AdminPostDetailView(AdminDetailView):
     serializer_class = PostAdminSerializer
-    queryset = Post.objects.select_related("view_record").all()
+    queryset = Post.objects.prefetch_related("view_record").all()
     lookup_field = "id"
     lookup_url_kwarg = "post_id"
 
@@ -882,9 +981,11 @@ class AdminObsidianPhotoSyncView(APIView):
         sync_key = str(payload.get("sync_key") or "").strip()
         normalized_image_url = _normalize_remote_image_url(payload.pop("image_url", ""))
         normalized_source_url = _resolve_photo_sync_source_url(normalized_image_url, payload.pop("source_url", ""))
+        content_sha256 = str(payload.pop("content_sha256", "") or "")
         candidate = _find_photo_sync_candidate(sync_key, normalized_image_url, normalized_source_url)
 
         if upload is not None:
+            content_sha256 = _uploaded_file_sha256(upload)
             if not dry_run:
                 try:
                     result = upload_photo_to_obsidian_images(
@@ -896,17 +997,12 @@ class AdminObsidianPhotoSyncView(APIView):
                 normalized_image_url = result.image_url
                 normalized_source_url = result.source_url
 
-        defaults = {
-            "title": str(payload.get("title") or "")[:120],
-            "description": str(payload.get("description") or ""),
-            "image_url": normalized_image_url,
-            "source_url": normalized_source_url[:800],
-            "captured_at": payload.get("captured_at"),
-            "is_public": bool(payload.get("is_public", True)),
-            "sort_order": int(payload.get("sort_order", 0)),
-            "obsidian_path": str(payload.get("obsidian_path") or ""),
-            "sync_key": sync_key,
-        }
+        defaults = _photo_sync_defaults(
+            payload,
+            image_url=normalized_image_url,
+            source_url=normalized_source_url,
+            content_sha256=content_sha256,
+        )
 
         action = "updated" if candidate is not None else "created"
         if not dry_run:
@@ -927,6 +1023,61 @@ class AdminObsidianPhotoSyncView(APIView):
         )
 
 
+class AdminObsidianPhotoManifestView(APIView):
+    """Tell a remote photo sync which rows are already current and which image hashes exist.
+
+    ``unchanged`` rows need no request at all, ``hashes`` maps known content
+    hashes to their image-bed URLs so only new images are uploaded, and
+    ``stale`` counts the public rows a reconcile would hide.
+    """
+
+    permission_classes = [IsStaffOrSyncToken]
+
+    def post(self, request):
+        serializer = AdminObsidianPhotoManifestRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        obsidian_path = str(serializer.validated_data["obsidian_path"]).strip()
+        items = serializer.validated_data.get("photos", [])
+        hashes = set(serializer.validated_data.get("hashes", []))
+        sync_keys = [str(item["sync_key"]).strip() for item in items]
+
+        photos = {photo.sync_key: photo for photo in PhotoWallImage.objects.filter(sync_key__in=sync_keys)}
+        unchanged = []
+        for item, sync_key in zip(items, sync_keys):
+            photo = photos.get(sync_key)
+            if photo is None:
+                continue
+            content_sha256 = str(item.get("content_sha256") or "")
+            image_url = _normalize_remote_image_url(item.get("image_url", ""))
+            expected = _photo_sync_defaults(
+                {**item, "obsidian_path": obsidian_path},
+                image_url=photo.image_url if content_sha256 else image_url,
+                source_url=photo.source_url if content_sha256 else _resolve_photo_sync_source_url(image_url, item.get("source_url", "")),
+                content_sha256=content_sha256 or photo.content_sha256,
+            )
+            if all(getattr(photo, field) == value for field, value in expected.items()):
+                unchanged.append(sync_key)
+
+        known_hashes = {}
+        if hashes:
+            for photo in PhotoWallImage.objects.filter(content_sha256__in=hashes).exclude(image_url=""):
+                known_hashes.setdefault(photo.content_sha256, {"image_url": photo.image_url, "source_url": photo.source_url})
+
+        stale = PhotoWallImage.objects.filter(obsidian_path=obsidian_path, is_public=True)
+        if sync_keys:
+            stale = stale.exclude(sync_key__in=sync_keys)
+
+        return api_ok(
+            {
+                "existing": sorted(photos),
+                "unchanged": unchanged,
+                "hashes": known_hashes,
+                "stale": stale.count(),
+            }
+        )
+
+
 class AdminObsidianPhotoReconcileView(APIView):
     permission_classes = [IsStaffOrSyncToken]
 
@@ -940,9 +1091,13 @@ class AdminObsidianPhotoReconcileView(APIView):
         queryset = PhotoWallImage.objects.filter(obsidian_path=obsidian_path, is_public=True)
         if active_sync_keys:
             queryset = queryset.exclude(sync_key__in=active_sync_keys)
-        matched = queryset.count()
-        if not dry_run and matched:
-            queryset.update(is_public=False, updated_at=timezone.now())
+        try:
+            with sync_lease(holder="api:photo-reconcile", wait=SYNC_LEASE_WAIT_SECONDS):
+                matched = queryset.count()
+                if not dry_run and matched:
+                    queryset.update(is_public=False, updated_at=timezone.now())
+        except SyncLockBusy as exc:
+            return api_error("sync_busy", str(exc), status.HTTP_409_CONFLICT)
 
         return api_ok({"action": "updated", "matched": matched, "deactivated": matched})
 
@@ -1112,6 +1267,7 @@ class AdminObsidianSyncView(APIView):
         payload = dict(serializer.validated_data)
         mode = payload.pop("mode", SyncLog.Mode.OVERWRITE)
         dry_run = bool(payload.pop("dry_run", False))
+        generation = payload.pop("sync_generation", None)
         operator = request.user if request.user and request.user.is_authenticated else None
         try:
             outcome = sync_post_payload(
@@ -1120,6 +1276,8 @@ class AdminObsidianSyncView(APIView):
                 source=SyncLog.Source.API,
                 operator=operator,
                 dry_run=dry_run,
+                generation=generation,
+                content_hash=sync_payload_hash(request.data, mode),
             )
         except ValueError as exc:
             return api_error("sync_failed", str(exc), status.HTTP_400_BAD_REQUEST)
@@ -1144,14 +1302,18 @@ class AdminObsidianReconcileView(APIView):
 
         payload = dict(serializer.validated_data)
         try:
-            result = reconcile_obsidian_publications(
-                published_paths=payload.get("published_paths", []),
-                scope_prefixes=payload.get("scope_prefixes", []),
-                behavior=payload.get("behavior", "draft"),
-                source=SyncLog.Source.API,
-                operator=operator,
-                dry_run=bool(payload.get("dry_run", False)),
-            )
+            with sync_lease(holder="api:reconcile", wait=SYNC_LEASE_WAIT_SECONDS):
+                result = reconcile_obsidian_publications(
+                    published_paths=payload.get("published_paths", []),
+                    scope_prefixes=payload.get("scope_prefixes", []),
+                    behavior=payload.get("behavior", "draft"),
+                    source=SyncLog.Source.API,
+                    operator=operator,
+                    dry_run=bool(payload.get("dry_run", False)),
+                    generation=payload.get("sync_generation"),
+                )
+        except SyncLockBusy as exc:
+            return api_error("sync_busy", str(exc), status.HTTP_409_CONFLICT)
         except ValueError as exc:
             return api_error("reconcile_failed", str(exc), status.HTTP_400_BAD_REQUEST)
 
@@ -1168,6 +1330,168 @@ class AdminObsidianReconcileView(APIView):
         return api_ok(response_serializer.validated_data)
 
 
+def _session_reconcile(
+    reconcile: dict, *, published_paths: list[str], dry_run: bool, operator, generation: int | None = None
+) -> dict:
+    """Reconcile at the end of a manifest/bulk session.
+
+    With the session's ``generation`` every post the client still publishes
+    has been stamped (written by a batch or confirmed by the manifest), so
+    stale posts are one ``sync_generation`` range; paths are the fallback
+    for clients that send no generation.
+    """
+    with sync_lease(holder="api:reconcile", wait=SYNC_LEASE_WAIT_SECONDS):
+        result = reconcile_obsidian_publications(
+            published_paths=[] if generation else reconcile.get("published_paths", published_paths),
+            scope_prefixes=reconcile.get("scope_prefixes", []),
+            behavior=reconcile.get("behavior", "draft"),
+            source=SyncLog.Source.API,
+            operator=operator,
+            dry_run=dry_run,
+            generation=generation,
+        )
+    return {
+        "behavior": result.behavior,
+        "matched": result.matched,
+        "drafted": result.drafted,
+        "deleted": result.deleted,
+        "sync_log_id": result.sync_log.id,
+    }
+
+
+class AdminObsidianManifestView(APIView):
+    """First step of a remote post sync: say which notes the server needs.
+
+    The client sends ``(obsidian_path, content_hash)`` for every publish
+    candidate; ``needed`` lists the paths whose post is missing, drafted or
+    carries a different ``sync_hash``. The others are stamped with the
+    session's ``sync_generation``. When nothing is needed the optional
+    ``reconcile`` runs here too, so an unchanged vault costs one request.
+
+    With ``new_generation`` the server issues the session's generation and
+    returns it; sweeps then compare generations from one clock only.
+    """
+
+    permission_classes = [IsStaffOrSyncToken]
+    parser_classes = [GzipJSONParser]
+
+    def post(self, request):
+        serializer = AdminObsidianManifestRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        hashes = {str(item["obsidian_path"]).strip(): item["content_hash"] for item in data.get("items", [])}
+        mode = data.get("mode", SyncLog.Mode.OVERWRITE)
+        dry_run = bool(data.get("dry_run"))
+        generation = data.get("sync_generation")
+        if data.get("new_generation") and not dry_run:
+            # Also above every stamp already stored, should the server clock ever step back.
+            stamped = Post.objects.aggregate(latest=Max("sync_generation"))["latest"] or 0
+            generation = max(next_generation(), stamped + 1)
+
+        posts = {
+            post.obsidian_path: post
+            for post in Post.objects.filter(sync_source=Post.SyncSource.OBSIDIAN, obsidian_path__in=list(hashes)).only(
+                "obsidian_path", "sync_hash", "draft"
+            )
+        }
+        needed = []
+        unchanged_ids = []
+        for path, content_hash in hashes.items():
+            post = posts.get(path)
+            if post is None or post.draft:
+                needed.append(path)
+            elif mode != SyncLog.Mode.SKIP and post.sync_hash != content_hash:
+                needed.append(path)
+            else:
+                unchanged_ids.append(post.pk)
+        if generation and not dry_run:
+            # Unchanged posts are never sent, so they are confirmed for this session here.
+            stamp_generation(Post, unchanged_ids, generation)
+
+        reconcile = None
+        if not needed and "reconcile" in data:
+            operator = request.user if request.user and request.user.is_authenticated else None
+            try:
+                reconcile = _session_reconcile(
+                    data["reconcile"],
+                    published_paths=list(hashes),
+                    dry_run=dry_run,
+                    operator=operator,
+                    generation=generation,
+                )
+            except SyncLockBusy as exc:
+                return api_error("sync_busy", str(exc), status.HTTP_409_CONFLICT)
+            except ValueError as exc:
+                return api_error("reconcile_failed", str(exc), status.HTTP_400_BAD_REQUEST)
+
+        return api_ok(
+            {
+                "needed": needed,
+                "unchanged": len(hashes) - len(needed),
+                "reconcile": reconcile,
+                "sync_generation": generation,
+            }
+        )
+
+
+class AdminObsidianBulkSyncView(APIView):
+    """Apply a batch of note payloads (usually gzip-compressed) and, on the last batch, the reconcile."""
+
+    permission_classes = [IsStaffOrSyncToken]
+    parser_classes = [GzipJSONParser]
+
+    def post(self, request):
+        serializer = AdminObsidianBulkSyncRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        mode = data.get("mode", SyncLog.Mode.OVERWRITE)
+        dry_run = bool(data.get("dry_run", False))
+        generation = data.get("sync_generation")
+        operator = request.user if request.user and request.user.is_authenticated else None
+
+        results = []
+        for item in data.get("items", []):
+            obsidian_path = str(item.get("obsidian_path") or "").strip()
+            item_serializer = AdminObsidianSyncRequestSerializer(data={**item, "mode": mode, "dry_run": dry_run})
+            if not item_serializer.is_valid():
+                results.append({"obsidian_path": obsidian_path, "action": "failed", "error": str(item_serializer.errors)})
+                continue
+            payload = dict(item_serializer.validated_data)
+            for key in ("mode", "dry_run", "sync_generation"):
+                payload.pop(key, None)
+            try:
+                outcome = sync_post_payload(
+                    payload,
+                    mode=mode,
+                    source=SyncLog.Source.API,
+                    operator=operator,
+                    dry_run=dry_run,
+                    generation=generation,
+                    content_hash=sync_payload_hash(item, mode),
+                )
+            except ValueError as exc:
+                results.append({"obsidian_path": obsidian_path, "action": "failed", "error": str(exc)})
+                continue
+            results.append({"obsidian_path": obsidian_path, "action": outcome.action, "error": ""})
+
+        reconcile = None
+        if "reconcile" in data:
+            try:
+                reconcile = _session_reconcile(
+                    data["reconcile"],
+                    published_paths=data["reconcile"].get("published_paths", []),
+                    dry_run=dry_run,
+                    operator=operator,
+                    generation=generation,
+                )
+            except SyncLockBusy as exc:
+                return api_error("sync_busy", str(exc), status.HTTP_409_CONFLICT)
+            except ValueError as exc:
+                return api_error("reconcile_failed", str(exc), status.HTTP_400_BAD_REQUEST)
+
+        return api_ok({"results": results, "reconcile": reconcile})
+
+
 def _travel_payload() -> list[dict]:
     rows = TravelPlace.objects.all().order_by("sort_order", "province", "city")
     grouped: dict[str, dict] = {}
@@ -1279,6 +1603,7 @@ def _home_stats_payload() -> dict:
         if isinstance(row, list):
             tags.update(str(item) for item in row if item)
 
+    # Engagement counters are separate aggregates against the analytics database; nothing here joins Post.
     views_total = PostView.objects.aggregate(total=Sum("views"))["total"] or 0
     views_total = int(views_total)
     views_delta_week = 0
@@ -1513,7 +1838,7 @@ def _home_payload(*, show_real_name: bool = False) -> dict:
     photo_wall = _photo_wall_payload()
     pinned_qs = (
         Post.objects.filter(draft=False, is_pinned=True)
-        .select_related("view_record", "like_record")
+        .prefetch_related("view_record", "like_record")
         .order_by("pin_order", "-created_at")[:12]
     )
     projects = GithubProject.objects.filter(is_public=True).order_by("sort_order", "name")[:6]
@@ -1606,31 +1931,28 @@ class AdminProjectImportGithubView(APIView):
         parsed = _urlparse(repo_url)
         parts = [p for p in parsed.path.strip("/").split("/") if p]
         owner, repo = parts[0], parts[1]
-        api_url = f"https://api.github.com/repos/{owner}/{repo}"
+        api_url = f"{GITHUB_API}/repos/{owner}/{repo}"
 
-        import json
-        import urllib.request
-
-        req = urllib.request.Request(api_url, headers={"Accept": "application/vnd.github.v3+json", "User-Agent": "openingcloud-blog"})
+        # An admin is waiting on this request: one retry, and never sleep out a rate limit.
         try:
-            with urllib.request.urlopen(req, timeout=15) as resp:
-                gh_data = json.loads(resp.read().decode())
-        except Exception as exc:
+            response = shared_client().request(
+                "GET",
+                api_url,
+                headers={"Accept": "application/vnd.github.v3+json"},
+                timeout=15,
+                retries=1,
+                max_wait=0,
+            )
+            if not response.ok:
+                raise HttpError(f"HTTP {response.status}: {response.reason}", url=api_url, response=response)
+            gh_data = response.json()
+        except (HttpError, ValueError) as exc:
             return api_error("github_fetch_failed", f"GitHub API 请求失败: {exc}", status.HTTP_502_BAD_GATEWAY)
 
         full_name = gh_data.get("full_name", f"{owner}/{repo}")
-        defaults = {
-            "name": gh_data.get("name", repo),
-            "description": gh_data.get("description") or "",
-            "html_url": gh_data.get("html_url", repo_url),
-            "language": gh_data.get("language") or "",
-            "topics": gh_data.get("topics") or [],
-            "homepage_url": gh_data.get("homepage") or "",
-            "stars_count": gh_data.get("stargazers_count", 0),
-            "forks_count": gh_data.get("forks_count", 0),
-            "open_issues_count": gh_data.get("open_issues_count", 0),
-            "synced_at": timezone.now(),
-        }
+        defaults = {**rest_project_fields(gh_data), "synced_at": timezone.now()}
+        defaults["name"] = defaults["name"] or repo
+        defaults["html_url"] = defaults["html_url"] or repo_url
 
         project, created = GithubProject.objects.update_or_create(full_name=full_name, defaults=defaults)
         data = GithubProjectAdminSerializer(project).data
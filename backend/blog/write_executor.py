@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+DEFAULT_MAX_BATCH = 64
+# How long the writer lingers after the first queued write to gather a group.
+DEFAULT_LINGER_SECONDS = 0.002
+DEFAULT_TIMEOUT_SECONDS = 5.0
+# Extra time a write the writer already picked up gets to commit before the caller gives up.
+DEFAULT_COMMIT_TIMEOUT_SECONDS = 30.0
+
+
+class WriteTimeout(RuntimeError):
+    pass
+
+
+class WriteStalled(WriteTimeout):
+    """The write started but did not commit in time; it may still commit later."""
+
+
+@dataclass
+class _Job:
+    fn: Callable[[], Any]
+    future: Future
+
+
+class WriteExecutor:
+    """Per-process single writer thread that commits queued writes in groups.
+
+    Request threads hand small write closures to ``run``; the writer drains up
+    to ``max_batch`` of them into one transaction (each in its own savepoint,
+    so one failing closure does not undo its neighbours) and resolves their
+    futures once the group has committed. N threads contending for SQLite's
+    write lock through ``busy_timeout`` become one writer paying one commit.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        linger: float = DEFAULT_LINGER_SECONDS,
+        using: str = DEFAULT_DB_ALIAS,
+    ):
+        self.max_batch = max(1, int(max_batch))
+        self.linger = max(0.0, float(linger))
+        self.using = using
+        self._queue: queue.Queue[_Job | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.writes = 0
+        self.largest_batch = 0
+
+    def submit(self, fn: Callable[[], Any]) -> Future:
+        job = _Job(fn=fn, future=Future())
+        self._ensure_started()
+        self._queue.put(job)
+        return job.future
+
+    def run(
+        self,
+        fn: Callable[[], Any],
+        *,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        commit_timeout: float = DEFAULT_COMMIT_TIMEOUT_SECONDS,
+    ) -> Any:
+        """Run ``fn`` on the writer thread and return its result once committed.
+
+        ``WriteTimeout`` means the write never started and never will. A
+        write the writer has already picked up cannot be withdrawn, so past
+        ``timeout`` the caller waits up to ``commit_timeout`` more for its
+        outcome; ``WriteStalled`` means even that ran out and the write may
+        still commit, so it is only safe for writes a client can repeat.
+
+        Callers already inside a transaction run inline: the writer's
+        connection could not see their uncommitted rows, and waiting on it
+        while holding the write lock would deadlock.
+        """
+        if connections[self.using].in_atomic_block:
+            return fn()
+        future = self.submit(fn)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout as exc:
+            if future.cancel():
+                raise WriteTimeout(f"write not started within {timeout:.1f}s") from exc
+        try:
+            return future.result(timeout=commit_timeout)
+        except FutureTimeout as exc:
+            raise WriteStalled(f"write not committed within {timeout + commit_timeout:.1f}s") from exc
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "writes": self.writes,
+            "largest_batch": self.largest_batch,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f"db-writer-{self.using}", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> tuple[list[_Job], bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is None:
+                self._commit(batch)
+                return [], True
+            batch.append(job)
+        return batch, False
+
+    def _loop(self) -> None:
+        try:
+            while True:
+                batch, stop = self._next_batch()
+                if stop:
+                    return
+                self._commit(batch)
+        finally:
+            connections[self.using].close()
+
+    def _commit(self, batch: list[_Job]) -> None:
+        jobs = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not jobs:
+            return
+        results: list[tuple[_Job, Any, BaseException | None]] = []
+        try:
+            with transaction.atomic(using=self.using):
+                for job in jobs:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            results.append((job, job.fn(), None))
+                    except Exception as exc:  # noqa: BLE001
+                        results.append((job, None, exc))
+        except Exception:  # noqa: BLE001
+            # The group commit itself failed (e.g. the lock was never granted):
+            # retry each write in its own transaction so errors stay per-request.
+            connections[self.using].close_if_unusable_or_obsolete()
+            results = []
+            for job in jobs:
+                try:
+                    with transaction.atomic(using=self.using):
+                        results.append((job, job.fn(), None))
+                except Exception as exc:  # noqa: BLE001
+                    results.append((job, None, exc))
+        self.batches += 1
+        self.writes += len(jobs)
+        self.largest_batch = max(self.largest_batch, len(jobs))
+        for job, value, error in results:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(value)
+
+
+_executors: dict[str, WriteExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def write_executor(using: str = DEFAULT_DB_ALIAS) -> WriteExecutor:
+    """The process's writer for database ``using``; group commit only helps writes to one file."""
+    with _executors_lock:
+        executor = _executors.get(using)
+        if executor is None:
+            executor = _executors[using] = WriteExecutor(
+                max_batch=getattr(settings, "WRITE_EXECUTOR_MAX_BATCH", DEFAULT_MAX_BATCH),
+                using=using,
+            )
+        return executor
+
+
+def run_write(fn: Callable[[], Any], *, using: str = DEFAULT_DB_ALIAS) -> Any:
+    """Run a public-endpoint write through the writer thread of ``using``, or inline when disabled."""
+    if not getattr(settings, "WRITE_EXECUTOR_ENABLED", True):
+        return fn()
+    return write_executor(using).run(
+        fn,
+        timeout=getattr(settings, "WRITE_EXECUTOR_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS),
+        commit_timeout=getattr(settings, "WRITE_EXECUTOR_COMMIT_TIMEOUT_SECONDS", DEFAULT_COMMIT_TIMEOUT_SECONDS),
+    )
@@ -84,8 +84,29 @@ DATABASES = {
         "OPTIONS": {
             "timeout": int(os.getenv("SQLITE_TIMEOUT", "20")),
         },
-    }
+    },
+    # Views, likes and visits get their own file and WAL writer lock; see blog.routers.
+    "analytics": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("ANALYTICS_SQLITE_PATH", str(Path(DB_PATH).with_name(f"{Path(DB_PATH).stem}_analytics.sqlite3"))),
+        "OPTIONS": {
+            "timeout": int(os.getenv("SQLITE_TIMEOUT", "20")),
+        },
+        "PRAGMAS": {
+            # OFF trades the last few counters on power loss for cheaper commits.
+            "synchronous": os.getenv("ANALYTICS_SQLITE_SYNCHRONOUS", "NORMAL"),
+            "wal_autocheckpoint": os.getenv("ANALYTICS_SQLITE_WAL_AUTOCHECKPOINT", "10000"),
+            "journal_size_limit": str(64 * 1024 * 1024),
+        },
+    },
 }
+DATABASE_ROUTERS = ["blog.routers.ShadowBuildRouter", "blog.routers.AnalyticsRouter"]
+
+# Public write endpoints (views, likes, visits, barrage) funnel through one writer thread per process.
+WRITE_EXECUTOR_ENABLED = bool_env("WRITE_EXECUTOR_ENABLED", True)
+WRITE_EXECUTOR_MAX_BATCH = int(os.getenv("WRITE_EXECUTOR_MAX_BATCH", "64"))
+WRITE_EXECUTOR_TIMEOUT_SECONDS = float(os.getenv("WRITE_EXECUTOR_TIMEOUT_SECONDS", "5"))
+WRITE_EXECUTOR_COMMIT_TIMEOUT_SECONDS = float(os.getenv("WRITE_EXECUTOR_COMMIT_TIMEOUT_SECONDS", "30"))
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -104,6 +125,9 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", BASE_DIR / "data" / "uploads"))
+# Locks, ETag/index caches and staged shadow databases. Must stay outside data/,
+# which nginx serves publicly under /media/.
+SYNC_CACHE_DIR = Path(os.getenv("SYNC_CACHE_DIR", BASE_DIR / "state" / "cache"))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -183,6 +207,12 @@ OBSIDIAN_IMAGES_REPO_BRANCH = os.getenv("OBSIDIAN_IMAGES_REPO_BRANCH", "main")
 OBSIDIAN_IMAGES_REPO_PREFIX = os.getenv("OBSIDIAN_IMAGES_REPO_PREFIX", "gallery")
 OBSIDIAN_IMAGES_COMMITTER_NAME = os.getenv("OBSIDIAN_IMAGES_COMMITTER_NAME", "")
 OBSIDIAN_IMAGES_COMMITTER_EMAIL = os.getenv("OBSIDIAN_IMAGES_COMMITTER_EMAIL", "")
+OBSIDIAN_IMAGES_API_BASE = os.getenv("OBSIDIAN_IMAGES_API_BASE", "https://api.github.com")
+OBSIDIAN_IMAGES_UPLOAD_WORKERS = int(os.getenv("OBSIDIAN_IMAGES_UPLOAD_WORKERS", "4"))
+# Where sync_obsidian stores images embedded in posts: local | image-bed | none.
+POST_ATTACHMENT_STORAGE = os.getenv("POST_ATTACHMENT_STORAGE", "local")
+# Public URL of MEDIA_ROOT/posts; nginx serves data/ under /media/. Point it at a CDN to offload images.
+POST_ATTACHMENT_URL = os.getenv("POST_ATTACHMENT_URL", "/media/uploads/posts/")
 ALLOWED_WRITE_ORIGINS = set(CORS_ALLOWED_ORIGINS)
 
 PUBLIC_CONTACT_EMAIL = os.getenv("PUBLIC_CONTACT_EMAIL", "hqy200091@163.com")
@@ -2,6 +2,8 @@
 set -eu
 
 python manage.py migrate --noinput
+python manage.py migrate --database analytics --noinput
+python manage.py move_analytics_data
 python manage.py collectstatic --noinput
 python manage.py backfill_wiki_quote_emphasis || true
 
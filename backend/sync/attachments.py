@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from urllib import parse
+
+from django.conf import settings
+
+from blog.image_bed import ImageBedUploadError, upload_photos_to_obsidian_images
+from sync.markdown import _FENCE, IMAGE_SUFFIXES
+from sync.scanner import DEFAULT_EXCLUDED_DIR_NAMES, _is_excluded
+
+STORAGE_CHOICES = ("local", "image-bed", "none")
+INDEX_FILE_NAME = "post_attachments.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+# Header bytes read to find an image's size; JPEG SOF markers sit after EXIF, which can be large.
+SIZE_PROBE_BYTES = 256 * 1024
+# Inline code is matched first so image syntax inside it is left alone.
+_IMAGE_REF = re.compile(
+    r"(?P<code>`[^`]+`)"
+    r"|!\[\[(?P<embed>[^\]|#]+)(?:#[^\]|]*)?(?:\|(?P<option>[^\]]*))?\]\]"
+    r"|!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)(?:\s+\"[^\"]*\")?\)"
+)
+_EMBED_SIZE = re.compile(r"(\d+)(?:x(\d+))?")
+
+
+@dataclass(frozen=True)
+class Attachment:
+    path: Path
+    digest: str
+    suffix: str
+    width: int | None = None
+    height: int | None = None
+
+    @property
+    def key(self) -> str:
+        """Storage key: the same bytes always map to the same name."""
+        return f"sha256/{self.digest[:2]}/{self.digest}{self.suffix}"
+
+
+def image_size(path: Path) -> tuple[int, int] | None:
+    """Pixel size read from a PNG, GIF, JPEG or WebP header; ``None`` for anything else."""
+    with path.open("rb") as handle:
+        head = handle.read(SIZE_PROBE_BYTES)
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", head[6:10])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        chunk = head[12:16]
+        if chunk == b"VP8 " and len(head) >= 30:
+            width, height = struct.unpack("<HH", head[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L" and len(head) >= 25:
+            bits = int.from_bytes(head[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X" and len(head) >= 30:
+            return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        return None
+    if head[:2] == b"\xff\xd8":
+        offset = 2
+        while offset + 9 < len(head):
+            if head[offset] != 0xFF:
+                offset += 1
+                continue
+            marker = head[offset + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                offset += 1 if marker == 0xFF else 2
+                continue
+            length = struct.unpack(">H", head[offset + 2:offset + 4])[0]
+            # SOF0-SOF15 carry the frame size; C4, C8 and CC are other tables.
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + length
+    return None
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _with_size(url: str, width: int | None, height: int | None) -> str:
+    # Size rides in the fragment: browsers never send it, so CDN cache keys stay the bare URL.
+    if not width or not height:
+        return url
+    return f"{url}#w={width}&h={height}"
+
+
+class PostAttachments:
+    """Resolves images embedded in post notes, stores each unique file once and rewrites the references.
+
+    ``![[img.png]]`` embeds resolve like Obsidian does (vault path, then next
+    to the note, then the shortest vault path with that file name); Markdown
+    ``![alt](path)`` images resolve against the note, then the vault root.
+    Files are addressed by SHA-256, so a renamed or duplicated image is stored
+    once and every URL is immutable. The hash and pixel size of each file are
+    cached by mtime and size, and the URL of each stored hash is remembered,
+    so an unchanged image costs one ``stat`` on re-sync. References that
+    resolve to nothing, or whose file could not be stored, are left as
+    written (counted in ``missing`` / ``failed``), so an image-bed outage
+    never keeps the note itself from syncing.
+    """
+
+    def __init__(self, vault: str | Path, *, storage: str = "local", dry_run: bool = False):
+        if storage not in STORAGE_CHOICES:
+            raise ValueError(f"unknown attachment storage: {storage}")
+        self.vault = Path(vault).expanduser().resolve()
+        self.storage = storage
+        self.dry_run = dry_run
+        self.stored = 0
+        self.reused = 0
+        self.missing = 0
+        self.failed = 0
+        self.errors: list[str] = []
+        self._by_name: dict[str, list[str]] | None = None
+        self._index_path = Path(settings.SYNC_CACHE_DIR) / INDEX_FILE_NAME
+        self._index = self._load_index()
+        self._dirty = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.storage != "none"
+
+    def rewrite(self, content: str, note_relative_path: str) -> str:
+        """Return ``content`` with every resolvable image pointing at its stored copy."""
+        if not self.enabled or "![" not in content:
+            return content
+        note_dir = (self.vault / note_relative_path).parent
+        lines = content.split("\n")
+        found: dict[str, Attachment | None] = {}
+        fence = ""
+        for line in lines:
+            fence = self._fence_state(line, fence)
+            if fence == "" and "![" in line:
+                for target in self._targets(line):
+                    if target not in found:
+                        found[target] = self._attachment(target, note_dir)
+        attachments = {target: attachment for target, attachment in found.items() if attachment is not None}
+        self.missing += len(found) - len(attachments)
+        if not attachments or self.dry_run:
+            return content
+
+        urls = self._store(list({attachment.digest: attachment for attachment in attachments.values()}.values()))
+        rewritten: list[str] = []
+        fence = ""
+        for line in lines:
+            inside = fence != ""
+            fence = self._fence_state(line, fence)
+            if inside or fence != "" or "![" not in line:
+                rewritten.append(line)
+                continue
+            rewritten.append(_IMAGE_REF.sub(lambda match: self._replacement(match, attachments, urls), line))
+        return "\n".join(rewritten)
+
+    def save(self) -> None:
+        """Persist the hash and URL caches; a lost write only costs rehashing next time."""
+        if not self._dirty or self.dry_run:
+            return
+        try:
+            self._index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=self._index_path.parent, prefix=f".{self._index_path.name}.")
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(self._index, handle, ensure_ascii=False)
+            os.replace(temp_name, self._index_path)
+        except OSError:
+            return
+        self._dirty = False
+
+    def summary(self) -> str:
+        return (
+            f"attachments: storage={self.storage}, stored={self.stored}, reused={self.reused}, "
+            f"missing={self.missing}, failed={self.failed}"
+        )
+
+    @staticmethod
+    def _fence_state(line: str, fence: str) -> str:
+        match = _FENCE.match(line)
+        if match is None:
+            return fence
+        marker = match.group(1)
+        if not fence:
+            return marker
+        return "" if marker[0] == fence[0] and len(marker) >= len(fence) else fence
+
+    @staticmethod
+    def _targets(line: str) -> list[str]:
+        targets = []
+        for match in _IMAGE_REF.finditer(line):
+            if match.group("embed") is not None:
+                targets.append(match.group("embed").strip())
+            elif match.group("src") is not None:
+                targets.append(match.group("src"))
+        return targets
+
+    def _replacement(self, match: re.Match, attachments: dict[str, Attachment], urls: dict[str, str]) -> str:
+        if match.group("code") is not None:
+            return match.group(0)
+        if match.group("embed") is not None:
+            attachment = attachments.get(match.group("embed").strip())
+            if attachment is None:
+                return match.group(0)
+            option = str(match.group("option") or "").strip()
+            alt = ""
+            width, height = attachment.width, attachment.height
+            size = _EMBED_SIZE.fullmatch(option)
+            if size and width and height:
+                # ``![[img.png|300]]`` is Obsidian's display width; keep the aspect ratio.
+                display_width = int(size.group(1))
+                height = int(size.group(2)) if size.group(2) else round(height * display_width / width)
+                width = display_width
+            elif option and not size:
+                alt = option
+        else:
+            attachment = attachments.get(match.group("src"))
+            if attachment is None:
+                return match.group(0)
+            alt = match.group("alt").strip()
+            width, height = attachment.width, attachment.height
+        url = urls.get(attachment.digest)
+        if url is None:
+            return match.group(0)
+        return f"![{alt}]({_with_size(url, width, height)})"
+
+    def _attachment(self, target: str, note_dir: Path) -> Attachment | None:
+        path = self._resolve(target, note_dir)
+        if path is None:
+            return None
+        stat = path.stat()
+        relative = path.relative_to(self.vault).as_posix()
+        cached = self._index["files"].get(relative)
+        if not (isinstance(cached, dict) and cached.get("mtime") == stat.st_mtime and cached.get("size") == stat.st_size):
+            size = image_size(path)
+            cached = {
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "sha256": _file_sha256(path),
+                "width": size[0] if size else None,
+                "height": size[1] if size else None,
+            }
+            self._index["files"][relative] = cached
+            self._dirty = True
+        return Attachment(
+            path=path,
+            digest=cached["sha256"],
+            suffix=path.suffix.lower(),
+            width=cached.get("width"),
+            height=cached.get("height"),
+        )
+
+    def _resolve(self, target: str, note_dir: Path) -> Path | None:
+        value = parse.unquote(str(target or "").strip()).replace("\\", "/")
+        if not value or "://" in value or value.startswith(("data:", "/", "#")):
+            return None
+        if not value.lower().endswith(IMAGE_SUFFIXES):
+            return None
+        candidates = [note_dir / value, self.vault / value]
+        if "/" not in value:
+            candidates.extend(self.vault / relative for relative in self._named(value))
+        for candidate in candidates:
+            try:
+                resolved = candidate.resolve()
+                resolved.relative_to(self.vault)
+            except (OSError, ValueError):
+                continue
+            if resolved.is_file():
+                return resolved
+        return None
+
+    def _named(self, name: str) -> list[str]:
+        """Vault paths of files called ``name``, shortest first (Obsidian's pick for a bare embed)."""
+        if self._by_name is None:
+            excluded = {item.lower() for item in DEFAULT_EXCLUDED_DIR_NAMES}
+            self._by_name = {}
+            for dirpath, dirnames, filenames in os.walk(self.vault):
+                relative_dir = Path(dirpath).relative_to(self.vault)
+                dirnames[:] = [item for item in dirnames if not _is_excluded(Path(item), excluded)]
+                for filename in filenames:
+                    if filename.lower().endswith(IMAGE_SUFFIXES):
+                        self._by_name.setdefault(filename.lower(), []).append((relative_dir / filename).as_posix())
+            for paths in self._by_name.values():
+                paths.sort(key=lambda item: (item.count("/"), item))
+        return self._by_name.get(name.lower(), [])
+
+    def _store(self, attachments: list[Attachment]) -> dict[str, str]:
+        """URLs of the stored attachments; one that could not be stored is left out and recorded in ``errors``."""
+        if self.storage != "local":
+            return self._store_image_bed(attachments)
+        urls = {}
+        for attachment in attachments:
+            try:
+                urls[attachment.digest] = self._store_local(attachment)
+            except OSError as exc:
+                self._fail(attachment, exc)
+        return urls
+
+    def _fail(self, attachment: Attachment, exc: Exception) -> None:
+        self.failed += 1
+        self.errors.append(f"{attachment.path.relative_to(self.vault).as_posix()}: {exc}")
+
+    def _store_local(self, attachment: Attachment) -> str:
+        target = Path(settings.MEDIA_ROOT) / "posts" / attachment.key
+        if target.exists():
+            self.reused += 1
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+            os.close(fd)
+            shutil.copyfile(attachment.path, temp_name)
+            os.chmod(temp_name, 0o644)
+            os.replace(temp_name, target)
+            self.stored += 1
+        return f"{str(settings.POST_ATTACHMENT_URL).rstrip('/')}/{attachment.key}"
+
+    def _store_image_bed(self, attachments: list[Attachment]) -> dict[str, str]:
+        repo_key = "{}/{}@{}".format(
+            getattr(settings, "OBSIDIAN_IMAGES_REPO_OWNER", ""),
+            getattr(settings, "OBSIDIAN_IMAGES_REPO_NAME", ""),
+            getattr(settings, "OBSIDIAN_IMAGES_REPO_BRANCH", ""),
+        )
+        known = self._index["image_bed"].setdefault(repo_key, {})
+        urls = {attachment.digest: known[attachment.digest] for attachment in attachments if attachment.digest in known}
+        self.reused += len(urls)
+        pending = [attachment for attachment in attachments if attachment.digest not in urls]
+        if not pending:
+            return urls
+        try:
+            # One commit for every new image of the note.
+            uploaded = list(zip(pending, self._upload(pending)))
+        except (ImageBedUploadError, OSError):
+            # Retry one by one so a single bad file or a short outage costs only those images.
+            uploaded = []
+            for attachment in pending:
+                try:
+                    uploaded.extend(zip([attachment], self._upload([attachment])))
+                except (ImageBedUploadError, OSError) as exc:
+                    self._fail(attachment, exc)
+        for attachment, result in uploaded:
+            urls[attachment.digest] = known[attachment.digest] = result.image_url
+        self.stored += len(uploaded)
+        self._dirty = self._dirty or bool(uploaded)
+        return urls
+
+    @staticmethod
+    def _upload(attachments: list[Attachment]):
+        with ExitStack() as stack:
+            handles = [stack.enter_context(attachment.path.open("rb")) for attachment in attachments]
+            return upload_photos_to_obsidian_images(handles, operator="obsidian-sync")
+
+    def _load_index(self) -> dict:
+        try:
+            data = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        for key in ("files", "image_bed"):
+            if not isinstance(data.get(key), dict):
+                data[key] = {}
+        return data
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator, Sequence
+from typing import Callable, TypeVar
+
+from django.db import transaction
+
+from sync.shadow import content_db_alias
+
+T = TypeVar("T")
+
+DEFAULT_CHUNK_ROWS = 200
+DEFAULT_CHUNK_MS = 100
+# Long enough for a queued public write to win the SQLite write lock between chunks.
+DEFAULT_YIELD_SECONDS = 0.005
+
+
+class ChunkedCommit:
+    """Transaction that commits every ``max_rows`` rows or ``max_ms`` milliseconds.
+
+    ``with transaction.atomic()`` around a whole sync run holds SQLite's write
+    lock until the run ends, so view/like/visit writes queue behind it until
+    ``busy_timeout`` gives up. Writers that report progress through ``tick`` or
+    ``batches`` release the lock after each chunk and pause briefly so waiting
+    writers get in.
+
+    Chunks are committed independently: callers keep a domain consistent by
+    staging rows invisible (inactive, unpublished) while chunking, then
+    flipping visibility in one short ``transaction.atomic()`` after the
+    with-block. Nested inside an outer ``atomic`` block a chunk only releases a
+    savepoint, and nothing is gained by pausing, so it does not.
+
+    ``using`` defaults to the alias content writes currently go to, so chunks
+    wrap the shadow copy's writes during a staged build.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_rows: int = DEFAULT_CHUNK_ROWS,
+        max_ms: float = DEFAULT_CHUNK_MS,
+        pause: float = DEFAULT_YIELD_SECONDS,
+        using: str | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_rows = max(1, int(max_rows))
+        self.max_ms = max(0.0, float(max_ms))
+        self.pause = max(0.0, float(pause))
+        self.using = using or content_db_alias()
+        self._sleep = sleep
+        self._clock = clock
+        self._atomic = None
+        self._started = 0.0
+        self._pending = 0
+        self.rows = 0
+        self.commits = 0
+
+    def __enter__(self) -> ChunkedCommit:
+        self._begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        atomic, self._atomic = self._atomic, None
+        if atomic is not None:
+            atomic.__exit__(exc_type, exc, tb)
+            if exc_type is None and self._pending:
+                self.commits += 1
+        self._pending = 0
+        return False
+
+    def _begin(self) -> None:
+        self._atomic = transaction.atomic(using=self.using)
+        self._atomic.__enter__()
+        self._started = self._clock()
+        self._pending = 0
+
+    def tick(self, rows: int = 1) -> bool:
+        """Count ``rows`` written; commit and yield when the chunk is full. Returns whether it committed."""
+        self.rows += rows
+        self._pending += rows
+        elapsed_ms = (self._clock() - self._started) * 1000
+        if self._pending < self.max_rows and elapsed_ms < self.max_ms:
+            return False
+        self.commit()
+        return True
+
+    def commit(self) -> None:
+        """Commit the current chunk now and open the next one."""
+        if self._atomic is None:
+            raise RuntimeError("ChunkedCommit.commit() outside its with-block")
+        self._atomic.__exit__(None, None, None)
+        self._atomic = None
+        if self._pending:
+            self.commits += 1
+        if self.pause and not transaction.get_connection(self.using).in_atomic_block:
+            self._sleep(self.pause)
+        self._begin()
+
+    def batches(self, items: Sequence[T], size: int | None = None) -> Iterator[Sequence[T]]:
+        """Yield ``items`` in slices of at most ``size`` rows, ticking after each one."""
+        size = max(1, min(size or self.max_rows, self.max_rows))
+        for start in range(0, len(items), size):
+            batch = items[start : start + size]
+            yield batch
+            self.tick(len(batch))
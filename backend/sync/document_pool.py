@@ -1,8 +1,8 @@
 from __future__ import annotations
 
 import hashlib
-import re
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -11,9 +11,15 @@ from django.utils import timezone
 
 from blog.models import ObsidianDocument, ObsidianSyncRun, Post, SyncLog
 from sync.mapper import resolve_category, resolve_slug
+from sync.generations import next_generation, stamp_generation
+from sync.markdown import analyze_markdown
 from sync.parser import build_excerpt, contains_publish_tag, normalize_tags
-from sync.scanner import scan_markdown_files
+from sync.scanner import iter_markdown_files
 from sync.service import sync_post_payload
+from sync.timing import StageTimer
+
+if TYPE_CHECKING:
+    from sync.prepare import PreparedNote
 
 DOCUMENT_POOL_EXCLUDED_DIR_NAMES = (
     ".obsidian",
@@ -43,20 +49,12 @@ def _read_markdown_text(path: Path) -> str:
         return path.read_text(encoding="utf-8", errors="ignore")
 
 
-def _extract_first_heading(content: str) -> str:
-    match = re.search(r"^\s*#\s+(.+?)\s*$", content or "", re.MULTILINE)
-    if not match:
-        return ""
-    return match.group(1).strip().strip("#").strip()
-
-
-def _resolve_title(metadata: dict, content: str, file_stem: str) -> str:
+def _resolve_title(metadata: dict, first_heading: str, file_stem: str) -> str:
     explicit = str(metadata.get("title") or "").strip()
     if explicit:
         return explicit
-    heading = _extract_first_heading(content)
-    if heading:
-        return heading
+    if first_heading:
+        return first_heading
     return str(file_stem or "").strip() or "untitled"
 
 
@@ -80,12 +78,19 @@ def sync_obsidian_documents(
     repo_branch: str = "",
     repo_commit: str = "",
     operator=None,
+    prepared: dict[str, PreparedNote] | None = None,
 ) -> DocumentPoolSyncResult:
+    """Index every note of the vault into ``ObsidianDocument``.
+
+    ``prepared`` maps relative paths to notes parsed ahead of time (see
+    ``sync.prepare``); entries whose file changed since are parsed again here.
+    """
     started_at = timezone.now()
     now = timezone.now()
+    generation = next_generation()
     status = ObsidianSyncRun.Status.SUCCESS
     message = ""
-    scan_paths: set[str] = set()
+    unparsed_paths: list[str] = []
     errors: list[str] = []
     stats = {
         "scanned_count": 0,
@@ -96,6 +101,7 @@ def sync_obsidian_documents(
         "drafted_count": 0,
     }
 
+    timer = StageTimer()
     normalized_trigger = _normalize_trigger(str(trigger or ""))
     normalized_missing_behavior = _normalize_missing_behavior(str(missing_behavior or ""))
     normalized_publish_tag = str(publish_tag or "").strip() or "publish"
@@ -105,7 +111,7 @@ def sync_obsidian_documents(
         if not source_path.exists() or not source_path.is_dir():
             raise ValueError(f"Invalid source path: {source_path}")
 
-        files = scan_markdown_files(
+        entries = iter_markdown_files(
             source_path,
             include_roots=None,
             excluded_dir_names=DOCUMENT_POOL_EXCLUDED_DIR_NAMES,
@@ -113,34 +119,48 @@ def sync_obsidian_documents(
 
         current_timezone = timezone.get_current_timezone()
 
-        for file_path in files:
+        for entry in timer.iterate("scan", entries):
+            file_path = entry.path
             stats["scanned_count"] += 1
-            relative_path = str(file_path.relative_to(source_path)).replace("\\", "/")
-            scan_paths.add(relative_path)
-
-            raw_text = _read_markdown_text(file_path)
-            file_hash = hashlib.sha1(raw_text.encode("utf-8")).hexdigest()
-
-            try:
-                note = frontmatter.loads(raw_text)
-            except Exception as exc:  # noqa: BLE001
-                errors.append(f"{relative_path}: {exc}")
-                continue
-
-            metadata = dict(note.metadata)
-            content = str(note.content or "")
-            tags = normalize_tags(metadata.get("tags", []))
-            title = _resolve_title(metadata, content, file_path.stem)
-            slug_candidate = resolve_slug(metadata, file_path, title, fallback_key=relative_path)
-            category_candidate = resolve_category(metadata, relative_path)
-            excerpt = build_excerpt(metadata, content)
-            has_publish_tag = contains_publish_tag(tags, normalized_publish_tag)
-            source_mtime = timezone.make_aware(
-                datetime.fromtimestamp(file_path.stat().st_mtime),
-                current_timezone,
-            )
-
-            document = ObsidianDocument.objects.filter(vault_path=relative_path).select_related("linked_post").first()
+            relative_path = entry.relative_path
+
+            source_mtime = timezone.make_aware(datetime.fromtimestamp(entry.mtime), current_timezone)
+            note = (prepared or {}).get(relative_path)
+            if note is not None and note.matches(entry):
+                if note.metadata is None:
+                    errors.append(f"{relative_path}: {note.error}")
+                    unparsed_paths.append(relative_path)
+                    continue
+                file_hash, metadata, content, analysis = note.file_hash, dict(note.metadata), note.content, note.analysis
+            else:
+                with timer.item("read"):
+                    raw_text = _read_markdown_text(file_path)
+                with timer.item("hash"):
+                    file_hash = hashlib.sha1(raw_text.encode("utf-8")).hexdigest()
+
+                try:
+                    with timer.item("parse_yaml"):
+                        parsed = frontmatter.loads(raw_text)
+                except Exception as exc:  # noqa: BLE001
+                    errors.append(f"{relative_path}: {exc}")
+                    unparsed_paths.append(relative_path)
+                    continue
+                metadata = dict(parsed.metadata)
+                content = str(parsed.content or "")
+                analysis = None
+
+            with timer.item("analyze"):
+                if analysis is None:
+                    analysis = analyze_markdown(content)
+                tags = normalize_tags(metadata.get("tags", []))
+                title = _resolve_title(metadata, analysis.first_heading, file_path.stem)
+                slug_candidate = resolve_slug(metadata, file_path, title, fallback_key=relative_path)
+                category_candidate = resolve_category(metadata, relative_path)
+                excerpt = build_excerpt(metadata, content)
+                has_publish_tag = contains_publish_tag(tags, normalized_publish_tag)
+
+            with timer.item("db_read"):
+                document = ObsidianDocument.objects.filter(vault_path=relative_path).select_related("linked_post").first()
             created = document is None
             if created:
                 document = ObsidianDocument(vault_path=relative_path, first_seen_at=now)
@@ -157,13 +177,16 @@ def sync_obsidian_documents(
             document.source_exists = True
             document.last_seen_at = now
             document.last_indexed_at = now
+            document.sync_generation = generation
 
             if document.linked_post_id is None:
-                existing_post = Post.objects.filter(obsidian_path=relative_path).order_by("-updated_at", "-id").first()
+                with timer.item("db_read"):
+                    existing_post = Post.objects.filter(obsidian_path=relative_path).order_by("-updated_at", "-id").first()
                 if existing_post:
                     document.linked_post = existing_post
 
-            document.save()
+            with timer.item("db_write"):
+                document.save()
             if created:
                 stats["created_count"] += 1
             else:
@@ -180,32 +203,31 @@ def sync_obsidian_documents(
                     "cover": str(document.linked_post.cover or ""),
                     "obsidian_path": document.vault_path,
                 }
-                outcome = sync_post_payload(
-                    payload,
-                    mode=SyncLog.Mode.OVERWRITE,
-                    source=SyncLog.Source.COMMAND,
-                    operator=operator,
-                    dry_run=False,
-                )
-                if outcome.post and document.linked_post_id != outcome.post.id:
-                    document.linked_post = outcome.post
-                    document.save(update_fields=["linked_post", "updated_at"])
+                with timer.item("publish"):
+                    outcome = sync_post_payload(
+                        payload,
+                        mode=SyncLog.Mode.OVERWRITE,
+                        source=SyncLog.Source.COMMAND,
+                        operator=operator,
+                        dry_run=False,
+                    )
+                    if outcome.post and document.linked_post_id != outcome.post.id:
+                        document.linked_post = outcome.post
+                        document.save(update_fields=["linked_post", "updated_at"])
                 if outcome.action in {SyncLog.Action.CREATED, SyncLog.Action.UPDATED}:
                     stats["published_updated_count"] += 1
 
-        missing_queryset = ObsidianDocument.objects.filter(source_exists=True).exclude(vault_path__in=scan_paths).select_related(
-            "linked_post"
-        )
-        for document in missing_queryset:
-            document.source_exists = False
-            document.last_indexed_at = now
-            document.save(update_fields=["source_exists", "last_indexed_at", "updated_at"])
-            stats["missing_count"] += 1
-
-            if normalized_missing_behavior == "draft" and document.linked_post_id and not document.linked_post.draft:
-                document.linked_post.draft = True
-                document.linked_post.save(update_fields=["draft"])
-                stats["drafted_count"] += 1
+        with timer.stage("reconcile"):
+            # Unparseable notes still exist; keep their documents out of the sweep.
+            stamp_generation(ObsidianDocument, unparsed_paths, generation, field="vault_path")
+            missing_queryset = ObsidianDocument.objects.filter(source_exists=True, sync_generation__lt=generation)
+            if normalized_missing_behavior == "draft":
+                stats["drafted_count"] = Post.objects.filter(
+                    draft=False,
+                    pk__in=missing_queryset.exclude(linked_post=None).values("linked_post_id"),
+                ).update(draft=True)
+            stats["missing_count"] = missing_queryset.update(source_exists=False, last_indexed_at=now, updated_at=now)
+        timer.count("reconcile", stats["missing_count"])
 
         if errors:
             message = f"completed_with_parse_errors={len(errors)}: {'; '.join(errors[:3])}"
@@ -233,6 +255,7 @@ def sync_obsidian_documents(
         started_at=started_at,
         finished_at=finished_at,
         duration_ms=max(0, duration_ms),
+        stage_timings=timer.as_dict(),
         message=message,
         operator=operator,
     )
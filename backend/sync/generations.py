@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterable
+
+STAMP_BATCH_SIZE = 500
+_lock = threading.Lock()
+_last_generation = 0
+
+
+def next_generation() -> int:
+    """Return a new sync-run generation (wall-clock microseconds, strictly increasing in-process).
+
+    Every row a run creates, updates or confirms is stamped with the run's
+    generation; whatever is left with ``sync_generation < generation`` inside
+    the run's scope was not seen and is stale. One indexed range query per
+    model replaces ``NOT IN (<every seen key>)`` lists.
+    """
+    global _last_generation
+    with _lock:
+        _last_generation = max(time.time_ns() // 1000, _last_generation + 1)
+        return _last_generation
+
+
+def stamp_generation(
+    model,
+    keys: Iterable,
+    generation: int,
+    *,
+    field: str = "pk",
+    batch_size: int = STAMP_BATCH_SIZE,
+) -> int:
+    """Mark rows seen but not otherwise written this run, in bounded ``field IN`` batches."""
+    stamped = 0
+    batch: list = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= batch_size:
+            stamped += model.objects.filter(**{f"{field}__in": batch}).update(sync_generation=generation)
+            batch = []
+    if batch:
+        stamped += model.objects.filter(**{f"{field}__in": batch}).update(sync_generation=generation)
+    return stamped
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import codecs
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+COMMIT_MARKER = "\x01"
+
+
+@dataclass
+class GitPathHistory:
+    created_at: datetime
+    modified_at: datetime
+
+
+@dataclass
+class GitHistory:
+    head: str = ""
+    shallow: bool = False
+    paths: dict[str, GitPathHistory] = field(default_factory=dict)
+
+    def to_json(self) -> dict:
+        return {
+            "head": self.head,
+            "shallow": self.shallow,
+            "paths": {
+                path: [item.created_at.isoformat(), item.modified_at.isoformat()]
+                for path, item in self.paths.items()
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "GitHistory":
+        paths: dict[str, GitPathHistory] = {}
+        for path, value in (data.get("paths") or {}).items():
+            try:
+                created, modified = value
+                paths[path] = GitPathHistory(datetime.fromisoformat(created), datetime.fromisoformat(modified))
+            except (TypeError, ValueError):
+                continue
+        return cls(head=str(data.get("head") or ""), shallow=bool(data.get("shallow")), paths=paths)
+
+
+def _git(repo: Path, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-C", str(repo), *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip()
+
+
+def _unquote_path(raw: str) -> str:
+    # git C-quotes paths containing control characters even with core.quotePath=false
+    if len(raw) >= 2 and raw.startswith('"') and raw.endswith('"'):
+        return codecs.escape_decode(raw[1:-1].encode("utf-8"))[0].decode("utf-8", "replace")
+    return raw
+
+
+def _flush_commit(changes: list[tuple[str, str, str, str]], committed_at: datetime, history: dict[str, GitPathHistory]) -> None:
+    # a delete and an add of the same blob in one commit is an exact rename
+    deleted_by_blob: dict[str, list[str]] = {}
+    for status, old_blob, _, path in changes:
+        if status == "D":
+            deleted_by_blob.setdefault(old_blob, []).append(path)
+    carried: dict[str, datetime] = {}
+    for status, _, new_blob, path in changes:
+        if status == "A" and deleted_by_blob.get(new_blob):
+            previous = history.get(deleted_by_blob[new_blob].pop(0))
+            if previous is not None:
+                carried[path] = previous.created_at
+    for status, _, _, path in changes:
+        if status == "D":
+            history.pop(path, None)
+    for status, _, _, path in changes:
+        if status == "D":
+            continue
+        existing = history.get(path)
+        if existing is None:
+            history[path] = GitPathHistory(created_at=carried.get(path, committed_at), modified_at=committed_at)
+        else:
+            existing.modified_at = committed_at
+
+
+def apply_raw_log(lines, history: dict[str, GitPathHistory]) -> None:
+    """Fold ``git log --reverse --raw --no-renames --no-abbrev`` output into ``history`` (oldest commit first).
+
+    Renames are paired by blob id inside each commit, so only exact renames carry
+    the creation date over; deletes drop the path. Blob ids come straight from the
+    tree objects, which keeps the scan free of blob fetches on ``--filter=blob:none`` clones.
+    """
+    committed_at: datetime | None = None
+    changes: list[tuple[str, str, str, str]] = []
+    for raw_line in lines:
+        line = raw_line.rstrip("\n")
+        if not line:
+            continue
+        if line.startswith(COMMIT_MARKER):
+            if committed_at is not None:
+                _flush_commit(changes, committed_at, history)
+            changes = []
+            _, _, stamp = line[1:].partition(" ")
+            try:
+                committed_at = datetime.fromisoformat(stamp.strip())
+            except ValueError:
+                committed_at = None
+            continue
+        if committed_at is None or not line.startswith(":"):
+            continue
+        meta, _, raw_path = line.partition("\t")
+        fields = meta[1:].split()
+        if len(fields) < 5 or not raw_path:
+            continue
+        changes.append((fields[4][:1], fields[2], fields[3], _unquote_path(raw_path)))
+    if committed_at is not None:
+        _flush_commit(changes, committed_at, history)
+
+
+def _stream_log(repo: Path, revision_range: str, pathspec: str, history: dict[str, GitPathHistory]) -> None:
+    command = [
+        "git",
+        "-C",
+        str(repo),
+        "-c",
+        "core.quotePath=false",
+        "log",
+        "--reverse",
+        "--root",
+        "--raw",
+        "--no-renames",
+        "--no-abbrev",
+        "--no-color",
+        f"--format={COMMIT_MARKER}%H %cI",
+        revision_range,
+    ]
+    if pathspec:
+        command.extend(["--", pathspec])
+    with subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    ) as proc:
+        apply_raw_log(proc.stdout, history)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+
+
+def _is_ancestor(repo: Path, ancestor: str, descendant: str) -> bool:
+    try:
+        _git(repo, "merge-base", "--is-ancestor", ancestor, descendant)
+    except subprocess.CalledProcessError:
+        return False
+    return True
+
+
+def load_git_history(repo: Path, *, pathspec: str = "", cache_file: Path | None = None) -> GitHistory:
+    """Return first-commit / last-modified timestamps for every path under ``pathspec``.
+
+    Results are cached per HEAD commit; when the cached HEAD is an ancestor of
+    the current one only the new commits are streamed.
+    """
+    head = _git(repo, "rev-parse", "HEAD")
+    shallow = _git(repo, "rev-parse", "--is-shallow-repository") == "true"
+
+    cached: GitHistory | None = None
+    if cache_file is not None:
+        try:
+            cached = GitHistory.from_json(json.loads(cache_file.read_text(encoding="utf-8")))
+        except (OSError, ValueError, AttributeError):
+            cached = None
+
+    if cached and cached.head == head and cached.shallow == shallow:
+        return cached
+
+    if cached and cached.head and not cached.shallow and not shallow and _is_ancestor(repo, cached.head, head):
+        history = cached
+        _stream_log(repo, f"{cached.head}..{head}", pathspec, history.paths)
+    else:
+        history = GitHistory()
+        _stream_log(repo, head, pathspec, history.paths)
+    history.head = head
+    history.shallow = shallow
+
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_file.with_name(f".{cache_file.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(history.to_json(), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, cache_file)
+    return history
+
+
+def load_subtree_history(root: Path, *, cache_file: Path | None = None) -> tuple[GitHistory, str]:
+    """History of the files under ``root`` inside its enclosing clone, plus ``root``'s prefix in that clone."""
+    toplevel = Path(_git(root, "rev-parse", "--show-toplevel"))
+    prefix = root.resolve().relative_to(toplevel.resolve()).as_posix()
+    prefix = "" if prefix == "." else f"{prefix}/"
+    return load_git_history(toplevel, pathspec=prefix, cache_file=cache_file), prefix
@@ -0,0 +1,482 @@
+from __future__ import annotations
+
+import email.utils
+import http.client
+import json
+import random
+import select
+import ssl
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlsplit
+
+from sync.timing import StageTimer, format_stage_timings
+
+DEFAULT_TIMEOUT_SECONDS = 30
+DEFAULT_RETRIES = 3
+BACKOFF_BASE_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+# A rate limit that resets further out than this is reported, not slept through.
+MAX_RATE_LIMIT_WAIT_SECONDS = 300.0
+# Used when a host says "slow down" without saying for how long.
+DEFAULT_RATE_LIMIT_WAIT_SECONDS = 60.0
+MAX_IDLE_PER_HOST = 8
+# Servers drop idle keep-alive sockets eventually; older ones are not reused.
+MAX_IDLE_SECONDS = 30.0
+MAX_REDIRECTS = 5
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+USER_AGENT = "openingcloud-blog"
+
+_TRANSPORT_ERRORS = (OSError, http.client.HTTPException)
+# A reused socket failing like this was closed by the server while idle.
+_STALE_ERRORS = (ConnectionResetError, BrokenPipeError, ConnectionAbortedError, http.client.RemoteDisconnected)
+
+
+class HttpError(Exception):
+    """Raised when no response could be obtained (after retries) or a rate limit is exhausted."""
+
+    def __init__(self, message: str, *, url: str = "", response: HttpResponse | None = None):
+        super().__init__(message)
+        self.url = url
+        self.response = response
+
+    @property
+    def status(self) -> int | None:
+        return self.response.status if self.response is not None else None
+
+
+@dataclass
+class HttpResponse:
+    status: int
+    reason: str
+    headers: dict[str, str]
+    body: bytes
+    url: str
+    attempts: int = 1
+    # The unread ``http.client.HTTPResponse`` for ``HttpClient.stream()``.
+    raw: http.client.HTTPResponse | None = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def header(self, name: str, default: str = "") -> str:
+        return self.headers.get(name.lower(), default)
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+@dataclass
+class _RateLimit:
+    remaining: int | None = None
+    reset: int | None = None
+
+
+@dataclass
+class _Exchange:
+    key: tuple[str, str, int]
+    connection: http.client.HTTPConnection
+    response: http.client.HTTPResponse
+    headers: dict[str, str]
+    url: str
+    attempts: int
+    started: float
+
+
+def _response_headers(response: http.client.HTTPResponse) -> dict[str, str]:
+    headers: dict[str, str] = {}
+    for name, value in response.getheaders():
+        name = name.lower()
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+    return headers
+
+
+def _retry_after_seconds(value: str, now: float) -> float | None:
+    value = (value or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - now)
+
+
+def _rewinder(body):
+    """Return a callable that readies ``body`` for a resend and says whether that worked."""
+    if body is None or isinstance(body, (bytes, bytearray, memoryview, str)):
+        return lambda: True
+    try:
+        position = body.tell()
+    except (AttributeError, OSError):
+        return lambda: False
+
+    def rewind() -> bool:
+        try:
+            body.seek(position)
+        except (AttributeError, OSError):
+            return False
+        return True
+
+    return rewind
+
+
+def _is_dropped(connection: http.client.HTTPConnection) -> bool:
+    sock = connection.sock
+    if sock is None:
+        return True
+    try:
+        # An idle keep-alive socket is only readable once the server closed it.
+        return bool(select.select([sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+class HttpClient:
+    """Keep-alive, retrying HTTP client shared by every outbound call.
+
+    Connections are pooled per ``(scheme, host, port)`` so consecutive calls to
+    GitHub or the remote site reuse one TLS session. Connection errors and
+    429/5xx responses are retried with capped exponential backoff; a
+    ``Retry-After`` header, or ``X-RateLimit-Remaining``/``X-RateLimit-Reset``
+    once a host reports its quota exhausted, decides the wait instead. Every
+    attempt is timed per host in ``timings``.
+
+    Non-2xx responses are returned, not raised: callers decide what a 404 or a
+    304 means. Bodies that cannot be rewound are sent once.
+    """
+
+    def __init__(
+        self,
+        *,
+        retries: int = DEFAULT_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        backoff: float = BACKOFF_BASE_SECONDS,
+        max_backoff: float = MAX_BACKOFF_SECONDS,
+        max_wait: float = MAX_RATE_LIMIT_WAIT_SECONDS,
+        max_idle_per_host: int = MAX_IDLE_PER_HOST,
+        proxies: dict[str, str] | None = None,
+        sleep=time.sleep,
+        clock=time.time,
+    ):
+        self.retries = max(0, retries)
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        self.max_idle_per_host = max(0, max_idle_per_host)
+        self.timings = StageTimer()
+        self.opened = 0
+        self.reused = 0
+        self.retried = 0
+        self._proxies = urllib.request.getproxies() if proxies is None else proxies
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str, int], list[tuple[http.client.HTTPConnection, float]]] = {}
+        self._limits: dict[str, _RateLimit] = {}
+        self._ssl_context = ssl.create_default_context()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        body=None,
+        payload=None,
+        timeout: float | None = None,
+        retries: int | None = None,
+        max_wait: float | None = None,
+    ) -> HttpResponse:
+        """Send one request and read the whole response; ``payload`` is sent as JSON."""
+        headers, body = self._prepare(headers, body, payload)
+        exchange = self._open(method.upper(), url, headers, body, timeout, retries, max_wait)
+        try:
+            data = exchange.response.read()
+        except _TRANSPORT_ERRORS as exc:
+            exchange.connection.close()
+            raise HttpError(f"{method} {exchange.url} failed: {exc}", url=exchange.url) from exc
+        self._finish(exchange)
+        return self._wrap(exchange, data)
+
+    @contextmanager
+    def stream(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+        retries: int | None = None,
+    ):
+        """Yield an ``HttpResponse`` whose ``raw`` body is read by the caller (large downloads)."""
+        exchange = self._open(method.upper(), url, dict(headers or {}), None, timeout, retries, None)
+        try:
+            yield self._wrap(exchange, b"", raw=exchange.response)
+        finally:
+            self._finish(exchange)
+
+    def rate_limit(self, host: str) -> tuple[int | None, int | None]:
+        """Last ``(remaining, reset)`` a host reported through ``X-RateLimit-*``."""
+        with self._lock:
+            limit = self._limits.get(host)
+            return (limit.remaining, limit.reset) if limit else (None, None)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "hosts": self.timings.as_dict(),
+                "opened": self.opened,
+                "reused": self.reused,
+                "retried": self.retried,
+            }
+
+    def format_metrics(self) -> str:
+        metrics = self.metrics()
+        hosts = format_stage_timings(metrics["hosts"]) or "-"
+        return f"{hosts} (connections opened={metrics['opened']} reused={metrics['reused']} retried={metrics['retried']})"
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [connection for connections in self._idle.values() for connection, _ in connections]
+            self._idle.clear()
+        for connection in idle:
+            connection.close()
+
+    @staticmethod
+    def _prepare(headers, body, payload):
+        headers = dict(headers or {})
+        if payload is not None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            if not any(name.lower() == "content-type" for name in headers):
+                headers["Content-Type"] = "application/json"
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        return headers, body
+
+    def _open(self, method, url, headers, body, timeout, retries, max_wait) -> _Exchange:
+        for _ in range(MAX_REDIRECTS + 1):
+            exchange = self._send(method, url, headers, body, timeout, retries, max_wait)
+            location = exchange.headers.get("location")
+            if exchange.response.status not in REDIRECT_STATUSES or not location or method not in {"GET", "HEAD"}:
+                return exchange
+            exchange.response.read()
+            self._finish(exchange)
+            target = urljoin(url, location)
+            if urlsplit(target).hostname != urlsplit(url).hostname:
+                headers = {name: value for name, value in headers.items() if name.lower() != "authorization"}
+            url = target
+        raise HttpError(f"{method} {url}: too many redirects", url=url)
+
+    def _send(self, method, url, headers, body, timeout, retries, max_wait) -> _Exchange:
+        parts = urlsplit(url)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise HttpError(f"unsupported URL: {url}", url=url)
+        host = parts.hostname
+        key = (parts.scheme, host, parts.port or (443 if parts.scheme == "https" else 80))
+        proxy = self._proxy_for(parts.scheme, host)
+        target = url if proxy and parts.scheme == "http" else (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        send_headers = {"User-Agent": USER_AGENT, **headers}
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else max(0, retries)
+        max_wait = self.max_wait if max_wait is None else max_wait
+        rewind = _rewinder(body)
+
+        attempt = 0
+        while True:
+            self._wait_for_quota(host, url, max_wait)
+            connection, reused = self._acquire(key, proxy, timeout)
+            started = time.perf_counter()
+            try:
+                connection.request(method, target, body=body, headers=send_headers)
+                response = connection.getresponse()
+            except _TRANSPORT_ERRORS as exc:
+                connection.close()
+                self._record(host, started)
+                if reused and isinstance(exc, _STALE_ERRORS) and rewind():
+                    # The server closed the idle socket; its siblings are suspect too.
+                    self._drop_idle(key)
+                    continue
+                if attempt >= retries or not rewind():
+                    raise HttpError(f"{method} {url} failed: {exc}", url=url) from exc
+                attempt += 1
+                self._note_retry()
+                self._sleep(self._backoff(attempt - 1))
+                continue
+
+            response_headers = _response_headers(response)
+            self._note_rate_limit(host, response_headers)
+            exchange = _Exchange(key, connection, response, response_headers, url, attempt + 1, started)
+            delay = self._retry_delay(host, response.status, response_headers, attempt, max_wait)
+            if delay is None or attempt >= retries or not rewind():
+                return exchange
+            try:
+                response.read()
+            except _TRANSPORT_ERRORS:
+                connection.close()
+            self._finish(exchange)
+            attempt += 1
+            self._note_retry()
+            self._sleep(delay)
+            self._reset_quota(host)
+
+    def _wrap(self, exchange: _Exchange, data: bytes, raw=None) -> HttpResponse:
+        return HttpResponse(
+            status=exchange.response.status,
+            reason=exchange.response.reason or "",
+            headers=exchange.headers,
+            body=data,
+            url=exchange.url,
+            attempts=exchange.attempts,
+            raw=raw,
+        )
+
+    def _finish(self, exchange: _Exchange) -> None:
+        self._record(exchange.key[1], exchange.started)
+        self._release(exchange.key, exchange.connection, exchange.response)
+
+    def _record(self, host: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.timings.add(host, elapsed)
+
+    def _note_retry(self) -> None:
+        with self._lock:
+            self.retried += 1
+
+    def _proxy_for(self, scheme: str, host: str):
+        proxy = self._proxies.get(scheme)
+        if not proxy or urllib.request.proxy_bypass(host):
+            return None
+        parts = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+        return parts if parts.hostname else None
+
+    def _acquire(self, key, proxy, timeout) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        stale: list[http.client.HTTPConnection] = []
+        connection = None
+        with self._lock:
+            idle = self._idle.get(key) or []
+            while idle:
+                candidate, since = idle.pop()
+                if now - since <= MAX_IDLE_SECONDS and not _is_dropped(candidate):
+                    connection = candidate
+                    self.reused += 1
+                    break
+                stale.append(candidate)
+            if connection is None:
+                self.opened += 1
+        for candidate in stale:
+            candidate.close()
+        if connection is not None:
+            connection.timeout = timeout
+            connection.sock.settimeout(timeout)
+            return connection, True
+        return self._connect(key, proxy, timeout), False
+
+    def _connect(self, key, proxy, timeout) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            if proxy:
+                connection = http.client.HTTPSConnection(
+                    proxy.hostname, proxy.port or 80, timeout=timeout, context=self._ssl_context
+                )
+                connection.set_tunnel(host, port)
+                return connection
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context)
+        if proxy:
+            return http.client.HTTPConnection(proxy.hostname, proxy.port or 80, timeout=timeout)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _release(self, key, connection, response) -> None:
+        if response.will_close or not response.isclosed():
+            connection.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def _drop_idle(self, key) -> None:
+        with self._lock:
+            idle = self._idle.pop(key, [])
+        for connection, _ in idle:
+            connection.close()
+
+    def _note_rate_limit(self, host: str, headers: dict[str, str]) -> None:
+        remaining = headers.get("x-ratelimit-remaining", "")
+        reset = headers.get("x-ratelimit-reset", "")
+        if not remaining.isdigit() and not reset.isdigit():
+            return
+        with self._lock:
+            limit = self._limits.setdefault(host, _RateLimit())
+            if remaining.isdigit():
+                limit.remaining = int(remaining)
+            if reset.isdigit():
+                limit.reset = int(reset)
+
+    def _quota_wait(self, host: str) -> float:
+        _, reset = self.rate_limit(host)
+        if reset is None:
+            return DEFAULT_RATE_LIMIT_WAIT_SECONDS
+        return max(0.0, reset - self._clock()) + 1.0
+
+    def _wait_for_quota(self, host: str, url: str, max_wait: float) -> None:
+        remaining, _ = self.rate_limit(host)
+        if remaining != 0:
+            return
+        wait = self._quota_wait(host)
+        if wait > max_wait:
+            raise HttpError(f"{host} rate limit exhausted, resets in {int(wait)}s", url=url)
+        self._sleep(wait)
+        self._reset_quota(host)
+
+    def _reset_quota(self, host: str) -> None:
+        # The next response reports the refreshed quota.
+        with self._lock:
+            limit = self._limits.get(host)
+            if limit is not None:
+                limit.remaining = None
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_backoff, self.backoff * 2.0**attempt) + random.uniform(0, self.backoff / 2)
+
+    def _retry_delay(self, host: str, status: int, headers: dict[str, str], attempt: int, max_wait: float) -> float | None:
+        retry_after = _retry_after_seconds(headers.get("retry-after", ""), self._clock())
+        rate_limited = status == 429 or (
+            status == 403 and (headers.get("x-ratelimit-remaining") == "0" or retry_after is not None)
+        )
+        if rate_limited:
+            wait = retry_after if retry_after is not None else self._quota_wait(host)
+            return wait if wait <= max_wait else None
+        if status in RETRY_STATUSES:
+            if retry_after is not None:
+                return retry_after if retry_after <= max_wait else None
+            return self._backoff(attempt)
+        return None
+
+
+_shared_client: HttpClient | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_client() -> HttpClient:
+    """Process-wide client, so every caller shares one connection pool."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
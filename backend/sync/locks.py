@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+VAULT_SYNC_LEASE = "vault-sync"
+
+
+class SyncLockBusy(RuntimeError):
+    def __init__(self, name: str, holder: dict | None = None):
+        self.name = name
+        self.holder = holder or {}
+        label = self.holder.get("holder") or "another process"
+        since = self.holder.get("acquired_at") or "?"
+        super().__init__(f"sync lease {name} is held by {label} since {since}")
+
+
+def _lock_dir() -> Path:
+    return Path(settings.SYNC_CACHE_DIR) / "locks"
+
+
+def read_lease_holder(name: str = VAULT_SYNC_LEASE) -> dict:
+    try:
+        return json.loads((_lock_dir() / f"{name}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+@contextmanager
+def sync_lease(name: str = VAULT_SYNC_LEASE, *, holder: str = "", wait: float = 0.0, poll: float = 0.5):
+    """Exclusive cross-process lease for writers that rebuild synced content.
+
+    Backed by ``flock`` on a file under ``SYNC_CACHE_DIR`` (shared by the web and
+    sync containers through the data volume), so a crashed holder releases it
+    automatically. Raises :class:`SyncLockBusy` when not acquired within ``wait``.
+    """
+    lock_dir = _lock_dir()
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_dir / f"{name}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + max(wait, 0.0)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise SyncLockBusy(name, read_lease_holder(name)) from None
+                time.sleep(poll)
+
+        info_path = lock_dir / f"{name}.json"
+        info = {
+            "holder": holder or "unknown",
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "acquired_at": timezone.now().isoformat(),
+        }
+        try:
+            info_path.write_text(json.dumps(info), encoding="utf-8")
+            yield info
+        finally:
+            try:
+                info_path.unlink()
+            except OSError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
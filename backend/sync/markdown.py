@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+
+from django.utils.text import slugify
+
+DEFAULT_EXCERPT_LENGTH = 150
+READING_CJK_CHARS_PER_MINUTE = 400
+READING_WORDS_PER_MINUTE = 200
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".bmp", ".avif")
+
+_FENCE = re.compile(r"^\s{0,3}(`{3,}|~{3,})")
+_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*$")
+_TABLE_SEPARATOR_CELL = re.compile(r":?-{2,}:?")
+# One alternation per inline construct; text between matches is prose.
+_INLINE_TOKEN = re.compile(
+    r"(?P<code>`[^`]+`)"
+    r"|!\[\[(?P<embed>[^\]|#]+)(?:#[^\]|]*)?(?:\|[^\]]*)?\]\]"
+    r"|!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)(?:\s+\"[^\"]*\")?\)"
+    r"|\[\[(?P<wikilink>[^\]|#]+)(?:#[^\]|]*)?(?:\|(?P<alias>[^\]]*))?\]\]"
+    r"|\[(?P<label>[^\]]+)\]\([^)]+\)"
+)
+_WORD = re.compile(
+    r"(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff])"
+    r"|[A-Za-z0-9]+(?:['’][A-Za-z]+)*"
+)
+_MARKUP_CHARS = str.maketrans({char: " " for char in "*_~>#-|"})
+
+
+@dataclass(frozen=True)
+class Heading:
+    level: int
+    text: str
+    anchor: str
+
+
+@dataclass(frozen=True)
+class MarkdownImage:
+    target: str
+    alt: str = ""
+    embed: bool = False
+
+
+@dataclass
+class MarkdownAnalysis:
+    excerpt: str = ""
+    word_count: int = 0
+    cjk_count: int = 0
+    headings: list[Heading] = field(default_factory=list)
+    wikilinks: list[str] = field(default_factory=list)
+    images: list[MarkdownImage] = field(default_factory=list)
+    tables: list[list[list[str]]] = field(default_factory=list)
+
+    @property
+    def first_heading(self) -> str:
+        return next((heading.text for heading in self.headings if heading.level == 1), "")
+
+    @property
+    def reading_minutes(self) -> int:
+        if not self.word_count:
+            return 0
+        latin = self.word_count - self.cjk_count
+        minutes = self.cjk_count / READING_CJK_CHARS_PER_MINUTE + latin / READING_WORDS_PER_MINUTE
+        return max(1, math.ceil(minutes))
+
+    def toc(self, *, max_level: int = 3) -> list[dict[str, str | int]]:
+        return [
+            {"level": heading.level, "text": heading.text, "anchor": heading.anchor}
+            for heading in self.headings
+            if heading.level <= max_level
+        ]
+
+
+class _Analyzer:
+    def __init__(self, excerpt_length: int):
+        self.result = MarkdownAnalysis()
+        self._excerpt_length = excerpt_length
+        self._excerpt_parts: list[str] = []
+        self._excerpt_size = 0
+        self._anchors: dict[str, int] = {}
+        self._table: list[list[str]] | None = None
+
+    def prose(self, text: str) -> None:
+        for match in _WORD.finditer(text):
+            self.result.word_count += 1
+            if match.group("cjk"):
+                self.result.cjk_count += 1
+        if self._excerpt_size > self._excerpt_length:
+            return
+        for word in text.translate(_MARKUP_CHARS).split():
+            self._excerpt_parts.append(word)
+            self._excerpt_size += len(word) + 1
+
+    def inline(self, line: str) -> str:
+        """Consume one line of inline Markdown; returns its visible text."""
+        visible: list[str] = []
+        position = 0
+        for match in _INLINE_TOKEN.finditer(line):
+            visible.append(line[position:match.start()])
+            position = match.end()
+            if match.group("code") is not None:
+                continue
+            if match.group("embed") is not None:
+                target = match.group("embed").strip()
+                if target.lower().endswith(IMAGE_SUFFIXES):
+                    self.result.images.append(MarkdownImage(target=target, embed=True))
+                elif target:
+                    # ``![[note]]`` transcludes another note: a link, not an image.
+                    self.result.wikilinks.append(target)
+            elif match.group("src") is not None:
+                self.result.images.append(MarkdownImage(target=match.group("src"), alt=match.group("alt").strip()))
+            elif match.group("wikilink") is not None:
+                target = match.group("wikilink").strip()
+                if target:
+                    self.result.wikilinks.append(target)
+                visible.append(f" {(match.group('alias') or target).strip()} ")
+            else:
+                visible.append(f" {match.group('label')} ")
+        visible.append(line[position:])
+        text = "".join(visible)
+        self.prose(text)
+        return text
+
+    def heading(self, level: int, raw: str) -> None:
+        text = self.inline(raw).strip().strip("#").strip()
+        text = " ".join(text.split())
+        if not text:
+            return
+        base = slugify(text, allow_unicode=True) or "section"
+        seen = self._anchors.get(base, 0)
+        self._anchors[base] = seen + 1
+        anchor = base if not seen else f"{base}-{seen}"
+        self.result.headings.append(Heading(level=level, text=text, anchor=anchor))
+
+    def table_row(self, stripped: str) -> None:
+        cells = [cell.strip() for cell in stripped.strip("|").split("|")]
+        if self._table is None:
+            self._table = []
+            self.result.tables.append(self._table)
+        if cells and all(_TABLE_SEPARATOR_CELL.fullmatch(cell.replace(" ", "")) for cell in cells):
+            return
+        self._table.append(cells)
+        for cell in cells:
+            self.inline(cell)
+
+    def end_table(self) -> None:
+        if self._table is not None and len(self._table) <= 1:
+            self.result.tables.remove(self._table)
+        self._table = None
+
+    def finish(self) -> MarkdownAnalysis:
+        self.end_table()
+        self.result.excerpt = " ".join(self._excerpt_parts)[: self._excerpt_length]
+        return self.result
+
+
+def analyze_markdown(content: str, *, excerpt_length: int = DEFAULT_EXCERPT_LENGTH) -> MarkdownAnalysis:
+    """Single pass over a note body (frontmatter already removed).
+
+    Collects the plain-text excerpt, CJK-aware word count, headings, wikilink
+    targets, embedded images and pipe tables. Fenced code is skipped and
+    inline code is left out of the excerpt and counts.
+    """
+    analyzer = _Analyzer(excerpt_length)
+    fence = ""
+    for line in (content or "").splitlines():
+        fence_match = _FENCE.match(line)
+        if fence:
+            if fence_match and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence):
+                fence = ""
+            continue
+        if fence_match:
+            analyzer.end_table()
+            fence = fence_match.group(1)
+            continue
+
+        stripped = line.strip()
+        if stripped.startswith("|") and stripped.endswith("|") and len(stripped) > 1:
+            analyzer.table_row(stripped)
+            continue
+        analyzer.end_table()
+
+        heading = _HEADING.match(line)
+        if heading:
+            analyzer.heading(len(heading.group(1)), heading.group(2))
+            continue
+        analyzer.inline(line)
+    return analyzer.finish()
@@ -1,9 +1,26 @@
 from __future__ import annotations
 
 import re
+from pathlib import Path
 from typing import Any
 
 import frontmatter
+import yaml
+
+# Upper bound on bytes read while looking for the closing ``---`` of a header.
+FRONTMATTER_HEADER_MAX_BYTES = 64 * 1024
+_YAML_BOUNDARY = re.compile(r"^-{3,}\s*$")
+_OTHER_BOUNDARY = re.compile(r"^(?:\+{3,}\s*|[{}])$")
+# Applied in order by build_excerpt.
+_EXCERPT_STRIP = (
+    (re.compile(r"```[\s\S]*?```"), " "),
+    (re.compile(r"`[^`]+`"), " "),
+    (re.compile(r"!\[[^\]]*\]\([^)]+\)"), " "),
+    (re.compile(r"\[[^\]]+\]\([^)]+\)"), " "),
+    (re.compile(r"^#{1,6}\s*", re.MULTILINE), ""),
+    (re.compile(r"[*_~>#-]"), " "),
+    (re.compile(r"\s+"), " "),
+)
 
 
 def normalize_tags(raw_tags: Any) -> list[str]:
@@ -33,20 +50,52 @@ def remove_publish_tag(tags: list[str], publish_tag: str = "publish") -> list[st
     return [tag for tag in tags if str(tag).strip().lower().lstrip("#") != needle]
 
 
+def read_frontmatter_header(path: str | Path, *, max_bytes: int = FRONTMATTER_HEADER_MAX_BYTES) -> dict[str, Any] | None:
+    """Parse only the leading ``---`` YAML block of a note, without reading its body.
+
+    Returns ``{}`` when the note has no frontmatter and ``None`` when the header
+    cannot be judged from the first ``max_bytes`` (unterminated, oversized, or a
+    TOML/JSON header); callers should then fall back to ``frontmatter.load``.
+    YAML errors propagate as they would from ``frontmatter.load``.
+    """
+    lines: list[str] = []
+    consumed = 0
+    opened = False
+    with open(path, "rb") as handle:
+        while consumed < max_bytes:
+            raw = handle.readline(max_bytes - consumed)
+            if not raw:
+                break
+            consumed += len(raw)
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if not opened:
+                if not line.strip():
+                    continue
+                if _YAML_BOUNDARY.match(line):
+                    opened = True
+                    continue
+                return None if _OTHER_BOUNDARY.match(line) else {}
+            if _YAML_BOUNDARY.match(line):
+                data = yaml.load("\n".join(lines), Loader=yaml.SafeLoader)
+                return data if isinstance(data, dict) else {}
+            lines.append(line)
+    return None if opened or consumed >= max_bytes else {}
+
+
 def build_excerpt(metadata: dict[str, Any], content: str, *, max_length: int = 150) -> str:
+    """Explicit description, else the note's plain text cut to ``max_length``.
+
+    Deliberately not ``sync.markdown``'s excerpt: that one keeps link labels and
+    wikilink text, and switching would rewrite every stored excerpt on the next sync.
+    """
     excerpt = str(metadata.get("description") or metadata.get("excerpt") or "").strip()
     if excerpt:
         return excerpt
 
     text = content or ""
-    text = re.sub(r"```[\s\S]*?```", " ", text)
-    text = re.sub(r"`[^`]+`", " ", text)
-    text = re.sub(r"!\[[^\]]*\]\([^)]+\)", " ", text)
-    text = re.sub(r"\[[^\]]+\]\([^)]+\)", " ", text)
-    text = re.sub(r"^#{1,6}\s*", "", text, flags=re.MULTILINE)
-    text = re.sub(r"[*_~>#-]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text[:max_length]
+    for pattern, replacement in _EXCERPT_STRIP:
+        text = pattern.sub(replacement, text)
+    return text.strip()[:max_length]
 
 
 def parse_markdown(path):
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from blog.models import SyncLog, SyncLogRollup, SyncPayloadBlob
+
+BLOB_REF_KEY = "$blob"
+# Top-level payload values whose JSON is at least this long move into the blob store.
+BLOB_MIN_BYTES = 512
+COMPRESSION_LEVEL = 6
+DEFAULT_RETENTION_DAYS = 30
+PRUNE_BATCH_SIZE = 500
+
+
+@dataclass
+class PruneResult:
+    logs: int = 0
+    batches: int = 0
+    blobs: int = 0
+    rollups: int = 0
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) == {BLOB_REF_KEY, "bytes"}
+
+
+def compact_payload(payload: dict[str, Any] | None) -> dict[str, Any]:
+    """Replace large top-level values with ``{"$blob": sha256, "bytes": n}`` references.
+
+    Blobs are content-addressed, so a note whose ``content`` did not change
+    between nightly syncs is stored once no matter how many logs mention it.
+    """
+    compacted: dict[str, Any] = {}
+    pending: dict[str, bytes] = {}
+    for key, value in (payload or {}).items():
+        if _is_ref(value) or isinstance(value, (bool, int, float)) or value is None:
+            compacted[key] = value
+            continue
+        encoded = _encode(value)
+        if len(encoded) < BLOB_MIN_BYTES:
+            compacted[key] = value
+            continue
+        digest = hashlib.sha256(encoded).hexdigest()
+        pending[digest] = encoded
+        compacted[key] = {BLOB_REF_KEY: digest, "bytes": len(encoded)}
+    if pending:
+        _store_blobs(pending)
+    return compacted
+
+
+def _store_blobs(encoded_by_digest: dict[str, bytes]) -> None:
+    now = timezone.now()
+    existing = SyncPayloadBlob.objects.filter(digest__in=list(encoded_by_digest))
+    known = set(existing.values_list("digest", flat=True))
+    if known:
+        # Keeps garbage collection from reclaiming a blob a fresh log points at.
+        SyncPayloadBlob.objects.filter(digest__in=known).update(last_used_at=now)
+    missing = [
+        SyncPayloadBlob(
+            digest=digest,
+            data=zlib.compress(encoded, COMPRESSION_LEVEL),
+            size=len(encoded),
+            last_used_at=now,
+        )
+        for digest, encoded in encoded_by_digest.items()
+        if digest not in known
+    ]
+    if missing:
+        SyncPayloadBlob.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def expand_payload(payload: dict[str, Any] | None) -> dict[str, Any]:
+    """Inverse of ``compact_payload``; a missing blob expands to ``None``."""
+    payload = dict(payload or {})
+    refs = {key: value[BLOB_REF_KEY] for key, value in payload.items() if _is_ref(value)}
+    if not refs:
+        return payload
+    blobs = dict(SyncPayloadBlob.objects.filter(digest__in=set(refs.values())).values_list("digest", "data"))
+    for key, digest in refs.items():
+        data = blobs.get(digest)
+        payload[key] = json.loads(zlib.decompress(bytes(data)).decode("utf-8")) if data is not None else None
+    return payload
+
+
+def _roll_up(log_ids: list[int]) -> int:
+    groups = (
+        SyncLog.objects.filter(id__in=log_ids)
+        .annotate(day=TruncDate("started_at"))
+        .values("day", "source", "action", "status")
+        .annotate(total=Count("id"), duration=Sum("duration_ms"))
+    )
+    for group in groups:
+        key = {name: group[name] for name in ("day", "source", "action", "status")}
+        updated = SyncLogRollup.objects.filter(**key).update(
+            count=F("count") + group["total"],
+            duration_ms=F("duration_ms") + (group["duration"] or 0),
+        )
+        if not updated:
+            SyncLogRollup.objects.create(**key, count=group["total"], duration_ms=group["duration"] or 0)
+    return len(groups)
+
+
+def prune_sync_logs(
+    *,
+    keep_days: int = DEFAULT_RETENTION_DAYS,
+    batch_size: int = PRUNE_BATCH_SIZE,
+    max_batches: int | None = None,
+    now=None,
+) -> PruneResult:
+    """Fold logs older than ``keep_days`` into daily ``SyncLogRollup`` counts and delete them.
+
+    Each batch is its own short transaction so a large backlog never holds the
+    SQLite write lock for long. Blobs are reclaimed only below the oldest log
+    that survives, so a run stopped by ``max_batches`` cannot orphan a reference.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=max(0, keep_days))
+    result = PruneResult()
+    while max_batches is None or result.batches < max_batches:
+        ids = list(
+            SyncLog.objects.filter(started_at__lt=cutoff).order_by("started_at", "id").values_list("id", flat=True)[
+                :batch_size
+            ]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            result.rollups += _roll_up(ids)
+            deleted, _ = SyncLog.objects.filter(id__in=ids).delete()
+        result.logs += deleted
+        result.batches += 1
+
+    oldest = SyncLog.objects.aggregate(oldest=Min("started_at"))["oldest"]
+    blob_cutoff = min(cutoff, oldest) if oldest else cutoff
+    while True:
+        digests = list(
+            SyncPayloadBlob.objects.filter(last_used_at__lt=blob_cutoff).values_list("digest", flat=True)[:batch_size]
+        )
+        if not digests:
+            break
+        deleted, _ = SyncPayloadBlob.objects.filter(digest__in=digests).delete()
+        result.blobs += deleted
+    return result
+
+
+def compact_existing_logs(*, batch_size: int = PRUNE_BATCH_SIZE, max_batches: int | None = None) -> int:
+    """Move large payload values of logs written before the blob store into it."""
+    compacted = 0
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = list(SyncLog.objects.filter(id__gt=last_id).order_by("id").values_list("id", "payload")[:batch_size])
+        if not rows:
+            break
+        batches += 1
+        last_id = rows[-1][0]
+        with transaction.atomic():
+            changed = [
+                SyncLog(id=log_id, payload=compact)
+                for log_id, payload in rows
+                if isinstance(payload, dict) and (compact := compact_payload(payload)) != payload
+            ]
+            SyncLog.objects.bulk_update(changed, ["payload"])
+        compacted += len(changed)
+    return compacted
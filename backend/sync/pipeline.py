@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable
+
+from sync.timing import StageTimer
+
+
+@dataclass
+class PipelineStage:
+    """One node of the site-sync DAG.
+
+    ``tasks`` are the parse/fetch phase: picklable callables (module-level
+    functions or ``partial``s of them) that must not touch the database, run in
+    worker processes. ``apply`` is the write phase; it runs in the calling
+    process with the task results, once every stage named in ``after`` has
+    been applied. Only one ``apply`` runs at a time.
+    """
+
+    name: str
+    apply: Callable[[list[Any]], Any]
+    tasks: list[Callable[[], Any]] = field(default_factory=list)
+    after: tuple[str, ...] = ()
+
+
+def _timed(task: Callable[[], Any]) -> tuple[Any, float]:
+    started = time.perf_counter()
+    return task(), time.perf_counter() - started
+
+
+def run_pipeline(
+    stages: list[PipelineStage],
+    *,
+    workers: int,
+    timer: StageTimer | None = None,
+    on_prepare_error: Callable[[str, BaseException], None] | None = None,
+) -> StageTimer:
+    """Run every stage's tasks in parallel and apply stages one by one as their inputs arrive.
+
+    Among ready stages the earliest declared is applied first. A failed task
+    is reported through ``on_prepare_error`` and its result left out, so the
+    stage's apply falls back to doing that work itself; an exception from an
+    apply stops the pipeline. With ``workers`` <= 0 tasks run inline, in order.
+    Records ``<name>.prepare`` per task and ``<name>.apply`` per stage.
+    """
+    timer = timer or StageTimer()
+    names = [stage.name for stage in stages]
+    for stage in stages:
+        unknown = set(stage.after) - set(names)
+        if unknown or stage.name in stage.after:
+            raise ValueError(f"stage {stage.name} depends on unknown stages: {sorted(unknown) or [stage.name]}")
+
+    results: dict[str, list[Any]] = {stage.name: [] for stage in stages}
+    pending: dict[Future, str] = {}
+
+    def collect(name: str, outcome: Callable[[], tuple[Any, float]]) -> None:
+        try:
+            value, seconds = outcome()
+        except Exception as exc:  # noqa: BLE001
+            if on_prepare_error is not None:
+                on_prepare_error(name, exc)
+            return
+        timer.add(f"{name}.prepare", seconds)
+        results[name].append(value)
+
+    pool = None
+    if workers > 0 and any(stage.tasks for stage in stages):
+        # spawn: a forked child would inherit open SQLite handles and the writer thread.
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        for stage in stages:
+            for task in stage.tasks:
+                if pool is None:
+                    collect(stage.name, partial(_timed, task))
+                else:
+                    pending[pool.submit(_timed, task)] = stage.name
+
+        applied: set[str] = set()
+        remaining = list(stages)
+        while remaining:
+            waiting = set(pending.values())
+            ready = next(
+                (
+                    stage
+                    for stage in remaining
+                    if stage.name not in waiting and all(name in applied for name in stage.after)
+                ),
+                None,
+            )
+            if ready is None:
+                if not pending:
+                    raise ValueError(f"stage dependency cycle among: {[stage.name for stage in remaining]}")
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(pending.pop(future), future.result)
+                continue
+            with timer.stage(f"{ready.name}.apply"):
+                ready.apply(results[ready.name])
+            applied.add(ready.name)
+            remaining.remove(ready)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    return timer
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import frontmatter
+
+from sync.git_history import load_subtree_history
+from sync.markdown import MarkdownAnalysis, analyze_markdown
+from sync.scanner import (
+    DEFAULT_EXCLUDED_DIR_NAMES,
+    MarkdownEntry,
+    _expand_root_aliases,
+    _is_excluded,
+    iter_markdown_files,
+)
+
+# Parse-phase work for ``sync_site_sources``. Everything here runs in worker
+# processes, so it must stay free of Django models and database access and
+# return plain picklable values.
+
+
+@dataclass(frozen=True)
+class PreparedNote:
+    mtime: float
+    size: int
+    file_hash: str
+    metadata: dict[str, Any] | None
+    content: str
+    analysis: MarkdownAnalysis | None
+    error: str = ""
+    # The file was not valid UTF-8 and was decoded with errors ignored.
+    lossy: bool = False
+
+    def matches(self, entry: MarkdownEntry) -> bool:
+        """Whether ``entry`` is still the file this note was parsed from."""
+        return entry.stat.st_mtime == self.mtime and entry.stat.st_size == self.size
+
+
+def vault_shards(
+    source: str | Path,
+    count: int,
+    *,
+    roots: list[str] | None = None,
+    excluded_dir_names=DEFAULT_EXCLUDED_DIR_NAMES,
+) -> list[list[str]]:
+    """Split the vault (or the given ``roots``) into ``count`` lists of include roots.
+
+    Units are taken two levels deep so one big top-level folder still spreads
+    across workers; a root nested deeper than that is a unit of its own.
+    """
+    root = Path(source).expanduser().resolve()
+    excluded = {name.lower() for name in excluded_dir_names}
+    wanted = (
+        {name.strip("/") for relative in roots for name in _expand_root_aliases(relative)}
+        if roots is not None
+        else None
+    )
+    units: list[str] = []
+    for top in sorted(os.scandir(root), key=lambda item: item.name):
+        if _is_excluded(Path(top.name), excluded):
+            continue
+        if wanted is not None and top.name not in wanted:
+            units.extend(
+                relative
+                for relative in sorted(wanted)
+                if relative.startswith(f"{top.name}/")
+                and not any(relative.startswith(f"{other}/") for other in wanted)
+                and not _is_excluded(Path(relative), excluded)
+                and (root / relative).exists()
+            )
+            continue
+        if top.is_dir(follow_symlinks=False):
+            units.extend(f"{top.name}/{child.name}" for child in sorted(os.scandir(top.path), key=lambda item: item.name))
+        elif top.name.lower().endswith(".md"):
+            units.append(top.name)
+    shards: list[list[str]] = [[] for _ in range(max(1, count))]
+    for index, unit in enumerate(units):
+        shards[index % len(shards)].append(unit)
+    return [shard for shard in shards if shard]
+
+
+def prepare_notes(
+    source: str | Path,
+    include_roots: list[str],
+    *,
+    excluded_dir_names=DEFAULT_EXCLUDED_DIR_NAMES,
+) -> dict[str, PreparedNote]:
+    """Read, hash, split frontmatter and analyze every note under ``include_roots``."""
+    notes: dict[str, PreparedNote] = {}
+    for entry in iter_markdown_files(source, include_roots=include_roots, excluded_dir_names=excluded_dir_names):
+        try:
+            text, lossy = entry.path.read_text(encoding="utf-8"), False
+        except UnicodeDecodeError:
+            text, lossy = entry.path.read_text(encoding="utf-8", errors="ignore"), True
+        file_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        common = {"mtime": entry.stat.st_mtime, "size": entry.stat.st_size, "file_hash": file_hash, "lossy": lossy}
+        try:
+            note = frontmatter.loads(text)
+        except Exception as exc:  # noqa: BLE001
+            notes[entry.relative_path] = PreparedNote(metadata=None, content="", analysis=None, error=str(exc), **common)
+            continue
+        content = str(note.content or "")
+        notes[entry.relative_path] = PreparedNote(
+            metadata=dict(note.metadata),
+            content=content,
+            analysis=analyze_markdown(content),
+            **common,
+        )
+    return notes
+
+
+def warm_subtree_history(root: str | Path, cache_file: str | Path) -> int:
+    """Bring the on-disk git history cache up to date; returns the number of paths it covers."""
+    history, _ = load_subtree_history(Path(root), cache_file=Path(cache_file))
+    return len(history.paths)
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
 from pathlib import Path
 
 
@@ -51,42 +54,91 @@ def _expand_root_aliases(relative: str) -> list[str]:
     return expanded
 
 
-def scan_markdown_files(
+@dataclass(frozen=True)
+class MarkdownEntry:
+    path: Path
+    relative_path: str
+    stat: os.stat_result
+
+    @property
+    def mtime(self) -> float:
+        return self.stat.st_mtime
+
+
+def _walk_markdown(directory: Path, relative: str, excluded_dir_names: set[str]) -> Iterator[MarkdownEntry]:
+    """Depth-first ``os.scandir`` walk that never enters excluded directories.
+
+    Entries are visited in name order, so the output matches ``sorted()`` over
+    the same paths without collecting them first. Like ``rglob``, symlinked
+    directories are not followed.
+    """
+    try:
+        with os.scandir(directory) as iterator:
+            entries = sorted(iterator, key=lambda entry: entry.name)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return
+    for entry in entries:
+        child_relative = f"{relative}/{entry.name}" if relative else entry.name
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name.lower() not in excluded_dir_names:
+                    yield from _walk_markdown(directory / entry.name, child_relative, excluded_dir_names)
+                continue
+            if not entry.name.endswith(".md") or not entry.is_file():
+                continue
+            stat = entry.stat()
+        except OSError:
+            continue
+        yield MarkdownEntry(path=directory / entry.name, relative_path=child_relative, stat=stat)
+
+
+def iter_markdown_files(
     root: str | Path,
     *,
     include_roots: list[str] | None = None,
     excluded_dir_names: list[str] | tuple[str, ...] | None = None,
-) -> list[Path]:
+) -> Iterator[MarkdownEntry]:
+    """Yield Markdown files under ``root`` lazily, pruning excluded directories before descending."""
     root_path = Path(root).expanduser().resolve()
     if not root_path.exists():
-        return []
+        return
 
     excluded_set = {item.strip().lower() for item in (excluded_dir_names or DEFAULT_EXCLUDED_DIR_NAMES) if item.strip()}
-    files: set[Path] = set()
 
-    scan_targets: list[Path] = []
+    scan_targets: list[tuple[str, ...]] = [()]
     if include_roots:
-        seen_targets: set[Path] = set()
+        candidates: set[tuple[str, ...]] = set()
         for relative in include_roots:
             for expanded in _expand_root_aliases(relative):
-                candidate = root_path / expanded
-                if not candidate.exists() or candidate in seen_targets:
-                    continue
-                seen_targets.add(candidate)
-                scan_targets.append(candidate)
-    else:
-        scan_targets.append(root_path)
-
-    for target in scan_targets:
-        if target.is_file() and target.suffix.lower() == ".md":
-            if not _is_excluded(target.relative_to(root_path), excluded_set):
-                files.add(target)
+                parts = Path(expanded).parts
+                if parts and (root_path.joinpath(*parts)).exists():
+                    candidates.add(parts)
+        # Sorted by parts so disjoint roots come out in the same order a global
+        # sort would give; roots nested inside another root are already covered.
+        scan_targets = []
+        for parts in sorted(candidates):
+            if not any(parts[: len(covered)] == covered for covered in scan_targets):
+                scan_targets.append(parts)
+
+    for parts in scan_targets:
+        relative_target = "/".join(parts)
+        if parts and _is_excluded(Path(*parts), excluded_set):
             continue
-        if not target.is_dir():
+        target = root_path.joinpath(*parts)
+        if target.is_file():
+            if target.suffix.lower() == ".md":
+                yield MarkdownEntry(path=target, relative_path=relative_target, stat=target.stat())
             continue
-        for path in target.rglob("*.md"):
-            if _is_excluded(path.relative_to(root_path), excluded_set):
-                continue
-            files.add(path)
+        yield from _walk_markdown(target, relative_target, excluded_set)
+
 
-    return sorted(files)
+def scan_markdown_files(
+    root: str | Path,
+    *,
+    include_roots: list[str] | None = None,
+    excluded_dir_names: list[str] | tuple[str, ...] | None = None,
+) -> list[Path]:
+    return [
+        entry.path
+        for entry in iter_markdown_files(root, include_roots=include_roots, excluded_dir_names=excluded_dir_names)
+    ]
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+# (minimum, maximum) for minute, hour, day of month, month, day of week (7 = Sunday too)
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+def _parse_field(text: str, minimum: int, maximum: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            raise ValueError(f"empty cron field: {text!r}")
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if step <= 0:
+            raise ValueError(f"invalid cron step: {part!r}")
+        if base == "*":
+            start, end = minimum, maximum
+        elif "-" in base:
+            start_text, end_text = base.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(base)
+            end = maximum if step_text else start
+        if start < minimum or end > maximum or start > end:
+            raise ValueError(f"cron field out of range: {part!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    """Five-field cron expression (``minute hour dom month dow``) in local time."""
+
+    expression: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    day_restricted: bool
+    weekday_restricted: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSchedule":
+        text = _ALIASES.get(expression.strip(), expression.strip())
+        fields = text.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expression!r}")
+        parsed = [_parse_field(field, minimum, maximum) for field, (minimum, maximum) in zip(fields, _FIELD_RANGES)]
+        return cls(
+            expression=expression,
+            minutes=parsed[0],
+            hours=parsed[1],
+            days=parsed[2],
+            months=parsed[3],
+            weekdays=frozenset(0 if day == 7 else day for day in parsed[4]),
+            day_restricted=fields[2] != "*",
+            weekday_restricted=fields[4] != "*",
+        )
+
+    def matches(self, moment: datetime) -> bool:
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.isoweekday() % 7) in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            # classic cron: either day field may match
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if self.matches(candidate):
+                return candidate
+            candidate += timedelta(minutes=1)
+        raise ValueError(f"cron expression never fires: {self.expression!r}")
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import hashlib
+import json
 from dataclasses import dataclass
 from datetime import timedelta
 from typing import Any
@@ -11,6 +12,13 @@ from django.utils import timezone
 from django.utils.text import slugify
 
 from blog.models import Post, SyncLog
+from sync.payload_store import compact_payload
+from sync.shadow import content_db_alias
+from sync.timing import StageTimer
+
+# Payload keys that decide what a synced post looks like; the remote manifest
+# compares their digest so unchanged notes are never uploaded again.
+SYNC_HASH_FIELDS = ("title", "slug", "excerpt", "content", "category", "tags", "cover", "obsidian_path")
 
 
 @dataclass
@@ -33,6 +41,14 @@ class SyncReconcileResult:
     sync_log: SyncLog
 
 
+def sync_payload_hash(payload: dict[str, Any], mode: str = SyncLog.Mode.OVERWRITE) -> str:
+    """SHA-256 of the note payload as the client sent it, so both ends compute it from the same bytes."""
+    canonical = {key: payload.get(key) for key in SYNC_HASH_FIELDS}
+    canonical["mode"] = str(mode or SyncLog.Mode.OVERWRITE)
+    encoded = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
 def _normalize_tags(value: Any) -> list[str]:
     if isinstance(value, list):
         values = [str(item).strip() for item in value if str(item).strip()]
@@ -158,7 +174,15 @@ def sync_post_payload(
     source: str = SyncLog.Source.API,
     operator=None,
     dry_run: bool = False,
+    generation: int | None = None,
+    content_hash: str = "",
 ) -> SyncExecutionResult:
+    """Create or update the post for one Obsidian note and log it.
+
+    ``content_hash`` is the client's ``sync_payload_hash`` of the raw payload;
+    API callers pass it because serializer cleaning (e.g. trimmed content)
+    would otherwise make the stored digest differ from the client's.
+    """
     started_at = timezone.now()
     normalized_mode = mode if mode in {choice[0] for choice in SyncLog.Mode.choices} else SyncLog.Mode.OVERWRITE
 
@@ -168,24 +192,29 @@ def sync_post_payload(
     post: Post | None = None
     result_payload: dict[str, Any] = {}
     normalized_slug = str(payload.get("slug") or "").strip()
+    timer = StageTimer()
 
     try:
-        data = _coerce_payload(payload)
-        existing_by_path: Post | None = None
-        if data["obsidian_path"]:
-            existing_by_path = Post.objects.filter(
-                sync_source=Post.SyncSource.OBSIDIAN,
-                obsidian_path=data["obsidian_path"],
-            ).first()
-
-        data["slug"] = _resolve_target_slug(data["slug"], data["obsidian_path"], existing_by_path=existing_by_path)
-        normalized_slug = data["slug"]
-        existing = existing_by_path or Post.objects.filter(slug=data["slug"]).first()
+        with timer.stage("coerce"):
+            data = _coerce_payload(payload)
+        with timer.stage("db_read"):
+            existing_by_path: Post | None = None
+            if data["obsidian_path"]:
+                existing_by_path = Post.objects.filter(
+                    sync_source=Post.SyncSource.OBSIDIAN,
+                    obsidian_path=data["obsidian_path"],
+                ).first()
+
+            data["slug"] = _resolve_target_slug(data["slug"], data["obsidian_path"], existing_by_path=existing_by_path)
+            normalized_slug = data["slug"]
+            existing = existing_by_path or Post.objects.filter(slug=data["slug"]).first()
 
         if existing and normalized_mode == SyncLog.Mode.SKIP:
             action = SyncLog.Action.SKIPPED
             message = "mode=skip 且文章已存在，已跳过"
             post = existing
+            if generation and not dry_run:
+                Post.objects.filter(pk=existing.pk).update(sync_generation=generation)
         elif dry_run:
             action = SyncLog.Action.UPDATED if existing else SyncLog.Action.CREATED
             status = SyncLog.Status.DRY_RUN
@@ -204,9 +233,12 @@ def sync_post_payload(
                 "obsidian_path": data["obsidian_path"],
                 "last_synced_at": now,
                 "sync_source": Post.SyncSource.OBSIDIAN,
+                "sync_hash": content_hash or sync_payload_hash(payload, normalized_mode),
             }
+            if generation:
+                defaults["sync_generation"] = generation
 
-            with transaction.atomic():
+            with timer.stage("db_write", items=1), transaction.atomic(using=content_db_alias()):
                 if existing and normalized_mode == SyncLog.Mode.MERGE:
                     changed_fields: set[str] = set()
                     if not existing.title and data["title"]:
@@ -232,7 +264,11 @@ def sync_post_payload(
                     existing.obsidian_path = data["obsidian_path"]
                     existing.last_synced_at = now
                     existing.sync_source = Post.SyncSource.OBSIDIAN
-                    changed_fields.update(["draft", "obsidian_path", "last_synced_at", "sync_source"])
+                    existing.sync_hash = defaults["sync_hash"]
+                    changed_fields.update(["draft", "obsidian_path", "last_synced_at", "sync_source", "sync_hash"])
+                    if generation:
+                        existing.sync_generation = generation
+                        changed_fields.add("sync_generation")
 
                     existing.save(update_fields=sorted(changed_fields))
                     post = existing
@@ -267,11 +303,12 @@ def sync_post_payload(
         action=action,
         status=status,
         message=message,
-        payload=payload,
+        payload=compact_payload(payload),
         result=result_payload,
         started_at=started_at,
         finished_at=finished_at,
         duration_ms=max(0, duration_ms),
+        stage_timings=timer.as_dict(),
         operator=operator,
     )
 
@@ -289,7 +326,14 @@ def reconcile_obsidian_publications(
     source: str = SyncLog.Source.API,
     operator=None,
     dry_run: bool = False,
+    generation: int | None = None,
 ) -> SyncReconcileResult:
+    """Draft or delete Obsidian posts in scope that the sync run did not publish.
+
+    With ``generation`` the run has stamped every post it saw, so stale posts
+    are one indexed ``sync_generation < generation`` range; otherwise they are
+    the posts missing from ``published_paths``.
+    """
     started_at = timezone.now()
     normalized_behavior = behavior if behavior in {"draft", "delete", "none"} else "draft"
     normalized_paths = _normalize_paths(published_paths)
@@ -297,6 +341,7 @@ def reconcile_obsidian_publications(
 
     status = SyncLog.Status.DRY_RUN if dry_run else SyncLog.Status.SUCCESS
     action = SyncLog.Action.SKIPPED
+    timer = StageTimer()
 
     queryset = Post.objects.filter(sync_source=Post.SyncSource.OBSIDIAN).exclude(obsidian_path="")
     if normalized_scope:
@@ -305,23 +350,30 @@ def reconcile_obsidian_publications(
             scope_query |= Q(obsidian_path__startswith=prefix)
         queryset = queryset.filter(scope_query)
 
-    targets = queryset.exclude(obsidian_path__in=normalized_paths)
-    matched = targets.count()
+    if generation:
+        targets = queryset.filter(sync_generation__lt=generation)
+    else:
+        targets = queryset.exclude(obsidian_path__in=normalized_paths)
+    with timer.stage("db_read"):
+        matched = targets.count()
+    timer.count("db_read", matched)
     drafted = 0
     deleted = 0
 
-    if matched and normalized_behavior == "draft":
-        action = SyncLog.Action.UPDATED
-        if dry_run:
-            drafted = matched
-        else:
-            drafted = targets.update(draft=True, last_synced_at=timezone.now())
-    elif matched and normalized_behavior == "delete":
-        action = SyncLog.Action.UPDATED
-        if dry_run:
-            deleted = matched
-        else:
-            deleted, _ = targets.delete()
+    with timer.stage("db_write"):
+        if matched and normalized_behavior == "draft":
+            action = SyncLog.Action.UPDATED
+            if dry_run:
+                drafted = matched
+            else:
+                drafted = targets.update(draft=True, last_synced_at=timezone.now())
+        elif matched and normalized_behavior == "delete":
+            action = SyncLog.Action.UPDATED
+            if dry_run:
+                deleted = matched
+            else:
+                deleted, _ = targets.delete()
+    timer.count("db_write", drafted + deleted)
 
     message = (
         f"reconcile behavior={normalized_behavior}, matched={matched}, "
@@ -351,11 +403,12 @@ def reconcile_obsidian_publications(
         action=action,
         status=status,
         message=message,
-        payload=payload,
+        payload=compact_payload(payload),
         result=result_payload,
         started_at=started_at,
         finished_at=finished_at,
         duration_ms=max(0, duration_ms),
+        stage_timings=timer.as_dict(),
         operator=operator,
     )
 
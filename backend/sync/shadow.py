@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import contextvars
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, Max
+
+from blog.signals import delete_engagement_for_posts
+
+SHADOW_DB = "shadow"
+SHADOW_FILE = "shadow/content.sqlite3"
+# Content tables the sync pipeline writes; only these are built in the shadow copy
+# (see blog.routers.ShadowBuildRouter) and swapped into live. Everything else,
+# including run logs and payload blobs, is written straight to live during a
+# build, so those writes survive a discarded build and the swap stays short.
+PUBLISHED_MODELS = (
+    "blog.Post",
+    "blog.ObsidianDocument",
+    "blog.KnowledgeNode",
+    "blog.KnowledgeEdge",
+    "blog.Book",
+    "blog.WishItem",
+    "blog.GameItem",
+    "blog.PhotoWallImage",
+    "blog.SocialMediaStat",
+    "blog.WikiQuote",
+)
+# Rows visitors can see; a build that hides too large a share of them is not published.
+VISIBLE_ROWS = (
+    ("blog.Post", {"draft": False}),
+    ("blog.Book", {"is_active": True}),
+    ("blog.WishItem", {"is_active": True}),
+    ("blog.GameItem", {"is_active": True}),
+    ("blog.PhotoWallImage", {"is_public": True}),
+    ("blog.KnowledgeNode", {"is_active": True}),
+)
+DEFAULT_MAX_DROP_RATIO = 0.5
+MIN_ROWS_FOR_DROP_CHECK = 10
+SHADOW_PRAGMAS = {"journal_mode": "MEMORY", "synchronous": "OFF"}
+
+_active_alias: contextvars.ContextVar[str | None] = contextvars.ContextVar("sync_shadow_alias", default=None)
+
+
+class ShadowPublishError(RuntimeError):
+    pass
+
+
+@dataclass
+class ShadowBuild:
+    path: Path
+    fingerprint: dict[str, tuple]
+    live_visible: dict[str, int]
+    shadow_visible: dict[str, int] = field(default_factory=dict)
+    published_rows: int = 0
+    removed_post_ids: list[int] = field(default_factory=list)
+    swap_ms: int = 0
+
+
+def active_shadow_alias() -> str | None:
+    """Alias every content query goes to while a staged build runs (see ``blog.routers``)."""
+    return _active_alias.get()
+
+
+def content_db_alias() -> str:
+    """Alias content writes land in right now; sync transactions must be opened on it."""
+    return active_shadow_alias() or DEFAULT_DB_ALIAS
+
+
+def shadow_path() -> Path:
+    return Path(settings.SYNC_CACHE_DIR) / SHADOW_FILE
+
+
+def _published_models() -> list:
+    return [apps.get_model(label) for label in PUBLISHED_MODELS]
+
+
+def _fingerprint(alias: str) -> dict[str, tuple]:
+    """Row count, highest id and newest ``updated_at`` of each published table."""
+    result: dict[str, tuple] = {}
+    for model in _published_models():
+        aggregates = {"rows": Count("pk"), "last_id": Max("pk")}
+        if any(field.name == "updated_at" for field in model._meta.concrete_fields):
+            aggregates["last_update"] = Max("updated_at")
+        values = model.objects.using(alias).aggregate(**aggregates)
+        result[model._meta.label] = tuple(values.get(key) for key in ("rows", "last_id", "last_update"))
+    return result
+
+
+def _visible_counts(alias: str) -> dict[str, int]:
+    return {
+        label: apps.get_model(label).objects.using(alias).filter(**filters).count() for label, filters in VISIBLE_ROWS
+    }
+
+
+def _remove_shadow_files(path: Path) -> None:
+    for candidate in (path, path.with_name(f"{path.name}-wal"), path.with_name(f"{path.name}-shm")):
+        candidate.unlink(missing_ok=True)
+
+
+def _register_shadow(path: Path) -> None:
+    # configure_settings() fills in Django's per-alias defaults and insists on seeing "default".
+    configured = connections.configure_settings(
+        {
+            DEFAULT_DB_ALIAS: dict(connections.settings[DEFAULT_DB_ALIAS]),
+            SHADOW_DB: {"ENGINE": "django.db.backends.sqlite3", "NAME": str(path), "PRAGMAS": SHADOW_PRAGMAS},
+        }
+    )
+    connections.settings[SHADOW_DB] = configured[SHADOW_DB]
+
+
+def _unregister_shadow() -> None:
+    if SHADOW_DB in connections.settings:
+        connections[SHADOW_DB].close()
+        del connections[SHADOW_DB]
+        del connections.settings[SHADOW_DB]
+
+
+def validate_shadow(build: ShadowBuild, *, max_drop_ratio: float = DEFAULT_MAX_DROP_RATIO) -> None:
+    """Refuse a build with dangling foreign keys or one that hides most visible rows of a domain.
+
+    The drop check guards against a half-mounted vault turning every post into a draft.
+    """
+    tables = [model._meta.db_table for model in _published_models()]
+    with connections[SHADOW_DB].cursor() as cursor:
+        for table in tables:
+            cursor.execute(f"PRAGMA foreign_key_check({connections[SHADOW_DB].ops.quote_name(table)})")
+            violation = cursor.fetchone()
+            if violation:
+                raise ShadowPublishError(f"影子库外键校验失败: {violation[0]} -> {violation[2]}")
+
+    build.shadow_visible = _visible_counts(SHADOW_DB)
+    for label, live_count in build.live_visible.items():
+        shadow_count = build.shadow_visible.get(label, 0)
+        if live_count >= MIN_ROWS_FOR_DROP_CHECK and shadow_count < live_count * (1 - max_drop_ratio):
+            raise ShadowPublishError(
+                f"{label} 可见行从 {live_count} 降到 {shadow_count}，超过允许的 {max_drop_ratio:.0%}，未发布"
+            )
+
+
+def publish_shadow(build: ShadowBuild) -> None:
+    """Replace the live published tables with the shadow's in one short transaction.
+
+    The live file attaches the shadow and copies table by table inside a
+    single transaction, so readers see the old version until the commit and
+    the new one after it. If any published table changed in live since the
+    build started (an admin edit, an API sync), nothing is published.
+    Engagement of posts the build deleted is removed after the commit.
+    """
+    live = connections[DEFAULT_DB_ALIAS]
+    if live.in_atomic_block:
+        raise ShadowPublishError("cannot publish a shadow build inside a transaction")
+    quote = live.ops.quote_name
+    started = time.perf_counter()
+    with live.cursor() as cursor:
+        cursor.execute("ATTACH DATABASE %s AS shadow_src", [str(build.path)])
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            if _fingerprint(DEFAULT_DB_ALIAS) != build.fingerprint:
+                raise ShadowPublishError("构建期间线上内容已被修改，本次未发布，请重新同步")
+            published = 0
+            with live.cursor() as cursor:
+                post_meta = apps.get_model("blog.Post")._meta
+                post_table, post_pk = quote(post_meta.db_table), quote(post_meta.pk.column)
+                cursor.execute(
+                    f"SELECT {post_pk} FROM main.{post_table} EXCEPT SELECT {post_pk} FROM shadow_src.{post_table}"
+                )
+                removed_post_ids = [row[0] for row in cursor.fetchall()]
+                for model in _published_models():
+                    table = quote(model._meta.db_table)
+                    columns = ", ".join(quote(field.column) for field in model._meta.local_concrete_fields)
+                    cursor.execute(f"DELETE FROM main.{table}")
+                    cursor.execute(f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM shadow_src.{table}")
+                    published += cursor.rowcount
+    finally:
+        with live.cursor() as cursor:
+            cursor.execute("DETACH DATABASE shadow_src")
+    # post_delete skipped engagement while the build ran; only published deletions drop it.
+    delete_engagement_for_posts(removed_post_ids)
+    build.published_rows = published
+    build.removed_post_ids = removed_post_ids
+    build.swap_ms = int((time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def staged_publish(*, max_drop_ratio: float = DEFAULT_MAX_DROP_RATIO, path: Path | None = None):
+    """Run the body against a private copy of the content database, then publish it atomically.
+
+    The live file is snapshotted with SQLite's online backup; inside the
+    with-block every content query is routed to the copy, so intermediate
+    states (books deactivated before re-creation, posts drafted mid-reconcile)
+    are never visible. On a clean exit the copy is validated and swapped in;
+    on an exception it is discarded and live is untouched.
+    """
+    if active_shadow_alias() is not None:
+        raise ShadowPublishError("staged builds cannot be nested")
+    live = connections[DEFAULT_DB_ALIAS]
+    if live.vendor != "sqlite":
+        raise ShadowPublishError("staged publish needs the SQLite backend")
+
+    path = path or shadow_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _remove_shadow_files(path)
+    build = ShadowBuild(path=path, fingerprint=_fingerprint(DEFAULT_DB_ALIAS), live_visible=_visible_counts(DEFAULT_DB_ALIAS))
+    live.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        live.connection.backup(target)
+    finally:
+        target.close()
+
+    _register_shadow(path)
+    token = _active_alias.set(SHADOW_DB)
+    try:
+        try:
+            yield build
+        finally:
+            _active_alias.reset(token)
+        validate_shadow(build, max_drop_ratio=max_drop_ratio)
+        connections[SHADOW_DB].close()
+        publish_shadow(build)
+    finally:
+        _unregister_shadow()
+        _remove_shadow_files(path)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# Per-item samples kept per stage for the p95; beyond this only totals grow.
+MAX_SAMPLES = 20000
+
+
+@dataclass
+class _Stage:
+    seconds: float = 0.0
+    count: int = 0
+    samples: list[float] = field(default_factory=list)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = max(math.ceil(pct / 100.0 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class StageTimer:
+    """Accumulates wall time per named sync stage.
+
+    ``stage()`` times a whole phase (``items`` adds to its count); ``item()``
+    times one unit of work and keeps the sample for the p95. ``as_dict()`` is
+    JSON-safe and is what gets stored on ``ObsidianSyncRun`` / ``SyncLog``.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._stages: dict[str, _Stage] = {}
+
+    def _get(self, name: str) -> _Stage:
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _Stage()
+        return stage
+
+    @contextmanager
+    def stage(self, name: str, *, items: int = 0):
+        started = self._clock()
+        try:
+            yield
+        finally:
+            stage = self._get(name)
+            stage.seconds += self._clock() - started
+            stage.count += items
+
+    @contextmanager
+    def item(self, name: str):
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, self._clock() - started)
+
+    def iterate(self, name: str, iterable):
+        """Yield from ``iterable`` lazily, timing each step (e.g. a streaming directory walk)."""
+        iterator = iter(iterable)
+        while True:
+            started = self._clock()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                self._get(name).seconds += self._clock() - started
+                return
+            self.add(name, self._clock() - started)
+            yield value
+
+    def add(self, name: str, seconds: float, count: int = 1) -> None:
+        stage = self._get(name)
+        stage.seconds += seconds
+        stage.count += count
+        if count == 1 and len(stage.samples) < MAX_SAMPLES:
+            stage.samples.append(seconds)
+
+    def count(self, name: str, items: int = 1) -> None:
+        self._get(name).count += items
+
+    def as_dict(self) -> dict[str, dict[str, float | int | None]]:
+        summary: dict[str, dict[str, float | int | None]] = {}
+        for name, stage in self._stages.items():
+            summary[name] = {
+                "ms": round(stage.seconds * 1000, 2),
+                "count": stage.count,
+                "p95_ms": round(_percentile(stage.samples, 95) * 1000, 3) if stage.samples else None,
+            }
+        return summary
+
+    def format(self) -> str:
+        return format_stage_timings(self.as_dict())
+
+
+def format_stage_timings(timings: dict) -> str:
+    """One-line ``name=12ms n=40 p95=0.3ms, ...`` rendering of ``StageTimer.as_dict()``."""
+    parts = []
+    for name, values in (timings or {}).items():
+        detail = f"{name}={float(values.get('ms') or 0):.0f}ms"
+        if values.get("count"):
+            detail += f" n={values['count']}"
+        if values.get("p95_ms") is not None:
+            detail += f" p95={float(values['p95_ms']):.1f}ms"
+        parts.append(detail)
+    return ", ".join(parts)
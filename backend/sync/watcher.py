@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from sync.scanner import DEFAULT_EXCLUDED_DIR_NAMES
+
+# Returned in a change set when the watcher lost track of events (queue
+# overflow, watched root replaced); callers should treat everything as changed.
+RESCAN = "*"
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_ATTRIB
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _excluded_set(excluded_dir_names) -> set[str]:
+    return {item.strip().lower() for item in (excluded_dir_names or DEFAULT_EXCLUDED_DIR_NAMES) if item.strip()}
+
+
+class InotifyWatcher:
+    """Recursive inotify watch on a directory tree (Linux only, via ctypes)."""
+
+    def __init__(self, root: str | Path, *, excluded_dir_names=None):
+        self.root = Path(root).expanduser().resolve()
+        self.excluded = _excluded_set(excluded_dir_names)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs: dict[int, Path] = {}
+        try:
+            self._watch_tree(self.root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in {errno.ENOENT, errno.ENOTDIR}:
+                return
+            # ENOSPC here means fs.inotify.max_user_watches is exhausted.
+            raise OSError(err, f"inotify_add_watch {directory}: {os.strerror(err)}")
+        self._dirs[wd] = directory
+
+    def _watch_tree(self, top: Path) -> list[str]:
+        """Watch ``top`` and its subdirectories; return files already inside it."""
+        found: list[str] = []
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            self._add_watch(directory)
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name.lower() not in self.excluded:
+                        stack.append(Path(entry.path))
+                else:
+                    found.append(self._relative(Path(entry.path)))
+        return found
+
+    def _relative(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def wait(self, timeout: float) -> set[str]:
+        ready, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if not ready:
+            return set()
+        changed: set[str] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                self._handle_event(wd, mask, name, changed)
+        return changed
+
+    def _handle_event(self, wd: int, mask: int, name: str, changed: set[str]) -> None:
+        if mask & IN_Q_OVERFLOW:
+            changed.add(RESCAN)
+            return
+        directory = self._dirs.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            self._dirs.pop(wd, None)
+            if directory == self.root:
+                changed.add(RESCAN)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            if directory == self.root:
+                changed.add(RESCAN)
+            return
+        if not name:
+            return
+        path = directory / name
+        if mask & IN_ISDIR:
+            if name.lower() in self.excluded:
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may land before the new watch is in place; report what is there.
+                changed.update(self._watch_tree(path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                changed.add(self._relative(path) + "/")
+            return
+        changed.add(self._relative(path))
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Portable fallback: compares (mtime, size) snapshots of the tree."""
+
+    def __init__(self, root: str | Path, *, interval: float = 5.0, excluded_dir_names=None):
+        self.root = Path(root).expanduser().resolve()
+        self.interval = interval
+        self.excluded = _excluded_set(excluded_dir_names)
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot: dict[str, tuple[int, int]] = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name.lower() not in self.excluded:
+                            stack.append(Path(entry.path))
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                relative = Path(entry.path).relative_to(self.root).as_posix()
+                snapshot[relative] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: float) -> set[str]:
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(max(timeout, 0))
+            return set()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_scan = time.monotonic() + self.interval
+        current = self._scan()
+        previous = self._snapshot
+        self._snapshot = current
+        changed = {path for path, stamp in current.items() if previous.get(path) != stamp}
+        changed.update(previous.keys() - current.keys())
+        return changed
+
+    def close(self) -> None:
+        return None
+
+
+def open_watcher(root: str | Path, *, poll_interval: float = 5.0, force_polling: bool = False, excluded_dir_names=None):
+    """Prefer inotify; fall back to stat polling when it is unavailable or out of watches."""
+    if not force_polling:
+        try:
+            return InotifyWatcher(root, excluded_dir_names=excluded_dir_names)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, interval=poll_interval, excluded_dir_names=excluded_dir_names)
+
+
+class Debouncer:
+    """Collects change bursts; releases them after ``quiet`` seconds without new
+    events, or ``max_delay`` seconds after the first one, whichever is sooner."""
+
+    def __init__(self, quiet: float = 2.0, max_delay: float = 30.0, clock=time.monotonic):
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending: set[str] = set()
+        self._first_at: float | None = None
+        self._last_at: float | None = None
+
+    def add(self, paths: set[str]) -> None:
+        if not paths:
+            return
+        now = self.clock()
+        if self._first_at is None:
+            self._first_at = now
+        self._last_at = now
+        self.pending.update(paths)
+
+    def time_until_ready(self) -> float | None:
+        if self._first_at is None or self._last_at is None:
+            return None
+        due = min(self._last_at + self.quiet, self._first_at + self.max_delay)
+        return max(due - self.clock(), 0.0)
+
+    def pop_ready(self) -> set[str]:
+        remaining = self.time_until_ready()
+        if remaining is None or remaining > 0:
+            return set()
+        batch = self.pending
+        self.pending = set()
+        self._first_at = self._last_at = None
+        return batch
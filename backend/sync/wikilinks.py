@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from django.utils.text import slugify
+
+
+def _normalize_key(value: str) -> str:
+    text = str(value or "").strip().replace("\\", "/").strip("/")
+    if text.lower().endswith(".md"):
+        text = text[:-3]
+    return text.casefold()
+
+
+def _frontmatter_aliases(frontmatter: dict[str, Any] | None) -> list[str]:
+    if not isinstance(frontmatter, dict):
+        return []
+    aliases: list[str] = []
+    for key in ("aliases", "alias"):
+        raw = frontmatter.get(key)
+        if isinstance(raw, list):
+            aliases.extend(str(item).strip() for item in raw if str(item).strip())
+        elif raw:
+            aliases.append(str(raw).strip())
+    return aliases
+
+
+@dataclass
+class WikilinkIndex:
+    """Resolves Obsidian ``[[target]]`` text to a node key.
+
+    Lookup order mirrors how Obsidian resolves links: explicit title, file
+    stem, frontmatter alias, then any trailing path suffix
+    (``entities/karpathy`` matches ``3-Knowledge/entities/karpathy.md``).
+    Matching is case-insensitive; the first entry added wins on collisions.
+    """
+
+    titles: dict[str, str] = field(default_factory=dict)
+    stems: dict[str, str] = field(default_factory=dict)
+    aliases: dict[str, str] = field(default_factory=dict)
+    path_suffixes: dict[str, str] = field(default_factory=dict)
+    slugs: set[str] = field(default_factory=set)
+
+    def add(
+        self,
+        key: str,
+        *,
+        path: str,
+        title: str = "",
+        frontmatter: dict[str, Any] | None = None,
+    ) -> None:
+        self.slugs.add(key)
+        if title:
+            self.titles.setdefault(_normalize_key(title), key)
+        normalized_path = _normalize_key(path)
+        parts = [part for part in normalized_path.split("/") if part]
+        if parts:
+            self.stems.setdefault(parts[-1], key)
+        for start in range(len(parts) - 1):
+            self.path_suffixes.setdefault("/".join(parts[start:]), key)
+        for alias in _frontmatter_aliases(frontmatter):
+            self.aliases.setdefault(_normalize_key(alias), key)
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[Any]) -> "WikilinkIndex":
+        """Build from objects exposing ``slug``, ``path``, ``title`` and ``frontmatter``."""
+        index = cls()
+        for node in sorted(nodes, key=lambda item: str(item.path)):
+            index.add(
+                node.slug,
+                path=node.path,
+                title=node.title,
+                frontmatter=getattr(node, "frontmatter", None),
+            )
+        return index
+
+    def resolve(self, target: str) -> str | None:
+        text = str(target or "").strip()
+        if not text:
+            return None
+        key = _normalize_key(text)
+        for table in (self.titles, self.stems, self.aliases, self.path_suffixes):
+            hit = table.get(key)
+            if hit:
+                return hit
+        for candidate in (slugify(text, allow_unicode=True), slugify(text.replace("/", "__"), allow_unicode=True)):
+            if candidate and candidate in self.slugs:
+                return candidate
+        return None
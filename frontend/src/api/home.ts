@@ -278,8 +278,8 @@ export async function fetchHomeLikeStatus() {
   return data.data as HomeLikeState;
 }
 
-export async function toggleHomeLike() {
-  const { data } = await apiClient.post("/home/like/");
+export async function toggleHomeLike(liked: boolean) {
+  const { data } = await apiClient.post("/home/like/", { liked });
   return data.data as HomeLikeState;
 }
 
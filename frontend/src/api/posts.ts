@@ -54,8 +54,9 @@ export async function incrementPostViews(slug: string) {
   return data.data as { slug: string; views: number; throttled: boolean };
 }
 
-export async function togglePostLike(slug: string) {
-  const { data } = await apiClient.post(`/posts/${slug}/like/`);
+// Sends the desired state rather than "toggle", so a retried request cannot undo the like.
+export async function togglePostLike(slug: string, liked: boolean) {
+  const { data } = await apiClient.post(`/posts/${slug}/like/`, { liked });
   return data.data as { slug: string; likes: number; liked: boolean };
 }
 
@@ -189,7 +189,7 @@ export function HeroSection({ hero, githubUrl, siteVisits }: HeroSectionProps) {
     homeLikeLoadingRef.current = true;
     setHomeLikeLoading(true);
     try {
-      const result = await toggleHomeLike();
+      const result = await toggleHomeLike(!homeLiked);
       setHomeLiked(result.liked);
       setHomeLikes(result.likes);
       if (result.liked) {
@@ -123,7 +123,7 @@ function useContextualLike() {
       const wasLiked = liked;
       setLiked(!wasLiked);
       setCount((n) => n + (wasLiked ? -1 : 1));
-      void toggleHomeLike().then((res) => {
+      void toggleHomeLike(!wasLiked).then((res) => {
         setLiked(res.liked);
         setCount(res.likes);
       });
@@ -131,7 +131,7 @@ function useContextualLike() {
       const wasLiked = liked;
       setLiked(!wasLiked);
       setCount((n) => n + (wasLiked ? -1 : 1));
-      void togglePostLike(slug).then((res) => {
+      void togglePostLike(slug, !wasLiked).then((res) => {
         setLiked(res.liked);
         setCount(res.likes);
       });
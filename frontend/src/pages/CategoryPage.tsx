@@ -131,7 +131,7 @@ export function CategoryPage({ category, title }: CategoryPageProps) {
       [post.slug]: { liked: !wasLiked, likes: prevLikes + (wasLiked ? -1 : 1) },
     }));
 
-    void togglePostLike(post.slug).then((res) => {
+    void togglePostLike(post.slug, !wasLiked).then((res) => {
       setLikeOverrides((prev) => ({
         ...prev,
         [post.slug]: { liked: res.liked, likes: res.likes },
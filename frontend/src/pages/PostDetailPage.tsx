@@ -157,6 +157,15 @@ function resolveMarkdownAssetUrl(src: string): string {
   }
 }
 
+// Synced post images carry their pixel size as `#w=..&h=..`; the fragment never reaches the server or CDN.
+function splitImageSize(src: string): { src: string; width?: number; height?: number } {
+  const match = /#w=(\d+)&h=(\d+)$/.exec(src);
+  if (!match) {
+    return { src };
+  }
+  return { src: src.slice(0, match.index), width: Number(match[1]), height: Number(match[2]) };
+}
+
 function scoreRelatedPost(post: PostSummary, tagSet: Set<string>): number {
   return post.tags.reduce((total, tag) => {
     const normalizedTag = String(tag).trim();
@@ -193,7 +202,7 @@ export function PostDetailPage() {
     setPostLiked(!wasLiked);
     setPostLikes((n) => n + (wasLiked ? -1 : 1));
 
-    void togglePostLike(slug).then((res) => {
+    void togglePostLike(slug, !wasLiked).then((res) => {
       setPostLiked(res.liked);
       setPostLikes(res.likes);
     }).catch(() => {
@@ -539,16 +548,19 @@ export function PostDetailPage() {
         </td>
       ),
       img: ({ src, alt, ...props }: ImgHTMLAttributes<HTMLImageElement>) => {
-        const resolvedSrc = resolveMarkdownAssetUrl(String(src ?? ""));
+        const sized = splitImageSize(String(src ?? ""));
+        const resolvedSrc = resolveMarkdownAssetUrl(sized.src);
         return (
           <figure className="mt-5 overflow-hidden rounded-xl border border-theme-line bg-theme-surface">
             <img
               {...props}
               src={resolvedSrc}
               alt={String(alt ?? "")}
+              width={sized.width}
+              height={sized.height}
               loading="lazy"
               decoding="async"
-              className="max-h-[460px] w-full object-contain bg-theme-surface-raised"
+              className="h-auto max-h-[460px] w-full object-contain bg-theme-surface-raised"
               onError={(event) => {
                 const image = event.currentTarget;
                 if (image.dataset.fallbackTried === "1") {
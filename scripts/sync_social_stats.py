@@ -7,11 +7,13 @@
 
 import os
 import sys
-import json
 import sqlite3
-import urllib.request
-import urllib.parse
 from datetime import datetime, timedelta
+from pathlib import Path
+
+# 复用后端的出站 HTTP 客户端（连接复用 + 重试退避）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from sync.http_client import HttpClient, HttpError  # noqa: E402
 
 # ── 配置 ──
 HERMES_DB = os.path.expanduser("~/.hermes/scripts/social-dashboard/data/social_stats.db")
@@ -78,28 +80,16 @@ def push_to_django(data: list[dict]) -> bool:
         print("ℹ️ 无数据，跳过推送")
         return False
 
-    payload = json.dumps({"data": data}).encode("utf-8")
-
-    req = urllib.request.Request(
-        DJANGO_API,
-        data=payload,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {API_TOKEN}" if API_TOKEN else "",
-        },
-        method="POST",
-    )
-
+    headers = {"Authorization": f"Bearer {API_TOKEN}"} if API_TOKEN else {}
     try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            result = json.loads(resp.read())
-            print(f"✅ 推送成功: {result.get('message', '')}")
-            return True
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        print(f"❌ HTTP {e.code}: {body[:500]}")
-        return False
-    except Exception as e:
+        resp = HttpClient().request("POST", DJANGO_API, payload={"data": data}, headers=headers, timeout=30)
+        if not resp.ok:
+            print(f"❌ HTTP {resp.status}: {resp.text()[:500]}")
+            return False
+        result = resp.json()
+        print(f"✅ 推送成功: {result.get('message', '')}")
+        return True
+    except (HttpError, ValueError) as e:
         print(f"❌ 请求失败: {e}")
         return False
 